@@ -0,0 +1,63 @@
+from flask import Flask, Response, render_template, jsonify, request
+from config import config
+import os
+
+def create_app(config_name='default'):
+    app = Flask(__name__)
+    
+    # 加载配置
+    app.config.from_object(config[config_name])
+    
+    # 部署在反向代理之后时按 X-Forwarded-For 取客户端IP（DeepSeek API 按客户端IP限流）
+    if app.config['PROXY_FIX_X_FOR']:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'])
+
+    # 确保实例文件夹存在
+    try:
+        os.makedirs(app.instance_path)
+    except OSError:
+        pass
+
+    # 监控指标：Redis 调用耗时在客户端层统计，需要在创建服务之前启用
+    if app.config['METRICS_ENABLED']:
+        from app.services import metrics
+        metrics.instrument_redis()
+
+        @app.route('/metrics')
+        def export_metrics():
+            return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+    # 注册蓝图（路由模块导入时创建各服务，需要应用上下文）
+    with app.app_context():
+        from app.api import api_bp
+    app.register_blueprint(api_bp, url_prefix='/api')
+
+    # 注册命令行工具
+    from app.commands import content_cli, memory_cli
+    app.cli.add_command(memory_cli)
+    app.cli.add_command(content_cli)
+
+    # 前端路由
+    @app.route('/')
+    def index():
+        return render_template('index.html')
+
+    @app.route('/learning-path')
+    def learning_path():
+        return render_template('learning_path.html')
+
+    @app.route('/review')
+    def review():
+        return render_template('review.html')
+
+    # 注册错误处理
+    @app.errorhandler(404)
+    def not_found_error(error):
+        return render_template('404.html'), 404
+
+    @app.errorhandler(500)
+    def internal_error(error):
+        return render_template('500.html'), 500
+
+    return app
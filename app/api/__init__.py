@@ -1,7 +1 @@
-from flask import Blueprint
-
-api_bp = Blueprint('api', __name__)
-
-from app.api import concept, learning, memory
-
-from . import routes 
\ No newline at end of file
+from app.api.routes import api_bp
@@ -0,0 +1,194 @@
+import asyncio
+import json
+import time
+from flask import current_app as wsgi_current_app
+from quart import Blueprint, Response, current_app, g, jsonify, request, stream_with_context, url_for
+from app.api.routes import (concept_service, hot_concepts, learning_path_jobs, learning_service,
+                            start_background_tasks)
+from app.services.concept_service import AsyncConceptService
+from app.services.content_store import create_async_content_store
+from app.services.hot_concepts import LEARNING_PATH_RULES, concept_from_request
+from app.services.job_queue import JobQueueFullError, create_learning_path_reader
+from app.services.learning_service import AsyncLearningService
+from app.services.metrics import observe_request, register_cache
+
+# 异步服务模式下由协程处理的接口：等待 DeepSeek API 和 Redis 期间不占用线程，
+# 其余接口仍由同步的 Flask 应用处理（见 app/asgi.py）。
+# 与同步路由共享进程内学习路径缓存、记忆服务和任务队列，需要在 Flask 应用上下文中导入。
+async_api_bp = Blueprint('async_api', __name__)
+wsgi_app = wsgi_current_app._get_current_object()
+async_content_store = create_async_content_store(wsgi_app.config)
+async_concept_service = AsyncConceptService(concept_service, async_content_store)
+async_learning_service = AsyncLearningService(learning_service, async_content_store)
+learning_path_reader = create_learning_path_reader(wsgi_app.config)
+
+if wsgi_app.config['METRICS_ENABLED']:
+    register_cache('content_async', lambda: async_content_store.stats)
+
+    @async_api_bp.before_request
+    async def start_request_timer():
+        g.request_started_at = time.perf_counter()
+
+    @async_api_bp.after_request
+    async def record_request(response):
+        # 流式响应只统计到开始输出为止
+        started_at = g.pop('request_started_at', None)
+        if started_at is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            observe_request(request.method, route, response.status_code, time.perf_counter() - started_at)
+        return response
+
+if hot_concepts is not None:
+    @async_api_bp.before_request
+    async def record_hot_concept():
+        start_background_tasks()
+        if request.url_rule is None:
+            return
+        rule = request.url_rule.rule
+        data = await request.get_json(silent=True) if rule in LEARNING_PATH_RULES else None
+        concept = concept_from_request(rule, request.view_args, data)
+        if concept is not None:
+            hot_concepts.record(concept)
+
+def _ndjson_response(rows):
+    """以 NDJSON 流式返回异步产生的结果，输出过程中出错时以一行 error 结束"""
+    @stream_with_context
+    async def generate():
+        try:
+            async for row in rows:
+                yield json.dumps(row, ensure_ascii=False) + '\n'
+        except Exception as e:
+            current_app.logger.exception('流式输出失败')
+            yield json.dumps({'error': str(e)}, ensure_ascii=False) + '\n'
+    response = Response(generate(), mimetype='application/x-ndjson')
+    # 生成时间取决于 DeepSeek API，不使用默认的响应超时
+    response.timeout = None
+    return response
+
+def _submit_learning_path_job(params):
+    """在线程池中提交学习路径生成任务（JobQueue 需要 Flask 应用上下文）"""
+    with wsgi_app.app_context():
+        return learning_path_jobs.submit(params)
+
+def _llm_client_id():
+    """DeepSeek API 限流的调用方标识（客户端IP，与同步路由相同；反向代理之后需启用 uvicorn 的 --proxy-headers）"""
+    return request.remote_addr
+
+# 概念相关API
+@async_api_bp.route('/concept/<concept_name>/explanation', methods=['GET'])
+async def get_concept_explanation(concept_name):
+    """获取概念解释"""
+    try:
+        explanation = await async_concept_service.get_concept_explanation(concept_name, _llm_client_id())
+        return jsonify(explanation)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@async_api_bp.route('/concept/<concept_name>/exercises', methods=['GET'])
+async def get_concept_exercises(concept_name):
+    """获取概念练习题"""
+    difficulty = request.args.get('difficulty', 'medium')
+    
+    try:
+        exercises = await async_concept_service.get_concept_exercises(
+            concept_name, difficulty, _llm_client_id())
+        return jsonify(exercises)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# 学习路径相关API
+@async_api_bp.route('/learning/path', methods=['POST'])
+async def generate_learning_path():
+    """生成学习路径（任务方式的选择与同步路由相同）"""
+    data = await request.get_json()
+    concept = data.get('concept')
+    user_level = data.get('user_level', 'beginner')
+    # 提供 user_id 时按该用户的掌握情况个性化，不提供时不区分用户
+    user_id = data.get('user_id')
+    client_id = _llm_client_id()
+    run_async = data.get('async', False)
+    
+    if not concept:
+        return jsonify({'error': '概念名称不能为空'}), 400
+    if not isinstance(run_async, bool):
+        return jsonify({'error': 'async 必须是布尔值'}), 400
+    
+    try:
+        if run_async or current_app.config['LEARNING_PATH_ASYNC']:
+            job_id = await asyncio.to_thread(_submit_learning_path_job, {
+                'concept': concept, 'user_level': user_level, 'user_id': user_id, 'client_id': client_id
+            })
+            return jsonify({
+                'job_id': job_id,
+                'status': 'queued',
+                'status_url': url_for('async_api.get_learning_path_job', job_id=job_id),
+                'events_url': url_for('async_api.stream_learning_path_job', job_id=job_id)
+            }), 202
+        learning_path = await async_learning_service.generate_learning_path(
+            concept, user_level, user_id, client_id)
+        return jsonify(learning_path)
+    except JobQueueFullError as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@async_api_bp.route('/learning/path/stream', methods=['POST'])
+async def stream_learning_path():
+    """流式生成学习路径（NDJSON，每天的学习计划完整后输出一行 {"day", "plan"}）
+
+    某一天的目标和学习活动之后出现空行即视为完整，不等待下一天的标题，见 LearningPathParser。
+    """
+    data = await request.get_json(silent=True) or {}
+    concept = data.get('concept')
+    user_level = data.get('user_level', 'beginner')
+    user_id = data.get('user_id')
+    client_id = _llm_client_id()
+    
+    if not concept:
+        return jsonify({'error': '概念名称不能为空'}), 400
+    
+    async def rows():
+        async for day, plan in async_learning_service.stream_learning_path(
+                concept, user_level, user_id, client_id):
+            yield {'day': day, 'plan': plan}
+    
+    return _ndjson_response(rows())
+
+@async_api_bp.route('/learning/path/<job_id>', methods=['GET'])
+async def get_learning_path_job(job_id):
+    """查询学习路径生成任务的状态和结果"""
+    try:
+        job = await learning_path_reader.get(job_id)
+        if job is None:
+            return jsonify({'error': '任务不存在或已过期'}), 404
+        return jsonify(job)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@async_api_bp.route('/learning/path/<job_id>/events', methods=['GET'])
+async def stream_learning_path_job(job_id):
+    """以 SSE 推送学习路径生成任务的状态，任务完成或失败后结束"""
+    try:
+        if await learning_path_reader.get(job_id) is None:
+            return jsonify({'error': '任务不存在或已过期'}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+    @stream_with_context
+    async def generate():
+        try:
+            async for job in learning_path_reader.watch(
+                    job_id, timeout=current_app.config['LEARNING_PATH_EVENTS_TIMEOUT']):
+                if job is None:
+                    # 心跳，防止代理断开空闲连接
+                    yield ': keep-alive\n\n'
+                else:
+                    yield f"event: {job['status']}\ndata: {json.dumps(job, ensure_ascii=False)}\n\n"
+        except Exception as e:
+            current_app.logger.exception('推送任务状态失败')
+            yield f"event: error\ndata: {json.dumps({'error': str(e)}, ensure_ascii=False)}\n\n"
+    
+    response = Response(generate(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.timeout = None
+    return response
\ No newline at end of file
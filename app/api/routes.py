@@ -1,12 +1,89 @@
-from flask import Blueprint, jsonify, request
+import hmac
+import json
+from datetime import datetime, timedelta
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context, url_for
+from app.services.admission import create_llm_admission
 from app.services.concept_service import ConceptService
+from app.services.content_store import create_content_store
+from app.services.hot_concepts import create_content_prewarmer, create_hot_concept_tracker
+from app.services.job_queue import JobQueueFullError, create_learning_path_queue
+from app.services.knowledge_graph_service import KnowledgeGraphService
 from app.services.learning_service import LearningService
-from app.services.memory_service import MemoryService
+from app.services.memory_service import DASHBOARD_FIELDS, MemoryService
+from app.services.memory_store import ConcurrentUpdateError
+from app.services.metrics import instrument_blueprint, register_cache, register_gauge
+from app.services.profiler import PROFILE_MODES, create_request_profiler
 
 api_bp = Blueprint('api', __name__)
-concept_service = ConceptService()
-learning_service = LearningService()
+content_store = create_content_store(current_app.config)
+llm_admission = create_llm_admission(current_app.config)
+concept_service = ConceptService(content_store, llm_admission)
 memory_service = MemoryService()
+learning_service = LearningService(content_store, memory_service, admission=llm_admission)
+learning_path_jobs = create_learning_path_queue(current_app.config, learning_service)
+hot_concepts = create_hot_concept_tracker(current_app.config)
+content_prewarmer = create_content_prewarmer(current_app.config, hot_concepts, concept_service)
+
+def start_background_tasks():
+    """启动热门概念统计和内容预热的后台线程（重复调用无效）
+
+    在处理首个请求时调用，导入本模块的 CLI 命令（flask memory export 等）不会启动。
+    """
+    for task in (hot_concepts, content_prewarmer):
+        if task is not None:
+            task.start()
+
+if hot_concepts is not None:
+    hot_concepts.instrument(api_bp)
+    api_bp.before_app_request(start_background_tasks)
+
+if current_app.config['METRICS_ENABLED']:
+    instrument_blueprint(api_bp)
+    register_cache('content', lambda: content_store.stats)
+    register_cache('learning_path', lambda: learning_service.learning_paths.stats)
+    register_gauge('job_queue_pending', '本进程排队和执行中的后台任务数',
+                   lambda: [({'queue': learning_path_jobs.name}, learning_path_jobs.pending_count())])
+    register_gauge('job_queue_capacity', '本进程后台任务数上限',
+                   lambda: [({'queue': learning_path_jobs.name}, learning_path_jobs.max_pending)])
+    if llm_admission is not None:
+        register_gauge('deepseek_rate_limit', 'DeepSeek API 调用限额（rate 为每秒补充的令牌数，burst 为令牌桶容量）',
+                       lambda: [({'limit': name}, value) for name, value in llm_admission.get_limits().items()])
+
+request_profiler = create_request_profiler(current_app.config, {
+    'ConceptService': ConceptService,
+    'MemoryService': MemoryService,
+    'KnowledgeGraphService': KnowledgeGraphService
+})
+if current_app.config['ADMIN_TOKEN']:
+    request_profiler.instrument(api_bp)
+
+def _check_admin():
+    """管理接口的访问检查，通过时返回 None，否则返回错误响应"""
+    token = current_app.config['ADMIN_TOKEN']
+    if not token:
+        return jsonify({'error': '管理接口未启用'}), 403
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), token):
+        return jsonify({'error': '无权访问'}), 403
+    return None
+
+def _ndjson_response(rows):
+    """以 NDJSON（每行一个JSON对象）流式返回结果，输出过程中出错时以一行 error 结束"""
+    def generate():
+        try:
+            for row in rows:
+                yield json.dumps(row, ensure_ascii=False) + '\n'
+        except Exception as e:
+            current_app.logger.exception('流式输出失败')
+            yield json.dumps({'error': str(e)}, ensure_ascii=False) + '\n'
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def _llm_client_id():
+    """DeepSeek API 限流的调用方标识
+    
+    没有用户认证，请求参数中的 user_id 可以任意填写，因此按客户端IP限流
+    （部署在反向代理之后时需要设置 PROXY_FIX_X_FOR，见 create_app）。
+    """
+    return request.remote_addr
 
 # 概念相关API
 @api_bp.route('/concept/search', methods=['GET'])
@@ -35,7 +112,7 @@ def get_concept(concept_name):
 def get_concept_explanation(concept_name):
     """获取概念解释"""
     try:
-        explanation = concept_service.get_concept_explanation(concept_name)
+        explanation = concept_service.get_concept_explanation(concept_name, _llm_client_id())
         return jsonify(explanation)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -43,8 +120,10 @@ def get_concept_explanation(concept_name):
 @api_bp.route('/concept/<concept_name>/exercises', methods=['GET'])
 def get_concept_exercises(concept_name):
     """获取概念练习题"""
+    difficulty = request.args.get('difficulty', 'medium')
+    
     try:
-        exercises = concept_service.get_concept_exercises(concept_name)
+        exercises = concept_service.get_concept_exercises(concept_name, difficulty, _llm_client_id())
         return jsonify(exercises)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -58,23 +137,143 @@ def get_concept_knowledge_graph(concept_name):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@api_bp.route('/content/stats', methods=['GET'])
+def get_content_stats():
+    """获取生成内容存储的压缩统计"""
+    try:
+        return jsonify(content_store.get_stats())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/content/hot', methods=['GET'])
+def get_hot_concepts():
+    """获取最热门的概念及内容预热统计"""
+    if hot_concepts is None:
+        return jsonify({'error': '热门概念统计未启用'}), 404
+    limit = request.args.get('limit', 20, type=int)
+    if limit <= 0 or limit > hot_concepts.top_k:
+        return jsonify({'error': f'limit 必须在 1 到 {hot_concepts.top_k} 之间'}), 400
+    
+    try:
+        return jsonify({
+            'concepts': [{'concept': concept, 'requests': count} for concept, count in hot_concepts.top(limit)],
+            'prewarm': content_prewarmer.stats if content_prewarmer is not None else None
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # 学习路径相关API
 @api_bp.route('/learning/path', methods=['POST'])
 def generate_learning_path():
-    """生成学习路径"""
+    """生成学习路径
+
+    LEARNING_PATH_ASYNC 开启时总是以任务方式生成；未开启时可以在请求体中传 "async": true
+    以任务方式生成（不能把已开启的任务方式改为同步生成）。同步服务模式不提供任务状态的
+    SSE 推送，返回的任务只包含 status_url。
+    """
     data = request.json
     concept = data.get('concept')
     user_level = data.get('user_level', 'beginner')
+    # 提供 user_id 时按该用户的掌握情况个性化，不提供时不区分用户
+    user_id = data.get('user_id')
+    client_id = _llm_client_id()
+    run_async = data.get('async', False)
     
     if not concept:
         return jsonify({'error': '概念名称不能为空'}), 400
+    if not isinstance(run_async, bool):
+        return jsonify({'error': 'async 必须是布尔值'}), 400
     
     try:
-        learning_path = learning_service.generate_learning_path(concept, user_level)
+        if run_async or current_app.config['LEARNING_PATH_ASYNC']:
+            # 异步模式：立即返回任务ID，由后台线程池生成
+            job_id = learning_path_jobs.submit({
+                'concept': concept, 'user_level': user_level, 'user_id': user_id, 'client_id': client_id
+            })
+            return jsonify({
+                'job_id': job_id,
+                'status': 'queued',
+                'status_url': url_for('api.get_learning_path_job', job_id=job_id)
+            }), 202
+        learning_path = learning_service.generate_learning_path(concept, user_level, user_id, client_id)
         return jsonify(learning_path)
+    except JobQueueFullError as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@api_bp.route('/learning/path/stream', methods=['POST'])
+def stream_learning_path():
+    """流式生成学习路径（NDJSON，每天的学习计划完整后输出一行 {"day", "plan"}）
+
+    某一天的目标和学习活动之后出现空行即视为完整，不等待下一天的标题，见 LearningPathParser。
+    """
+    data = request.get_json(silent=True) or {}
+    concept = data.get('concept')
+    user_level = data.get('user_level', 'beginner')
+    user_id = data.get('user_id')
+    
+    if not concept:
+        return jsonify({'error': '概念名称不能为空'}), 400
+    
+    return _ndjson_response(
+        {'day': day, 'plan': plan}
+        for day, plan in learning_service.stream_learning_path(concept, user_level, user_id, _llm_client_id())
+    )
+
+@api_bp.route('/learning/path-cache/stats', methods=['GET'])
+def get_learning_path_cache_stats():
+    """获取学习路径缓存统计"""
+    try:
+        return jsonify(learning_service.learning_paths.get_stats())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/learning/path-cache/invalidate', methods=['POST'])
+def invalidate_learning_path_cache():
+    """知识图谱在外部修改后，使相关概念的学习路径缓存失效（管理接口）
+
+    只递增所列概念的图谱版本号，不查询知识图谱。学习路径依据概念周围 GRAPH_DEPTH 跳以内的
+    图谱生成，调用方需要同时列出变化的边的端点及距端点 GRAPH_DEPTH - 1 跳以内的概念，
+    否则其余概念缓存的学习路径最迟在 LEARNING_PATH_CACHE_TTL 后才过期。
+    """
+    denied = _check_admin()
+    if denied:
+        return denied
+    
+    data = request.get_json(silent=True) or {}
+    concepts = data.get('concepts')
+    
+    if not isinstance(concepts, list) or not concepts \
+            or not all(isinstance(concept, str) and concept for concept in concepts):
+        return jsonify({'error': 'concepts 必须是非空的概念名称列表'}), 400
+    
+    try:
+        learning_service.learning_paths.invalidate(concepts)
+        return jsonify({'status': 'success', 'invalidated': len(set(concepts))})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/learning/path/<job_id>', methods=['GET'])
+def get_learning_path_job(job_id):
+    """查询学习路径生成任务的状态和结果"""
+    try:
+        job = learning_path_jobs.get(job_id)
+        if job is None:
+            return jsonify({'error': '任务不存在或已过期'}), 404
+        return jsonify(job)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/learning/path/<job_id>/events', methods=['GET'])
+def stream_learning_path_job(job_id):
+    """以 SSE 推送学习路径生成任务的状态（只在异步服务模式下提供）
+
+    同步 worker 在 SSE 连接等待期间无法处理其他请求，因此同步服务模式下返回 501，客户端改为
+    轮询 status_url；异步服务模式下该路径由 async_routes 中的同名路由以协程处理。
+    """
+    return jsonify({'error': '同步服务模式不支持推送任务状态，请轮询 status_url 或使用异步服务模式'}), 501
+
 # 记忆管理相关API
 @api_bp.route('/memory/review', methods=['GET'])
 def get_review_schedule():
@@ -82,7 +281,18 @@ def get_review_schedule():
     user_id = request.args.get('user_id', '1')
     
     try:
-        schedule = memory_service.get_review_schedule(user_id)
+        before = request.args.get('before')
+        before = datetime.fromisoformat(before) if before else None
+        limit = request.args.get('limit', type=int)
+        offset = request.args.get('offset', 0, type=int)
+    except ValueError:
+        return jsonify({'error': 'before 参数必须是ISO格式的日期或时间'}), 400
+    
+    if (limit is not None and limit <= 0) or offset < 0:
+        return jsonify({'error': '分页参数无效'}), 400
+    
+    try:
+        schedule = memory_service.get_review_schedule(user_id, before, limit, offset)
         return jsonify(schedule)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -119,6 +329,41 @@ def skip_review():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@api_bp.route('/memory/review/batch', methods=['POST'])
+def submit_review_batch():
+    """批量提交复习结果"""
+    data = request.json or {}
+    user_id = data.get('user_id', '1')
+    results = data.get('results')
+    
+    if not results or not isinstance(results, list):
+        return jsonify({'error': '复习结果不能为空'}), 400
+    if len(results) > current_app.config['REVIEW_BATCH_MAX_SIZE']:
+        return jsonify({'error': '复习结果条数超过上限'}), 400
+    
+    reviews = []
+    for item in results:
+        concept = item.get('concept') if isinstance(item, dict) else None
+        score = item.get('performance_score') if isinstance(item, dict) else None
+        if not concept or isinstance(score, bool) or not isinstance(score, (int, float)) \
+                or not 0 <= score <= 1:
+            return jsonify({'error': '每条结果需要包含概念名称和0-1之间的表现分'}), 400
+        reviews.append((concept, score))
+    
+    try:
+        records, skipped = memory_service.apply_review_results(user_id, reviews)
+        schedule = memory_service.get_review_schedule(user_id)
+        return jsonify({
+            'status': 'success',
+            'updated': len(records),
+            'skipped': skipped,
+            'schedule': schedule
+        })
+    except ConcurrentUpdateError as e:
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @api_bp.route('/memory/stats', methods=['GET'])
 def get_learning_stats():
     """获取学习统计"""
@@ -139,4 +384,246 @@ def get_memory_strength():
         strength_data = memory_service.get_memory_strength(user_id)
         return jsonify(strength_data)
     except Exception as e:
-        return jsonify({'error': str(e)}), 500 
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500 
+
+@api_bp.route('/memory/history', methods=['GET'])
+def get_review_history():
+    """获取记忆强度变化历史"""
+    user_id = request.args.get('user_id', '1')
+    concept = request.args.get('concept')
+    
+    try:
+        history = memory_service.get_review_history(user_id, concept)
+        return jsonify(history)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/memory/forecast', methods=['GET', 'POST'])
+def get_review_forecast():
+    """预测未来每天到期的复习数量（单个用户，或按 cohort_id / user_ids 指定的多个用户）"""
+    params = _cohort_params()
+    
+    try:
+        days = int(params.get('days', 30))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'days 必须是整数'}), 400
+    if not 0 < days <= current_app.config['MEMORY_FORECAST_MAX_DAYS']:
+        return jsonify({'error': '预测天数超出范围'}), 400
+    
+    try:
+        if params.get('cohort_id') or params.get('user_ids'):
+            user_ids, error = _resolve_cohort_users(params)
+            if error:
+                return jsonify({'error': error[0]}), error[1]
+        else:
+            user_ids = [params.get('user_id', '1')]
+        if len(user_ids) > current_app.config['MEMORY_FORECAST_MAX_USERS']:
+            return jsonify({'error': '用户数量超过上限'}), 400
+        per_user = str(params.get('per_user', 'false')).lower() == 'true' or len(user_ids) == 1
+        
+        counts = memory_service.forecast_reviews(user_ids, days)
+        start = datetime.now().date()
+        result = {
+            'dates': [(start + timedelta(days=day)).isoformat() for day in range(days)],
+            'total': counts.sum(axis=0).tolist()
+        }
+        if per_user:
+            result['users'] = dict(zip(user_ids, counts.tolist()))
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/memory/dashboard', methods=['GET'])
+def get_memory_dashboard():
+    """获取复习页面数据（复习计划、记忆强度、学习统计）"""
+    user_id = request.args.get('user_id', '1')
+    fields = request.args.get('fields')
+    
+    if fields:
+        fields = [field.strip() for field in fields.split(',') if field.strip()]
+        invalid = [field for field in fields if field not in DASHBOARD_FIELDS]
+        if invalid:
+            return jsonify({'error': f'不支持的字段: {", ".join(invalid)}'}), 400
+    else:
+        fields = None
+    
+    try:
+        dashboard = memory_service.get_dashboard(user_id, fields)
+        return jsonify(dashboard)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# 班级批量查询API
+def _cohort_params():
+    """班级批量查询参数：GET 读取查询字符串，POST 读取JSON请求体（适合很长的用户列表）"""
+    if request.method == 'POST':
+        return request.get_json(silent=True) or {}
+    return request.args
+
+def _resolve_cohort_users(params):
+    """根据 cohort_id 或 user_ids 参数确定用户列表
+
+    Returns:
+        tuple: (用户ID列表, None) 或 (None, (错误信息, 状态码))
+    """
+    cohort_id = params.get('cohort_id')
+    user_ids = params.get('user_ids')
+    if cohort_id:
+        user_ids = memory_service.get_cohort_members(cohort_id)
+        if not user_ids:
+            return None, ('班级不存在或没有成员', 404)
+    elif isinstance(user_ids, str):
+        user_ids = [uid.strip() for uid in user_ids.split(',') if uid.strip()]
+    if not user_ids or not isinstance(user_ids, list) \
+            or not all(isinstance(uid, str) and uid for uid in user_ids):
+        return None, ('需要提供 cohort_id 或用户ID列表 user_ids', 400)
+    if len(user_ids) > current_app.config['COHORT_MAX_USERS']:
+        return None, ('用户数量超过上限', 400)
+    return user_ids, None
+
+@api_bp.route('/memory/cohorts/<cohort_id>', methods=['GET'])
+def get_cohort(cohort_id):
+    """获取班级成员"""
+    try:
+        user_ids = memory_service.get_cohort_members(cohort_id)
+        if not user_ids:
+            return jsonify({'error': '班级不存在或没有成员'}), 404
+        return jsonify({'cohort_id': cohort_id, 'user_ids': user_ids})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/memory/cohorts/<cohort_id>', methods=['PUT'])
+def set_cohort(cohort_id):
+    """设置班级成员（替换原有成员，空列表表示删除班级）"""
+    data = request.get_json(silent=True) or {}
+    user_ids = data.get('user_ids')
+    
+    if not isinstance(user_ids, list) or not all(isinstance(uid, str) and uid for uid in user_ids):
+        return jsonify({'error': 'user_ids 必须是用户ID列表'}), 400
+    if len(user_ids) > current_app.config['COHORT_MAX_USERS']:
+        return jsonify({'error': '用户数量超过上限'}), 400
+    
+    try:
+        members = memory_service.set_cohort_members(cohort_id, user_ids)
+        return jsonify({'status': 'success', 'cohort_id': cohort_id, 'members': members})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/memory/cohort/mastery', methods=['GET', 'POST'])
+def get_cohort_mastery():
+    """批量获取多个用户的掌握情况（NDJSON，每行一个用户）"""
+    try:
+        user_ids, error = _resolve_cohort_users(_cohort_params())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    if error:
+        return jsonify({'error': error[0]}), error[1]
+    
+    return _ndjson_response(memory_service.iter_cohort_mastery(user_ids))
+
+@api_bp.route('/memory/cohort/schedule', methods=['GET', 'POST'])
+def get_cohort_schedule():
+    """批量获取多个用户的复习计划（NDJSON，每行一个用户）"""
+    params = _cohort_params()
+    
+    try:
+        before = params.get('before')
+        before = datetime.fromisoformat(before) if before else None
+        limit = int(params['limit']) if params.get('limit') is not None else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'before 必须是ISO格式的日期或时间，limit 必须是整数'}), 400
+    
+    if limit is not None and limit <= 0:
+        return jsonify({'error': '分页参数无效'}), 400
+    
+    try:
+        user_ids, error = _resolve_cohort_users(params)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    if error:
+        return jsonify({'error': error[0]}), error[1]
+    
+    return _ndjson_response(memory_service.iter_cohort_schedule(user_ids, before, limit))
+
+@api_bp.route('/memory/cohort/concepts', methods=['GET', 'POST'])
+def get_cohort_concepts():
+    """按概念汇总多个用户的掌握情况"""
+    try:
+        user_ids, error = _resolve_cohort_users(_cohort_params())
+        if error:
+            return jsonify({'error': error[0]}), error[1]
+        concepts = memory_service.get_cohort_concept_summary(user_ids)
+        return jsonify({'users': len(user_ids), 'concepts': concepts})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# 管理API
+@api_bp.route('/admin/profiling', methods=['POST'])
+def start_profiling():
+    """开启性能分析会话：对之后匹配的请求（所有 worker 合计最多 requests 个，或在 duration 秒内）进行分析"""
+    denied = _check_admin()
+    if denied:
+        return denied
+    
+    data = request.get_json(silent=True) or {}
+    route = data.get('route') or None
+    mode = data.get('mode', 'sampling')
+    
+    if route is not None and not isinstance(route, str):
+        return jsonify({'error': 'route 必须是路由规则或请求路径'}), 400
+    if mode not in PROFILE_MODES:
+        return jsonify({'error': f'不支持的分析模式: {mode}'}), 400
+    try:
+        max_requests = int(data.get('requests', 10))
+        duration = float(data.get('duration', 60))
+        interval = float(data.get('interval', 0.005))
+    except (TypeError, ValueError):
+        return jsonify({'error': '分析参数无效'}), 400
+    if max_requests < 0 or not 0 < duration <= current_app.config['PROFILING_MAX_DURATION'] \
+            or not 0.001 <= interval <= 1:
+        return jsonify({'error': '分析参数超出范围'}), 400
+    
+    try:
+        session = request_profiler.start(route, mode, max_requests, duration, interval)
+        return jsonify(session)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/admin/profiling', methods=['GET'])
+def get_profiling_report():
+    """获取性能分析报告：各请求耗时、累计耗时最高的函数及各服务类中耗时最高的方法"""
+    denied = _check_admin()
+    if denied:
+        return denied
+    
+    top = request.args.get('top', 20, type=int)
+    
+    try:
+        return jsonify(request_profiler.get_report(request.args.get('session_id'), top))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/admin/profiling/flame', methods=['GET'])
+def get_profiling_flame():
+    """获取采样分析的火焰图数据（collapsed stack 格式）"""
+    denied = _check_admin()
+    if denied:
+        return denied
+    
+    try:
+        flame = request_profiler.get_flame(request.args.get('session_id'), request.args.get('request_id'))
+        return Response(flame, mimetype='text/plain')
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/admin/profiling', methods=['DELETE'])
+def stop_profiling():
+    """结束当前性能分析会话"""
+    denied = _check_admin()
+    if denied:
+        return denied
+    
+    try:
+        return jsonify({'status': 'success', 'session': request_profiler.stop()})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
\ No newline at end of file
@@ -0,0 +1,69 @@
+"""异步服务模式（ASGI）
+
+用法:
+    uvicorn --factory app.asgi:create_asgi_app --host 0.0.0.0 --port 5000
+
+需要等待 DeepSeek API 和 Redis 的接口（概念解释、练习题、学习路径及任务状态推送，见
+app/api/async_routes.py）由 Quart 协程处理，单个进程可以同时保持数百个慢请求；
+其余接口和页面仍由同步的 Flask 应用在线程池中处理，行为与同步模式相同。
+"""
+import os
+from a2wsgi import WSGIMiddleware
+from quart import Quart
+from werkzeug.exceptions import HTTPException
+from app import create_app
+
+
+class AsyncDispatcher:
+    """按路径分发 ASGI 请求：异步路由表中的接口交给 Quart 应用，其余交给 Flask 应用"""
+
+    def __init__(self, async_app, wsgi_app, wsgi_workers=10):
+        """初始化分发器
+
+        Args:
+            async_app: Quart 应用
+            wsgi_app: Flask 应用
+            wsgi_workers: 处理同步接口的线程数
+        """
+        self.async_app = async_app
+        self.wsgi_app = WSGIMiddleware(wsgi_app, workers=wsgi_workers)
+        self._urls = async_app.url_map.bind('')
+
+    def _is_async(self, scope):
+        try:
+            self._urls.match(scope['path'], method=scope['method'])
+        except HTTPException:
+            return False
+        return True
+
+    async def __call__(self, scope, receive, send):
+        # lifespan 等非 HTTP 事件由 Quart 应用处理
+        if scope['type'] == 'http' and not self._is_async(scope):
+            await self.wsgi_app(scope, receive, send)
+        else:
+            await self.async_app(scope, receive, send)
+
+
+def create_asgi_app(config_name=None):
+    """创建异步服务模式的 ASGI 应用
+
+    Args:
+        config_name: 配置名称，默认读取环境变量 FLASK_CONFIG
+
+    Returns:
+        AsyncDispatcher: ASGI 应用
+    """
+    wsgi_app = create_app(config_name or os.getenv('FLASK_CONFIG', 'default'))
+
+    async_app = Quart(__name__, static_folder=None, template_folder=None)
+    async_app.config.from_mapping(wsgi_app.config)
+
+    # 异步路由与同步路由共享服务实例，需要在 Flask 应用上下文中导入
+    with wsgi_app.app_context():
+        from app.api.async_routes import async_api_bp
+    async_app.register_blueprint(async_api_bp, url_prefix='/api')
+
+    # DeepSeek 客户端首次请求时才导入 openai（耗时较长），异步模式下会阻塞事件循环，启动时先导入
+    import openai  # noqa: F401
+
+    return AsyncDispatcher(async_app, wsgi_app, wsgi_app.config['ASGI_WSGI_WORKERS'])
@@ -0,0 +1,165 @@
+import click
+from flask.cli import AppGroup
+
+memory_cli = AppGroup('memory', help='记忆数据维护命令')
+content_cli = AppGroup('content', help='生成内容存储维护命令')
+
+
+@memory_cli.command('rescore')
+@click.option('--batch-size', default=500, show_default=True, help='每批处理的用户数')
+def rescore_command(batch_size):
+    """批量重算所有用户的复习时间（建议每晚执行）"""
+    from app.services.memory_service import MemoryService
+
+    result = MemoryService().rescore_all_records(batch_size=batch_size)
+    click.echo(
+        f"已重算 {result['users']} 个用户的 {result['records']} 条记录，"
+        f"耗时 {result['seconds']:.2f}s（{result['records_per_second']:.0f} 条/秒）"
+    )
+
+
+@memory_cli.command('rebuild-stats')
+@click.option('--user-id', default=None, help='只重建指定用户的统计数据')
+@click.option('--batch-size', default=500, show_default=True, help='SCAN 每批返回的键数量')
+def rebuild_stats_command(user_id, batch_size):
+    """根据原始学习记录重建统计计数器"""
+    from app.services.memory_service import MemoryService
+
+    memory_service = MemoryService()
+    if user_id:
+        stats = memory_service.rebuild_learning_stats(user_id)
+        click.echo(f"已重建用户 {user_id} 的统计数据: {stats}")
+    else:
+        users = memory_service.rebuild_all_learning_stats(batch_size=batch_size)
+        click.echo(f"已重建 {users} 个用户的统计数据")
+
+
+@memory_cli.command('migrate-legacy')
+@click.option('--batch-size', default=500, show_default=True, help='SCAN 每批返回的键数量')
+def migrate_legacy_command(batch_size):
+    """将旧版本以 JSON 字符串保存的学习记录转换为哈希表并建立复习时间索引（升级后执行一次）"""
+    from app.services.memory_service import MemoryService
+
+    try:
+        users, records = MemoryService().migrate_legacy_records(batch_size=batch_size)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"已转换 {users} 个用户的 {records} 条记录")
+
+
+@memory_cli.command('compact-events')
+@click.option('--user-id', default=None, help='只压缩指定用户的事件流')
+@click.option('--batch-size', default=500, show_default=True, help='SCAN 每批返回的键数量')
+def compact_events_command(user_id, batch_size):
+    """将复习事件流压缩为快照（建议定期执行）"""
+    from app.services.memory_service import MemoryService
+
+    event_log = MemoryService().event_log
+    if user_id:
+        events = event_log.compact(user_id)
+        click.echo(f"已将用户 {user_id} 的 {events} 条事件合并到快照")
+    else:
+        users, events = event_log.compact_all(batch_size=batch_size)
+        click.echo(f"已压缩 {users} 个用户的 {events} 条事件")
+
+
+def _open_dump(path, mode):
+    """打开导入导出文件：.gz 结尾时使用 gzip 流式压缩，- 表示标准输入输出"""
+    if path.endswith('.gz'):
+        import gzip
+        return gzip.open(path, mode + 't', encoding='utf-8', compresslevel=6)
+    return click.open_file(path, mode, encoding='utf-8')
+
+
+def _progress_printer(interval=5.0):
+    """每隔 interval 秒向标准错误输出一次进度"""
+    import time
+
+    last = [time.perf_counter()]
+
+    def report(result):
+        now = time.perf_counter()
+        if now - last[0] >= interval:
+            last[0] = now
+            click.echo(
+                f"  {result['users']} 个用户，{result['records']} 条记录，"
+                f"{result['records_per_second']:.0f} 条/秒", err=True)
+
+    return report
+
+
+def _echo_transfer(action, result):
+    click.echo(
+        f"已{action} {result['users']} 个用户的 {result['records']} 条记录（{result['bytes'] / 1e6:.1f} MB），"
+        f"耗时 {result['seconds']:.2f}s（{result['records_per_second']:.0f} 条/秒，"
+        f"{result['megabytes_per_second']:.1f} MB/秒）", err=True)
+
+
+@memory_cli.command('export')
+@click.argument('path')
+@click.option('--batch-size', default=1000, show_default=True, help='每批读取的用户数')
+def export_command(path, batch_size):
+    """流式导出所有用户的学习记录（NDJSON，PATH 以 .gz 结尾时压缩，- 表示标准输出）
+
+    Redis 存储通过 SCAN 遍历用户，少数用户可能导出多行；导入时后一行替换前一行，不影响导入结果。
+    """
+    from app.services.memory_service import MemoryService
+
+    memory_service = MemoryService()
+    with _open_dump(path, 'w') as output:
+        result = memory_service.export_records(output, batch_size=batch_size, progress=_progress_printer())
+    _echo_transfer('导出', result)
+
+
+@memory_cli.command('import')
+@click.argument('path')
+@click.option('--batch-size', default=1000, show_default=True, help='每批写入的用户数')
+def import_command(path, batch_size):
+    """流式导入 memory export 导出的学习记录（替换文件中各用户的已有记录，- 表示标准输入）"""
+    from app.services.memory_service import MemoryService
+
+    memory_service = MemoryService()
+    with _open_dump(path, 'r') as lines:
+        try:
+            result = memory_service.import_records(lines, batch_size=batch_size, progress=_progress_printer())
+        except ValueError as e:
+            raise click.ClickException(str(e))
+    _echo_transfer('导入', result)
+
+
+@content_cli.command('train-dict')
+@click.option('--samples', default=None, type=int, help='训练样本数，默认使用 CONTENT_DICT_SAMPLES')
+@click.option('--recompress/--no-recompress', default=False, show_default=True,
+              help='训练后用新字典重新压缩已有条目')
+def train_dict_command(samples, recompress):
+    """从已保存的生成内容中训练压缩字典"""
+    from flask import current_app
+    from app.services.content_store import create_content_store
+
+    content_store = create_content_store(current_app.config)
+    dictionary_id, size, used = content_store.train(
+        sample_size=samples or current_app.config['CONTENT_DICT_SAMPLES'],
+        size=current_app.config['CONTENT_DICT_SIZE']
+    )
+    if dictionary_id is None:
+        click.echo("没有可用的样本，未训练字典")
+        return
+    click.echo(f"已使用 {used} 个样本训练字典 {dictionary_id}（{size} 字节）")
+    if recompress:
+        totals = content_store.recompress()
+        ratio = totals['raw_bytes'] / totals['stored_bytes'] if totals['stored_bytes'] else 0.0
+        click.echo(f"已重新压缩 {totals['entries']} 个条目，压缩比 {ratio:.2f}")
+
+
+@content_cli.command('stats')
+def content_stats_command():
+    """显示生成内容的压缩统计"""
+    from flask import current_app
+    from app.services.content_store import create_content_store
+
+    stats = create_content_store(current_app.config).get_stats()
+    click.echo(
+        f"条目 {stats.get('entries', 0)} 个，原始 {stats.get('raw_bytes', 0)} 字节，"
+        f"存储 {stats.get('stored_bytes', 0)} 字节，压缩比 {stats.get('compression_ratio', 0.0):.2f}，"
+        f"字典版本 {stats.get('dictionary_id')}"
+    )
@@ -0,0 +1,258 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import redis
+
+from app.services.metrics import record_admission
+
+logger = logging.getLogger(__name__)
+
+# 检查全局令牌桶和（可选的）调用方令牌桶，都有令牌时才各扣除一个（被拒绝的请求不消耗令牌）
+# KEYS: 全局令牌桶[, 调用方令牌桶]；ARGV: 全局速率, 全局容量, 调用方速率, 调用方容量
+# 返回 {是否允许, 拒绝范围, 建议重试等待秒数}（小数以字符串返回）
+TOKEN_BUCKET_SCRIPT = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local function level(key, rate, burst)
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or burst
+    local ts = tonumber(state[2]) or now
+    return math.min(burst, tokens + math.max(0, now - ts) * rate)
+end
+local function take(key, tokens, rate, burst)
+    redis.call('HSET', key, 'tokens', tokens - 1, 'ts', now)
+    redis.call('PEXPIRE', key, math.ceil(burst / rate * 1000))
+end
+local global_rate, global_burst = tonumber(ARGV[1]), tonumber(ARGV[2])
+local user_rate, user_burst = tonumber(ARGV[3]), tonumber(ARGV[4])
+local user
+if KEYS[2] then
+    user = level(KEYS[2], user_rate, user_burst)
+    if user < 1 then
+        return {0, 'user', tostring((1 - user) / user_rate)}
+    end
+end
+local global = level(KEYS[1], global_rate, global_burst)
+if global < 1 then
+    return {0, 'global', tostring((1 - global) / global_rate)}
+end
+if KEYS[2] then
+    take(KEYS[2], user, user_rate, user_burst)
+end
+take(KEYS[1], global, global_rate, global_burst)
+return {1, '', '0'}
+"""
+
+class LLMRateLimitExceeded(Exception):
+    """DeepSeek API 调用超出限额"""
+
+    def __init__(self, scope, retry_after):
+        super().__init__(f'DeepSeek API 调用超出{"单个调用方" if scope == "user" else "全局"}限额，'
+                         f'请 {retry_after:.1f} 秒后重试')
+        self.scope = scope
+        self.retry_after = retry_after
+
+
+class _LocalBucket:
+    """进程内令牌桶"""
+
+    __slots__ = ('tokens', 'updated_at')
+
+    def __init__(self, burst, now):
+        self.tokens = burst
+        self.updated_at = now
+
+    def refill(self, rate, burst, now):
+        self.tokens = min(burst, self.tokens + (now - self.updated_at) * rate)
+        self.updated_at = now
+
+
+class LLMAdmission:
+    """DeepSeek API 调用的准入控制（每个调用方和全局两级令牌桶）
+
+    调用方标识由服务端确定（没有用户认证时为客户端IP），不能取自请求参数中的 user_id，
+    否则调用方可以通过更换 user_id 绕过限额。
+
+    只在需要调用 DeepSeek API 时（缓存未命中）检查，超出限额时抛出 LLMRateLimitExceeded，
+    调用方改为返回已缓存内容或模拟数据，不排队等待。
+
+    令牌桶保存在 Redis 中（ratelimit:llm:client:{client_id}、ratelimit:llm:global），由 Lua 脚本
+    原子地检查和扣除，所有进程共享限额。进程内快速路径：
+    - 本进程的令牌桶（参数与 Redis 中相同）先检查一次，本进程的调用次数不会超过所有进程的合计，
+      本地令牌不足时 Redis 中也一定不足，直接拒绝而不访问 Redis；
+    - Redis 拒绝后记录建议的等待时间，期间同一调用方（或全局）的请求直接拒绝。
+    Redis 不可用时只按本进程的令牌桶限流。
+    """
+
+    GLOBAL = 'global'
+
+    def __init__(self, redis_client, user_rate, user_burst, global_rate, global_burst, max_local_users=10000):
+        """初始化准入控制
+
+        Args:
+            redis_client: Redis 客户端
+            user_rate: 每个调用方每秒补充的令牌数
+            user_burst: 每个调用方的令牌桶容量（允许的突发调用次数）
+            global_rate: 全局每秒补充的令牌数
+            global_burst: 全局令牌桶容量
+            max_local_users: 本进程保留令牌桶的调用方数（LRU淘汰）
+        """
+        self.redis_client = redis_client
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.global_rate = global_rate
+        self.global_burst = global_burst
+        self.max_local_users = max_local_users
+        self._script = redis_client.register_script(TOKEN_BUCKET_SCRIPT)
+        # 调用方标识（全局为 GLOBAL）-> 本进程令牌桶
+        self._buckets = OrderedDict()
+        # 调用方标识（全局为 GLOBAL）-> Redis 拒绝后的等待截止时间
+        self._blocked_until = {}
+        self._lock = threading.Lock()
+        self._redis_warned_at = None
+
+    @staticmethod
+    def _redis_key(client_id):
+        return f'ratelimit:llm:client:{client_id}'
+
+    def _bucket(self, client_id, burst, now):
+        bucket = self._buckets.get(client_id)
+        if bucket is None:
+            bucket = self._buckets[client_id] = _LocalBucket(burst, now)
+            while len(self._buckets) > self.max_local_users + 1:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client_id)
+        return bucket
+
+    def _take_local(self, client_id):
+        """检查并扣除本进程的令牌（client_id 为 None 时只检查全局限额）
+
+        Returns:
+            tuple: (拒绝范围, 建议等待秒数)，允许时拒绝范围为 None
+        """
+        now = time.monotonic()
+        with self._lock:
+            for key, scope in ((client_id, 'user'), (self.GLOBAL, 'global')):
+                if key is None:
+                    continue
+                blocked_until = self._blocked_until.get(key)
+                if blocked_until is not None:
+                    if blocked_until > now:
+                        return scope, blocked_until - now
+                    del self._blocked_until[key]
+            user = None
+            if client_id is not None:
+                user = self._bucket(client_id, self.user_burst, now)
+                user.refill(self.user_rate, self.user_burst, now)
+                if user.tokens < 1:
+                    return 'user', (1 - user.tokens) / self.user_rate
+            shared = self._bucket(self.GLOBAL, self.global_burst, now)
+            shared.refill(self.global_rate, self.global_burst, now)
+            if shared.tokens < 1:
+                return 'global', (1 - shared.tokens) / self.global_rate
+            if user is not None:
+                user.tokens -= 1
+            shared.tokens -= 1
+        return None, 0.0
+
+    def _refund_local(self, client_id, scope, retry_after):
+        """Redis 拒绝时退回本进程的令牌，并在等待期间直接拒绝"""
+        with self._lock:
+            for key in (client_id, self.GLOBAL):
+                bucket = self._buckets.get(key) if key is not None else None
+                if bucket is not None:
+                    bucket.tokens += 1
+            self._blocked_until[client_id if scope == 'user' else self.GLOBAL] = time.monotonic() + retry_after
+            if len(self._blocked_until) > self.max_local_users:
+                now = time.monotonic()
+                self._blocked_until = {key: until for key, until in self._blocked_until.items() if until > now}
+
+    def _take_redis(self, client_id):
+        """检查并扣除 Redis 中的令牌，返回值与 _take_local 相同；Redis 不可用时允许"""
+        keys = ['ratelimit:llm:global'] + ([self._redis_key(client_id)] if client_id is not None else [])
+        try:
+            allowed, scope, retry_after = self._script(
+                keys=keys, args=[self.global_rate, self.global_burst, self.user_rate, self.user_burst])
+        except redis.RedisError:
+            # Redis 不可用期间每分钟最多记录一次
+            now = time.monotonic()
+            if self._redis_warned_at is None or now - self._redis_warned_at >= 60:
+                self._redis_warned_at = now
+                logger.warning('检查 DeepSeek API 调用限额失败，只按本进程限流', exc_info=True)
+            return None, 0.0
+        if allowed:
+            return None, 0.0
+        scope = scope.decode('utf-8') if isinstance(scope, bytes) else scope
+        return scope, float(retry_after)
+
+    def _reject(self, scope, retry_after, source):
+        record_admission('rejected', scope, source)
+        raise LLMRateLimitExceeded(scope, retry_after)
+
+    def acquire(self, client_id):
+        """调用 DeepSeek API 前获取一个令牌
+
+        Args:
+            client_id: 调用方标识（由服务端确定，如客户端IP），None 视为匿名调用方
+
+        Raises:
+            LLMRateLimitExceeded: 超出调用方或全局限额
+        """
+        self._acquire('anonymous' if client_id is None else str(client_id))
+
+    def acquire_global(self):
+        """后台任务（如内容预热）调用 DeepSeek API 前获取一个令牌，只检查全局限额
+
+        Raises:
+            LLMRateLimitExceeded: 超出全局限额
+        """
+        self._acquire(None)
+
+    def _acquire(self, client_id):
+        scope, retry_after = self._take_local(client_id)
+        if scope is not None:
+            self._reject(scope, retry_after, 'local')
+        scope, retry_after = self._take_redis(client_id)
+        if scope is not None:
+            self._refund_local(client_id, scope, retry_after)
+            self._reject(scope, retry_after, 'redis')
+        record_admission('admitted')
+
+    async def acquire_async(self, client_id):
+        """acquire 的异步版本：本进程检查直接执行，访问 Redis 在线程池中执行"""
+        client_id = 'anonymous' if client_id is None else str(client_id)
+        scope, retry_after = self._take_local(client_id)
+        if scope is not None:
+            self._reject(scope, retry_after, 'local')
+        scope, retry_after = await asyncio.to_thread(self._take_redis, client_id)
+        if scope is not None:
+            self._refund_local(client_id, scope, retry_after)
+            self._reject(scope, retry_after, 'redis')
+        record_admission('admitted')
+
+    def get_limits(self):
+        """当前的限额配置"""
+        return {
+            'user_rate': self.user_rate,
+            'user_burst': self.user_burst,
+            'global_rate': self.global_rate,
+            'global_burst': self.global_burst
+        }
+
+
+def create_llm_admission(config):
+    """根据配置创建 DeepSeek API 调用准入控制，未启用限流时返回 None"""
+    if not config['LLM_RATE_LIMIT_ENABLED']:
+        return None
+    return LLMAdmission(
+        redis.from_url(config['REDIS_URL']),
+        user_rate=config['LLM_USER_RATE'],
+        user_burst=config['LLM_USER_BURST'],
+        global_rate=config['LLM_GLOBAL_RATE'],
+        global_burst=config['LLM_GLOBAL_BURST'],
+        max_local_users=config['LLM_RATE_LIMIT_LOCAL_USERS']
+    )
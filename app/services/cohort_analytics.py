@@ -0,0 +1,153 @@
+import pandas as pd
+
+
+def records_frame(user_records):
+    """将一批用户的学习记录展开为 DataFrame
+
+    Args:
+        user_records: [(用户ID, [学习记录, ...]), ...]
+
+    Returns:
+        pandas.DataFrame: 每条记录一行，列为 user_id、concept、memory_strength、
+            review_count、next_review（原始字符串）和 due_at（解析后的时间，无需复习时为 NaT）
+    """
+    user_ids, concepts, strengths, review_counts, next_reviews = [], [], [], [], []
+    for user_id, records in user_records:
+        for record in records:
+            user_ids.append(user_id)
+            concepts.append(record['concept'])
+            strengths.append(record.get('memory_strength', 0.5))
+            review_counts.append(record.get('review_count', 0))
+            next_reviews.append(record.get('next_review'))
+    frame = pd.DataFrame({
+        'user_id': pd.Series(user_ids, dtype=object),
+        'concept': pd.Series(concepts, dtype=object),
+        'memory_strength': pd.Series(strengths, dtype=float),
+        'review_count': pd.Series(review_counts, dtype='int64'),
+        'next_review': pd.Series(next_reviews, dtype=object)
+    })
+    frame['due_at'] = pd.to_datetime(frame['next_review'], errors='coerce')
+    return frame
+
+
+def mastery_by_user(frame, user_ids, threshold, now):
+    """按用户汇总掌握情况
+
+    Args:
+        frame: records_frame 返回的 DataFrame
+        user_ids: 用户ID列表（决定输出顺序，没有记录的用户输出零值）
+        threshold: 掌握阈值
+        now: 当前时间，用于统计已到期的复习数
+
+    Returns:
+        list: 与 user_ids 一一对应的掌握情况
+    """
+    frame = frame.assign(
+        mastered=frame['memory_strength'] >= threshold,
+        due=frame['due_at'] <= pd.Timestamp(now)
+    )
+    grouped = frame.groupby('user_id', sort=False).agg(
+        total_concepts=('concept', 'size'),
+        mastered_concepts=('mastered', 'sum'),
+        review_count=('review_count', 'sum'),
+        strength_sum=('memory_strength', 'sum'),
+        due_count=('due', 'sum'),
+        next_review=('due_at', 'min')
+    ).reindex(user_ids)
+
+    counts = grouped[['total_concepts', 'mastered_concepts', 'review_count', 'due_count']] \
+        .fillna(0).astype('int64')
+    total = counts['total_concepts']
+    average_strength = (grouped['strength_sum'] / total.where(total > 0)).fillna(0.0)
+    mastery_rate = (counts['mastered_concepts'] / total.where(total > 0)).fillna(0.0)
+    next_review = [None if pd.isna(value) else value.isoformat() for value in grouped['next_review']]
+
+    return [{
+        'user_id': user_id,
+        'total_concepts': total_concepts,
+        'mastered_concepts': mastered_concepts,
+        'mastery_rate': rate,
+        'average_strength': strength,
+        'review_count': review_count,
+        'due_count': due_count,
+        'next_review': next_at
+    } for user_id, total_concepts, mastered_concepts, rate, strength, review_count, due_count, next_at in zip(
+        user_ids, total.tolist(), counts['mastered_concepts'].tolist(), mastery_rate.tolist(),
+        average_strength.tolist(), counts['review_count'].tolist(), counts['due_count'].tolist(), next_review
+    )]
+
+
+def schedule_by_user(frame, user_ids, before, limit):
+    """按用户取出最早到期的复习计划
+
+    Args:
+        frame: records_frame 返回的 DataFrame
+        user_ids: 用户ID列表（决定输出顺序）
+        before: 截止时间（datetime），只返回在此之前到期的复习，None 表示不限
+        limit: 每个用户返回的条数上限
+
+    Returns:
+        list: [{'user_id', 'schedule': [复习计划条目, ...]}, ...]
+    """
+    due = frame[frame['due_at'].notna()]
+    if before is not None:
+        due = due[due['due_at'] <= pd.Timestamp(before)]
+    due = due.sort_values('due_at', kind='mergesort').groupby('user_id', sort=False).head(limit)
+
+    schedules = {}
+    for user_id, concept, strength, next_review, review_count in zip(
+            due['user_id'].tolist(), due['concept'].tolist(), due['memory_strength'].tolist(),
+            due['next_review'].tolist(), due['review_count'].tolist()):
+        schedules.setdefault(user_id, []).append({
+            'concept': concept,
+            'memory_strength': strength,
+            'next_review': next_review,
+            'review_count': review_count
+        })
+    return [{'user_id': user_id, 'schedule': schedules.get(user_id, [])} for user_id in user_ids]
+
+
+def concept_totals(frame, threshold, now):
+    """按概念累计一批用户的学习情况
+
+    不同批次的结果可用 DataFrame.add(..., fill_value=0) 合并，最后由 concept_summary 计算比率。
+
+    Returns:
+        pandas.DataFrame: 以概念为索引，列为 learners、mastered、strength_sum、due_count
+    """
+    frame = frame.assign(
+        mastered=(frame['memory_strength'] >= threshold).astype('int64'),
+        due=(frame['due_at'] <= pd.Timestamp(now)).astype('int64')
+    )
+    return frame.groupby('concept').agg(
+        learners=('user_id', 'size'),
+        mastered=('mastered', 'sum'),
+        strength_sum=('memory_strength', 'sum'),
+        due_count=('due', 'sum')
+    )
+
+
+def concept_summary(totals):
+    """根据 concept_totals 的累计结果计算每个概念的掌握率，掌握率最低的概念在前
+
+    Returns:
+        list: [{'concept', 'learners', 'mastered', 'mastery_rate', 'average_strength', 'due_count'}, ...]
+    """
+    if totals is None or totals.empty:
+        return []
+    learners = totals['learners']
+    totals = totals.assign(
+        mastery_rate=totals['mastered'] / learners,
+        average_strength=totals['strength_sum'] / learners
+    ).sort_values(['mastery_rate', 'learners'], ascending=[True, False], kind='mergesort')
+    return [{
+        'concept': concept,
+        'learners': int(learner_count),
+        'mastered': int(mastered),
+        'mastery_rate': rate,
+        'average_strength': strength,
+        'due_count': int(due_count)
+    } for concept, learner_count, mastered, rate, strength, due_count in zip(
+        totals.index.tolist(), totals['learners'].tolist(), totals['mastered'].tolist(),
+        totals['mastery_rate'].tolist(), totals['average_strength'].tolist(), totals['due_count'].tolist()
+    )]
@@ -1,23 +1,38 @@
-import openai
 from flask import current_app
 import json
 import random
-from app.services.deepseek_client import DeepSeekClient
+from app.services.admission import create_llm_admission
+from app.services.content_store import create_async_content_store, create_content_store
+from app.services.deepseek_client import AsyncDeepSeekClient, DeepSeekClient
 
 class ConceptService:
-    def __init__(self):
-        openai.api_key = current_app.config['OPENAI_API_KEY']
+    def __init__(self, content_store=None, admission=None):
+        """初始化概念服务
+
+        Args:
+            content_store: 生成内容存储，默认根据配置创建
+            admission: DeepSeek API 调用准入控制，默认根据配置创建
+        """
+        self.openai_api_key = current_app.config['OPENAI_API_KEY']
         self.model = current_app.config['OPENAI_MODEL']
         # 实际应用中应从数据库加载数据
         self.concepts = {}
         self.deepseek_client = DeepSeekClient()
+        self.content_store = content_store or create_content_store(current_app.config)
+        self.admission = admission or create_llm_admission(current_app.config)
+
+    def _openai(self):
+        """旧版 OpenAI 接口模块（导入耗时较长，首次使用时才导入）"""
+        import openai
+        openai.api_key = self.openai_api_key
+        return openai
 
     def get_explanation(self, concept):
         """获取概念的多角度解释"""
         prompt = current_app.config['CONCEPT_EXPLANATION_TEMPLATE'].format(concept=concept)
         
         try:
-            response = openai.ChatCompletion.create(
+            response = self._openai().ChatCompletion.create(
                 model=self.model,
                 messages=[
                     {"role": "system", "content": "你是一个专业的教育专家，擅长用多种方式解释复杂概念。"},
@@ -71,7 +86,7 @@ class ConceptService:
         """
         
         try:
-            response = openai.ChatCompletion.create(
+            response = self._openai().ChatCompletion.create(
                 model=self.model,
                 messages=[
                     {"role": "system", "content": "你是一个专业的教育专家，擅长出题。"},
@@ -114,7 +129,7 @@ class ConceptService:
         """
         
         try:
-            response = openai.ChatCompletion.create(
+            response = self._openai().ChatCompletion.create(
                 model=self.model,
                 messages=[
                     {"role": "system", "content": "你是一个专业的教育专家，擅长制定学习计划。"},
@@ -171,82 +186,135 @@ class ConceptService:
             ], 3)
         }
     
-    def get_concept_explanation(self, concept_name):
+    def _generate(self, client_id, generate, *args):
+        """调用DeepSeek API生成内容，超出调用限额时抛出 LLMRateLimitExceeded"""
+        if self.admission is not None:
+            self.admission.acquire(client_id)
+        return generate(*args)
+    
+    def get_concept_explanation(self, concept_name, client_id=None):
         """获取概念解释
         
         Args:
             concept_name: 概念名称
+            client_id: 调用方标识（用于DeepSeek API调用限流，由服务端确定，如客户端IP）
             
         Returns:
             dict: 概念解释
         """
         try:
-            # 使用DeepSeek API生成概念解释
-            return self.deepseek_client.generate_concept_explanation(concept_name)
+            # 优先读取已保存的内容，未命中时使用DeepSeek API生成并保存
+            return self.content_store.get_or_create(
+                'explanation', concept_name,
+                lambda: self._generate(client_id, self.deepseek_client.generate_concept_explanation, concept_name)
+            )
         except Exception as e:
-            # 如果API调用失败，使用模拟数据
-            return {
-                'core_definition': f'{concept_name}的核心定义是...',
-                'feynman_explanation': f'用费曼技巧解释{concept_name}...',
-                'misconceptions': [
-                    f'关于{concept_name}的常见误解1...',
-                    f'关于{concept_name}的常见误解2...',
-                    f'关于{concept_name}的常见误解3...'
-                ]
-            }
+            # 如果API调用失败或超出调用限额，使用模拟数据
+            return self._fallback_explanation(concept_name)
     
-    def get_concept_exercises(self, concept_name):
+    def _fallback_explanation(self, concept_name):
+        """API调用失败时使用的模拟概念解释"""
+        return {
+            'core_definition': f'{concept_name}的核心定义是...',
+            'feynman_explanation': f'用费曼技巧解释{concept_name}...',
+            'misconceptions': [
+                f'关于{concept_name}的常见误解1...',
+                f'关于{concept_name}的常见误解2...',
+                f'关于{concept_name}的常见误解3...'
+            ]
+        }
+    
+    def get_concept_exercises(self, concept_name, difficulty='medium', client_id=None):
         """获取概念练习题
         
         Args:
             concept_name: 概念名称
+            difficulty: 难度级别
+            client_id: 调用方标识（用于DeepSeek API调用限流，由服务端确定，如客户端IP）
             
         Returns:
             dict: 练习题
         """
         try:
-            # 使用DeepSeek API生成练习题
-            return self.deepseek_client.generate_exercises(concept_name)
+            # 优先读取已保存的内容，未命中时使用DeepSeek API生成并保存
+            return self.content_store.get_or_create(
+                'exercises', (concept_name, difficulty),
+                lambda: self._generate(client_id, self.deepseek_client.generate_exercises, concept_name, difficulty)
+            )
         except Exception as e:
-            # 如果API调用失败，使用模拟数据
-            return {
-                'true_false': [
-                    {
-                        'question': f'关于{concept_name}的说法1是正确的。',
-                        'answer': True,
-                        'explanation': f'解释为什么关于{concept_name}的说法1是正确的。'
-                    },
-                    {
-                        'question': f'关于{concept_name}的说法2是错误的。',
-                        'answer': False,
-                        'explanation': f'解释为什么关于{concept_name}的说法2是错误的。'
-                    }
-                ],
-                'case_studies': [
-                    {
-                        'scenario': f'场景1：如何使用{concept_name}解决问题A...',
-                        'questions': [
-                            f'在场景1中，{concept_name}的应用是否正确？',
-                            f'在场景1中，如何改进{concept_name}的应用？'
-                        ],
-                        'answers': [
-                            '是的，应用正确。',
-                            '可以通过以下方式改进...'
-                        ]
-                    }
-                ],
-                'code_exercises': [
-                    {
-                        'description': f'编写代码实现{concept_name}的基本功能...',
-                        'template': 'def function_name():\n    # 在这里编写代码\n    pass',
-                        'solution': 'def function_name():\n    # 解决方案\n    return result',
-                        'hints': [
-                            f'提示1：考虑{concept_name}的核心特性...',
-                            f'提示2：注意{concept_name}的边界条件...'
-                        ]
-                    }
-                ]
-            }
+            # 如果API调用失败或超出调用限额，使用模拟数据
+            return self._fallback_exercises(concept_name)
+    
+    def refresh_content(self, concept_name, refresh_before, difficulties=('medium',)):
+        """预先生成概念解释和练习题（用于热门概念的内容预热）
+        
+        已保存且剩余有效时间超过 refresh_before 秒的内容跳过，其余调用DeepSeek API重新生成并保存。
+        
+        Args:
+            concept_name: 概念名称
+            refresh_before: 剩余有效时间低于该值（秒）的内容重新生成
+            difficulties: 练习题难度
+            
+        Returns:
+            int: 重新生成的内容数
+            
+        Raises:
+            LLMRateLimitExceeded: 超出DeepSeek API全局调用限额（预热不占用用户限额）
+        """
+        targets = [('explanation', concept_name, self.deepseek_client.generate_concept_explanation, (concept_name,))]
+        targets += [('exercises', (concept_name, difficulty), self.deepseek_client.generate_exercises,
+                     (concept_name, difficulty)) for difficulty in difficulties]
+        ttls = self.content_store.get_ttls([(kind, key) for kind, key, _, _ in targets])
+        generated = 0
+        for (kind, key, generate, args), ttl in zip(targets, ttls):
+            if ttl is not None and ttl > refresh_before:
+                continue
+            if self.admission is not None:
+                self.admission.acquire_global()
+            self.content_store.put(kind, key, generate(*args))
+            generated += 1
+        return generated
+    
+    def _fallback_exercises(self, concept_name):
+        """API调用失败时使用的模拟练习题"""
+        return {
+            'true_false': [
+                {
+                    'question': f'关于{concept_name}的说法1是正确的。',
+                    'answer': True,
+                    'explanation': f'解释为什么关于{concept_name}的说法1是正确的。'
+                },
+                {
+                    'question': f'关于{concept_name}的说法2是错误的。',
+                    'answer': False,
+                    'explanation': f'解释为什么关于{concept_name}的说法2是错误的。'
+                }
+            ],
+            'case_studies': [
+                {
+                    'scenario': f'场景1：如何使用{concept_name}解决问题A...',
+                    'questions': [
+                        f'在场景1中，{concept_name}的应用是否正确？',
+                        f'在场景1中，如何改进{concept_name}的应用？'
+                    ],
+                    'answers': [
+                        '是的，应用正确。',
+                        '可以通过以下方式改进...'
+                    ]
+                }
+            ],
+            'code_exercises': [
+                {
+                    'description': f'编写代码实现{concept_name}的基本功能...',
+                    'template': 'def function_name():\n    # 在这里编写代码\n    pass',
+                    'solution': 'def function_name():\n    # 解决方案\n    return result',
+                    'hints': [
+                        f'提示1：考虑{concept_name}的核心特性...',
+                        f'提示2：注意{concept_name}的边界条件...'
+                    ]
+                }
+            ]
+        }
     
     def get_concept_knowledge_graph(self, concept_name):
         """获取概念知识图谱
@@ -274,4 +342,47 @@ class ConceptService:
         return {
             'nodes': nodes,
             'edges': edges
-        } 
\ No newline at end of file
+        }
+
+
+class AsyncConceptService:
+    """概念服务的异步版本（用于异步服务模式），只包含需要调用DeepSeek API的接口"""
+    
+    def __init__(self, concept_service, content_store=None, deepseek_client=None):
+        """初始化异步概念服务
+        
+        Args:
+            concept_service: 同步的 ConceptService 实例（提供模拟数据）
+            content_store: 异步生成内容存储，默认根据配置创建
+            deepseek_client: DeepSeek API异步客户端，默认根据配置创建
+        """
+        self.concept_service = concept_service
+        self.admission = concept_service.admission
+        self.content_store = content_store or create_async_content_store(current_app.config)
+        self.deepseek_client = deepseek_client or AsyncDeepSeekClient()
+    
+    async def _generate(self, client_id, generate, *args):
+        """调用DeepSeek API生成内容，超出调用限额时抛出 LLMRateLimitExceeded"""
+        if self.admission is not None:
+            await self.admission.acquire_async(client_id)
+        return await generate(*args)
+    
+    async def get_concept_explanation(self, concept_name, client_id=None):
+        """获取概念解释（与 ConceptService.get_concept_explanation 相同）"""
+        try:
+            return await self.content_store.get_or_create(
+                'explanation', concept_name,
+                lambda: self._generate(client_id, self.deepseek_client.generate_concept_explanation, concept_name)
+            )
+        except Exception as e:
+            return self.concept_service._fallback_explanation(concept_name)
+    
+    async def get_concept_exercises(self, concept_name, difficulty='medium', client_id=None):
+        """获取概念练习题（与 ConceptService.get_concept_exercises 相同）"""
+        try:
+            return await self.content_store.get_or_create(
+                'exercises', (concept_name, difficulty),
+                lambda: self._generate(client_id, self.deepseek_client.generate_exercises, concept_name, difficulty)
+            )
+        except Exception as e:
+            return self.concept_service._fallback_exercises(concept_name)
@@ -0,0 +1,592 @@
+import json
+import logging
+import re
+import struct
+import time
+import zlib
+from collections import Counter
+
+import redis
+import redis.asyncio
+
+logger = logging.getLogger(__name__)
+
+# 条目格式版本：生成内容的结构变化时递增，旧版本条目在读取时视为未命中
+CONTENT_SCHEMA_VERSION = 1
+
+# 条目头部：魔数、格式版本、字典版本（0 表示不使用字典）、原始长度
+_HEADER = struct.Struct('>2sBHI')
+_MAGIC = b'CZ'
+
+# 字典版本：0 不使用字典，1 为内置初始字典，训练得到的字典从 2 开始编号
+NO_DICTIONARY = 0
+SEED_DICTIONARY_ID = 1
+
+# 内置初始字典：生成内容中反复出现的字段名和固定文字，训练出新字典之前使用
+SEED_DICTIONARY = ''.join([
+    '学习', '概念', '理解', '掌握', '基础', '练习', '知识点', '原理', '应用', '案例',
+    '"hints":["提示1：考虑', '的核心特性', '"hints":["提示2：注意', '的边界条件',
+    '"template":"def solution():\\n    # 在这里编写代码\\n    pass",',
+    '"solution":"def solution():\\n    # 解决方案\\n    return result",',
+    '{"code_exercises":[{"description":"编写代码实现', '"answers":["答案1","答案2"]',
+    '{"case_studies":[{"scenario":"场景1：如何使用', '"questions":["在场景1中，',
+    '"true_false":[{"question":"关于', '","answer":true,"explanation":"解释为什么这个说法正确"},',
+    '","answer":false,"explanation":"解释为什么这个说法错误"},',
+    '{"core_definition":"', '","feynman_explanation":"用费曼技巧解释', '","misconceptions":["关于',
+    '的常见误解', '{"day1":{"goal":"了解', '的基本概念和原理","activities":["阅读',
+    '的入门介绍","观看', '的基础视频教程","完成', '的基础练习题"],"resources":["https://',
+    '"},"day2":{"goal":"深入学习', '"],"resources":["https://', '"]},"day3":{"goal":"',
+]).encode('utf-8')
+
+# 写入条目并按新旧条目的大小差更新统计（覆盖写入时扣除旧条目），头部格式见 _HEADER
+# KEYS: 条目键, 统计哈希表；ARGV: 条目数据, 原始字节数, 过期时间（秒，0 表示不过期）
+PUT_SCRIPT = """
+local old = redis.call('GET', KEYS[1])
+if tonumber(ARGV[3]) > 0 then
+    redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[3])
+else
+    redis.call('SET', KEYS[1], ARGV[1])
+end
+local entries = 1
+local raw = tonumber(ARGV[2])
+local stored = string.len(ARGV[1])
+if old then
+    entries = 0
+    stored = stored - string.len(old)
+    if string.len(old) >= 9 and string.sub(old, 1, 2) == 'CZ' then
+        local b1, b2, b3, b4 = string.byte(old, 6, 9)
+        raw = raw - (((b1 * 256 + b2) * 256 + b3) * 256 + b4)
+    else
+        raw = raw - string.len(old)
+    end
+end
+redis.call('HINCRBY', KEYS[2], 'entries', entries)
+redis.call('HINCRBY', KEYS[2], 'raw_bytes', raw)
+redis.call('HINCRBY', KEYS[2], 'stored_bytes', stored)
+return entries
+"""
+
+# 训练字典时统计的片段：带引号的JSON键/值（含相邻的结构符号）和中文短语
+_TOKEN_RE = re.compile(r'[{\[,]*"(?:[^"\\]|\\.){1,120}"[:,\]}]*')
+_PHRASE_RE = re.compile(r'[^\s"，。：；、,.:;()（）\[\]{}]{2,40}')
+
+
+def encode_content(value):
+    """将生成内容序列化为紧凑的 UTF-8 JSON（中文不转义，比 \\uXXXX 少一半字节）"""
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def train_dictionary(samples, size=32768):
+    """根据样本内容训练 zlib 预设字典
+
+    统计每个片段出现在多少个样本中，按 (样本数 - 1) × 字节数 估计可节省的字节数，
+    取收益最高的片段拼接为字典；只在少数样本中出现的片段（如含具体概念名的内容）
+    对其他条目没有帮助，不放入字典。zlib 对距离更近的匹配编码更短，因此收益高的片段放在字典末尾。
+
+    Args:
+        samples: 序列化后的内容（bytes）列表
+        size: 字典最大字节数（zlib 窗口为 32KB，更大没有意义）
+
+    Returns:
+        bytes: 字典
+    """
+    document_frequency = Counter()
+    for sample in samples:
+        text = sample.decode('utf-8')
+        document_frequency.update(set(_TOKEN_RE.findall(text)) | set(_PHRASE_RE.findall(text)))
+
+    min_frequency = max(2, len(samples) // 100)
+    scored = sorted(
+        ((count - 1) * len(fragment.encode('utf-8')), fragment)
+        for fragment, count in document_frequency.items() if count >= min_frequency
+    )
+    chosen = []
+    used = 0
+    for _, fragment in reversed(scored):
+        encoded = fragment.encode('utf-8')
+        if used + len(encoded) > size:
+            continue
+        # 已被更长片段包含的片段不再重复放入
+        if any(fragment in other for other in chosen):
+            continue
+        chosen.append(fragment)
+        used += len(encoded)
+
+    dictionary = ''.join(reversed(chosen)).encode('utf-8')
+    # 空余空间用内置字典填充
+    if len(dictionary) < size:
+        dictionary = SEED_DICTIONARY[-(size - len(dictionary)):] + dictionary
+    return dictionary[-size:]
+
+
+class CorruptContentError(Exception):
+    """条目数据损坏，无法解压或反序列化"""
+
+
+class ContentEntry:
+    """压缩存储的生成内容
+
+    创建时只解析头部，内容在首次访问 text / value 时才解压和反序列化；
+    数据损坏时抛出 CorruptContentError（ContentStore.load_value 将其视为未命中）。
+    """
+
+    __slots__ = ('_store', '_blob', 'schema_version', 'dictionary_id', 'raw_size', '_text', '_value')
+
+    def __init__(self, store, blob):
+        self._store = store
+        self._blob = blob
+        _, self.schema_version, self.dictionary_id, self.raw_size = _HEADER.unpack_from(blob)
+        self._text = None
+        self._value = None
+
+    @property
+    def compressed_size(self):
+        return len(self._blob)
+
+    @property
+    def ratio(self):
+        """压缩比（原始字节数 / 存储字节数）"""
+        return self.raw_size / len(self._blob) if self._blob else 0.0
+
+    @property
+    def text(self):
+        """解压后的 JSON 文本
+
+        Raises:
+            CorruptContentError: 数据损坏
+        """
+        if self._text is None:
+            try:
+                self._text = self._store.decompress(self._blob).decode('utf-8')
+            except (zlib.error, UnicodeDecodeError) as e:
+                raise CorruptContentError(str(e)) from e
+        return self._text
+
+    @property
+    def value(self):
+        """反序列化后的内容
+
+        Raises:
+            CorruptContentError: 数据损坏
+        """
+        if self._value is None:
+            try:
+                self._value = json.loads(self.text)
+            except ValueError as e:
+                raise CorruptContentError(str(e)) from e
+        return self._value
+
+
+class ContentStore:
+    """生成内容存储（Redis）
+
+    - content:entry:{kind}:{key...}：压缩后的内容，格式为头部 + zlib 数据
+    - content:dict:{id}：训练得到的预设字典，content:dict:current 为当前使用的字典版本
+    - content:stats：全部条目的条目数和原始/存储字节数（覆盖写入时扣除旧条目，过期的条目不扣除）
+
+    写入时使用当前字典压缩，并在头部记录字典版本，因此更换字典后旧条目仍可读取。
+    读取时只检查头部和字典，旧格式或字典丢失的条目计为 stale 并视为未命中；内容在首次
+    访问时才解压，数据损坏的条目由 load_value 计为 stale 并视为未命中。未命中的条目
+    由调用方重新生成后覆盖。Redis 不可用时读取视为未命中、写入被跳过，不影响内容生成。
+    """
+
+    # 当前字典版本的缓存时间（秒），其他进程训练出新字典后最迟在此时间后生效
+    DICTIONARY_REFRESH = 60
+
+    def __init__(self, redis_client, level=6, ttl=None):
+        """初始化内容存储
+
+        Args:
+            redis_client: Redis 客户端
+            level: zlib 压缩级别
+            ttl: 条目过期时间（秒），None 表示不过期
+        """
+        self.redis_client = redis_client
+        self.level = level
+        self.ttl = ttl
+        self._put_script = redis_client.register_script(PUT_SCRIPT)
+        self._dictionaries = {NO_DICTIONARY: None, SEED_DICTIONARY_ID: SEED_DICTIONARY}
+        self._current_dictionary = None
+        self._current_loaded_at = 0.0
+        self.stats = {
+            'hits': 0, 'misses': 0, 'stale': 0, 'writes': 0, 'errors': 0, 'decompressions': 0,
+            'raw_bytes_written': 0, 'stored_bytes_written': 0
+        }
+
+    @staticmethod
+    def _key(kind, key):
+        parts = key if isinstance(key, (tuple, list)) else (key,)
+        return ':'.join(['content', 'entry', kind, *map(str, parts)])
+
+    def _dictionary(self, dictionary_id):
+        dictionary = self._dictionaries.get(dictionary_id)
+        if dictionary is None and dictionary_id != NO_DICTIONARY:
+            dictionary = self.redis_client.get(f'content:dict:{dictionary_id}')
+            if dictionary is None:
+                raise KeyError(f'压缩字典 {dictionary_id} 不存在')
+            self._dictionaries[dictionary_id] = dictionary
+        return dictionary
+
+    def _current_dictionary_id(self):
+        now = time.monotonic()
+        if self._current_dictionary is None or now - self._current_loaded_at > self.DICTIONARY_REFRESH:
+            current = self.redis_client.get('content:dict:current')
+            self._current_dictionary = int(current) if current else SEED_DICTIONARY_ID
+            self._current_loaded_at = now
+        return self._current_dictionary
+
+    def compress(self, raw, dictionary_id=None):
+        """压缩序列化后的内容
+
+        Args:
+            raw: 序列化后的内容（bytes）
+            dictionary_id: 使用的字典版本，默认使用当前字典
+
+        Returns:
+            bytes: 头部 + 压缩数据
+        """
+        if dictionary_id is None:
+            dictionary_id = self._current_dictionary_id()
+        dictionary = self._dictionary(dictionary_id)
+        compressor = zlib.compressobj(self.level, zdict=dictionary) if dictionary \
+            else zlib.compressobj(self.level)
+        body = compressor.compress(raw) + compressor.flush()
+        return _HEADER.pack(_MAGIC, CONTENT_SCHEMA_VERSION, dictionary_id, len(raw)) + body
+
+    def decompress(self, blob):
+        """解压 compress 生成的数据"""
+        _, _, dictionary_id, _ = _HEADER.unpack_from(blob)
+        dictionary = self._dictionary(dictionary_id)
+        decompressor = zlib.decompressobj(zdict=dictionary) if dictionary else zlib.decompressobj()
+        self.stats['decompressions'] += 1
+        return decompressor.decompress(blob[_HEADER.size:]) + decompressor.flush()
+
+    def _is_current(self, blob):
+        return len(blob) >= _HEADER.size and blob[:2] == _MAGIC \
+            and _HEADER.unpack_from(blob)[1] == CONTENT_SCHEMA_VERSION
+
+    def _stale(self):
+        self.stats['stale'] += 1
+        self.stats['misses'] += 1
+        return None
+
+    def _entry(self, blob):
+        if blob is None:
+            self.stats['misses'] += 1
+            return None
+        if not self._is_current(blob):
+            # 旧格式的条目视为未命中，由调用方重新生成后覆盖
+            return self._stale()
+        entry = ContentEntry(self, blob)
+        try:
+            self._dictionary(entry.dictionary_id)
+        except KeyError:
+            # 压缩字典丢失的条目同样视为未命中，重新生成后覆盖
+            logger.warning('生成内容的压缩字典 %s 不存在，按未命中处理', entry.dictionary_id)
+            return self._stale()
+        self.stats['hits'] += 1
+        return entry
+
+    def load_value(self, entry):
+        """取出条目内容，数据损坏时计为 stale
+
+        Args:
+            entry: get / get_many 返回的 ContentEntry 或 None
+
+        Returns:
+            反序列化后的内容；未命中或数据损坏时为 None，由调用方重新生成后覆盖
+        """
+        if entry is None:
+            return None
+        try:
+            return entry.value
+        except CorruptContentError:
+            logger.warning('生成内容无法解压（字典 %s），按未命中处理', entry.dictionary_id, exc_info=True)
+            self.stats['hits'] -= 1
+            return self._stale()
+
+    def get(self, kind, key):
+        """读取内容
+
+        Args:
+            kind: 内容类型，如 explanation、exercises、learning_path
+            key: 键，字符串或元组，如 (概念, 难度)
+
+        Returns:
+            ContentEntry: 未命中时为 None
+        """
+        try:
+            return self._entry(self.redis_client.get(self._key(kind, key)))
+        except redis.RedisError:
+            self.stats['errors'] += 1
+            logger.warning('读取生成内容失败: %s %s', kind, key, exc_info=True)
+            return None
+
+    def get_many(self, kind, keys):
+        """批量读取内容（一次往返）
+
+        Returns:
+            list: 与 keys 一一对应的 ContentEntry 或 None
+        """
+        if not keys:
+            return []
+        try:
+            blobs = self.redis_client.mget([self._key(kind, key) for key in keys])
+            return [self._entry(blob) for blob in blobs]
+        except redis.RedisError:
+            self.stats['errors'] += 1
+            logger.warning('批量读取生成内容失败: %s', kind, exc_info=True)
+            return [None] * len(keys)
+
+    def get_ttls(self, items):
+        """批量查询内容的剩余有效时间（一次往返）
+
+        Args:
+            items: [(kind, key), ...]
+
+        Returns:
+            list: 与 items 一一对应的剩余秒数，不存在时为 None，不过期时为 float('inf')
+
+        Raises:
+            redis.RedisError: Redis 不可用
+        """
+        pipe = self.redis_client.pipeline(transaction=False)
+        for kind, key in items:
+            pipe.ttl(self._key(kind, key))
+        # TTL 返回 -2 表示不存在，-1 表示不过期
+        return [None if ttl == -2 else float('inf') if ttl == -1 else ttl for ttl in pipe.execute()]
+
+    def put(self, kind, key, value):
+        """压缩并保存内容
+
+        Args:
+            kind: 内容类型
+            key: 键，字符串或元组
+            value: 可 JSON 序列化的内容
+
+        Returns:
+            bool: 是否写入成功
+        """
+        raw = encode_content(value)
+        try:
+            blob = self.compress(raw)
+            self._put_script(keys=[self._key(kind, key), 'content:stats'],
+                             args=[blob, len(raw), self.ttl or 0])
+        except redis.RedisError:
+            self.stats['errors'] += 1
+            logger.warning('保存生成内容失败: %s %s', kind, key, exc_info=True)
+            return False
+        self.stats['writes'] += 1
+        self.stats['raw_bytes_written'] += len(raw)
+        self.stats['stored_bytes_written'] += len(blob)
+        return True
+
+    def get_or_create(self, kind, key, factory):
+        """读取内容，未命中时调用 factory 生成并保存
+
+        factory 抛出的异常会直接向上传递，生成失败的内容不会被保存。
+
+        Returns:
+            反序列化后的内容
+        """
+        value = self.load_value(self.get(kind, key))
+        if value is not None:
+            return value
+        value = factory()
+        self.put(kind, key, value)
+        return value
+
+    def _iter_entry_keys(self, batch_size=500):
+        batch = []
+        for key in self.redis_client.scan_iter(match='content:entry:*', count=batch_size):
+            batch.append(key)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def train(self, sample_size=2000, size=32768):
+        """从已保存的内容中抽样训练新字典，并设为当前字典
+
+        Args:
+            sample_size: 最多使用的样本数
+            size: 字典最大字节数
+
+        Returns:
+            tuple: (新字典版本, 字典字节数, 样本数)；没有样本时版本为 None
+        """
+        samples = []
+        for keys in self._iter_entry_keys():
+            for blob in self.redis_client.mget(keys):
+                entry = self._entry(blob)
+                if self.load_value(entry) is not None:
+                    samples.append(entry.text.encode('utf-8'))
+            if len(samples) >= sample_size:
+                break
+        if not samples:
+            return None, 0, 0
+
+        dictionary = train_dictionary(samples[:sample_size], size)
+        # 训练得到的字典从 2 开始编号
+        dictionary_id = self.redis_client.incr('content:dict:next') + SEED_DICTIONARY_ID
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.set(f'content:dict:{dictionary_id}', dictionary)
+        pipe.set('content:dict:current', dictionary_id)
+        pipe.execute()
+        self._dictionaries[dictionary_id] = dictionary
+        self._current_dictionary = dictionary_id
+        self._current_loaded_at = time.monotonic()
+        return dictionary_id, len(dictionary), min(len(samples), sample_size)
+
+    def recompress(self, batch_size=500):
+        """使用当前字典重新压缩全部条目（保留剩余过期时间），并重新统计存储字节数
+
+        Returns:
+            dict: 条目数、原始字节数和存储字节数
+        """
+        dictionary_id = self._current_dictionary_id()
+        totals = {'entries': 0, 'raw_bytes': 0, 'stored_bytes': 0}
+        for keys in self._iter_entry_keys(batch_size):
+            pipe = self.redis_client.pipeline(transaction=False)
+            for key in keys:
+                pipe.get(key)
+                pipe.pttl(key)
+            values = pipe.execute()
+            pipe = self.redis_client.pipeline(transaction=False)
+            for key, blob, ttl in zip(keys, values[::2], values[1::2]):
+                entry = self._entry(blob)
+                if entry is None:
+                    continue
+                if entry.dictionary_id != dictionary_id:
+                    if self.load_value(entry) is None:
+                        continue
+                    blob = self.compress(entry.text.encode('utf-8'), dictionary_id)
+                    pipe.set(key, blob, px=ttl if ttl and ttl > 0 else None)
+                totals['entries'] += 1
+                totals['raw_bytes'] += entry.raw_size
+                totals['stored_bytes'] += len(blob)
+            pipe.execute()
+        self.redis_client.hset('content:stats', mapping=totals)
+        return totals
+
+    def get_stats(self):
+        """压缩效果统计
+
+        Returns:
+            dict: 存储中全部条目的原始/存储字节数及压缩比、当前字典版本，以及本进程的读写计数
+        """
+        stats = {'process': dict(self.stats)}
+        written = self.stats['stored_bytes_written']
+        stats['process']['compression_ratio'] = \
+            self.stats['raw_bytes_written'] / written if written else 0.0
+        try:
+            raw_stats = self.redis_client.hgetall('content:stats')
+            totals = {
+                field.decode() if isinstance(field, bytes) else field: int(value)
+                for field, value in raw_stats.items()
+            }
+            stored = totals.get('stored_bytes', 0)
+            stats.update({
+                'entries': totals.get('entries', 0),
+                'raw_bytes': totals.get('raw_bytes', 0),
+                'stored_bytes': stored,
+                'compression_ratio': totals.get('raw_bytes', 0) / stored if stored else 0.0,
+                'dictionary_id': self._current_dictionary_id(),
+                'schema_version': CONTENT_SCHEMA_VERSION
+            })
+        except redis.RedisError:
+            logger.warning('读取生成内容统计失败', exc_info=True)
+        return stats
+
+
+class AsyncContentStore(ContentStore):
+    """生成内容存储的异步版本（用于异步服务模式），使用 redis.asyncio 客户端
+
+    条目格式和键与 ContentStore 相同。读写前先异步加载所需的压缩字典，之后的压缩和解压
+    沿用同步实现（不再访问 Redis）。训练字典、重新压缩等维护操作仍使用同步的 ContentStore。
+    """
+
+    async def _load_dictionary(self, dictionary_id):
+        if dictionary_id not in self._dictionaries:
+            dictionary = await self.redis_client.get(f'content:dict:{dictionary_id}')
+            if dictionary is None:
+                raise KeyError(f'压缩字典 {dictionary_id} 不存在')
+            self._dictionaries[dictionary_id] = dictionary
+
+    async def _load_current_dictionary(self):
+        now = time.monotonic()
+        if self._current_dictionary is None or now - self._current_loaded_at > self.DICTIONARY_REFRESH:
+            current = await self.redis_client.get('content:dict:current')
+            self._current_dictionary = int(current) if current else SEED_DICTIONARY_ID
+            self._current_loaded_at = now
+        await self._load_dictionary(self._current_dictionary)
+        return self._current_dictionary
+
+    async def get(self, kind, key):
+        """读取内容（参数和返回值与 ContentStore.get 相同）"""
+        try:
+            blob = await self.redis_client.get(self._key(kind, key))
+            if blob is not None and self._is_current(blob):
+                # 先加载解压所需的字典，之后的同步解压不再访问 Redis
+                try:
+                    await self._load_dictionary(_HEADER.unpack_from(blob)[2])
+                except KeyError:
+                    logger.warning('生成内容的压缩字典不存在，按未命中处理: %s %s', kind, key)
+                    return self._stale()
+            return self._entry(blob)
+        except redis.RedisError:
+            self.stats['errors'] += 1
+            logger.warning('读取生成内容失败: %s %s', kind, key, exc_info=True)
+            return None
+
+    async def put(self, kind, key, value):
+        """压缩并保存内容（参数和返回值与 ContentStore.put 相同）"""
+        raw = encode_content(value)
+        try:
+            blob = self.compress(raw, await self._load_current_dictionary())
+            await self._put_script(keys=[self._key(kind, key), 'content:stats'],
+                                   args=[blob, len(raw), self.ttl or 0])
+        except redis.RedisError:
+            self.stats['errors'] += 1
+            logger.warning('保存生成内容失败: %s %s', kind, key, exc_info=True)
+            return False
+        self.stats['writes'] += 1
+        self.stats['raw_bytes_written'] += len(raw)
+        self.stats['stored_bytes_written'] += len(blob)
+        return True
+
+    async def get_or_create(self, kind, key, factory):
+        """读取内容，未命中时等待 factory() 生成并保存
+
+        Args:
+            factory: 无参数的协程函数
+        """
+        value = self.load_value(await self.get(kind, key))
+        if value is not None:
+            return value
+        value = await factory()
+        await self.put(kind, key, value)
+        return value
+
+
+def create_content_store(config):
+    """根据配置创建生成内容存储"""
+    return ContentStore(
+        redis.from_url(config['REDIS_URL']),
+        level=config['CONTENT_COMPRESSION_LEVEL'],
+        ttl=config['CONTENT_TTL']
+    )
+
+
+def create_async_content_store(config):
+    """根据配置创建异步生成内容存储"""
+    # 连接数有上限，并发请求超出时等待空闲连接
+    pool = redis.asyncio.BlockingConnectionPool.from_url(
+        config['REDIS_URL'], max_connections=config['ASYNC_REDIS_MAX_CONNECTIONS'],
+        timeout=config['ASYNC_REDIS_POOL_TIMEOUT'])
+    return AsyncContentStore(
+        redis.asyncio.Redis(connection_pool=pool),
+        level=config['CONTENT_COMPRESSION_LEVEL'],
+        ttl=config['CONTENT_TTL']
+    )
@@ -1,16 +1,26 @@
-from openai import OpenAI
 from flask import current_app
+from app.services.metrics import record_token_usage, track_dependency
 
 class DeepSeekClient:
     """DeepSeek API客户端"""
     
     def __init__(self):
-        """初始化DeepSeek客户端"""
-        self.client = OpenAI(
-            api_key=current_app.config['DEEPSEEK_API_KEY'],
-            base_url=current_app.config['DEEPSEEK_API_BASE']
-        )
+        """初始化DeepSeek客户端（openai 导入耗时较长，首次请求时才导入并创建客户端）"""
+        self.api_key = current_app.config['DEEPSEEK_API_KEY']
+        self.base_url = current_app.config['DEEPSEEK_API_BASE']
         self.model = current_app.config['DEEPSEEK_MODEL']
+        self._client = None
+    
+    def _create_client(self):
+        from openai import OpenAI
+        return OpenAI(api_key=self.api_key, base_url=self.base_url)
+    
+    @property
+    def client(self):
+        """OpenAI 兼容客户端（并发创建时多余的一个会被丢弃，不影响使用）"""
+        if self._client is None:
+            self._client = self._create_client()
+        return self._client
     
     def chat_completion(self, messages, temperature=0.7, max_tokens=2000):
         """发送聊天请求
@@ -24,17 +34,48 @@ class DeepSeekClient:
             dict: API响应
         """
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=temperature,
-                max_tokens=max_tokens,
-                stream=False
-            )
+            with track_dependency('deepseek', 'chat_completion'):
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    stream=False
+                )
+            record_token_usage(response.usage)
             return response
         except Exception as e:
             raise Exception(f'DeepSeek API请求失败: {str(e)}')
     
+    def chat_completion_stream(self, messages, temperature=0.7, max_tokens=2000):
+        """发送流式聊天请求
+        
+        Args:
+            messages: 消息列表
+            temperature: 温度参数，控制随机性
+            max_tokens: 最大生成token数
+            
+        Yields:
+            str: 依次生成的文本片段
+        """
+        try:
+            # 耗时为整个输出过程；最后一个片段包含 token 用量
+            with track_dependency('deepseek', 'chat_completion_stream'):
+                stream = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    stream=True,
+                    stream_options={'include_usage': True}
+                )
+                for chunk in stream:
+                    record_token_usage(chunk.usage)
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+        except Exception as e:
+            raise Exception(f'DeepSeek API请求失败: {str(e)}')
+    
     def generate_concept_explanation(self, concept):
         """生成概念解释
         
@@ -44,7 +85,16 @@ class DeepSeekClient:
         Returns:
             dict: 概念解释
         """
-        messages = [
+        try:
+            response = self.chat_completion(self._explanation_messages(concept))
+            return self._parse_explanation(response.choices[0].message.content)
+        except Exception as e:
+            raise Exception(f'生成概念解释失败: {str(e)}')
+    
+    @staticmethod
+    def _explanation_messages(concept):
+        """生成概念解释的请求消息"""
+        return [
             {
                 'role': 'system',
                 'content': '你是一个专业的教育专家，擅长用通俗易懂的方式解释复杂的概念。'
@@ -54,22 +104,16 @@ class DeepSeekClient:
                 'content': f'请用以下三种方式解释"{concept}"这个概念：\n1. 核心定义\n2. 用费曼技巧解释\n3. 列出3个常见的误解'
             }
         ]
-        
-        try:
-            response = self.chat_completion(messages)
-            content = response.choices[0].message.content
-            
-            # 解析响应内容
-            parts = content.split('\n\n')
-            explanation = {
-                'core_definition': parts[0].replace('1. 核心定义\n', ''),
-                'feynman_explanation': parts[1].replace('2. 用费曼技巧解释\n', ''),
-                'misconceptions': parts[2].replace('3. 列出3个常见的误解\n', '').split('\n')
-            }
-            
-            return explanation
-        except Exception as e:
-            raise Exception(f'生成概念解释失败: {str(e)}')
+    
+    @staticmethod
+    def _parse_explanation(content):
+        """解析概念解释的响应内容"""
+        parts = content.split('\n\n')
+        return {
+            'core_definition': parts[0].replace('1. 核心定义\n', ''),
+            'feynman_explanation': parts[1].replace('2. 用费曼技巧解释\n', ''),
+            'misconceptions': parts[2].replace('3. 列出3个常见的误解\n', '').split('\n')
+        }
     
     def generate_exercises(self, concept, difficulty='medium'):
         """生成练习题
@@ -81,7 +125,16 @@ class DeepSeekClient:
         Returns:
             dict: 练习题
         """
-        messages = [
+        try:
+            response = self.chat_completion(self._exercise_messages(concept, difficulty))
+            return self._parse_exercises(response.choices[0].message.content)
+        except Exception as e:
+            raise Exception(f'生成练习题失败: {str(e)}')
+    
+    @staticmethod
+    def _exercise_messages(concept, difficulty):
+        """生成练习题的请求消息"""
+        return [
             {
                 'role': 'system',
                 'content': '你是一个专业的教育专家，擅长设计练习题。'
@@ -91,22 +144,15 @@ class DeepSeekClient:
                 'content': f'请为"{concept}"这个概念生成{difficulty}难度的练习题，包括：\n1. 2道判断题\n2. 1个案例分析\n3. 1道编程题'
             }
         ]
-        
-        try:
-            response = self.chat_completion(messages)
-            content = response.choices[0].message.content
-            
-            # 解析响应内容
-            parts = content.split('\n\n')
-            exercises = {
-                'true_false': self._parse_true_false(parts[0]),
-                'case_studies': self._parse_case_studies(parts[1]),
-                'code_exercises': self._parse_code_exercises(parts[2])
-            }
-            
-            return exercises
-        except Exception as e:
-            raise Exception(f'生成练习题失败: {str(e)}')
+    
+    def _parse_exercises(self, content):
+        """解析练习题的响应内容"""
+        parts = content.split('\n\n')
+        return {
+            'true_false': self._parse_true_false(parts[0]),
+            'case_studies': self._parse_case_studies(parts[1]),
+            'code_exercises': self._parse_code_exercises(parts[2])
+        }
     
     def _parse_true_false(self, content):
         """解析判断题"""
@@ -146,4 +192,63 @@ class DeepSeekClient:
             'template': 'def solution():\n    # 在这里编写代码\n    pass',
             'solution': 'def solution():\n    # 解决方案\n    return result',
             'hints': parts[1].split('\n') if len(parts) > 1 else []
-        }] 
\ No newline at end of file
+        }]
+
+
+class AsyncDeepSeekClient(DeepSeekClient):
+    """DeepSeek API异步客户端（用于异步服务模式），提示词和解析逻辑与同步客户端相同"""
+    
+    def _create_client(self):
+        from openai import AsyncOpenAI
+        return AsyncOpenAI(api_key=self.api_key, base_url=self.base_url)
+    
+    async def chat_completion(self, messages, temperature=0.7, max_tokens=2000):
+        """发送聊天请求（参数与同步客户端相同）"""
+        try:
+            with track_dependency('deepseek', 'chat_completion'):
+                response = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    stream=False
+                )
+            record_token_usage(response.usage)
+            return response
+        except Exception as e:
+            raise Exception(f'DeepSeek API请求失败: {str(e)}')
+    
+    async def chat_completion_stream(self, messages, temperature=0.7, max_tokens=2000):
+        """发送流式聊天请求，依次产生文本片段"""
+        try:
+            with track_dependency('deepseek', 'chat_completion_stream'):
+                stream = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    stream=True,
+                    stream_options={'include_usage': True}
+                )
+                async for chunk in stream:
+                    record_token_usage(chunk.usage)
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+        except Exception as e:
+            raise Exception(f'DeepSeek API请求失败: {str(e)}')
+    
+    async def generate_concept_explanation(self, concept):
+        """生成概念解释"""
+        try:
+            response = await self.chat_completion(self._explanation_messages(concept))
+            return self._parse_explanation(response.choices[0].message.content)
+        except Exception as e:
+            raise Exception(f'生成概念解释失败: {str(e)}')
+    
+    async def generate_exercises(self, concept, difficulty='medium'):
+        """生成练习题"""
+        try:
+            response = await self.chat_completion(self._exercise_messages(concept, difficulty))
+            return self._parse_exercises(response.choices[0].message.content)
+        except Exception as e:
+            raise Exception(f'生成练习题失败: {str(e)}')
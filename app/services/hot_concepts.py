@@ -0,0 +1,322 @@
+import atexit
+import hashlib
+import logging
+import os
+import threading
+import time
+
+import redis
+
+from app.services.admission import LLMRateLimitExceeded
+
+logger = logging.getLogger(__name__)
+
+# 统计范围：/api/concept/<concept_name> 及其子路由（路径参数），学习路径生成（请求体中的 concept）
+CONCEPT_RULE_PREFIX = '/api/concept/<concept_name>'
+LEARNING_PATH_RULES = ('/api/learning/path', '/api/learning/path/stream')
+# 超过该长度的概念名称不统计，避免异常请求占用排行榜
+MAX_CONCEPT_LENGTH = 100
+
+# 将各 worker 的增量合并到 Redis 中的 count-min sketch，并更新候选概念的全局估计值和排行榜
+# KEYS: sketch 哈希表, 排行榜有序集合
+# ARGV: 深度, 排行榜长度, 过期时间, 单元格数, (单元格, 增量)..., (概念, 深度个单元格)...
+MERGE_SCRIPT = """
+local depth = tonumber(ARGV[1])
+local top_k = tonumber(ARGV[2])
+local ttl = tonumber(ARGV[3])
+local cells = tonumber(ARGV[4])
+local i = 5
+for _ = 1, cells do
+    redis.call('HINCRBY', KEYS[1], ARGV[i], ARGV[i + 1])
+    i = i + 2
+end
+while i <= #ARGV do
+    local estimate = nil
+    for j = 1, depth do
+        local count = tonumber(redis.call('HGET', KEYS[1], ARGV[i + j])) or 0
+        if estimate == nil or count < estimate then
+            estimate = count
+        end
+    end
+    redis.call('ZADD', KEYS[2], estimate, ARGV[i])
+    i = i + depth + 1
+end
+redis.call('ZREMRANGEBYRANK', KEYS[2], 0, -top_k - 1)
+redis.call('EXPIRE', KEYS[1], ttl)
+redis.call('EXPIRE', KEYS[2], ttl)
+return redis.call('ZCARD', KEYS[2])
+"""
+
+
+def concept_from_request(rule, view_args, data=None):
+    """请求对应的概念，不在统计范围内时为 None
+
+    Args:
+        rule: 路由规则（含 /api 前缀）
+        view_args: 路径参数
+        data: 学习路径请求的 JSON 请求体
+    """
+    if rule.startswith(CONCEPT_RULE_PREFIX):
+        concept = (view_args or {}).get('concept_name')
+    elif rule in LEARNING_PATH_RULES and isinstance(data, dict):
+        concept = data.get('concept')
+    else:
+        return None
+    if not isinstance(concept, str) or not concept or len(concept) > MAX_CONCEPT_LENGTH:
+        return None
+    return concept
+
+
+class HotConceptTracker:
+    """热门概念统计（count-min sketch + top-k）
+
+    每个进程在内存中累计两次合并之间的增量：sketch 的单元格计数（最多 深度 x 宽度 个）和
+    本地估计值最高的候选概念（最多 2 x top_k 个），内存占用与请求量和概念数无关。
+    后台线程每隔 flush_interval 秒通过 Lua 脚本把增量加到 Redis 中的 sketch 上，并用合并后的
+    计数更新候选概念的全局估计值，排行榜只保留 top_k 个概念。
+
+    Redis 中按时间窗口分别统计（hot:cms:{窗口}、hot:topk:{窗口}，保留两个窗口），
+    排行榜合并当前和上一个窗口，不再被请求的概念会逐渐移出。count-min sketch 的估计值
+    只会偏高，宽度越大偏差越小。
+
+    后台线程由 start 启动（在 worker 处理首个请求时调用），导入路由模块的 CLI 命令不会启动。
+    """
+
+    def __init__(self, redis_client, width=2048, depth=4, top_k=100, window=3600, flush_interval=5.0):
+        """初始化热门概念统计
+
+        Args:
+            redis_client: Redis 客户端
+            width: sketch 每行的单元格数
+            depth: sketch 的行数（哈希函数个数）
+            top_k: 排行榜保留的概念数
+            window: 统计窗口（秒）
+            flush_interval: 合并到 Redis 的间隔（秒）
+        """
+        self.redis_client = redis_client
+        self.width = width
+        self.depth = depth
+        self.top_k = top_k
+        self.window = window
+        self.flush_interval = flush_interval
+        self._merge = redis_client.register_script(MERGE_SCRIPT)
+        # 单元格编号（行 x 宽度 + 列）-> 增量
+        self._cells = {}
+        # 候选概念 -> 单元格编号
+        self._candidates = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self.stats = {'recorded': 0, 'flushes': 0, 'errors': 0}
+        atexit.register(self.close)
+
+    def start(self):
+        """启动定期合并到 Redis 的后台线程（重复调用无效）"""
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None and not self._closed.is_set():
+                self._thread = threading.Thread(target=self._run, name='hot-concepts', daemon=True)
+                self._thread.start()
+
+    def _cell_indexes(self, concept):
+        # 各进程需要得到相同的单元格，不能使用随进程变化的 hash()
+        digest = hashlib.blake2b(concept.encode('utf-8'), digest_size=4 * self.depth).digest()
+        return tuple(row * self.width + int.from_bytes(digest[4 * row:4 * row + 4], 'little') % self.width
+                     for row in range(self.depth))
+
+    def record(self, concept):
+        """记录一次对概念的请求"""
+        cells = self._cell_indexes(concept)
+        with self._lock:
+            for cell in cells:
+                self._cells[cell] = self._cells.get(cell, 0) + 1
+            self._candidates[concept] = cells
+            self.stats['recorded'] += 1
+            if len(self._candidates) > 2 * self.top_k:
+                # 只保留本地估计值最高的 top_k 个候选概念
+                ranked = sorted(self._candidates.items(),
+                                key=lambda item: min(self._cells[cell] for cell in item[1]), reverse=True)
+                self._candidates = dict(ranked[:self.top_k])
+
+    def _window_keys(self, window_id):
+        return f'hot:cms:{window_id}', f'hot:topk:{window_id}'
+
+    def flush(self):
+        """将本进程的增量合并到 Redis，失败时丢弃（统计结果只用于预热，不要求精确）"""
+        with self._flush_lock:
+            with self._lock:
+                cells, candidates = self._cells, self._candidates
+                self._cells, self._candidates = {}, {}
+            if not cells:
+                return
+            args = [self.depth, self.top_k, 2 * self.window, len(cells)]
+            for cell, delta in cells.items():
+                args.extend((cell, delta))
+            for concept, concept_cells in candidates.items():
+                args.append(concept)
+                args.extend(concept_cells)
+            try:
+                self._merge(keys=self._window_keys(int(time.time() // self.window)), args=args)
+            except redis.RedisError:
+                self.stats['errors'] += 1
+                logger.warning('合并热门概念统计失败', exc_info=True)
+                return
+            self.stats['flushes'] += 1
+
+    def top(self, n=10):
+        """全局最热门的概念（合并当前和上一个统计窗口）
+
+        Returns:
+            list: [(概念, 估计请求数)]，按请求数从高到低
+        """
+        window_id = int(time.time() // self.window)
+        pipe = self.redis_client.pipeline(transaction=False)
+        for offset in (0, 1):
+            pipe.zrevrange(self._window_keys(window_id - offset)[1], 0, self.top_k - 1, withscores=True)
+        counts = {}
+        for ranking in pipe.execute():
+            for concept, score in ranking:
+                concept = concept.decode('utf-8') if isinstance(concept, bytes) else concept
+                counts[concept] = counts.get(concept, 0) + int(score)
+        return sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:n]
+
+    def instrument(self, blueprint):
+        """为 Flask 蓝图中统计范围内的请求记录概念"""
+        from flask import request
+
+        @blueprint.before_request
+        def record_hot_concept():
+            if request.url_rule is None:
+                return
+            rule = request.url_rule.rule
+            data = request.get_json(silent=True) if rule in LEARNING_PATH_RULES else None
+            concept = concept_from_request(rule, request.view_args, data)
+            if concept is not None:
+                self.record(concept)
+
+    def _run(self):
+        """后台线程：定期合并到 Redis"""
+        while not self._closed.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('热门概念统计定时合并失败')
+
+    def close(self):
+        """停止后台线程并合并剩余增量"""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self.flush()
+
+
+class ContentPrewarmer:
+    """热门概念的内容预热
+
+    后台线程每隔 interval 秒检查最热门的 top_n 个概念，为缺失或剩余有效时间不足 refresh_before
+    秒的概念解释和练习题调用 DeepSeek API 重新生成，使热门内容不会在请求时才生成。
+    各进程通过 Redis 锁（hot:prewarm:lock，有效期为 interval）保证每个周期只有一个进程执行；
+    超出 DeepSeek API 调用限额时结束本周期，下个周期继续。后台线程由 start 启动。
+    """
+
+    LOCK_KEY = 'hot:prewarm:lock'
+
+    def __init__(self, tracker, concept_service, top_n=20, interval=300, refresh_before=86400,
+                 difficulties=('medium',)):
+        """初始化内容预热
+
+        Args:
+            tracker: 热门概念统计
+            concept_service: 概念服务
+            top_n: 预热的热门概念数
+            interval: 检查间隔（秒）
+            refresh_before: 剩余有效时间低于该值（秒）的内容重新生成
+            difficulties: 预热的练习题难度
+        """
+        self.tracker = tracker
+        self.concept_service = concept_service
+        self.redis_client = tracker.redis_client
+        self.top_n = top_n
+        self.interval = interval
+        self.refresh_before = refresh_before
+        self.difficulties = tuple(difficulties)
+        self._closed = threading.Event()
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self.stats = {'runs': 0, 'generated': 0, 'rate_limited': 0, 'errors': 0}
+
+    def start(self):
+        """启动定期预热的后台线程（重复调用无效）"""
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None and not self._closed.is_set():
+                self._thread = threading.Thread(target=self._run, name='content-prewarm', daemon=True)
+                self._thread.start()
+
+    def run_once(self):
+        """执行一个预热周期（不检查锁）
+
+        Returns:
+            int: 重新生成的内容数
+        """
+        generated = 0
+        for concept, _ in self.tracker.top(self.top_n):
+            try:
+                generated += self.concept_service.refresh_content(concept, self.refresh_before, self.difficulties)
+            except LLMRateLimitExceeded:
+                self.stats['rate_limited'] += 1
+                logger.info('内容预热超出 DeepSeek API 调用限额，已生成 %d 项，下个周期继续', generated)
+                break
+            except Exception:
+                self.stats['errors'] += 1
+                logger.warning('预热概念 %s 的内容失败', concept, exc_info=True)
+        self.stats['runs'] += 1
+        self.stats['generated'] += generated
+        return generated
+
+    def _acquire(self):
+        return self.redis_client.set(self.LOCK_KEY, os.getpid(), nx=True, ex=max(int(self.interval), 1))
+
+    def _run(self):
+        """后台线程：定期预热（首次在启动一个周期后执行）"""
+        while not self._closed.wait(self.interval):
+            try:
+                if self._acquire():
+                    self.run_once()
+            except Exception:
+                logger.exception('内容预热失败')
+
+    def close(self):
+        """停止后台线程（正在执行的周期会继续完成）"""
+        self._closed.set()
+
+
+def create_hot_concept_tracker(config):
+    """根据配置创建热门概念统计，未启用时返回 None"""
+    if not config['HOT_CONCEPTS_ENABLED']:
+        return None
+    return HotConceptTracker(
+        redis.from_url(config['REDIS_URL']),
+        width=config['HOT_CONCEPT_SKETCH_WIDTH'],
+        depth=config['HOT_CONCEPT_SKETCH_DEPTH'],
+        top_k=config['HOT_CONCEPT_TOP_K'],
+        window=config['HOT_CONCEPT_WINDOW'],
+        flush_interval=config['HOT_CONCEPT_FLUSH_INTERVAL']
+    )
+
+
+def create_content_prewarmer(config, tracker, concept_service):
+    """根据配置创建内容预热，未启用时返回 None"""
+    if tracker is None or not config['CONTENT_PREWARM_ENABLED']:
+        return None
+    return ContentPrewarmer(
+        tracker, concept_service,
+        top_n=config['CONTENT_PREWARM_TOP_N'],
+        interval=config['CONTENT_PREWARM_INTERVAL'],
+        refresh_before=config['CONTENT_PREWARM_REFRESH_BEFORE'],
+        difficulties=config['CONTENT_PREWARM_DIFFICULTIES']
+    )
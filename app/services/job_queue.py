@@ -0,0 +1,290 @@
+import json
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import redis
+import redis.asyncio
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+# 任务状态
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+FINAL_STATES = (JOB_DONE, JOB_FAILED)
+
+
+class JobQueueFullError(Exception):
+    """本进程待处理的任务数已达上限"""
+
+
+def _job_key(name, job_id):
+    return f'job:{name}:{job_id}'
+
+
+def _job_channel(name, job_id):
+    return f'job:{name}:{job_id}:events'
+
+
+def _decode_job(job_id, raw):
+    """将任务状态哈希表转换为查询结果，任务不存在时为 None"""
+    if not raw:
+        return None
+    job = {
+        (field.decode() if isinstance(field, bytes) else field):
+            (value.decode() if isinstance(value, bytes) else value)
+        for field, value in raw.items()
+    }
+    result = {'job_id': job_id, 'status': job['status']}
+    for field in ('created_at', 'started_at', 'finished_at', 'error'):
+        if field in job:
+            result[field] = job[field]
+    if 'result' in job:
+        result['result'] = json.loads(job['result'])
+    return result
+
+
+class JobQueue:
+    """后台任务队列
+
+    任务在本进程的有界线程池中执行，状态保存在 Redis 中，因此任何进程都可以查询任务结果：
+    - job:{name}:{job_id}：任务状态哈希表（status、params、result、error 及各阶段时间）
+    - job:{name}:{job_id}:events：任务状态变化时发布消息的频道，供 SSE 推送
+
+    进程异常退出时，其中未完成的任务会停留在 queued/running 状态，直到过期被删除。
+    """
+
+    def __init__(self, redis_client, name, handler, max_workers=4, max_pending=100, ttl=3600):
+        """初始化任务队列
+
+        Args:
+            redis_client: Redis 客户端
+            name: 队列名称，用于区分不同类型的任务
+            handler: 处理函数，接收任务参数dict，返回可 JSON 序列化的结果；在应用上下文中执行
+            max_workers: 线程池大小
+            max_pending: 本进程排队和执行中的任务数上限
+            ttl: 任务状态的保留时间（秒）
+        """
+        self.redis_client = redis_client
+        self.name = name
+        self.handler = handler
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+
+    def _key(self, job_id):
+        return _job_key(self.name, job_id)
+
+    def _channel(self, job_id):
+        return _job_channel(self.name, job_id)
+
+    def _get_executor(self):
+        # 首次提交任务时才创建线程池
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix=f'job-{self.name}')
+        return self._executor
+
+    def _update(self, job_id, **fields):
+        """更新任务状态并发布状态变化"""
+        key = self._key(job_id)
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.hset(key, mapping=fields)
+        pipe.expire(key, self.ttl)
+        pipe.publish(self._channel(job_id), fields.get('status', ''))
+        pipe.execute()
+
+    def submit(self, params):
+        """提交任务
+
+        Args:
+            params: 任务参数（可 JSON 序列化）
+
+        Returns:
+            str: 任务ID
+
+        Raises:
+            JobQueueFullError: 本进程待处理的任务数已达上限
+        """
+        if not self._slots.acquire(blocking=False):
+            raise JobQueueFullError('任务队列已满，请稍后重试')
+        self._add_pending(1)
+        job_id = uuid.uuid4().hex
+        try:
+            self._update(job_id, status=JOB_QUEUED, params=json.dumps(params, ensure_ascii=False),
+                         created_at=datetime.now().isoformat())
+            app = current_app._get_current_object()
+            self._get_executor().submit(self._run, app, job_id, params)
+        except Exception:
+            self._add_pending(-1)
+            self._slots.release()
+            raise
+        return job_id
+
+    def _run(self, app, job_id, params):
+        try:
+            self._update(job_id, status=JOB_RUNNING, started_at=datetime.now().isoformat())
+            with app.app_context():
+                result = self.handler(params)
+            self._update(job_id, status=JOB_DONE, finished_at=datetime.now().isoformat(),
+                         result=json.dumps(result, ensure_ascii=False))
+        except Exception as e:
+            logger.exception('任务 %s 执行失败', job_id)
+            try:
+                self._update(job_id, status=JOB_FAILED, finished_at=datetime.now().isoformat(),
+                             error=str(e))
+            except redis.RedisError:
+                logger.exception('更新任务 %s 的状态失败', job_id)
+        finally:
+            self._add_pending(-1)
+            self._slots.release()
+
+    def _add_pending(self, delta):
+        with self._pending_lock:
+            self._pending += delta
+
+    def pending_count(self):
+        """本进程排队和执行中的任务数"""
+        return self._pending
+
+    def get(self, job_id):
+        """查询任务状态
+
+        Returns:
+            dict: job_id、status、created_at、started_at、finished_at，
+                完成时包含 result，失败时包含 error；任务不存在时为 None
+        """
+        return _decode_job(job_id, self.redis_client.hgetall(self._key(job_id)))
+
+    def watch(self, job_id, timeout=120, heartbeat=15):
+        """订阅任务状态变化
+
+        先订阅频道再读取当前状态，避免遗漏订阅前完成的任务。
+
+        Args:
+            job_id: 任务ID
+            timeout: 最长等待时间（秒）
+            heartbeat: 无状态变化时产生心跳（None）的间隔（秒）
+
+        Yields:
+            dict: 当前任务状态（首次及每次状态变化时），None 表示心跳；
+                任务完成、失败、不存在或超时后结束
+        """
+        pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(self._channel(job_id))
+        try:
+            job = self.get(job_id)
+            if job is None:
+                return
+            yield job
+            deadline = time.monotonic() + timeout
+            while job['status'] not in FINAL_STATES:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                message = pubsub.get_message(timeout=min(heartbeat, remaining))
+                current = self.get(job_id)
+                if current is None:
+                    return
+                # 发布/订阅消息可能丢失，超时后也重新读取状态
+                if message is None and current['status'] == job['status']:
+                    yield None
+                    continue
+                job = current
+                yield job
+        finally:
+            pubsub.close()
+
+    def shutdown(self, wait=True):
+        """停止线程池"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+
+
+class AsyncJobReader:
+    """任务状态的异步读取（用于异步服务模式），SSE 连接等待期间不占用线程
+
+    任务仍由 JobQueue 提交和执行，这里只使用 redis.asyncio 客户端查询和订阅任务状态。
+    """
+
+    def __init__(self, redis_client, name):
+        """初始化任务状态读取
+
+        Args:
+            redis_client: redis.asyncio 客户端
+            name: 队列名称，与 JobQueue 相同
+        """
+        self.redis_client = redis_client
+        self.name = name
+
+    async def get(self, job_id):
+        """查询任务状态（返回值与 JobQueue.get 相同）"""
+        return _decode_job(job_id, await self.redis_client.hgetall(_job_key(self.name, job_id)))
+
+    async def watch(self, job_id, timeout=120, heartbeat=15):
+        """订阅任务状态变化（参数和产生的值与 JobQueue.watch 相同）"""
+        pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(_job_channel(self.name, job_id))
+        try:
+            job = await self.get(job_id)
+            if job is None:
+                return
+            yield job
+            deadline = time.monotonic() + timeout
+            while job['status'] not in FINAL_STATES:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                message = await pubsub.get_message(timeout=min(heartbeat, remaining))
+                current = await self.get(job_id)
+                if current is None:
+                    return
+                if message is None and current['status'] == job['status']:
+                    yield None
+                    continue
+                job = current
+                yield job
+        finally:
+            await pubsub.reset()
+
+
+def create_learning_path_queue(config, learning_service):
+    """创建学习路径生成任务队列
+
+    Args:
+        config: 配置映射
+        learning_service: LearningService 实例
+    """
+    return JobQueue(
+        redis.from_url(config['REDIS_URL']),
+        'learning_path',
+        lambda params: learning_service.generate_learning_path(
+            params['concept'], params['user_level'], params.get('user_id'), params.get('client_id')),
+        max_workers=config['LEARNING_PATH_WORKERS'],
+        max_pending=config['LEARNING_PATH_MAX_PENDING'],
+        ttl=config['LEARNING_PATH_JOB_TTL']
+    )
+
+
+def create_learning_path_reader(config):
+    """创建学习路径生成任务的异步状态读取
+
+    每个 SSE 连接订阅期间占用一个 Redis 连接，连接数上限即同时推送的任务数上限。
+    """
+    pool = redis.asyncio.BlockingConnectionPool.from_url(
+        config['REDIS_URL'], max_connections=config['LEARNING_PATH_EVENTS_MAX_STREAMS'],
+        timeout=config['ASYNC_REDIS_POOL_TIMEOUT'])
+    return AsyncJobReader(redis.asyncio.Redis(connection_pool=pool), 'learning_path')
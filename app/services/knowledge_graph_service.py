@@ -1,10 +1,23 @@
-from neo4j import GraphDatabase
+import logging
 from flask import current_app
-import networkx as nx
+import redis
+from app.services.learning_path_cache import bump_graph_versions
+from app.services.metrics import track_dependency
 import json
 
+logger = logging.getLogger(__name__)
+
 class KnowledgeGraphService:
-    def __init__(self):
+    def __init__(self, redis_client=None):
+        """初始化知识图谱服务
+
+        Args:
+            redis_client: 保存概念图谱版本号的 Redis 客户端，默认连接 REDIS_URL；
+                图谱变化时递增相关概念的版本号，使各进程缓存的学习路径失效
+        """
+        # neo4j 和 networkx 导入耗时较长，只在使用知识图谱时导入
+        from neo4j import GraphDatabase
+        self.redis_client = redis_client or redis.from_url(current_app.config['REDIS_URL'])
         self.driver = GraphDatabase.driver(
             current_app.config['NEO4J_URI'],
             auth=(current_app.config['NEO4J_USER'], current_app.config['NEO4J_PASSWORD'])
@@ -14,8 +27,9 @@ class KnowledgeGraphService:
 
     def get_concept_graph(self, concept):
         """获取概念的知识图谱"""
+        import networkx as nx
         try:
-            with self.driver.session() as session:
+            with track_dependency('neo4j', 'get_concept_graph'), self.driver.session() as session:
                 # 查询概念及其关联概念
                 result = session.run("""
                     MATCH (c:Concept {name: $concept})-[r:RELATES_TO*1..2]-(related:Concept)
@@ -80,7 +94,7 @@ class KnowledgeGraphService:
     def add_concept(self, concept, description, related_concepts=None):
         """添加新概念到知识图谱"""
         try:
-            with self.driver.session() as session:
+            with track_dependency('neo4j', 'add_concept'), self.driver.session() as session:
                 # 创建主概念节点
                 session.run("""
                     MERGE (c:Concept {name: $concept})
@@ -96,6 +110,8 @@ class KnowledgeGraphService:
                             MERGE (c)-[rel:RELATES_TO]->(r)
                             SET rel.weight = 1.0
                         """, concept=concept, related=related)
+            
+            self._invalidate_learning_paths([concept] + list(related_concepts or []))
                         
         except Exception as e:
             raise Exception(f"添加概念失败: {str(e)}")
@@ -103,19 +119,52 @@ class KnowledgeGraphService:
     def update_relationship(self, concept1, concept2, weight):
         """更新概念间的关系权重"""
         try:
-            with self.driver.session() as session:
+            with track_dependency('neo4j', 'update_relationship'), self.driver.session() as session:
                 session.run("""
                     MATCH (c1:Concept {name: $concept1})-[r:RELATES_TO]-(c2:Concept {name: $concept2})
                     SET r.weight = $weight
                 """, concept1=concept1, concept2=concept2, weight=weight)
+            
+            self._invalidate_learning_paths([concept1, concept2])
                 
         except Exception as e:
             raise Exception(f"更新关系失败: {str(e)}")
 
+    def _invalidate_learning_paths(self, concepts):
+        """概念周围的图谱结构变化后，使受影响概念的学习路径缓存失效
+
+        学习路径依据概念周围 graph_depth 跳以内的图谱生成，一条边变化会影响其端点及距端点
+        graph_depth - 1 跳以内的概念，这些概念的版本号一起递增。
+        图谱已经写入，查询邻居或更新版本号失败时只记录日志（查询邻居失败时仍递增端点的版本号），
+        缓存的学习路径最迟在 LEARNING_PATH_CACHE_TTL 后过期。
+        """
+        concepts = list(dict.fromkeys(concepts))
+        try:
+            concepts = list(dict.fromkeys(concepts + self._neighbors(concepts, self.graph_depth - 1)))
+        except Exception:
+            logger.warning('查询概念 %s 的邻居失败', concepts, exc_info=True)
+        try:
+            bump_graph_versions(self.redis_client, concepts)
+        except redis.RedisError:
+            logger.warning('更新概念 %s 的图谱版本失败', concepts, exc_info=True)
+
+    def _neighbors(self, concepts, depth):
+        """距给定概念 depth 跳以内的其他概念名称"""
+        if depth < 1 or not concepts:
+            return []
+        with track_dependency('neo4j', 'get_neighbors'), self.driver.session() as session:
+            # 可变长度路径的跳数不能使用查询参数
+            result = session.run(f"""
+                MATCH (c:Concept)-[:RELATES_TO*1..{int(depth)}]-(n:Concept)
+                WHERE c.name IN $concepts
+                RETURN DISTINCT n.name AS name
+            """, concepts=concepts)
+            return [record['name'] for record in result]
+
     def get_related_concepts(self, concept, limit=5):
         """获取与概念最相关的其他概念"""
         try:
-            with self.driver.session() as session:
+            with track_dependency('neo4j', 'get_related_concepts'), self.driver.session() as session:
                 result = session.run("""
                     MATCH (c:Concept {name: $concept})-[r:RELATES_TO]-(related:Concept)
                     RETURN related.name as name, related.description as description, r.weight as weight
@@ -0,0 +1,193 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+# 不区分用户掌握情况时使用的分桶
+ANY_BUCKET = 'any'
+
+# 分桶对应的学习者情况描述，用于生成个性化的学习路径（同一分桶的提示词相同，结果可以共享）
+CONCEPT_STATE_TEXT = {
+    'new': '尚未学习过该概念',
+    'learning': '正在学习该概念，尚未掌握',
+    'mastered': '已基本掌握该概念，希望进一步巩固和拓展'
+}
+OVERALL_LEVEL_TEXT = {
+    'low': '整体记忆强度较低，需要更多复习',
+    'mid': '整体记忆强度中等',
+    'high': '整体记忆强度较高'
+}
+
+
+def mastery_bucket(profile, edges):
+    """将用户的掌握情况粗粒度分桶
+
+    Args:
+        profile: MemoryService.get_mastery_profile 的返回值，None 表示不区分用户
+        edges: 整体平均记忆强度的分档边界，如 [0.4, 0.7] 分为 low、mid、high 三档
+
+    Returns:
+        str: 分桶，如 learning-mid；没有学习记录的用户只按概念状态分桶
+    """
+    if profile is None:
+        return ANY_BUCKET
+    if not profile['total_concepts']:
+        return profile['concept_state']
+    levels = ('low', 'mid', 'high')
+    level = levels[min(sum(profile['average_strength'] >= edge for edge in edges), len(levels) - 1)]
+    return f"{profile['concept_state']}-{level}"
+
+
+def describe_bucket(bucket):
+    """分桶对应的学习者情况描述，ANY_BUCKET 返回空字符串"""
+    if bucket == ANY_BUCKET:
+        return ''
+    state, _, level = bucket.partition('-')
+    return '；'.join(text for text in (CONCEPT_STATE_TEXT[state], OVERALL_LEVEL_TEXT.get(level)) if text)
+
+
+def graph_version_key(concept):
+    """概念的知识图谱版本号键名"""
+    return f'graph_version:{concept}'
+
+
+def bump_graph_versions(redis_client, concepts):
+    """递增概念的知识图谱版本号，各进程缓存的这些概念的学习路径随之失效
+
+    Args:
+        redis_client: Redis 客户端
+        concepts: 周围图谱结构发生变化的概念名称列表（不含重复）
+
+    Returns:
+        list: 与 concepts 一一对应的新版本号
+    """
+    pipe = redis_client.pipeline(transaction=False)
+    for concept in concepts:
+        pipe.incr(graph_version_key(concept))
+    return pipe.execute()
+
+
+class LearningPathCache:
+    """学习路径缓存（进程内 LRU + TTL）
+
+    按 (概念, 用户水平, 掌握情况分桶) 缓存学习路径。知识图谱中概念周围的结构变化时，
+    KnowledgeGraphService（外部修改时为 invalidate，只处理所列概念，不查询邻居）递增概念的图谱版本号
+    （保存在 Redis 的 graph_version:{concept}），缓存条目记录生成时的版本号，版本不一致即失效。其他进程最迟在 version_ttl 秒后看到新版本。
+    """
+
+    def __init__(self, redis_client, max_entries=1000, ttl=3600, version_ttl=5):
+        """初始化学习路径缓存
+
+        Args:
+            redis_client: Redis 客户端
+            max_entries: 最多缓存的学习路径数
+            ttl: 缓存条目的有效时间（秒）
+            version_ttl: 本进程缓存图谱版本号的时间（秒）
+        """
+        self.redis_client = redis_client
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.version_ttl = version_ttl
+        # (概念, 用户水平, 分桶) -> (过期时间, 图谱版本号, 学习路径)
+        self._entries = OrderedDict()
+        # 概念 -> (读取时间, 图谱版本号)
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'expired': 0, 'invalidated': 0, 'evictions': 0}
+
+    def graph_version(self, concept):
+        """概念的知识图谱版本号"""
+        now = time.monotonic()
+        cached = self._versions.get(concept)
+        if cached is not None and now - cached[0] < self.version_ttl:
+            return cached[1]
+        try:
+            version = int(self.redis_client.get(graph_version_key(concept)) or 0)
+        except redis.RedisError:
+            logger.warning('读取概念 %s 的图谱版本失败', concept, exc_info=True)
+            # 无法读取时沿用已知版本
+            return cached[1] if cached is not None else 0
+        self._versions[concept] = (now, version)
+        return version
+
+    def get(self, concept, user_level, bucket):
+        """读取缓存的学习路径
+
+        Returns:
+            dict: 学习路径，未命中、过期或图谱已变化时为 None
+        """
+        key = (concept, user_level, bucket)
+        version = self.graph_version(concept)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            expires_at, entry_version, learning_path = entry
+            if expires_at <= time.monotonic() or entry_version != version:
+                del self._entries[key]
+                self.stats['expired' if entry_version == version else 'invalidated'] += 1
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return learning_path
+
+    def put(self, concept, user_level, bucket, learning_path, version=None):
+        """缓存学习路径
+
+        Args:
+            version: 生成学习路径时的图谱版本号，默认使用当前版本
+        """
+        if version is None:
+            version = self.graph_version(concept)
+        with self._lock:
+            key = (concept, user_level, bucket)
+            self._entries[key] = (time.monotonic() + self.ttl, version, learning_path)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def invalidate(self, concepts):
+        """知识图谱变化后使相关概念的学习路径失效
+
+        Args:
+            concepts: 周围图谱结构发生变化的概念名称列表
+        """
+        concepts = list(dict.fromkeys(concepts))
+        if not concepts:
+            return
+        versions = bump_graph_versions(self.redis_client, concepts)
+        now = time.monotonic()
+        with self._lock:
+            for concept, version in zip(concepts, versions):
+                self._versions[concept] = (now, version)
+            changed = set(concepts)
+            stale = [key for key in self._entries if key[0] in changed]
+            for key in stale:
+                del self._entries[key]
+            self.stats['invalidated'] += len(stale)
+
+    def get_stats(self):
+        """缓存统计：命中、未命中、过期、失效、淘汰次数，命中率及当前条目数"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['size'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+
+def create_learning_path_cache(config):
+    """根据配置创建学习路径缓存"""
+    return LearningPathCache(
+        redis.from_url(config['REDIS_URL']),
+        max_entries=config['LEARNING_PATH_CACHE_SIZE'],
+        ttl=config['LEARNING_PATH_CACHE_TTL'],
+        version_ttl=config['LEARNING_PATH_CACHE_VERSION_TTL']
+    )
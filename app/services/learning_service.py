@@ -1,109 +1,324 @@
+import asyncio
+import logging
 import random
+import re
 from datetime import datetime, timedelta
-from app.services.deepseek_client import DeepSeekClient
+from flask import current_app
+from app.services.admission import create_llm_admission
+from app.services.content_store import create_async_content_store, create_content_store
+from app.services.deepseek_client import AsyncDeepSeekClient, DeepSeekClient
+from app.services.learning_path_cache import (ANY_BUCKET, create_learning_path_cache, describe_bucket,
+                                              mastery_bucket)
+
+logger = logging.getLogger(__name__)
+
+# 每天学习计划的标题，如“第1天”“### 第一天：入门”
+DAY_HEADER_PATTERN = re.compile(r'^[#*\s]*第\s*([0-9]+|[一二三四五六七八九十]+)\s*天')
+CHINESE_DIGITS = {'一': 1, '二': 2, '三': 3, '四': 4, '五': 5, '六': 6, '七': 7, '八': 8, '九': 9}
+
+
+def _day_number(text):
+    """将标题中的天数（阿拉伯数字或不超过九十九的中文数字）转换为整数"""
+    if text.isdigit():
+        return int(text)
+    tens, ten, ones = text.partition('十')
+    if not ten:
+        return CHINESE_DIGITS[text]
+    return CHINESE_DIGITS.get(tens, 1) * 10 + CHINESE_DIGITS.get(ones, 0)
+
+
+class LearningPathParser:
+    """学习路径增量解析器
+
+    逐段接收模型输出，按行解析。某一天已解析出学习目标和至少一项学习活动后，遇到紧跟在
+    列表项之后的空行即认为这一天完整，立即返回（提示词要求每天之间空一行），之后到下一天
+    标题之前的内容忽略；没有空行分隔时，在下一天的标题或输出结束时返回。
+    """
+    
+    def __init__(self):
+        self._buffer = ''
+        self._day = None
+        self._plan = None
+        # 上一个非空行是否为学习活动或资源
+        self._after_item = False
+    
+    def feed(self, chunk):
+        """接收一段输出
+        
+        Args:
+            chunk: 文本片段（可以在任意位置截断）
+            
+        Returns:
+            list: 本次完整的 [(dayN, 学习计划), ...]
+        """
+        self._buffer += chunk
+        *lines, self._buffer = self._buffer.split('\n')
+        completed = []
+        for line in lines:
+            block = self._parse_line(line)
+            if block is not None:
+                completed.append(block)
+        return completed
+    
+    def close(self):
+        """输出结束，返回剩余的学习计划"""
+        completed = self.feed('\n')
+        block = self._finish()
+        if block is not None:
+            completed.append(block)
+        return completed
+    
+    def _finish(self):
+        """结束当前这一天，返回其学习计划（没有正在解析的一天时为 None）"""
+        completed = (self._day, self._plan) if self._day is not None else None
+        self._day = self._plan = None
+        self._after_item = False
+        return completed
+    
+    def _parse_line(self, line):
+        """解析一行，某一天的学习计划完整时返回"""
+        line = line.strip()
+        if not line:
+            if self._after_item and self._plan['goal'] and self._plan['activities']:
+                return self._finish()
+            return None
+        
+        match = DAY_HEADER_PATTERN.match(line)
+        if match:
+            # 新的一天
+            completed = self._finish()
+            self._day = f'day{_day_number(match.group(1))}'
+            self._plan = {
+                'goal': '',
+                'activities': [],
+                'resources': []
+            }
+            return completed
+        
+        if self._day is None:
+            return None
+        self._after_item = line.startswith('- ')
+        if line.startswith('目标：'):
+            # 学习目标
+            self._plan['goal'] = line[3:].strip()
+        elif self._after_item:
+            # 学习活动或资源
+            item = line[2:].strip()
+            if 'http' in item:
+                self._plan['resources'].append(item)
+            else:
+                self._plan['activities'].append(item)
+        return None
 
 class LearningService:
     """学习服务类"""
     
-    def __init__(self):
-        """初始化学习服务"""
-        # 实际应用中应从数据库加载数据
-        self.learning_paths = {}
+    def __init__(self, content_store=None, memory_service=None, learning_path_cache=None, admission=None):
+        """初始化学习服务
+
+        Args:
+            content_store: 生成内容存储，默认根据配置创建
+            memory_service: 记忆服务，用于按用户掌握情况个性化学习路径，默认不区分用户
+            learning_path_cache: 学习路径缓存，默认根据配置创建
+            admission: DeepSeek API 调用准入控制，默认根据配置创建
+        """
         self.deepseek_client = DeepSeekClient()
+        self.content_store = content_store or create_content_store(current_app.config)
+        self.memory_service = memory_service
+        self.mastery_edges = current_app.config['LEARNING_PATH_MASTERY_EDGES']
+        # 进程内学习路径缓存，按 (概念, 用户水平, 掌握情况分桶) 缓存
+        self.learning_paths = learning_path_cache or create_learning_path_cache(current_app.config)
+        self.admission = admission or create_llm_admission(current_app.config)
     
-    def generate_learning_path(self, concept, user_level='beginner'):
+    def generate_learning_path(self, concept, user_level='beginner', user_id=None, client_id=None):
         """生成学习路径
         
         Args:
             concept: 概念名称
             user_level: 用户水平，可选值为 beginner, intermediate, advanced
+            user_id: 用户ID，提供时按用户的掌握情况个性化
+            client_id: 调用方标识（用于DeepSeek API调用限流，由服务端确定，如客户端IP）
             
         Returns:
             dict: 学习路径
         """
         try:
-            # 使用DeepSeek API生成学习路径
-            messages = [
-                {
-                    'role': 'system',
-                    'content': '你是一个专业的教育专家，擅长设计学习路径。'
-                },
-                {
-                    'role': 'user',
-                    'content': f'请为"{concept}"这个概念设计一个适合{user_level}水平的学习路径，包括每天的学习目标和活动。'
-                }
-            ]
-            
-            response = self.deepseek_client.chat_completion(messages)
-            content = response['choices'][0]['message']['content']
-            
-            # 解析响应内容
-            learning_path = self._parse_learning_path(content)
-            return learning_path
-            
+            return dict(self.stream_learning_path(concept, user_level, user_id, client_id))
         except Exception as e:
-            # 如果API调用失败，使用模拟数据
-            # 根据用户水平调整学习路径
-            if user_level == 'beginner':
-                days = 7
-                difficulty = '简单'
-            elif user_level == 'intermediate':
-                days = 5
-                difficulty = '中等'
-            else:  # advanced
-                days = 3
-                difficulty = '困难'
+            # 输出中途失败时，使用模拟数据
+            return self._fallback_learning_path(concept, user_level)
+    
+    def _mastery_bucket(self, user_id, concept):
+        """用户对概念掌握情况的分桶，无法获取时不区分用户"""
+        if self.memory_service is None or user_id is None:
+            return ANY_BUCKET
+        try:
+            profile = self.memory_service.get_mastery_profile(user_id, concept)
+        except Exception:
+            logger.warning('获取用户 %s 的掌握情况失败', user_id, exc_info=True)
+            return ANY_BUCKET
+        return mastery_bucket(profile, self.mastery_edges)
+    
+    def _lookup_cached(self, concept, user_level, user_id):
+        """查找进程内缓存的学习路径
+        
+        Returns:
+            tuple: (分桶, 图谱版本号, 学习路径)，未命中时学习路径为 None
+        """
+        bucket = self._mastery_bucket(user_id, concept)
+        learning_path = self.learning_paths.get(concept, user_level, bucket)
+        version = self.learning_paths.graph_version(concept)
+        return bucket, version, learning_path
+    
+    @staticmethod
+    def _content_key(concept, user_level, bucket, version):
+        """已保存学习路径的键，包含分桶和图谱版本号"""
+        return (concept, user_level, bucket, f'v{version}')
+    
+    def stream_learning_path(self, concept, user_level='beginner', user_id=None, client_id=None):
+        """流式生成学习路径
+        
+        依次查找进程内缓存和已保存的学习路径；未命中时使用DeepSeek API流式生成，
+        每天的学习计划完整后立即产出，全部完成后保存。缓存键包含用户掌握情况的分桶
+        和概念的知识图谱版本号。
+        
+        Args:
+            concept: 概念名称
+            user_level: 用户水平，可选值为 beginner, intermediate, advanced
+            user_id: 用户ID，提供时按用户的掌握情况个性化
+            client_id: 调用方标识（用于DeepSeek API调用限流，由服务端确定，如客户端IP）
             
-            # 生成学习路径
-            learning_path = {}
+        Yields:
+            tuple: (dayN, 学习计划)
+        """
+        bucket, version, learning_path = self._lookup_cached(concept, user_level, user_id)
+        if learning_path is not None:
+            yield from learning_path.items()
+            return
+        
+        key = self._content_key(concept, user_level, bucket, version)
+        learning_path = self.content_store.load_value(self.content_store.get('learning_path', key))
+        if learning_path is not None:
+            self.learning_paths.put(concept, user_level, bucket, learning_path, version)
+            yield from learning_path.items()
+            return
+        
+        learning_path = {}
+        try:
+            if self.admission is not None:
+                self.admission.acquire(client_id)
+            for day, plan in self._request_learning_path(concept, user_level, bucket):
+                learning_path[day] = plan
+                yield day, plan
+        except Exception:
+            # 已输出部分内容时无法再改用模拟数据
+            if learning_path:
+                raise
+        
+        if learning_path:
+            self.content_store.put('learning_path', key, learning_path)
+            self.learning_paths.put(concept, user_level, bucket, learning_path, version)
+        else:
+            # 如果API调用失败、超出调用限额或无法解析，使用模拟数据（不保存）
+            yield from self._fallback_learning_path(concept, user_level).items()
+    
+    def _request_learning_path(self, concept, user_level, bucket=ANY_BUCKET):
+        """使用DeepSeek API流式生成学习路径
+        
+        Args:
+            concept: 概念名称
+            user_level: 用户水平
+            bucket: 用户掌握情况分桶（提示词只依赖分桶，同一分桶的用户可以共享结果）
             
-            # 第一天：介绍和基础
-            learning_path['day1'] = {
-                'goal': f'了解{concept}的基本概念和原理',
-                'activities': [
-                    f'阅读{concept}的入门介绍',
-                    f'观看{concept}的基础视频教程',
-                    f'完成{concept}的基础练习题'
-                ],
-                'resources': [
-                    f'https://example.com/{concept}/intro',
-                    f'https://example.com/{concept}/video',
-                    f'https://example.com/{concept}/exercises'
-                ]
+        Yields:
+            tuple: (dayN, 学习计划)
+        """
+        parser = LearningPathParser()
+        for chunk in self.deepseek_client.chat_completion_stream(
+                self._learning_path_messages(concept, user_level, bucket)):
+            yield from parser.feed(chunk)
+        yield from parser.close()
+    
+    @staticmethod
+    def _learning_path_messages(concept, user_level, bucket):
+        """生成学习路径的请求消息"""
+        learner = describe_bucket(bucket)
+        return [
+            {
+                'role': 'system',
+                'content': '你是一个专业的教育专家，擅长设计学习路径。'
+            },
+            {
+                'role': 'user',
+                'content': f'请为"{concept}"这个概念设计一个适合{user_level}水平的学习路径，包括每天的学习目标和活动。'
+                           + (f'学习者情况：{learner}。' if learner else '')
+                           + '每天以“第N天”开头，依次写“目标：”和以“- ”开头的学习活动及资源链接，'
+                             '每天的内容之间空一行。'
             }
-            
-            # 第二天到倒数第二天：深入学习
-            for day in range(2, days):
-                learning_path[f'day{day}'] = {
-                    'goal': f'深入学习{concept}的{difficulty}内容',
-                    'activities': [
-                        f'学习{concept}的{difficulty}知识点',
-                        f'完成{concept}的{difficulty}练习题',
-                        f'阅读{concept}的{difficulty}案例'
-                    ],
-                    'resources': [
-                        f'https://example.com/{concept}/advanced{day}',
-                        f'https://example.com/{concept}/exercises{day}',
-                        f'https://example.com/{concept}/cases{day}'
-                    ]
-                }
-            
-            # 最后一天：总结和实践
-            learning_path[f'day{days}'] = {
-                'goal': f'总结{concept}的学习内容并进行实践',
+        ]
+    
+    def _fallback_learning_path(self, concept, user_level):
+        """API调用失败时使用的模拟学习路径（根据用户水平调整天数和难度）"""
+        if user_level == 'beginner':
+            days = 7
+            difficulty = '简单'
+        elif user_level == 'intermediate':
+            days = 5
+            difficulty = '中等'
+        else:  # advanced
+            days = 3
+            difficulty = '困难'
+        
+        # 生成学习路径
+        learning_path = {}
+        
+        # 第一天：介绍和基础
+        learning_path['day1'] = {
+            'goal': f'了解{concept}的基本概念和原理',
+            'activities': [
+                f'阅读{concept}的入门介绍',
+                f'观看{concept}的基础视频教程',
+                f'完成{concept}的基础练习题'
+            ],
+            'resources': [
+                f'https://example.com/{concept}/intro',
+                f'https://example.com/{concept}/video',
+                f'https://example.com/{concept}/exercises'
+            ]
+        }
+        
+        # 第二天到倒数第二天：深入学习
+        for day in range(2, days):
+            learning_path[f'day{day}'] = {
+                'goal': f'深入学习{concept}的{difficulty}内容',
                 'activities': [
-                    f'复习{concept}的所有知识点',
-                    f'完成{concept}的综合项目',
-                    f'参与{concept}的讨论或问答'
+                    f'学习{concept}的{difficulty}知识点',
+                    f'完成{concept}的{difficulty}练习题',
+                    f'阅读{concept}的{difficulty}案例'
                 ],
                 'resources': [
-                    f'https://example.com/{concept}/summary',
-                    f'https://example.com/{concept}/project',
-                    f'https://example.com/{concept}/forum'
+                    f'https://example.com/{concept}/advanced{day}',
+                    f'https://example.com/{concept}/exercises{day}',
+                    f'https://example.com/{concept}/cases{day}'
                 ]
             }
-            
-            return learning_path
+        
+        # 最后一天：总结和实践
+        learning_path[f'day{days}'] = {
+            'goal': f'总结{concept}的学习内容并进行实践',
+            'activities': [
+                f'复习{concept}的所有知识点',
+                f'完成{concept}的综合项目',
+                f'参与{concept}的讨论或问答'
+            ],
+            'resources': [
+                f'https://example.com/{concept}/summary',
+                f'https://example.com/{concept}/project',
+                f'https://example.com/{concept}/forum'
+            ]
+        }
+        
+        return learning_path
     
     def _parse_learning_path(self, content):
         """解析学习路径内容
@@ -114,32 +329,80 @@ class LearningService:
         Returns:
             dict: 学习路径
         """
+        parser = LearningPathParser()
+        return dict(parser.feed(content) + parser.close())
+
+
+class AsyncLearningService:
+    """学习服务的异步版本（用于异步服务模式）
+
+    与同步的 LearningService 共享进程内学习路径缓存和记忆服务：读取用户掌握情况等
+    同步操作在线程池中执行，生成内容存储和 DeepSeek API 请求使用异步客户端。
+    """
+    
+    def __init__(self, learning_service, content_store=None, deepseek_client=None):
+        """初始化异步学习服务
+        
+        Args:
+            learning_service: 同步的 LearningService 实例
+            content_store: 异步生成内容存储，默认根据配置创建
+            deepseek_client: DeepSeek API异步客户端，默认根据配置创建
+        """
+        self.learning_service = learning_service
+        self.content_store = content_store or create_async_content_store(current_app.config)
+        self.deepseek_client = deepseek_client or AsyncDeepSeekClient()
+    
+    async def generate_learning_path(self, concept, user_level='beginner', user_id=None, client_id=None):
+        """生成学习路径（参数和返回值与 LearningService.generate_learning_path 相同）"""
+        try:
+            return {day: plan async for day, plan in self.stream_learning_path(
+                concept, user_level, user_id, client_id)}
+        except Exception as e:
+            return self.learning_service._fallback_learning_path(concept, user_level)
+    
+    async def stream_learning_path(self, concept, user_level='beginner', user_id=None, client_id=None):
+        """流式生成学习路径（查找顺序与 LearningService.stream_learning_path 相同）
+        
+        Yields:
+            tuple: (dayN, 学习计划)
+        """
+        service = self.learning_service
+        bucket, version, learning_path = await asyncio.to_thread(
+            service._lookup_cached, concept, user_level, user_id)
+        if learning_path is not None:
+            for day, plan in learning_path.items():
+                yield day, plan
+            return
+        
+        key = service._content_key(concept, user_level, bucket, version)
+        learning_path = self.content_store.load_value(await self.content_store.get('learning_path', key))
+        if learning_path is not None:
+            service.learning_paths.put(concept, user_level, bucket, learning_path, version)
+            for day, plan in learning_path.items():
+                yield day, plan
+            return
+        
         learning_path = {}
-        current_day = None
+        try:
+            if service.admission is not None:
+                await service.admission.acquire_async(client_id)
+            parser = LearningPathParser()
+            async for chunk in self.deepseek_client.chat_completion_stream(
+                    service._learning_path_messages(concept, user_level, bucket)):
+                for day, plan in parser.feed(chunk):
+                    learning_path[day] = plan
+                    yield day, plan
+            for day, plan in parser.close():
+                learning_path[day] = plan
+                yield day, plan
+        except Exception:
+            # 已输出部分内容时无法再改用模拟数据
+            if learning_path:
+                raise
         
-        for line in content.split('\n'):
-            line = line.strip()
-            if not line:
-                continue
-            
-            if line.startswith('第') and '天' in line:
-                # 新的一天
-                day_num = int(line[1:line.index('天')])
-                current_day = f'day{day_num}'
-                learning_path[current_day] = {
-                    'goal': '',
-                    'activities': [],
-                    'resources': []
-                }
-            elif line.startswith('目标：'):
-                # 学习目标
-                learning_path[current_day]['goal'] = line[3:].strip()
-            elif line.startswith('- '):
-                # 学习活动或资源
-                item = line[2:].strip()
-                if 'http' in item:
-                    learning_path[current_day]['resources'].append(item)
-                else:
-                    learning_path[current_day]['activities'].append(item)
-        
-        return learning_path 
\ No newline at end of file
+        if learning_path:
+            await self.content_store.put('learning_path', key, learning_path)
+            service.learning_paths.put(concept, user_level, bucket, learning_path, version)
+        else:
+            for day, plan in service._fallback_learning_path(concept, user_level).items():
+                yield day, plan
@@ -1,75 +1,84 @@
-import redis
-from datetime import datetime, timedelta
+from datetime import datetime
 from flask import current_app
 import json
-import random
+import time
+from app.services.memory_store import STATS_FIELDS, create_memory_store, empty_stats, make_event
+from app.services.review_event_log import ReviewEventLog
+from app.services.scheduling_engine import SchedulingEngine, get_model
+from app.services.write_behind import WriteBehindBuffer
+
+# 复习页面数据字段
+DASHBOARD_FIELDS = ('schedule', 'strength', 'stats')
+
 
 class MemoryService:
     """记忆管理服务类"""
     
     def __init__(self):
         """初始化记忆服务"""
-        self.redis_client = redis.from_url(current_app.config['REDIS_URL'])
+        self.store = create_memory_store(current_app.config)
         self.intervals = current_app.config['MEMORY_INTERVALS']
         self.memory_strength_threshold = current_app.config['MEMORY_STRENGTH_THRESHOLD']
-        # 实际应用中应从数据库加载数据
-        self.user_memory = {}
+        self.schedule_page_size = current_app.config['REVIEW_SCHEDULE_PAGE_SIZE']
+        self.forecast_score = current_app.config['MEMORY_FORECAST_SCORE']
+        self.cohort_batch_size = current_app.config['COHORT_BATCH_SIZE']
+        self.scheduler = SchedulingEngine(get_model(
+            current_app.config['MEMORY_MODEL'], self.intervals, self.memory_strength_threshold
+        ))
+        self.event_log = ReviewEventLog(self.store)
+        # 可选的写后模式：复习结果先在进程内合并，再批量写入存储
+        self.write_buffer = None
+        if current_app.config['MEMORY_WRITE_BEHIND']:
+            self.write_buffer = WriteBehindBuffer(
+                lambda user_id, results: self._apply_review_results(user_id, results),
+                max_batch=current_app.config['MEMORY_WRITE_BEHIND_MAX_BATCH'],
+                max_age=current_app.config['MEMORY_WRITE_BEHIND_MAX_AGE'],
+                max_pending=current_app.config['MEMORY_WRITE_BEHIND_MAX_PENDING']
+            )
+
+    @staticmethod
+    def _to_score(dt):
+        """将时间转换为复习时间索引的分值"""
+        return dt.timestamp()
+
+    def _flush_pending(self, user_id):
+        """写后模式下，读取前先写入该用户缓冲的复习结果（保证读到自己的写入）"""
+        if self.write_buffer is not None:
+            self.write_buffer.flush_user(user_id)
 
-    def get_review_schedule(self, user_id):
+    def get_review_schedule(self, user_id, before=None, limit=None, offset=0):
         """获取用户的复习计划
-        
+
+        复习时间索引按下次复习时间排序（Redis 中为有序集合 review_schedule:{user_id}），
+        按时间区间分页查询，复杂度为 O(log n + k)，不需要扫描用户的全部学习记录。
+
         Args:
             user_id: 用户ID
-            
+            before: 截止时间（datetime），只返回在此之前到期的复习，默认不限
+            limit: 返回条数上限，默认使用 REVIEW_SCHEDULE_PAGE_SIZE
+            offset: 分页偏移量
+
         Returns:
-            list: 复习计划列表
+            list: 按下次复习时间升序排列的复习计划列表
         """
-        # 实际应用中应从数据库获取数据
-        # 这里使用模拟数据
-        today = datetime.now().strftime('%Y-%m-%d')
-        
-        # 生成今日复习内容
-        today_reviews = [
-            {
-                'concept': '机器学习',
-                'memory_strength': 0.65,
-                'next_review': today,
-                'review_count': 3
-            },
-            {
-                'concept': '神经网络',
-                'memory_strength': 0.45,
-                'next_review': today,
-                'review_count': 2
-            },
-            {
-                'concept': '深度学习',
-                'memory_strength': 0.75,
-                'next_review': today,
-                'review_count': 5
-            }
-        ]
-        
-        # 生成历史复习内容
-        history_reviews = []
-        concepts = ['Python', '数据结构', '算法', '数据库', 'Web开发', '人工智能', '大数据']
-        
-        for i in range(10):
-            days_ago = random.randint(1, 30)
-            review_date = (datetime.now() - timedelta(days=days_ago)).strftime('%Y-%m-%d')
-            concept = random.choice(concepts)
-            memory_strength = random.uniform(0.3, 0.9)
-            review_count = random.randint(1, 8)
-            
-            history_reviews.append({
-                'concept': concept,
-                'memory_strength': memory_strength,
-                'next_review': review_date,
-                'review_count': review_count
-            })
-        
-        # 合并今日和历史复习内容
-        return today_reviews + history_reviews
+        self._flush_pending(user_id)
+        records = self.store.due_records(
+            user_id,
+            self._to_score(before) if before is not None else None,
+            offset,
+            self.schedule_page_size if limit is None else limit
+        )
+        return self._build_schedule(records)
+
+    @staticmethod
+    def _build_schedule(records):
+        """将学习记录转换为复习计划条目"""
+        return [{
+            'concept': record['concept'],
+            'memory_strength': record.get('memory_strength', 0.5),
+            'next_review': record.get('next_review'),
+            'review_count': record.get('review_count', 0)
+        } for record in records]
 
     def start_review(self, user_id, concept):
         """开始复习某个概念
@@ -107,6 +116,8 @@ class MemoryService:
 
     def get_learning_stats(self, user_id):
         """获取学习统计数据
+
+        统计计数器在每次写入学习记录时于同一事务内增量维护，读取为 O(1)。
         
         Args:
             user_id: 用户ID
@@ -114,12 +125,41 @@ class MemoryService:
         Returns:
             dict: 学习统计数据
         """
-        # 实际应用中应从数据库获取数据
+        self._flush_pending(user_id)
+        return self._build_stats(self.store.get_stats(user_id))
+
+    @staticmethod
+    def _build_stats(stats):
+        """将统计计数器转换为学习统计数据"""
+        total = stats['total_concepts']
+        return {
+            'total_concepts': total,
+            'mastered_concepts': stats['mastered_concepts'],
+            'review_count': stats['review_count'],
+            'average_strength': stats['strength_sum'] / total if total else 0.0
+        }
+
+    def get_mastery_profile(self, user_id, concept):
+        """获取用户对某个概念的掌握情况及整体记忆强度（用于个性化学习路径）
+
+        Args:
+            user_id: 用户ID
+            concept: 概念名称
+
+        Returns:
+            dict: concept_state（new、learning 或 mastered）、average_strength 和 total_concepts
+        """
+        self._flush_pending(user_id)
+        record = self.store.get_records(user_id, [concept]).get(concept)
+        stats = self._build_stats(self.store.get_stats(user_id))
+        if record is None:
+            concept_state = 'new'
+        else:
+            concept_state = 'mastered' if self._is_mastered(record) else 'learning'
         return {
-            'total_concepts': 25,
-            'mastered_concepts': 15,
-            'review_count': 120,
-            'average_strength': 0.75
+            'concept_state': concept_state,
+            'average_strength': stats['average_strength'],
+            'total_concepts': stats['total_concepts']
         }
 
     def get_memory_strength(self, user_id):
@@ -131,89 +171,550 @@ class MemoryService:
         Returns:
             dict: 记忆强度数据
         """
-        # 实际应用中应从数据库获取数据
-        concepts = ['机器学习', '神经网络', '深度学习', 'Python', '数据结构', '算法', '数据库']
-        strengths = [random.uniform(0.3, 0.9) for _ in range(len(concepts))]
-        
+        self._flush_pending(user_id)
+        return self._build_strength(self.store.get_all_records(user_id))
+
+    @staticmethod
+    def _build_strength(records):
+        """将学习记录转换为记忆强度数据"""
         return {
-            'concepts': concepts,
-            'strengths': strengths
+            'concepts': [record['concept'] for record in records],
+            'strengths': [record.get('memory_strength', 0.5) for record in records]
         }
 
+    def get_dashboard(self, user_id, fields=None):
+        """获取复习页面所需的全部数据
+
+        复习计划、记忆强度和学习统计由存储一次读取（Redis 存储为同一个管道的一次往返）。
+
+        Args:
+            user_id: 用户ID
+            fields: 需要返回的字段，可选值见 DASHBOARD_FIELDS，默认全部
+
+        Returns:
+            dict: 以字段名为键的数据
+        """
+        fields = DASHBOARD_FIELDS if fields is None else fields
+        self._flush_pending(user_id)
+        data = self.store.get_dashboard(user_id, fields, self.schedule_page_size)
+
+        dashboard = {}
+        if 'schedule' in data:
+            dashboard['schedule'] = self._build_schedule(data['schedule'])
+        if 'strength' in data:
+            dashboard['strength'] = self._build_strength(data['strength'])
+        if 'stats' in data:
+            dashboard['stats'] = self._build_stats(data['stats'])
+        return dashboard
+
     def _get_learning_records(self, user_id):
         """获取用户的学习记录"""
-        records_key = f"learning_records:{user_id}"
-        records = self.redis_client.get(records_key)
-        return json.loads(records) if records else []
-
-    def _calculate_next_review(self, first_learned, memory_strength):
-        """计算下次复习时间"""
-        if memory_strength >= self.memory_strength_threshold:
-            return None
-            
-        # 根据记忆强度选择复习间隔
-        interval_index = int(memory_strength * len(self.intervals))
-        if interval_index >= len(self.intervals):
-            return None
-            
-        days = self.intervals[interval_index]
-        return first_learned + timedelta(days=days)
+        self._flush_pending(user_id)
+        return self.store.get_all_records(user_id)
+
+    def _get_learning_record(self, user_id, concept):
+        """获取用户某个概念的学习记录"""
+        self._flush_pending(user_id)
+        return self.store.get_records(user_id, [concept]).get(concept)
 
     def update_memory_strength(self, user_id, concept, performance_score):
-        """更新概念的记忆强度"""
+        """更新概念的记忆强度
+
+        启用写后模式（MEMORY_WRITE_BEHIND）时只写入进程内缓冲区，
+        由缓冲区按条数或时间批量写入存储。
+
+        Raises:
+            WriteBehindFullError: 写后缓冲区已满（存储持续写入失败）
+        """
+        if self.write_buffer is not None:
+            self.write_buffer.add(user_id, concept, performance_score)
+            return
+
         try:
-            records_key = f"learning_records:{user_id}"
-            records = self._get_learning_records(user_id)
-            
-            # 查找并更新记录
-            for record in records:
-                if record['concept'] == concept:
-                    # 根据表现更新记忆强度
-                    new_strength = self._calculate_new_strength(
-                        record.get('memory_strength', 0.5),
-                        performance_score
-                    )
-                    record['memory_strength'] = new_strength
-                    record['review_count'] = record.get('review_count', 0) + 1
-                    record['last_reviewed'] = datetime.now().isoformat()
-                    break
-            
-            # 保存更新后的记录
-            self.redis_client.set(records_key, json.dumps(records))
-            
+            self.apply_review_results(user_id, [(concept, performance_score)])
         except Exception as e:
             raise Exception(f"更新记忆强度失败: {str(e)}")
 
-    def _calculate_new_strength(self, current_strength, performance_score):
-        """计算新的记忆强度"""
-        # 简单的线性更新模型
-        # 可以根据需要实现更复杂的算法
-        weight = 0.3  # 学习权重
-        new_strength = current_strength * (1 - weight) + performance_score * weight
-        return min(max(new_strength, 0), 1)  # 确保在0-1之间
+    def apply_review_results(self, user_id, results):
+        """批量应用复习结果
+
+        一次读取涉及的全部记录，由调度引擎向量化计算后，在同一个事务中
+        写回记录、复习时间索引和统计计数器（Redis 存储为 WATCH + MULTI，
+        并发修改时自动重试）。
+
+        Args:
+            user_id: 用户ID
+            results: (概念名称, 表现分) 列表，按复习先后顺序排列
+
+        Returns:
+            tuple: (更新后的学习记录列表, 不存在学习记录的概念列表)
+        """
+        # 写后模式下先写入该用户缓冲的复习结果，保证按提交顺序应用
+        self._flush_pending(user_id)
+        return self._apply_review_results(user_id, results)
+
+    def _apply_review_results(self, user_id, results):
+        """批量应用复习结果（不检查写后缓冲区，供缓冲区写入时调用）"""
+        concepts = list(dict.fromkeys(concept for concept, _ in results))
+
+        def review(records):
+            events = []
+            for review_round in self._review_rounds(results, records):
+                round_records = self.scheduler.review(
+                    [records[concept] for concept, _ in review_round],
+                    [score for _, score in review_round]
+                )
+                # 记录每次复习后的状态，同一概念的多次复习各产生一条事件
+                events.extend(
+                    make_event('review', dict(record), score)
+                    for record, (_, score) in zip(round_records, review_round)
+                )
+            return records, events
+
+        records = self._update_records(user_id, concepts, review)
+        skipped = [concept for concept in concepts if concept not in records]
+        return list(records.values()), skipped
+
+    def _update_records(self, user_id, concepts, mutate):
+        """原子地读取、修改并写回学习记录
+
+        在存储的同一个事务中写回记录、复习时间索引、统计计数器增量，并追加复习事件。
+
+        Args:
+            user_id: 用户ID
+            concepts: 需要读取的概念名称列表
+            mutate: 接收 {概念: 记录}（不含不存在的记录），返回
+                ({概念: 需要保存的记录}, [复习事件, ...])
+
+        Returns:
+            dict: 已保存的 {概念: 记录}
+        """
+        def apply(old_records):
+            # 存储冲突重试时会重新调用，mutate 需在副本上修改
+            records, events = mutate({
+                concept: dict(record) for concept, record in old_records.items()
+            })
+            stats_delta = empty_stats()
+            for concept, record in records.items():
+                old = self._record_stats(old_records.get(concept))
+                new = self._record_stats(record)
+                for field in STATS_FIELDS:
+                    stats_delta[field] += new[field] - old[field]
+            return records, stats_delta, events
+
+        return self.store.update_records(user_id, concepts, apply)
+
+    @staticmethod
+    def _review_rounds(results, records):
+        """将复习结果拆分为多轮，每轮中每个概念至多出现一次
+
+        同一概念的多次复习需要按顺序依次计算，不同概念可以在同一轮中向量化计算。
+        """
+        rounds = []
+        seen_count = {}
+        for concept, score in results:
+            if concept not in records:
+                continue
+            index = seen_count.get(concept, 0)
+            seen_count[concept] = index + 1
+            if index == len(rounds):
+                rounds.append([])
+            rounds[index].append((concept, score))
+        return rounds
 
     def add_learning_record(self, user_id, concept):
         """添加新的学习记录"""
+        self._flush_pending(user_id)
         try:
-            records_key = f"learning_records:{user_id}"
-            records = self._get_learning_records(user_id)
-            
-            # 检查是否已存在
-            for record in records:
-                if record['concept'] == concept:
-                    return
-            
-            # 添加新记录
-            new_record = {
-                'concept': concept,
-                'first_learned': datetime.now().isoformat(),
-                'memory_strength': 0.5,
-                'review_count': 0
-            }
-            records.append(new_record)
-            
-            # 保存更新后的记录
-            self.redis_client.set(records_key, json.dumps(records))
+            def add(records):
+                # 检查是否已存在
+                if concept in records:
+                    return {}, []
+
+                # 添加新记录
+                new_record = {
+                    'concept': concept,
+                    'first_learned': datetime.now().isoformat(),
+                    'memory_strength': 0.5,
+                    'review_count': 0
+                }
+                self.scheduler.schedule([new_record])
+                return {concept: new_record}, [make_event('learn', dict(new_record), None)]
+
+            self._update_records(user_id, [concept], add)
             
         except Exception as e:
-            raise Exception(f"添加学习记录失败: {str(e)}") 
\ No newline at end of file
+            raise Exception(f"添加学习记录失败: {str(e)}")
+
+    def _is_mastered(self, record):
+        """判断概念是否已掌握"""
+        return record.get('memory_strength', 0.5) >= self.memory_strength_threshold
+
+    def _record_stats(self, record):
+        """单条学习记录对统计计数器的贡献"""
+        if record is None:
+            return empty_stats()
+        return {
+            'total_concepts': 1,
+            'mastered_concepts': int(self._is_mastered(record)),
+            'review_count': record.get('review_count', 0),
+            'strength_sum': float(record.get('memory_strength', 0.5))
+        }
+
+    def rebuild_learning_stats(self, user_id):
+        """根据原始学习记录重建用户的统计计数器
+
+        Args:
+            user_id: 用户ID
+
+        Returns:
+            dict: 重建后的统计计数器
+        """
+        return self.store.rebuild_stats(user_id, self._compute_stats)
+
+    def _compute_stats(self, records):
+        """根据全部学习记录计算统计计数器"""
+        stats = empty_stats()
+        for record in records:
+            for field, value in self._record_stats(record).items():
+                stats[field] += value
+        return stats
+
+    def rebuild_all_learning_stats(self, batch_size=500):
+        """重建所有用户的统计计数器（修复任务）
+
+        Args:
+            batch_size: 每批遍历的用户数
+
+        Returns:
+            int: 处理的用户数
+        """
+        users = 0
+        for user_ids in self.store.iter_user_ids(batch_size):
+            for user_id in user_ids:
+                self.rebuild_learning_stats(user_id)
+            users += len(user_ids)
+        return users
+
+    def migrate_legacy_records(self, batch_size=500):
+        """将 Redis 中旧版本格式（JSON 字符串）的学习记录转换为当前格式（升级时执行一次）
+
+        Args:
+            batch_size: 每批遍历的用户数
+
+        Returns:
+            tuple: (转换的用户数, 记录数)
+
+        Raises:
+            ValueError: 当前不是 Redis 存储
+        """
+        if self.store.name != 'redis':
+            raise ValueError('只有 Redis 存储存在旧版本格式的学习记录')
+        return self.store.migrate_legacy_records(batch_size, self._compute_stats)
+
+    def get_review_history(self, user_id, concept=None):
+        """获取记忆强度变化历史（从事件快照和事件流顺序读取）
+
+        Args:
+            user_id: 用户ID
+            concept: 概念名称，默认返回全部概念
+
+        Returns:
+            dict: {概念: 按时间排列的复习历史}
+        """
+        self._flush_pending(user_id)
+        return self.event_log.history(user_id, concept)
+
+    def rebuild_records_from_events(self, user_id):
+        """根据事件日志重建用户的学习记录、复习时间索引和统计计数器
+
+        Args:
+            user_id: 用户ID
+
+        Returns:
+            int: 重建的记录数
+        """
+        records = self.event_log.rebuild_records(user_id)
+        self.store.replace_records(user_id, list(records.values()))
+        self.rebuild_learning_stats(user_id)
+        return len(records)
+
+    def _load_record_batches(self, user_ids, batch_size=1000):
+        """按批次读取多个用户的学习记录（Redis 存储每批为一次管道往返）
+
+        Args:
+            user_ids: 用户ID列表
+            batch_size: 每批读取的用户数
+
+        Yields:
+            tuple: (本批用户ID列表, [(用户ID, 学习记录列表), ...])
+        """
+        for start in range(0, len(user_ids), batch_size):
+            chunk = user_ids[start:start + batch_size]
+            for user_id in chunk:
+                self._flush_pending(user_id)
+            yield chunk, list(zip(chunk, self.store.get_records_for_users(chunk)))
+
+    def _load_records_for_users(self, user_ids, batch_size=1000):
+        """按批次读取多个用户的学习记录
+
+        Yields:
+            tuple: (用户ID, 学习记录列表)
+        """
+        for _, user_records in self._load_record_batches(user_ids, batch_size):
+            yield from user_records
+
+    def get_cohort_members(self, cohort_id):
+        """获取班级成员用户ID列表"""
+        return self.store.get_cohort_members(cohort_id)
+
+    def set_cohort_members(self, cohort_id, user_ids):
+        """设置班级成员（替换原有成员）
+
+        Args:
+            cohort_id: 班级ID
+            user_ids: 用户ID列表，为空时删除该班级
+
+        Returns:
+            int: 成员数
+        """
+        user_ids = list(dict.fromkeys(user_ids))
+        self.store.set_cohort_members(cohort_id, user_ids)
+        return len(user_ids)
+
+    def iter_cohort_mastery(self, user_ids):
+        """逐批计算多个用户的掌握情况
+
+        每批用户的记录通过一次批量读取获得，再用 pandas 分组聚合，
+        调用方可边计算边输出，内存占用只与批大小有关。
+
+        Args:
+            user_ids: 用户ID列表
+
+        Yields:
+            dict: 单个用户的掌握情况，顺序与 user_ids 一致
+        """
+        # 班级查询依赖 pandas（导入耗时较长），首次使用时才导入
+        from app.services.cohort_analytics import mastery_by_user, records_frame
+        now = datetime.now()
+        for chunk, user_records in self._load_record_batches(user_ids, self.cohort_batch_size):
+            yield from mastery_by_user(records_frame(user_records), chunk,
+                                       self.memory_strength_threshold, now)
+
+    def iter_cohort_schedule(self, user_ids, before=None, limit=None):
+        """逐批获取多个用户的复习计划
+
+        Args:
+            user_ids: 用户ID列表
+            before: 截止时间（datetime），只返回在此之前到期的复习，默认不限
+            limit: 每个用户返回的条数上限，默认使用 REVIEW_SCHEDULE_PAGE_SIZE
+
+        Yields:
+            dict: {'user_id', 'schedule'}，顺序与 user_ids 一致
+        """
+        from app.services.cohort_analytics import records_frame, schedule_by_user
+        limit = self.schedule_page_size if limit is None else limit
+        for chunk, user_records in self._load_record_batches(user_ids, self.cohort_batch_size):
+            yield from schedule_by_user(records_frame(user_records), chunk, before, limit)
+
+    def get_cohort_concept_summary(self, user_ids):
+        """按概念汇总多个用户的掌握情况，掌握率最低的概念在前
+
+        Args:
+            user_ids: 用户ID列表
+
+        Returns:
+            list: 每个概念的学习人数、掌握人数、掌握率、平均记忆强度和已到期复习数
+        """
+        from app.services.cohort_analytics import concept_summary, concept_totals, records_frame
+        now = datetime.now()
+        totals = None
+        for _, user_records in self._load_record_batches(user_ids, self.cohort_batch_size):
+            batch = concept_totals(records_frame(user_records), self.memory_strength_threshold, now)
+            totals = batch if totals is None else totals.add(batch, fill_value=0)
+        return concept_summary(totals)
+
+    def forecast_reviews(self, user_ids, days=30, score=None):
+        """预测用户未来每天到期的复习数量
+
+        全部用户的记录合并后由调度引擎一次性向量化推演。
+
+        Args:
+            user_ids: 用户ID列表
+            days: 预测天数
+            score: 假设的复习表现分，默认使用 MEMORY_FORECAST_SCORE
+
+        Returns:
+            numpy.ndarray: 形状为 (len(user_ids), days) 的每日到期复习数
+        """
+        if score is None:
+            score = self.forecast_score
+        records = []
+        groups = []
+        for index, (_, user_records) in enumerate(self._load_records_for_users(user_ids)):
+            records.extend(user_records)
+            groups.extend([index] * len(user_records))
+        return self.scheduler.forecast(records, groups, len(user_ids), days, score)
+
+    def rescore_all_records(self, batch_size=500):
+        """批量重算所有用户学习记录的复习时间（每晚任务）
+
+        按批次遍历用户，每批记录合并后由调度引擎一次性向量化计算，再逐个用户通过存储的
+        事务（Redis 为 WATCH/MULTI）写回记录和复习时间索引。读取之后被并发复习修改过的
+        记录在事务中按最新内容重新计算，不会覆盖复习结果。
+
+        Args:
+            batch_size: 每批处理的用户数
+
+        Returns:
+            dict: 处理的用户数、记录数和耗时
+        """
+        start = time.perf_counter()
+        total_users = 0
+        total_records = 0
+
+        for user_ids in self.store.iter_user_ids(batch_size):
+            loaded = dict(zip(user_ids, self.store.get_records_for_users(user_ids)))
+            snapshots = {
+                user_id: {record['concept']: dict(record) for record in records}
+                for user_id, records in loaded.items()
+            }
+            self.scheduler.rescore([record for records in loaded.values() for record in records])
+
+            for user_id, records in loaded.items():
+                if not records:
+                    continue
+                rescored = {record['concept']: record for record in records}
+                total_records += len(self._rescore_user(user_id, snapshots[user_id], rescored))
+            total_users += len(user_ids)
+
+        elapsed = time.perf_counter() - start
+        return {
+            'users': total_users,
+            'records': total_records,
+            'seconds': elapsed,
+            'records_per_second': total_records / elapsed if elapsed else 0.0
+        }
+
+    def _rescore_user(self, user_id, snapshots, rescored):
+        """在事务中写回单个用户的重算结果
+
+        Args:
+            user_id: 用户ID
+            snapshots: 批量计算前读取的 {概念: 记录}
+            rescored: 批量计算后的 {概念: 记录}
+
+        Returns:
+            dict: 已保存的 {概念: 记录}
+        """
+        def rescore(records):
+            # 未被修改的记录直接使用批量计算结果，其余按最新内容重新计算
+            unchanged = [
+                concept for concept, record in records.items()
+                if record == snapshots.get(concept)
+            ]
+            self.scheduler.rescore([
+                record for concept, record in records.items() if concept not in unchanged
+            ])
+            for concept in unchanged:
+                records[concept] = rescored[concept]
+            return records, []
+
+        return self._update_records(user_id, list(rescored), rescore)
+
+    def export_records(self, output, batch_size=1000, progress=None):
+        """以 NDJSON 格式流式导出所有用户的学习记录（迁移和备份）
+
+        按批次遍历用户（Redis 存储使用 SCAN），每批学习记录通过一次读取取回后立即写出，
+        内存占用只与批次大小有关。每行一个用户: {"user_id": ..., "records": [...]}。
+        统计计数器可由学习记录重新计算，不导出；复习事件流和快照不导出。
+        Redis 存储的 SCAN 可能在不同批次中返回同一用户，该用户会导出多行（内容相同，
+        导入时后一行替换前一行，结果不变），导出的用户数可能略多于实际用户数。
+
+        Args:
+            output: 以文本模式打开的输出文件
+            batch_size: 每批读取的用户数
+            progress: 每批写出后调用，参数为与返回值相同结构的累计结果
+
+        Returns:
+            dict: 导出的用户数、记录数、字节数和耗时
+        """
+        start = time.perf_counter()
+        totals = {'users': 0, 'records': 0, 'bytes': 0}
+
+        for user_ids in self.store.iter_user_ids(batch_size):
+            lines = []
+            for user_id, records in zip(user_ids, self.store.get_records_for_users(user_ids)):
+                lines.append(json.dumps({'user_id': user_id, 'records': records},
+                                        ensure_ascii=False, separators=(',', ':')))
+                totals['records'] += len(records)
+            chunk = '\n'.join(lines) + '\n'
+            output.write(chunk)
+            totals['users'] += len(user_ids)
+            totals['bytes'] += len(chunk.encode('utf-8'))
+            if progress is not None:
+                progress(self._transfer_result(totals, start))
+        return self._transfer_result(totals, start)
+
+    def import_records(self, lines, batch_size=1000, progress=None):
+        """从 NDJSON 流式导入学习记录（export_records 的输出）
+
+        每批 batch_size 个用户的记录、复习时间索引和统计计数器一次写入（Redis 存储为一次管道往返），
+        文件中出现的用户的已有学习记录会被替换，其他用户不受影响；重复导入同一文件结果相同。
+
+        Args:
+            lines: 逐行读取的输入（以文本模式打开的文件）
+            batch_size: 每批写入的用户数
+            progress: 每批写入后调用，参数为与返回值相同结构的累计结果
+
+        Returns:
+            dict: 导入的用户数、记录数、字节数和耗时
+
+        Raises:
+            ValueError: 某一行不是合法的导出格式
+        """
+        start = time.perf_counter()
+        totals = {'users': 0, 'records': 0, 'bytes': 0}
+        user_records = {}
+
+        def write_batch():
+            self.store.restore_records(user_records, {
+                user_id: self._compute_stats(records) for user_id, records in user_records.items()
+            })
+            totals['users'] += len(user_records)
+            totals['records'] += sum(len(records) for records in user_records.values())
+            user_records.clear()
+            if progress is not None:
+                progress(self._transfer_result(totals, start))
+
+        for line_number, line in enumerate(lines, 1):
+            totals['bytes'] += len(line.encode('utf-8'))
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"第 {line_number} 行不是合法的JSON: {e}") from e
+            if not isinstance(item, dict) or item.get('user_id') is None:
+                raise ValueError(f"第 {line_number} 行缺少 user_id")
+            records = item.get('records')
+            if not isinstance(records, list) or not all(
+                    isinstance(record, dict) and 'concept' in record for record in records):
+                raise ValueError(f"第 {line_number} 行的 records 不是学习记录列表")
+            user_records[str(item['user_id'])] = records
+            if len(user_records) >= batch_size:
+                write_batch()
+        if user_records:
+            write_batch()
+        return self._transfer_result(totals, start)
+
+    @staticmethod
+    def _transfer_result(totals, start):
+        """导入导出的累计结果及吞吐量"""
+        elapsed = time.perf_counter() - start
+        return dict(
+            totals,
+            seconds=elapsed,
+            records_per_second=totals['records'] / elapsed if elapsed else 0.0,
+            megabytes_per_second=totals['bytes'] / 1e6 / elapsed if elapsed else 0.0
+        )
\ No newline at end of file
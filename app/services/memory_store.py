@@ -0,0 +1,1027 @@
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import zlib
+from bisect import bisect_right, insort
+from collections import OrderedDict
+from datetime import datetime
+
+import redis
+
+# 统计计数器字段
+STATS_FIELDS = ('total_concepts', 'mastered_concepts', 'review_count', 'strength_sum')
+# 乐观锁（WATCH）冲突时的最大重试次数，超过后抛出 ConcurrentUpdateError
+WATCH_MAX_RETRIES = 5
+
+
+class ConcurrentUpdateError(Exception):
+    """同一用户的数据被并发修改，重试后仍然冲突"""
+
+
+def _watch_retries(user_id):
+    """WATCH 事务的重试次数迭代器：两次重试之间随机退避，用尽后抛出 ConcurrentUpdateError"""
+    for attempt in range(WATCH_MAX_RETRIES):
+        if attempt:
+            time.sleep(random.uniform(0, 0.005 * 2 ** attempt))
+        yield attempt
+    raise ConcurrentUpdateError(f"用户 {user_id} 的学习记录正在被并发修改，请稍后重试")
+
+
+def empty_stats():
+    """全零的统计计数器"""
+    return {'total_concepts': 0, 'mastered_concepts': 0, 'review_count': 0, 'strength_sum': 0.0}
+
+
+def make_event(event_type, record, score):
+    """构造一条复习事件
+
+    Args:
+        event_type: 事件类型，learn（新增学习记录）或 review（复习）
+        record: 事件发生后的学习记录
+        score: 复习表现分，learn 事件为 None
+    """
+    return {
+        'type': event_type,
+        'concept': record['concept'],
+        'score': score,
+        'record': record,
+        'ts': datetime.now().isoformat()
+    }
+
+
+def review_score(record):
+    """学习记录在复习时间索引中的分值（下次复习时间戳），无需复习时为 None"""
+    next_review = record.get('next_review')
+    return datetime.fromisoformat(next_review).timestamp() if next_review else None
+
+
+class MemoryStore:
+    """记忆数据存储接口
+
+    保存每个用户的学习记录、按下次复习时间排序的索引、统计计数器，
+    以及只追加的复习事件流和事件快照。所有实现都保证 update_records
+    中记录、索引、计数器和事件的写入是原子的。
+    """
+
+    name = None
+
+    def get_records(self, user_id, concepts):
+        """读取指定概念的学习记录
+
+        Returns:
+            dict: {概念: 记录}，不含不存在的记录
+        """
+        raise NotImplementedError
+
+    def get_all_records(self, user_id):
+        """读取用户的全部学习记录"""
+        raise NotImplementedError
+
+    def get_records_for_users(self, user_ids):
+        """批量读取多个用户的全部学习记录
+
+        Returns:
+            list: 与 user_ids 一一对应的学习记录列表
+        """
+        raise NotImplementedError
+
+    def due_records(self, user_id, max_score, offset, limit):
+        """按下次复习时间升序读取到期的学习记录
+
+        Args:
+            user_id: 用户ID
+            max_score: 下次复习时间戳上限，None 表示不限
+            offset: 分页偏移量
+            limit: 返回条数上限
+        """
+        raise NotImplementedError
+
+    def get_stats(self, user_id):
+        """读取统计计数器"""
+        raise NotImplementedError
+
+    def get_dashboard(self, user_id, fields, limit):
+        """一次读取复习页面所需的数据
+
+        Returns:
+            dict: schedule（到期记录列表）、strength（全部记录列表）、stats（计数器），
+                只包含 fields 中请求的部分
+        """
+        dashboard = {}
+        if 'schedule' in fields:
+            dashboard['schedule'] = self.due_records(user_id, None, 0, limit)
+        if 'strength' in fields:
+            dashboard['strength'] = self.get_all_records(user_id)
+        if 'stats' in fields:
+            dashboard['stats'] = self.get_stats(user_id)
+        return dashboard
+
+    def update_records(self, user_id, concepts, mutate):
+        """原子地读取、修改并写回学习记录
+
+        Args:
+            user_id: 用户ID
+            concepts: 需要读取的概念名称列表
+            mutate: 接收 {概念: 记录}，返回
+                ({概念: 需要保存的记录}, 计数器增量dict, [事件, ...])；
+                并发冲突重试时可能被多次调用
+
+        Returns:
+            dict: 已保存的 {概念: 记录}
+
+        Raises:
+            ConcurrentUpdateError: 并发冲突重试 WATCH_MAX_RETRIES 次后仍未成功
+        """
+        raise NotImplementedError
+
+    def save_records(self, user_records):
+        """批量写入学习记录及复习时间索引（不修改计数器，不追加事件）
+
+        Args:
+            user_records: {用户ID: [记录, ...]}
+        """
+        raise NotImplementedError
+
+    def replace_records(self, user_id, records):
+        """用给定记录替换用户的全部学习记录及复习时间索引"""
+        raise NotImplementedError
+
+    def restore_records(self, user_records, user_stats):
+        """批量替换多个用户的学习记录、复习时间索引和统计计数器（导入备份，不追加事件）
+
+        Args:
+            user_records: {用户ID: [记录, ...]}
+            user_stats: {用户ID: 计数器dict}
+        """
+        raise NotImplementedError
+
+    def rebuild_stats(self, user_id, compute):
+        """根据全部学习记录原子地重建统计计数器
+
+        Args:
+            user_id: 用户ID
+            compute: 接收记录列表、返回计数器dict的函数
+
+        Returns:
+            dict: 重建后的计数器
+
+        Raises:
+            ConcurrentUpdateError: 并发冲突重试 WATCH_MAX_RETRIES 次后仍未成功
+        """
+        raise NotImplementedError
+
+    def iter_user_ids(self, batch_size):
+        """分批遍历有学习记录的用户ID
+
+        同一批次内不含重复的用户ID；Redis 存储使用 SCAN 遍历，同一用户可能出现在不同批次中。
+
+        Yields:
+            list: 一批用户ID
+        """
+        raise NotImplementedError
+
+    def read_events(self, user_id, after_id=None):
+        """顺序读取用户在 after_id 之后的全部事件
+
+        Returns:
+            list: [(事件ID, 事件), ...]
+        """
+        raise NotImplementedError
+
+    def load_snapshot(self, user_id):
+        """读取用户的事件快照，不存在时返回 None"""
+        raise NotImplementedError
+
+    def save_snapshot(self, user_id, snapshot, previous_last_id):
+        """保存事件快照并删除已合并的事件
+
+        Args:
+            user_id: 用户ID
+            snapshot: 新快照，snapshot['last_id'] 为已合并的最后一条事件ID
+            previous_last_id: 读取时快照的 last_id，用于检测并发压缩
+
+        Returns:
+            bool: 快照在读取后被其他进程修改时返回 False
+        """
+        raise NotImplementedError
+
+    def get_cohort_members(self, cohort_id):
+        """读取班级（学习队列）的成员用户ID
+
+        Returns:
+            list: 排序后的用户ID列表，班级不存在时为空列表
+        """
+        raise NotImplementedError
+
+    def set_cohort_members(self, cohort_id, user_ids):
+        """用给定用户ID替换班级的全部成员，user_ids 为空时删除该班级"""
+        raise NotImplementedError
+
+    def close(self):
+        """释放存储资源"""
+
+
+class RedisMemoryStore(MemoryStore):
+    """Redis 存储
+
+    - learning_records:{user_id}：哈希表，field 为概念名，value 为记录JSON
+    - review_schedule:{user_id}：有序集合，score 为下次复习时间戳
+    - learning_stats:{user_id}：统计计数器哈希表
+    - review_events:{user_id}：用户事件流，review_snapshot:{user_id}：事件快照
+    - review_events:shard:{n}：按用户ID哈希分片的全局事件流，供消费组读取
+    - cohort:{cohort_id}：班级成员用户ID集合
+    """
+
+    name = 'redis'
+
+    def __init__(self, redis_client, event_shards=16, event_shard_maxlen=1000000):
+        """初始化 Redis 存储
+
+        Args:
+            redis_client: Redis 客户端
+            event_shards: 全局事件流分片数
+            event_shard_maxlen: 每个分片保留的近似最大事件数
+        """
+        self.redis_client = redis_client
+        self.event_shards = event_shards
+        self.event_shard_maxlen = event_shard_maxlen
+
+    @staticmethod
+    def _records_key(user_id):
+        return f"learning_records:{user_id}"
+
+    @staticmethod
+    def _schedule_key(user_id):
+        return f"review_schedule:{user_id}"
+
+    @staticmethod
+    def _stats_key(user_id):
+        return f"learning_stats:{user_id}"
+
+    @staticmethod
+    def _events_key(user_id):
+        return f"review_events:{user_id}"
+
+    @staticmethod
+    def _snapshot_key(user_id):
+        return f"review_snapshot:{user_id}"
+
+    @staticmethod
+    def _cohort_key(cohort_id):
+        return f"cohort:{cohort_id}"
+
+    def shard_keys(self):
+        """全部全局事件流分片键名"""
+        return [f"review_events:shard:{shard}" for shard in range(self.event_shards)]
+
+    def _shard_key(self, user_id):
+        return f"review_events:shard:{zlib.crc32(str(user_id).encode()) % self.event_shards}"
+
+    @staticmethod
+    def decode(value):
+        """将 Redis 返回的字节串解码为字符串"""
+        return value.decode() if isinstance(value, bytes) else value
+
+    def get_records(self, user_id, concepts):
+        if not concepts:
+            return {}
+        raw_records = self.redis_client.hmget(self._records_key(user_id), concepts)
+        return {
+            concept: json.loads(raw) for concept, raw in zip(concepts, raw_records) if raw
+        }
+
+    def get_all_records(self, user_id):
+        return [json.loads(raw) for raw in self.redis_client.hvals(self._records_key(user_id))]
+
+    def get_records_for_users(self, user_ids):
+        pipe = self.redis_client.pipeline(transaction=False)
+        for user_id in user_ids:
+            pipe.hvals(self._records_key(user_id))
+        return [[json.loads(raw) for raw in values] for values in pipe.execute()]
+
+    def _schedule_range_args(self, user_id, max_score, offset, limit):
+        return (self._schedule_key(user_id), '-inf',
+                '+inf' if max_score is None else max_score, offset, limit)
+
+    def due_records(self, user_id, max_score, offset, limit):
+        concepts = self.redis_client.zrangebyscore(
+            *self._schedule_range_args(user_id, max_score, offset, limit))
+        if not concepts:
+            return []
+        raw_records = self.redis_client.hmget(self._records_key(user_id), concepts)
+        # 索引与记录不同步时跳过缺失的记录
+        return [json.loads(raw) for raw in raw_records if raw]
+
+    @classmethod
+    def _parse_stats(cls, raw_stats):
+        raw_stats = {cls.decode(key): value for key, value in raw_stats.items()}
+        stats = empty_stats()
+        for field in STATS_FIELDS:
+            if field in raw_stats:
+                stats[field] = type(stats[field])(float(raw_stats[field]))
+        return stats
+
+    def get_stats(self, user_id):
+        return self._parse_stats(self.redis_client.hgetall(self._stats_key(user_id)))
+
+    def get_dashboard(self, user_id, fields, limit):
+        """复习计划、全部记录和计数器在同一个管道中一次往返读取
+
+        同时请求复习计划和记忆强度时，复习计划直接复用已读取的全部记录；
+        只请求复习计划时需要第二次往返按索引读取对应记录。
+        """
+        pipe = self.redis_client.pipeline(transaction=False)
+        if 'schedule' in fields:
+            pipe.zrangebyscore(*self._schedule_range_args(user_id, None, 0, limit))
+        if 'strength' in fields:
+            pipe.hgetall(self._records_key(user_id))
+        if 'stats' in fields:
+            pipe.hgetall(self._stats_key(user_id))
+        replies = iter(pipe.execute())
+
+        dashboard = {}
+        schedule_concepts = next(replies) if 'schedule' in fields else None
+        if 'strength' in fields:
+            all_records = next(replies)
+            dashboard['strength'] = [json.loads(raw) for raw in all_records.values()]
+            if schedule_concepts is not None:
+                dashboard['schedule'] = [
+                    json.loads(all_records[concept])
+                    for concept in schedule_concepts if concept in all_records
+                ]
+        if 'stats' in fields:
+            dashboard['stats'] = self._parse_stats(next(replies))
+        if schedule_concepts is not None and 'schedule' not in dashboard:
+            raw_records = self.redis_client.hmget(
+                self._records_key(user_id), schedule_concepts) if schedule_concepts else []
+            dashboard['schedule'] = [json.loads(raw) for raw in raw_records if raw]
+        return dashboard
+
+    def _queue_save_record(self, pipe, user_id, record):
+        """在管道中排队写入学习记录及其复习时间索引"""
+        pipe.hset(self._records_key(user_id), record['concept'], json.dumps(record))
+        score = review_score(record)
+        if score is not None:
+            pipe.zadd(self._schedule_key(user_id), {record['concept']: score})
+        else:
+            # 已掌握的概念不再需要复习
+            pipe.zrem(self._schedule_key(user_id), record['concept'])
+
+    def _queue_append_event(self, pipe, user_id, event):
+        """在管道中排队追加事件到用户事件流和全局分片"""
+        fields = {
+            'type': event['type'],
+            'concept': event['concept'],
+            'score': '' if event['score'] is None else event['score'],
+            'record': json.dumps(event['record']),
+            'ts': event['ts']
+        }
+        pipe.xadd(self._events_key(user_id), fields)
+        pipe.xadd(self._shard_key(user_id), dict(fields, user_id=user_id),
+                  maxlen=self.event_shard_maxlen, approximate=True)
+
+    def parse_event(self, fields):
+        """解析事件流中的一条事件"""
+        event = {self.decode(key): self.decode(value) for key, value in fields.items()}
+        event['record'] = json.loads(event['record'])
+        event['score'] = float(event['score']) if event['score'] != '' else None
+        return event
+
+    def update_records(self, user_id, concepts, mutate):
+        """WATCH 记录键后一次 HMGET 读取，在同一个 MULTI 事务中写回，并发修改时退避重试"""
+        records_key = self._records_key(user_id)
+        stats_key = self._stats_key(user_id)
+
+        with self.redis_client.pipeline(transaction=True) as pipe:
+            for _ in _watch_retries(user_id):
+                try:
+                    pipe.watch(records_key)
+                    raw_records = pipe.hmget(records_key, concepts)
+                    records, stats_delta, events = mutate({
+                        concept: json.loads(raw)
+                        for concept, raw in zip(concepts, raw_records) if raw
+                    })
+
+                    pipe.multi()
+                    for record in records.values():
+                        self._queue_save_record(pipe, user_id, record)
+                    for field, delta in stats_delta.items():
+                        if not delta:
+                            continue
+                        if isinstance(delta, float):
+                            pipe.hincrbyfloat(stats_key, field, delta)
+                        else:
+                            pipe.hincrby(stats_key, field, delta)
+                    for event in events:
+                        self._queue_append_event(pipe, user_id, event)
+                    pipe.execute()
+                    return records
+                except redis.WatchError:
+                    continue
+
+    def save_records(self, user_records):
+        pipe = self.redis_client.pipeline(transaction=False)
+        for user_id, records in user_records.items():
+            for record in records:
+                self._queue_save_record(pipe, user_id, record)
+        pipe.execute()
+
+    def replace_records(self, user_id, records):
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.delete(self._records_key(user_id), self._schedule_key(user_id))
+        for record in records:
+            self._queue_save_record(pipe, user_id, record)
+        pipe.execute()
+
+    def restore_records(self, user_records, user_stats):
+        # 每批一次管道往返；各用户的键互不相关，不需要事务
+        pipe = self.redis_client.pipeline(transaction=False)
+        for user_id, records in user_records.items():
+            stats_key = self._stats_key(user_id)
+            pipe.delete(self._records_key(user_id), self._schedule_key(user_id), stats_key)
+            for record in records:
+                self._queue_save_record(pipe, user_id, record)
+            pipe.hset(stats_key, mapping=user_stats[user_id])
+        pipe.execute()
+
+    def rebuild_stats(self, user_id, compute):
+        records_key = self._records_key(user_id)
+        stats_key = self._stats_key(user_id)
+        with self.redis_client.pipeline(transaction=True) as pipe:
+            for _ in _watch_retries(user_id):
+                try:
+                    pipe.watch(records_key)
+                    stats = compute([json.loads(raw) for raw in pipe.hvals(records_key)])
+                    pipe.multi()
+                    pipe.delete(stats_key)
+                    pipe.hset(stats_key, mapping=stats)
+                    pipe.execute()
+                    return stats
+                except redis.WatchError:
+                    continue
+
+    def migrate_legacy_records(self, batch_size, compute):
+        """将旧版本的学习记录（learning_records:{user_id} 为整个记录列表的 JSON 字符串）
+        转换为哈希表，同时建立复习时间索引和统计计数器
+
+        旧格式的键在新版本中读取会出现 WRONGTYPE 错误，升级后、开放访问前执行一次；
+        已是新格式的用户不受影响，重复执行结果相同。
+
+        Args:
+            batch_size: 每批遍历的用户数
+            compute: 根据用户的全部学习记录计算统计计数器的函数
+
+        Returns:
+            tuple: (转换的用户数, 记录数)
+        """
+        users = records_count = 0
+        for user_ids in self.iter_user_ids(batch_size):
+            pipe = self.redis_client.pipeline(transaction=False)
+            for user_id in user_ids:
+                pipe.type(self._records_key(user_id))
+            legacy = [user_id for user_id, key_type in zip(user_ids, pipe.execute())
+                      if self.decode(key_type) == 'string']
+            if not legacy:
+                continue
+            user_records = {}
+            for user_id, raw in zip(legacy, self.redis_client.mget(
+                    [self._records_key(user_id) for user_id in legacy])):
+                # 旧格式的列表中同一概念只保留最后一条
+                user_records[user_id] = list({
+                    record['concept']: record for record in json.loads(raw or '[]')}.values())
+            self.restore_records(user_records, {
+                user_id: compute(records) for user_id, records in user_records.items()})
+            users += len(user_records)
+            records_count += sum(len(records) for records in user_records.values())
+        return users, records_count
+
+    def iter_user_ids(self, batch_size):
+        # SCAN 可能多次返回同一个键，批次内按用户ID去重
+        batch = {}
+        for key in self.redis_client.scan_iter(match='learning_records:*', count=batch_size):
+            batch[self.decode(key).split(':', 1)[1]] = None
+            if len(batch) >= batch_size:
+                yield list(batch)
+                batch = {}
+        if batch:
+            yield list(batch)
+
+    def read_events(self, user_id, after_id=None):
+        start = f'({after_id}' if after_id else '-'
+        return [
+            (self.decode(event_id), self.parse_event(fields))
+            for event_id, fields in self.redis_client.xrange(self._events_key(user_id), start, '+')
+        ]
+
+    def load_snapshot(self, user_id):
+        raw = self.redis_client.get(self._snapshot_key(user_id))
+        return json.loads(raw) if raw else None
+
+    def save_snapshot(self, user_id, snapshot, previous_last_id):
+        snapshot_key = self._snapshot_key(user_id)
+        with self.redis_client.pipeline(transaction=True) as pipe:
+            try:
+                pipe.watch(snapshot_key)
+                current = pipe.get(snapshot_key)
+                current_last_id = json.loads(current)['last_id'] if current else None
+                if current_last_id != previous_last_id:
+                    return False
+                # 保留 ID 大于 last_id 的事件（压缩期间新追加的事件）
+                ms, seq = snapshot['last_id'].split('-')
+                pipe.multi()
+                pipe.set(snapshot_key, json.dumps(snapshot))
+                pipe.xtrim(self._events_key(user_id), minid=f'{ms}-{int(seq) + 1}', approximate=False)
+                pipe.execute()
+                return True
+            except redis.WatchError:
+                return False
+
+    def get_cohort_members(self, cohort_id):
+        return sorted(self.decode(user_id)
+                      for user_id in self.redis_client.smembers(self._cohort_key(cohort_id)))
+
+    def set_cohort_members(self, cohort_id, user_ids):
+        key = self._cohort_key(cohort_id)
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.delete(key)
+        # 分批写入，避免单条命令参数过多
+        for start in range(0, len(user_ids), 1000):
+            pipe.sadd(key, *user_ids[start:start + 1000])
+        pipe.execute()
+
+
+class SQLiteMemoryStore(MemoryStore):
+    """SQLite 存储
+
+    使用 WAL 日志模式；每次 update_records / save_records 在一个事务中批量提交。
+    复习时间索引为 (user_id, next_review) 上的B树索引。
+    每个进程的每个线程使用独立的数据库连接，首次使用时创建。
+    """
+
+    name = 'sqlite'
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS learning_records (
+            user_id TEXT NOT NULL,
+            concept TEXT NOT NULL,
+            data TEXT NOT NULL,
+            next_review REAL,
+            PRIMARY KEY (user_id, concept)
+        );
+        CREATE INDEX IF NOT EXISTS idx_review_schedule
+            ON learning_records (user_id, next_review) WHERE next_review IS NOT NULL;
+        CREATE TABLE IF NOT EXISTS learning_stats (
+            user_id TEXT PRIMARY KEY,
+            total_concepts INTEGER NOT NULL DEFAULT 0,
+            mastered_concepts INTEGER NOT NULL DEFAULT 0,
+            review_count INTEGER NOT NULL DEFAULT 0,
+            strength_sum REAL NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS review_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_review_events_user ON review_events (user_id, id);
+        CREATE TABLE IF NOT EXISTS review_snapshots (
+            user_id TEXT PRIMARY KEY,
+            last_id TEXT,
+            data TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS cohort_members (
+            cohort_id TEXT NOT NULL,
+            user_id TEXT NOT NULL,
+            PRIMARY KEY (cohort_id, user_id)
+        );
+    """
+    # 整行写入统计计数器（user_id 及 STATS_FIELDS 中的各字段）
+    _REPLACE_STATS = (f"INSERT OR REPLACE INTO learning_stats (user_id, {', '.join(STATS_FIELDS)}) "
+                      f"VALUES ({', '.join('?' * (len(STATS_FIELDS) + 1))})")
+
+    def __init__(self, path):
+        """初始化 SQLite 存储
+
+        Args:
+            path: 数据库文件路径
+        """
+        self.path = path
+        self._local = threading.local()
+        # (进程ID, 连接)
+        self._connections = []
+        self._connections_lock = threading.Lock()
+
+    def _connection(self):
+        """当前线程的数据库连接，首次使用时创建
+
+        连接不会在 fork 后的子进程中复用：线程本地变量会随 fork 复制，
+        因此按进程ID区分，子进程首次使用时重新创建。
+        """
+        pid = os.getpid()
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != pid:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None,
+                                         check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.executescript(self._SCHEMA)
+            self._local.connection = connection
+            self._local.pid = pid
+            with self._connections_lock:
+                self._connections.append((pid, connection))
+        return connection
+
+    def _transaction(self, mode='IMMEDIATE'):
+        return _SQLiteTransaction(self._connection(), mode)
+
+    def get_records(self, user_id, concepts):
+        return self._get_records(self._connection(), user_id, concepts)
+
+    @staticmethod
+    def _get_records(connection, user_id, concepts):
+        records = {}
+        # 分批查询，避免超出 SQLite 参数个数上限
+        for start in range(0, len(concepts), 500):
+            chunk = concepts[start:start + 500]
+            rows = connection.execute(
+                f"SELECT concept, data FROM learning_records WHERE user_id = ? "
+                f"AND concept IN ({','.join('?' * len(chunk))})", [user_id, *chunk])
+            records.update((concept, json.loads(data)) for concept, data in rows)
+        return records
+
+    def get_all_records(self, user_id):
+        rows = self._connection().execute(
+            "SELECT data FROM learning_records WHERE user_id = ?", (user_id,))
+        return [json.loads(data) for data, in rows]
+
+    def get_records_for_users(self, user_ids):
+        grouped = {user_id: [] for user_id in user_ids}
+        for start in range(0, len(user_ids), 500):
+            chunk = user_ids[start:start + 500]
+            rows = self._connection().execute(
+                f"SELECT user_id, data FROM learning_records "
+                f"WHERE user_id IN ({','.join('?' * len(chunk))})", chunk)
+            for user_id, data in rows:
+                grouped[user_id].append(json.loads(data))
+        return [grouped[user_id] for user_id in user_ids]
+
+    def due_records(self, user_id, max_score, offset, limit):
+        rows = self._connection().execute(
+            "SELECT data FROM learning_records WHERE user_id = ? AND next_review IS NOT NULL "
+            "AND next_review <= ? ORDER BY next_review LIMIT ? OFFSET ?",
+            (user_id, float('inf') if max_score is None else max_score, limit, offset))
+        return [json.loads(data) for data, in rows]
+
+    def get_stats(self, user_id):
+        row = self._connection().execute(
+            f"SELECT {', '.join(STATS_FIELDS)} FROM learning_stats WHERE user_id = ?",
+            (user_id,)).fetchone()
+        return dict(zip(STATS_FIELDS, row)) if row else empty_stats()
+
+    def get_dashboard(self, user_id, fields, limit):
+        # 在同一个读事务中读取，保证三部分数据一致
+        with self._transaction('DEFERRED'):
+            return super().get_dashboard(user_id, fields, limit)
+
+    @staticmethod
+    def _save_record(connection, user_id, record):
+        connection.execute(
+            "INSERT OR REPLACE INTO learning_records (user_id, concept, data, next_review) "
+            "VALUES (?, ?, ?, ?)",
+            (user_id, record['concept'], json.dumps(record), review_score(record)))
+
+    def update_records(self, user_id, concepts, mutate):
+        with self._transaction() as connection:
+            records, stats_delta, events = mutate(self._get_records(connection, user_id, concepts))
+            for record in records.values():
+                self._save_record(connection, user_id, record)
+            if any(stats_delta.values()):
+                connection.execute(
+                    "INSERT OR IGNORE INTO learning_stats (user_id) VALUES (?)", (user_id,))
+                connection.execute(
+                    f"UPDATE learning_stats SET "
+                    f"{', '.join(f'{field} = {field} + ?' for field in STATS_FIELDS)} "
+                    f"WHERE user_id = ?",
+                    [stats_delta.get(field, 0) for field in STATS_FIELDS] + [user_id])
+            connection.executemany(
+                "INSERT INTO review_events (user_id, data) VALUES (?, ?)",
+                [(user_id, json.dumps(event)) for event in events])
+            return records
+
+    def save_records(self, user_records):
+        with self._transaction() as connection:
+            for user_id, records in user_records.items():
+                for record in records:
+                    self._save_record(connection, user_id, record)
+
+    def replace_records(self, user_id, records):
+        with self._transaction() as connection:
+            connection.execute("DELETE FROM learning_records WHERE user_id = ?", (user_id,))
+            for record in records:
+                self._save_record(connection, user_id, record)
+
+    def restore_records(self, user_records, user_stats):
+        with self._transaction() as connection:
+            connection.executemany("DELETE FROM learning_records WHERE user_id = ?",
+                                   [(user_id,) for user_id in user_records])
+            connection.executemany(
+                "INSERT OR REPLACE INTO learning_records (user_id, concept, data, next_review) "
+                "VALUES (?, ?, ?, ?)",
+                [(user_id, record['concept'], json.dumps(record), review_score(record))
+                 for user_id, records in user_records.items() for record in records])
+            connection.executemany(
+                self._REPLACE_STATS,
+                [[user_id] + [user_stats[user_id][field] for field in STATS_FIELDS]
+                 for user_id in user_records])
+
+    def rebuild_stats(self, user_id, compute):
+        with self._transaction() as connection:
+            rows = connection.execute(
+                "SELECT data FROM learning_records WHERE user_id = ?", (user_id,))
+            stats = compute([json.loads(data) for data, in rows])
+            connection.execute(
+                self._REPLACE_STATS, [user_id] + [stats[field] for field in STATS_FIELDS])
+            return stats
+
+    def iter_user_ids(self, batch_size):
+        last = ''
+        while True:
+            rows = self._connection().execute(
+                "SELECT DISTINCT user_id FROM learning_records WHERE user_id > ? "
+                "ORDER BY user_id LIMIT ?", (last, batch_size)).fetchall()
+            if not rows:
+                return
+            batch = [user_id for user_id, in rows]
+            yield batch
+            last = batch[-1]
+
+    def read_events(self, user_id, after_id=None):
+        rows = self._connection().execute(
+            "SELECT id, data FROM review_events WHERE user_id = ? AND id > ? ORDER BY id",
+            (user_id, int(after_id) if after_id else 0))
+        return [(str(event_id), json.loads(data)) for event_id, data in rows]
+
+    def load_snapshot(self, user_id):
+        row = self._connection().execute(
+            "SELECT data FROM review_snapshots WHERE user_id = ?", (user_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save_snapshot(self, user_id, snapshot, previous_last_id):
+        with self._transaction() as connection:
+            row = connection.execute(
+                "SELECT last_id FROM review_snapshots WHERE user_id = ?", (user_id,)).fetchone()
+            if (row[0] if row else None) != previous_last_id:
+                return False
+            connection.execute(
+                "INSERT OR REPLACE INTO review_snapshots (user_id, last_id, data) VALUES (?, ?, ?)",
+                (user_id, snapshot['last_id'], json.dumps(snapshot)))
+            connection.execute(
+                "DELETE FROM review_events WHERE user_id = ? AND id <= ?",
+                (user_id, int(snapshot['last_id'])))
+            return True
+
+    def get_cohort_members(self, cohort_id):
+        rows = self._connection().execute(
+            "SELECT user_id FROM cohort_members WHERE cohort_id = ? ORDER BY user_id", (cohort_id,))
+        return [user_id for user_id, in rows]
+
+    def set_cohort_members(self, cohort_id, user_ids):
+        with self._transaction() as connection:
+            connection.execute("DELETE FROM cohort_members WHERE cohort_id = ?", (cohort_id,))
+            connection.executemany(
+                "INSERT OR IGNORE INTO cohort_members (cohort_id, user_id) VALUES (?, ?)",
+                ((cohort_id, user_id) for user_id in user_ids))
+
+    def close(self):
+        pid = os.getpid()
+        with self._connections_lock:
+            # 父进程创建的连接由父进程关闭
+            for owner, connection in self._connections:
+                if owner == pid:
+                    connection.close()
+            self._connections = []
+        self._local = threading.local()
+
+
+class _SQLiteTransaction:
+    """SQLite 事务，写事务使用 BEGIN IMMEDIATE 提前获取写锁，异常时回滚"""
+
+    def __init__(self, connection, mode):
+        self.connection = connection
+        self.mode = mode
+
+    def __enter__(self):
+        self.connection.execute(f'BEGIN {self.mode}')
+        return self.connection
+
+    def __exit__(self, exc_type, exc, tb):
+        self.connection.execute('ROLLBACK' if exc_type else 'COMMIT')
+
+
+class _UserData:
+    """内存存储中单个用户的数据"""
+
+    def __init__(self):
+        self.records = {}
+        # 复习时间索引：按 (分值, 概念) 排序的列表，以及概念到分值的映射
+        self.schedule = []
+        self.scores = {}
+        self.stats = empty_stats()
+        self.events = []
+        self.snapshot = None
+
+
+class InMemoryMemoryStore(MemoryStore):
+    """进程内存储（有界LRU）
+
+    按最近访问顺序最多保留 max_users 个用户的数据，超出时淘汰最久未访问的用户
+    （班级成员列表单独保存，不会被淘汰，但班级成员的学习记录与其他用户一样会被淘汰）。
+    数据不持久化，适合本地开发和基准测试。
+    """
+
+    name = 'memory'
+
+    def __init__(self, max_users=10000):
+        """初始化内存存储
+
+        Args:
+            max_users: 最多保留的用户数
+        """
+        self.max_users = max_users
+        self._users = OrderedDict()
+        self._cohorts = {}
+        self._lock = threading.RLock()
+        self._next_event_id = 0
+
+    def _user(self, user_id, create=False):
+        user = self._users.get(user_id)
+        if user is not None:
+            self._users.move_to_end(user_id)
+        elif create:
+            user = self._users[user_id] = _UserData()
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        return user
+
+    @staticmethod
+    def _copy(record):
+        return json.loads(record)
+
+    def get_records(self, user_id, concepts):
+        with self._lock:
+            user = self._user(user_id)
+            if user is None:
+                return {}
+            return {
+                concept: self._copy(user.records[concept])
+                for concept in concepts if concept in user.records
+            }
+
+    def get_all_records(self, user_id):
+        with self._lock:
+            user = self._user(user_id)
+            return [self._copy(raw) for raw in user.records.values()] if user else []
+
+    def get_records_for_users(self, user_ids):
+        return [self.get_all_records(user_id) for user_id in user_ids]
+
+    def due_records(self, user_id, max_score, offset, limit):
+        with self._lock:
+            user = self._user(user_id)
+            if user is None:
+                return []
+            end = len(user.schedule) if max_score is None else \
+                bisect_right(user.schedule, (max_score, '\U0010ffff'))
+            entries = user.schedule[offset:min(end, offset + limit)]
+            return [self._copy(user.records[concept]) for _, concept in entries]
+
+    def get_stats(self, user_id):
+        with self._lock:
+            user = self._user(user_id)
+            return dict(user.stats) if user else empty_stats()
+
+    def get_dashboard(self, user_id, fields, limit):
+        with self._lock:
+            return super().get_dashboard(user_id, fields, limit)
+
+    @staticmethod
+    def _save_record(user, record):
+        concept = record['concept']
+        user.records[concept] = json.dumps(record)
+        old_score = user.scores.pop(concept, None)
+        if old_score is not None:
+            user.schedule.remove((old_score, concept))
+        score = review_score(record)
+        if score is not None:
+            user.scores[concept] = score
+            insort(user.schedule, (score, concept))
+
+    def update_records(self, user_id, concepts, mutate):
+        with self._lock:
+            records, stats_delta, events = mutate(self.get_records(user_id, concepts))
+            user = self._user(user_id, create=True)
+            for record in records.values():
+                self._save_record(user, record)
+            for field, delta in stats_delta.items():
+                user.stats[field] += delta
+            for event in events:
+                self._next_event_id += 1
+                user.events.append((str(self._next_event_id), json.dumps(event)))
+            return records
+
+    def save_records(self, user_records):
+        with self._lock:
+            for user_id, records in user_records.items():
+                user = self._user(user_id, create=True)
+                for record in records:
+                    self._save_record(user, record)
+
+    def replace_records(self, user_id, records):
+        with self._lock:
+            user = self._user(user_id, create=True)
+            user.records, user.schedule, user.scores = {}, [], {}
+            for record in records:
+                self._save_record(user, record)
+
+    def restore_records(self, user_records, user_stats):
+        with self._lock:
+            for user_id, records in user_records.items():
+                user = self._user(user_id, create=True)
+                user.records, user.schedule, user.scores = {}, [], {}
+                for record in records:
+                    self._save_record(user, record)
+                user.stats = dict(user_stats[user_id])
+
+    def rebuild_stats(self, user_id, compute):
+        with self._lock:
+            user = self._user(user_id, create=True)
+            user.stats = compute([self._copy(raw) for raw in user.records.values()])
+            return dict(user.stats)
+
+    def iter_user_ids(self, batch_size):
+        with self._lock:
+            user_ids = [user_id for user_id, user in self._users.items() if user.records]
+        for start in range(0, len(user_ids), batch_size):
+            yield user_ids[start:start + batch_size]
+
+    def read_events(self, user_id, after_id=None):
+        with self._lock:
+            user = self._user(user_id)
+            if user is None:
+                return []
+            after = int(after_id) if after_id else 0
+            return [(event_id, json.loads(data)) for event_id, data in user.events
+                    if int(event_id) > after]
+
+    def load_snapshot(self, user_id):
+        with self._lock:
+            user = self._user(user_id)
+            return json.loads(user.snapshot) if user and user.snapshot else None
+
+    def save_snapshot(self, user_id, snapshot, previous_last_id):
+        with self._lock:
+            user = self._user(user_id, create=True)
+            current = json.loads(user.snapshot)['last_id'] if user.snapshot else None
+            if current != previous_last_id:
+                return False
+            user.snapshot = json.dumps(snapshot)
+            last_id = int(snapshot['last_id'])
+            user.events = [(event_id, data) for event_id, data in user.events
+                           if int(event_id) > last_id]
+            return True
+
+    def get_cohort_members(self, cohort_id):
+        with self._lock:
+            return sorted(self._cohorts.get(cohort_id, ()))
+
+    def set_cohort_members(self, cohort_id, user_ids):
+        with self._lock:
+            if user_ids:
+                self._cohorts[cohort_id] = set(user_ids)
+            else:
+                self._cohorts.pop(cohort_id, None)
+
+
+def create_memory_store(config):
+    """根据配置创建记忆数据存储
+
+    Args:
+        config: 配置映射，使用 MEMORY_STORE（redis, sqlite, memory）及对应后端的配置项
+
+    Returns:
+        MemoryStore: 存储实例
+    """
+    backend = config['MEMORY_STORE']
+    if backend == 'redis':
+        return RedisMemoryStore(
+            redis.from_url(config['REDIS_URL']),
+            event_shards=config['REVIEW_EVENT_SHARDS'],
+            event_shard_maxlen=config['REVIEW_EVENT_SHARD_MAXLEN']
+        )
+    if backend == 'sqlite':
+        return SQLiteMemoryStore(config['MEMORY_SQLITE_PATH'])
+    if backend == 'memory':
+        return InMemoryMemoryStore(max_users=config['MEMORY_STORE_MAX_USERS'])
+    raise ValueError(f"未知的记忆存储后端: {backend}")
@@ -0,0 +1,351 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import redis
+import redis.asyncio
+
+# 延迟直方图的默认分桶（秒），覆盖 Redis 的毫秒级到 DeepSeek API 的分钟级
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class MetricsRegistry:
+    """进程内指标注册表
+
+    记录指标时每个线程只写自己的分片（线程首次记录时登记分片），因此计数无需加锁；
+    导出时合并所有分片，已退出线程的分片并入汇总后释放。每个 worker 进程各自计数，
+    导出的指标带有 worker（进程ID）标签。
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        # [(线程, 分片)]，只在登记和导出时加锁
+        self._shards = []
+        self._retired = {}
+        self._lock = threading.Lock()
+        self._metrics = []
+        self._collectors = []
+
+    def shard(self):
+        """当前线程的分片：(指标名, 标签值) -> 计数或直方图数组"""
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector):
+        """注册导出时调用的采集函数
+
+        Args:
+            collector: 无参数函数，返回 [(指标名, 类型, 说明, [(标签dict, 值), ...]), ...]
+        """
+        self._collectors.append(collector)
+
+    def _snapshot(self):
+        """合并各线程分片"""
+        with self._lock:
+            alive = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    alive.append((thread, shard))
+                else:
+                    # 线程已退出，不会再写入，并入汇总
+                    self._merge(self._retired, shard)
+            self._shards = alive
+            merged = {}
+            self._merge(merged, self._retired)
+            for _, shard in alive:
+                # dict.copy 在持有 GIL 时完成，不会与写入线程交错
+                self._merge(merged, shard.copy())
+        return merged
+
+    @staticmethod
+    def _merge(target, shard):
+        for key, value in shard.items():
+            if isinstance(value, list):
+                current = target.get(key)
+                if current is None:
+                    target[key] = list(value)
+                else:
+                    for i, count in enumerate(value):
+                        current[i] += count
+            else:
+                target[key] = target.get(key, 0) + value
+
+    def render(self):
+        """以 Prometheus 文本格式导出全部指标"""
+        snapshot = self._snapshot()
+        worker = str(os.getpid())
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render(snapshot, worker))
+        for collector in self._collectors:
+            for name, kind, help_text, samples in collector():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in samples:
+                    labels = dict(labels, worker=worker)
+                    lines.append(f'{name}{_format_labels(labels.keys(), labels.values())} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+class Counter:
+    """计数器"""
+
+    kind = 'counter'
+
+    def __init__(self, registry, name, help_text, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames) + ('worker',)
+        registry.register(self)
+
+    def inc(self, *labelvalues, value=1):
+        shard = self.registry.shard()
+        key = (self.name, labelvalues)
+        shard[key] = shard.get(key, 0) + value
+
+    def render(self, snapshot, worker):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.kind}']
+        for (name, labelvalues), value in sorted(snapshot.items(), key=lambda item: item[0]):
+            if name == self.name:
+                labels = _format_labels(self.labelnames, labelvalues + (worker,))
+                lines.append(f'{self.name}{labels} {_format_value(value)}')
+        return lines
+
+
+class Gauge(Counter):
+    """瞬时值（如进行中的调用数），增减可以在不同线程中进行，导出时各分片相加"""
+
+    kind = 'gauge'
+
+    def dec(self, *labelvalues, value=1):
+        self.inc(*labelvalues, value=-value)
+
+
+class Histogram:
+    """直方图：各分桶计数（非累计）、总和及次数保存在同一数组中"""
+
+    kind = 'histogram'
+
+    def __init__(self, registry, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.registry = registry
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames) + ('worker',)
+        self.buckets = tuple(buckets)
+        registry.register(self)
+
+    def observe(self, value, *labelvalues):
+        shard = self.registry.shard()
+        key = (self.name, labelvalues)
+        counts = shard.get(key)
+        if counts is None:
+            # 分桶计数 + 超出最大分桶的计数 + 总和 + 次数
+            counts = shard[key] = [0] * (len(self.buckets) + 3)
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-2] += value
+        counts[-1] += 1
+
+    def render(self, snapshot, worker):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.kind}']
+        for (name, labelvalues), counts in sorted(snapshot.items(), key=lambda item: item[0]):
+            if name != self.name:
+                continue
+            values = labelvalues + (worker,)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, values, f'le="{_format_value(bound)}"')
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f'{self.name}_sum{labels} {_format_value(counts[-2])}')
+            lines.append(f'{self.name}_count{labels} {counts[-1]}')
+        return lines
+
+
+registry = MetricsRegistry()
+
+HTTP_REQUESTS = Counter(registry, 'http_requests_total', 'HTTP 请求数', ('method', 'route', 'status'))
+HTTP_DURATION = Histogram(registry, 'http_request_duration_seconds', 'HTTP 请求处理时间（秒）',
+                          ('method', 'route'))
+DEPENDENCY_DURATION = Histogram(registry, 'dependency_duration_seconds', '外部依赖调用耗时（秒）',
+                                ('dependency', 'operation'))
+DEPENDENCY_ERRORS = Counter(registry, 'dependency_errors_total', '外部依赖调用失败次数',
+                            ('dependency', 'operation'))
+DEPENDENCY_IN_FLIGHT = Gauge(registry, 'dependency_in_flight', '进行中的外部依赖调用数', ('dependency',))
+LLM_TOKENS = Counter(registry, 'deepseek_tokens_total', 'DeepSeek API 消耗的 token 数', ('type',))
+LLM_ADMISSIONS = Counter(registry, 'deepseek_admissions_total', 'DeepSeek API 调用的限流检查结果',
+                         ('result', 'scope', 'source'))
+
+
+def observe_request(method, route, status, seconds):
+    """记录一次 HTTP 请求
+
+    Args:
+        method: 请求方法
+        route: 路由规则（如 /api/concept/<concept_name>），未匹配时为 unmatched
+        status: 响应状态码
+        seconds: 处理时间（秒）
+    """
+    HTTP_REQUESTS.inc(method, route, str(status))
+    HTTP_DURATION.observe(seconds, method, route)
+
+
+@contextmanager
+def track_dependency(dependency, operation):
+    """记录外部依赖调用的耗时，调用抛出异常时计入失败次数
+
+    Args:
+        dependency: 依赖名称，如 deepseek、redis、neo4j
+        operation: 操作名称
+    """
+    start = time.perf_counter()
+    DEPENDENCY_IN_FLIGHT.inc(dependency)
+    try:
+        yield
+    except Exception:
+        # 调用方提前关闭生成器、协程被取消不计为失败
+        DEPENDENCY_ERRORS.inc(dependency, operation)
+        raise
+    finally:
+        DEPENDENCY_IN_FLIGHT.dec(dependency)
+        DEPENDENCY_DURATION.observe(time.perf_counter() - start, dependency, operation)
+
+
+def record_token_usage(usage):
+    """记录 DeepSeek API 响应中的 token 用量（usage 为 None 时忽略）"""
+    if usage is None:
+        return
+    LLM_TOKENS.inc('prompt', value=usage.prompt_tokens or 0)
+    LLM_TOKENS.inc('completion', value=usage.completion_tokens or 0)
+
+
+def record_admission(result, scope='', source=''):
+    """记录一次 DeepSeek API 调用的限流检查
+
+    Args:
+        result: admitted 或 rejected
+        scope: 拒绝时超出的限额，user 或 global
+        source: 拒绝时作出判断的位置，local（进程内）或 redis
+    """
+    LLM_ADMISSIONS.inc(result, scope, source)
+
+
+def register_gauge(name, help_text, get_samples):
+    """导出在采集时读取的瞬时值（如队列长度、配置的限额）
+
+    Args:
+        name: 指标名
+        help_text: 说明
+        get_samples: 返回 [(标签dict, 值), ...] 的函数
+    """
+    registry.register_collector(lambda: [(name, 'gauge', help_text, get_samples())])
+
+
+def register_cache(name, get_stats):
+    """导出缓存的命中统计
+
+    Args:
+        name: 缓存名称
+        get_stats: 返回包含 hits、misses 的统计dict的函数
+    """
+    def collect():
+        stats = get_stats()
+        hits, misses = stats.get('hits', 0), stats.get('misses', 0)
+        labels = {'cache': name}
+        return [
+            ('cache_hits_total', 'counter', '缓存命中次数', [(labels, hits)]),
+            ('cache_misses_total', 'counter', '缓存未命中次数', [(labels, misses)]),
+            ('cache_hit_ratio', 'gauge', '缓存命中率', [(labels, hits / (hits + misses) if hits + misses else 0.0)])
+        ]
+    registry.register_collector(collect)
+
+
+_redis_instrumented = False
+
+
+def instrument_redis():
+    """为 redis-py 的同步和异步客户端（命令及管道）加上耗时统计，重复调用无效"""
+    global _redis_instrumented
+    if _redis_instrumented:
+        return
+    _redis_instrumented = True
+
+    execute_command = redis.client.Redis.execute_command
+    pipeline_execute = redis.client.Pipeline.execute
+    async_execute_command = redis.asyncio.client.Redis.execute_command
+    async_pipeline_execute = redis.asyncio.client.Pipeline.execute
+
+    def timed_execute_command(self, *args, **options):
+        with track_dependency('redis', str(args[0]).upper()):
+            return execute_command(self, *args, **options)
+
+    def timed_pipeline_execute(self, *args, **kwargs):
+        with track_dependency('redis', 'PIPELINE'):
+            return pipeline_execute(self, *args, **kwargs)
+
+    async def timed_async_execute_command(self, *args, **options):
+        with track_dependency('redis', str(args[0]).upper()):
+            return await async_execute_command(self, *args, **options)
+
+    async def timed_async_pipeline_execute(self, *args, **kwargs):
+        with track_dependency('redis', 'PIPELINE'):
+            return await async_pipeline_execute(self, *args, **kwargs)
+
+    redis.client.Redis.execute_command = timed_execute_command
+    redis.client.Pipeline.execute = timed_pipeline_execute
+    redis.asyncio.client.Redis.execute_command = timed_async_execute_command
+    redis.asyncio.client.Pipeline.execute = timed_async_pipeline_execute
+
+
+def instrument_blueprint(blueprint):
+    """为 Flask 蓝图的每个请求记录处理时间和状态码（流式响应只统计到开始输出为止）"""
+    from flask import g, request
+
+    @blueprint.before_request
+    def start_request_timer():
+        g.request_started_at = time.perf_counter()
+
+    def record(status):
+        started_at = g.pop('request_started_at', None)
+        if started_at is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            observe_request(request.method, route, status, time.perf_counter() - started_at)
+
+    @blueprint.after_request
+    def record_request(response):
+        record(response.status_code)
+        return response
+
+    @blueprint.teardown_request
+    def record_failed_request(exc):
+        # 未处理的异常不会经过 after_request
+        if exc is not None:
+            record(500)
@@ -0,0 +1,443 @@
+import cProfile
+import json
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+import zlib
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ('sampling', 'cprofile')
+
+SESSION_KEY = 'profiling:session'
+# 最近一次会话的ID，会话结束后报告默认使用该会话
+LAST_SESSION_KEY = 'profiling:last'
+# 栈深度上限，防止递归过深时单个样本过大
+MAX_STACK_DEPTH = 200
+
+
+def _taken_key(session_id):
+    return f'profiling:taken:{session_id}'
+
+
+def _results_key(session_id):
+    return f'profiling:results:{session_id}'
+
+
+def _code_key(code):
+    # 与 pstats 的函数标识 (文件名, 起始行号, 函数名) 一致
+    return code.co_filename, code.co_firstlineno, code.co_name
+
+
+def _short_path(filename):
+    parts = filename.replace('\\', '/').split('/')
+    return '/'.join(parts[-2:])
+
+
+def _label(key):
+    filename, line, name = key
+    return f'{name} ({_short_path(filename)}:{line})'
+
+
+def _class_functions(name, cls):
+    """类中定义的方法 -> 服务名称"""
+    functions = {}
+    for attr in vars(cls).values():
+        code = getattr(getattr(attr, '__func__', attr), '__code__', None)
+        if code is not None:
+            functions[_code_key(code)] = name
+    return functions
+
+
+class _ActiveProfile:
+    """一个正在被分析的请求"""
+
+    def __init__(self, session, method, route, path):
+        self.session = session
+        self.method = method
+        self.route = route
+        self.path = path
+        self.mode = session['mode']
+        self.interval = session['interval']
+        self.status = None
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.thread_id = threading.get_ident()
+        self.profile = None
+        # 采样模式：调用栈（从外到内的函数标识）-> 样本数
+        self.stacks = {}
+
+    def add_sample(self, frame):
+        stack = []
+        while frame is not None and len(stack) < MAX_STACK_DEPTH:
+            stack.append(_code_key(frame.f_code))
+            frame = frame.f_back
+        stack.reverse()
+        stack = tuple(stack)
+        self.stacks[stack] = self.stacks.get(stack, 0) + 1
+
+
+class RequestProfiler:
+    """按需开启的请求性能分析
+
+    管理员开启分析会话（指定路由、请求数和时间窗口）后，各 worker 对之后匹配的请求进行采样分析
+    （后台线程定期读取请求线程的调用栈，开销低，可得到火焰图数据）或 cProfile 分析（记录每次
+    函数调用，结果精确但开销较大，同一时间每个进程只分析一个请求）。
+
+    会话保存在 Redis 中，各进程每隔 poll_interval 秒读取一次，未开启时每个请求只多一次时间比较；
+    请求数通过 Redis 计数在所有 worker 间共享；每个请求的分析结果压缩后写入 Redis，
+    报告汇总所有 worker 的结果。
+    """
+
+    def __init__(self, redis_client, services=None, poll_interval=2.0, max_results=100,
+                 max_functions=200, result_ttl=3600):
+        """初始化性能分析器
+
+        Args:
+            redis_client: Redis 客户端
+            services: 服务名称 -> 服务类，报告中单独列出这些类中方法的耗时
+            poll_interval: 读取会话状态的间隔（秒）
+            max_results: 每个会话保留的请求分析结果数
+            max_functions: 每个请求保留的函数数（按累计耗时，服务类中的方法全部保留）
+            result_ttl: 分析结果的保留时间（秒）
+        """
+        self.redis_client = redis_client
+        self.poll_interval = poll_interval
+        self.max_results = max_results
+        self.max_functions = max_functions
+        self.result_ttl = result_ttl
+        self.service_functions = {}
+        for name, cls in (services or {}).items():
+            self.service_functions.update(_class_functions(name, cls))
+        self._session = None
+        self._checked_at = float('-inf')
+        # 已用完请求数的会话，不再访问 Redis 计数
+        self._exhausted = set()
+        self._lock = threading.Lock()
+        self._cprofile_lock = threading.Lock()
+        # 线程ID -> 采样中的请求
+        self._sampled = {}
+        self._sampler = None
+
+    # ---- 会话管理 ----
+
+    def start(self, route=None, mode='sampling', max_requests=10, duration=60, interval=0.005):
+        """开启分析会话，覆盖正在进行的会话
+
+        Args:
+            route: 路由规则（如 /api/concept/<concept_name>/explanation）或请求路径，None 表示所有路由
+            mode: sampling 或 cprofile
+            max_requests: 最多分析的请求数（所有 worker 合计），0 表示只受时间窗口限制
+            duration: 时间窗口（秒）
+            interval: 采样间隔（秒）
+
+        Returns:
+            dict: 会话信息
+        """
+        now = time.time()
+        session = {
+            'id': uuid.uuid4().hex[:12],
+            'route': route,
+            'mode': mode,
+            'max_requests': max_requests,
+            'interval': interval,
+            'started_at': now,
+            'expires_at': now + duration
+        }
+        ttl = int(duration) + 1
+        pipe = self.redis_client.pipeline()
+        pipe.set(SESSION_KEY, json.dumps(session), ex=ttl)
+        pipe.set(_taken_key(session['id']), 0, ex=ttl)
+        pipe.set(LAST_SESSION_KEY, session['id'], ex=ttl + self.result_ttl)
+        pipe.execute()
+        self._session = session
+        self._checked_at = time.monotonic()
+        return session
+
+    def stop(self):
+        """结束当前会话（已有的分析结果保留到过期）
+
+        Returns:
+            dict: 被结束的会话，没有进行中的会话时为 None
+        """
+        session = self.current_session(refresh=True)
+        self.redis_client.delete(SESSION_KEY)
+        self._session = None
+        return session
+
+    def current_session(self, refresh=False):
+        """当前进行中的会话，没有时为 None"""
+        now = time.monotonic()
+        if refresh or now - self._checked_at >= self.poll_interval:
+            self._checked_at = now
+            try:
+                raw = self.redis_client.get(SESSION_KEY)
+            except redis.RedisError:
+                logger.warning('读取性能分析会话失败', exc_info=True)
+                raw = None
+            self._session = json.loads(raw) if raw else None
+        session = self._session
+        if session is not None and time.time() >= session['expires_at']:
+            return None
+        return session
+
+    # ---- 请求分析 ----
+
+    def begin(self, method, route, path):
+        """请求开始时调用，请求需要分析时开始分析
+
+        Returns:
+            _ActiveProfile: 正在分析的请求，不需要分析时为 None
+        """
+        session = self.current_session()
+        if session is None or session['id'] in self._exhausted:
+            return None
+        if session['route'] and session['route'] not in (route, path):
+            return None
+        if session['mode'] == 'cprofile' and not self._cprofile_lock.acquire(blocking=False):
+            # cProfile 同一时间只分析一个请求，跳过的请求不计数
+            return None
+        if session['max_requests'] and not self._take(session):
+            if session['mode'] == 'cprofile':
+                self._cprofile_lock.release()
+            return None
+
+        active = _ActiveProfile(session, method, route, path)
+        if active.mode == 'cprofile':
+            active.profile = cProfile.Profile()
+            active.profile.enable()
+        else:
+            self._start_sampling(active)
+        return active
+
+    def _take(self, session):
+        """占用会话的一个请求名额，名额已用完或无法计数时返回 False"""
+        try:
+            taken = self.redis_client.incr(_taken_key(session['id']))
+        except redis.RedisError:
+            logger.warning('性能分析计数失败', exc_info=True)
+            return False
+        if taken > session['max_requests']:
+            self._exhausted.add(session['id'])
+            return False
+        return True
+
+    def finish(self, active, status=None):
+        """请求结束时调用，保存分析结果
+
+        Args:
+            active: begin 的返回值
+            status: 响应状态码，默认使用 active.status
+        """
+        duration = time.perf_counter() - active.start
+        if active.mode == 'cprofile':
+            active.profile.disable()
+            self._cprofile_lock.release()
+            functions = self._profiled_functions(active.profile)
+            stacks = []
+        else:
+            self._stop_sampling(active)
+            functions = self._sampled_functions(active.stacks, active.interval)
+            stacks = [[';'.join(_label(key) for key in stack), count]
+                      for stack, count in active.stacks.items()]
+
+        result = {
+            'id': uuid.uuid4().hex[:12],
+            'worker': os.getpid(),
+            'method': active.method,
+            'route': active.route,
+            'path': active.path,
+            'status': status if status is not None else active.status,
+            'mode': active.mode,
+            'started_at': active.started_at,
+            'duration': duration,
+            'samples': sum(active.stacks.values()),
+            'functions': self._trim_functions(functions),
+            'stacks': stacks
+        }
+        key = _results_key(active.session['id'])
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.lpush(key, zlib.compress(json.dumps(result).encode('utf-8')))
+            pipe.ltrim(key, 0, self.max_results - 1)
+            pipe.expire(key, self.result_ttl)
+            pipe.execute()
+        except redis.RedisError:
+            logger.warning('保存性能分析结果失败', exc_info=True)
+
+    @staticmethod
+    def _profiled_functions(profile):
+        """cProfile 结果：函数标识 -> [调用次数, 自身耗时, 累计耗时]"""
+        stats = pstats.Stats(profile).stats
+        return {key: [calls, tottime, cumtime] for key, (_, calls, tottime, cumtime, _) in stats.items()}
+
+    @staticmethod
+    def _sampled_functions(stacks, interval):
+        """由采样的调用栈估算：函数标识 -> [None, 自身耗时, 累计耗时]"""
+        functions = {}
+        for stack, count in stacks.items():
+            for key in set(stack):
+                functions.setdefault(key, [None, 0.0, 0.0])[2] += count * interval
+            functions[stack[-1]][1] += count * interval
+        return functions
+
+    def _trim_functions(self, functions):
+        """保留累计耗时最高的函数及服务类中的方法，转换为可序列化的列表"""
+        ranked = sorted(functions.items(), key=lambda item: item[1][2], reverse=True)
+        rows = []
+        for i, (key, (calls, tottime, cumtime)) in enumerate(ranked):
+            service = self.service_functions.get(key)
+            if i < self.max_functions or service is not None:
+                rows.append([key[0], key[1], key[2], calls, tottime, cumtime, service])
+        return rows
+
+    def _start_sampling(self, active):
+        with self._lock:
+            self._sampled[active.thread_id] = active
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample_loop, name='request-profiler',
+                                                 daemon=True)
+                self._sampler.start()
+
+    def _stop_sampling(self, active):
+        with self._lock:
+            self._sampled.pop(active.thread_id, None)
+
+    def _sample_loop(self):
+        """采样线程：定期记录所有被分析请求线程的调用栈，没有被分析的请求时退出"""
+        while True:
+            with self._lock:
+                if not self._sampled:
+                    self._sampler = None
+                    return
+                frames = sys._current_frames()
+                for thread_id, active in self._sampled.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        active.add_sample(frame)
+                interval = min(active.interval for active in self._sampled.values())
+                del frames
+            time.sleep(interval)
+
+    # ---- 报告 ----
+
+    def _load_results(self, session_id):
+        raw = self.redis_client.lrange(_results_key(session_id), 0, -1)
+        return [json.loads(zlib.decompress(item)) for item in raw]
+
+    def _resolve_session_id(self, session_id):
+        if session_id:
+            return session_id
+        raw = self.redis_client.get(LAST_SESSION_KEY)
+        return raw.decode('utf-8') if isinstance(raw, bytes) else raw
+
+    def get_report(self, session_id=None, top=20):
+        """汇总会话中所有请求的分析结果
+
+        Args:
+            session_id: 会话ID，默认为最近一次会话
+            top: 每个列表返回的函数数
+
+        Returns:
+            dict: 会话ID及是否进行中、请求列表、累计耗时最高的函数及各服务类中耗时最高的方法
+        """
+        session = self.current_session(refresh=True)
+        session_id = self._resolve_session_id(session_id)
+        if session_id is None:
+            return {'session': None, 'active': False, 'requests': [], 'top_functions': [], 'services': {}}
+        results = self._load_results(session_id)
+
+        totals = {}
+        for result in results:
+            for filename, line, name, calls, tottime, cumtime, service in result['functions']:
+                entry = totals.setdefault((filename, line, name), {
+                    'function': f'{service}.{name}' if service else _label((filename, line, name)),
+                    'service': service, 'calls': None, 'tottime': 0.0, 'cumtime': 0.0
+                })
+                if calls is not None:
+                    entry['calls'] = (entry['calls'] or 0) + calls
+                entry['tottime'] += tottime
+                entry['cumtime'] += cumtime
+
+        def ranked(entries):
+            return sorted(entries, key=lambda entry: entry['cumtime'], reverse=True)[:top]
+
+        services = {}
+        for entry in totals.values():
+            if entry['service']:
+                services.setdefault(entry['service'], []).append(entry)
+        active = session is not None and session['id'] == session_id
+        return {
+            'session': session if active else {'id': session_id},
+            'active': active,
+            'requests': [{field: result[field] for field in (
+                'id', 'worker', 'method', 'route', 'path', 'status', 'mode', 'started_at', 'duration', 'samples'
+            )} for result in results],
+            'top_functions': ranked(totals.values()),
+            'services': {name: ranked(entries) for name, entries in services.items()}
+        }
+
+    def get_flame(self, session_id=None, request_id=None):
+        """采样模式的火焰图数据（collapsed stack 格式，每行为 "栈;帧 样本数"）
+
+        Args:
+            session_id: 会话ID，默认为最近一次会话
+            request_id: 只输出该请求的调用栈，默认合并会话中的所有请求
+
+        Returns:
+            str: 可直接交给 flamegraph.pl、speedscope 等工具的文本
+        """
+        session_id = self._resolve_session_id(session_id)
+        if session_id is None:
+            return ''
+        counts = {}
+        for result in self._load_results(session_id):
+            if request_id and result['id'] != request_id:
+                continue
+            for stack, count in result['stacks']:
+                counts[stack] = counts.get(stack, 0) + count
+        return ''.join(f'{stack} {count}\n' for stack, count in sorted(counts.items()))
+
+    def instrument(self, blueprint):
+        """为 Flask 蓝图的请求加上分析钩子（流式响应分析到输出结束）"""
+        from flask import g, request
+
+        @blueprint.before_request
+        def start_profiling():
+            route = request.url_rule.rule if request.url_rule else None
+            if route is None or route.startswith('/api/admin/'):
+                return
+            active = self.begin(request.method, route, request.path)
+            if active is not None:
+                g.request_profile = active
+
+        @blueprint.after_request
+        def record_profiled_status(response):
+            active = g.get('request_profile')
+            if active is not None:
+                active.status = response.status_code
+            return response
+
+        @blueprint.teardown_request
+        def finish_profiling(exc):
+            active = g.pop('request_profile', None)
+            if active is not None:
+                self.finish(active, 500 if exc is not None else None)
+
+
+def create_request_profiler(config, services=None):
+    """根据配置创建请求性能分析器"""
+    return RequestProfiler(
+        redis.from_url(config['REDIS_URL']),
+        services=services,
+        poll_interval=config['PROFILING_POLL_INTERVAL'],
+        max_results=config['PROFILING_MAX_RESULTS'],
+        max_functions=config['PROFILING_MAX_FUNCTIONS'],
+        result_ttl=config['PROFILING_RESULT_TTL']
+    )
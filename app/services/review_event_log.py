@@ -0,0 +1,219 @@
+import redis
+
+from app.services.memory_store import ConcurrentUpdateError, WATCH_MAX_RETRIES
+
+
+class ReviewEventLog:
+    """复习事件日志
+
+    每次学习/复习结果以只追加的方式写入存储的用户事件流（与学习记录在同一
+    事务中写入，见 MemoryStore.update_records），用于历史查询和状态重建；
+    事件流定期压缩为快照。Redis 存储还会将事件写入按用户ID分片的全局事件流，
+    供 ReviewEventConsumer 以消费组方式读取。
+    """
+
+    def __init__(self, store):
+        """初始化事件日志
+
+        Args:
+            store: MemoryStore 实例
+        """
+        self.store = store
+
+    def _load_snapshot(self, user_id):
+        return self.store.load_snapshot(user_id) or {'last_id': None, 'records': {}, 'history': {}}
+
+    def _replay(self, user_id):
+        """读取快照，并顺序合并快照之后的全部事件"""
+        snapshot = self._load_snapshot(user_id)
+        previous_last_id = snapshot['last_id']
+        events = self.store.read_events(user_id, previous_last_id)
+        for _, event in events:
+            self._apply(snapshot, event)
+        if events:
+            snapshot['last_id'] = events[-1][0]
+        return snapshot, previous_last_id, len(events)
+
+    @staticmethod
+    def _apply(snapshot, event):
+        """将一条事件合并到快照状态中"""
+        concept = event['concept']
+        snapshot['records'][concept] = event['record']
+        if event['type'] == 'review':
+            snapshot['history'].setdefault(concept, []).append([
+                event['ts'], event['record'].get('memory_strength'), event['score']
+            ])
+
+    def history(self, user_id, concept=None):
+        """查询记忆强度的变化历史
+
+        Args:
+            user_id: 用户ID
+            concept: 概念名称，默认返回全部概念
+
+        Returns:
+            dict: {概念: [{'timestamp', 'memory_strength', 'performance_score'}, ...]}
+        """
+        history = self._replay(user_id)[0]['history']
+        if concept is not None:
+            history = {concept: history.get(concept, [])}
+        return {
+            name: [
+                {'timestamp': ts, 'memory_strength': strength, 'performance_score': score}
+                for ts, strength, score in points
+            ]
+            for name, points in history.items()
+        }
+
+    def rebuild_records(self, user_id):
+        """根据快照和之后的事件重建学习记录
+
+        Args:
+            user_id: 用户ID
+
+        Returns:
+            dict: {概念: 学习记录}
+        """
+        return self._replay(user_id)[0]['records']
+
+    def compact(self, user_id):
+        """将用户事件流压缩为快照，并删除已合并的事件
+
+        Args:
+            user_id: 用户ID
+
+        Returns:
+            int: 合并的事件数
+
+        Raises:
+            ConcurrentUpdateError: 其他进程同时压缩，重试 WATCH_MAX_RETRIES 次后仍未成功
+        """
+        for _ in range(WATCH_MAX_RETRIES):
+            snapshot, previous_last_id, count = self._replay(user_id)
+            if not count:
+                return 0
+            # 其他进程同时压缩时重试
+            if self.store.save_snapshot(user_id, snapshot, previous_last_id):
+                return count
+        raise ConcurrentUpdateError(f"用户 {user_id} 的事件流正在被其他进程压缩")
+
+    def compact_all(self, batch_size=500):
+        """压缩全部用户的事件流
+
+        Args:
+            batch_size: 每批遍历的用户数
+
+        Returns:
+            tuple: (处理的用户数, 合并的事件数)
+        """
+        users = 0
+        events = 0
+        for user_ids in self.store.iter_user_ids(batch_size):
+            for user_id in user_ids:
+                try:
+                    events += self.compact(user_id)
+                except ConcurrentUpdateError:
+                    # 正在被其他进程压缩，下次执行时再处理
+                    continue
+                users += 1
+        return users, events
+
+
+class ReviewEventConsumer:
+    """全局事件流消费组读取器
+
+    以消费组方式读取全部分片，交由 handler 处理后确认（XACK）。
+    启动时以及 handler 失败后，先从头重新处理本消费者未确认的事件（每个分片读到
+    没有未确认事件为止），再读取新事件，保证至少处理一次。已被裁剪的未确认事件
+    没有内容，直接确认。仅支持 Redis 存储。
+    """
+
+    def __init__(self, store, group, consumer, handler):
+        """初始化消费者
+
+        Args:
+            store: RedisMemoryStore 实例
+            group: 消费组名称
+            consumer: 消费者名称（同一消费组内唯一）
+            handler: 处理函数，签名为 handler([(分片键, 事件ID, 事件), ...])
+        """
+        self.store = store
+        self.redis_client = store.redis_client
+        self.group = group
+        self.consumer = consumer
+        self.handler = handler
+        # 重新处理未确认事件时各分片的读取位置，None 表示已处理完、只读取新事件
+        self._pending_cursors = None
+        self._ensure_groups()
+        self._reset_recovery()
+
+    def _ensure_groups(self):
+        for key in self.store.shard_keys():
+            try:
+                self.redis_client.xgroup_create(key, self.group, id='0', mkstream=True)
+            except redis.ResponseError as e:
+                if 'BUSYGROUP' not in str(e):
+                    raise
+
+    def _reset_recovery(self):
+        """下次读取时从头重新处理全部分片中本消费者未确认的事件"""
+        self._pending_cursors = {key: '0' for key in self.store.shard_keys()}
+
+    def poll(self, count=100, block=None):
+        """读取并处理一批事件
+
+        Args:
+            count: 每个分片最多读取的事件数
+            block: 无新事件时阻塞等待的毫秒数，默认不阻塞（重新处理未确认事件时不阻塞）
+
+        Returns:
+            int: 处理的事件数
+
+        Raises:
+            Exception: handler 抛出的异常；对应事件未确认，下次读取时重新处理
+        """
+        recovering = self._pending_cursors is not None
+        if recovering:
+            streams = dict(self._pending_cursors)
+        else:
+            streams = {key: '>' for key in self.store.shard_keys()}
+        response = self.redis_client.xreadgroup(
+            self.group, self.consumer, streams, count=count,
+            block=None if recovering else block
+        )
+
+        events = []
+        trimmed = []
+        last_ids = {}
+        for key, messages in response or []:
+            key = self.store.decode(key)
+            for event_id, fields in messages:
+                event_id = self.store.decode(event_id)
+                last_ids[key] = event_id
+                if fields:
+                    events.append((key, event_id, self.store.parse_event(fields)))
+                else:
+                    trimmed.append((key, event_id))
+
+        if events:
+            try:
+                self.handler(events)
+            except Exception:
+                # 已读取但未确认的事件只会出现在未确认列表中，需要重新从头读取
+                self._reset_recovery()
+                raise
+        if events or trimmed:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for key, event_id in [(key, event_id) for key, event_id, _ in events] + trimmed:
+                pipe.xack(key, self.group, event_id)
+            pipe.execute()
+
+        if recovering:
+            # 处理并确认成功后才前移读取位置；没有返回事件的分片已处理完
+            self._pending_cursors = {key: last_ids[key] for key in streams if key in last_ids} or None
+        return len(events)
+
+    def run(self, count=100, block=5000, stop_event=None):
+        """持续消费，直到 stop_event 被设置"""
+        while stop_event is None or not stop_event.is_set():
+            self.poll(count=count, block=block)
@@ -0,0 +1,405 @@
+import numpy as np
+from datetime import datetime
+
+# 目标记忆保持率：各模型的复习间隔均定义为保持率衰减到该值所需的天数
+TARGET_RETENTION = 0.9
+
+_ONE_DAY = np.timedelta64(1, 'D')
+
+
+class RecordBatch:
+    """学习记录批次
+
+    将学习记录（dict列表）转换为按字段排列的NumPy数组，
+    以便对整批记录做向量化计算，计算结果再写回原记录。
+    """
+
+    def __init__(self, records, state_fields, now):
+        """初始化记录批次
+
+        Args:
+            records: 学习记录列表
+            state_fields: 模型状态字段及其默认值
+            now: 当前时间（datetime64）
+        """
+        self.records = records
+        self.strength = np.array(
+            [record.get('memory_strength', 0.5) for record in records], dtype=np.float64)
+        self.review_count = np.array(
+            [record.get('review_count', 0) for record in records], dtype=np.int64)
+        # 以上次复习时间为基准，从未复习过则以首次学习时间为基准
+        self.last_reviewed = np.array(
+            [record.get('last_reviewed') or record.get('first_learned') or now
+             for record in records], dtype='datetime64[us]')
+        self.state = {
+            field: np.array([record.get(field, default) for record in records], dtype=np.float64)
+            for field, default in state_fields.items()
+        }
+
+    def __len__(self):
+        return len(self.strength)
+
+    def take(self, index):
+        """取出部分记录组成新批次（仅数组字段，用于模拟计算）"""
+        subset = object.__new__(RecordBatch)
+        subset.records = None
+        subset.strength = self.strength[index]
+        subset.review_count = self.review_count[index]
+        subset.last_reviewed = self.last_reviewed[index]
+        subset.state = {field: values[index] for field, values in self.state.items()}
+        return subset
+
+    def put(self, index, subset):
+        """将 take 取出并修改后的批次写回对应位置"""
+        self.strength[index] = subset.strength
+        self.review_count[index] = subset.review_count
+        self.last_reviewed[index] = subset.last_reviewed
+        for field, values in subset.state.items():
+            self.state[field][index] = values
+
+    def elapsed_days(self, now):
+        """距上次复习经过的天数"""
+        return np.maximum((now - self.last_reviewed) / _ONE_DAY, 0.0)
+
+    def write_back(self, next_review):
+        """将计算结果写回学习记录
+
+        Args:
+            next_review: 下次复习时间数组，NaT 表示无需再复习
+        """
+        next_review_str = np.datetime_as_string(next_review, unit='us')
+        last_reviewed_str = np.datetime_as_string(self.last_reviewed, unit='us')
+        missing = np.isnat(next_review)
+        state = {field: values.tolist() for field, values in self.state.items()}
+        strength = self.strength.tolist()
+        review_count = self.review_count.tolist()
+
+        for i, record in enumerate(self.records):
+            record['memory_strength'] = strength[i]
+            record['review_count'] = review_count[i]
+            record['next_review'] = None if missing[i] else str(next_review_str[i])
+            if 'last_reviewed' in record or review_count[i] > 0:
+                record['last_reviewed'] = str(last_reviewed_str[i])
+            for field in state:
+                record[field] = state[field][i]
+        return self.records
+
+
+class MemoryModel:
+    """记忆模型基类
+
+    记忆强度（memory_strength）在所有模型中都采用线性更新，作为面向用户的
+    掌握程度指标；各模型通过自己的状态字段决定复习间隔和遗忘曲线。
+    """
+
+    name = None
+    # 模型状态字段及默认值，保存在学习记录中
+    state_fields = {}
+
+    def __init__(self, intervals, threshold, weight=0.3):
+        """初始化记忆模型
+
+        Args:
+            intervals: 复习间隔（天）
+            threshold: 记忆强度阈值
+            weight: 学习权重
+        """
+        self.intervals = np.asarray(intervals, dtype=np.float64)
+        self.threshold = threshold
+        self.weight = weight
+
+    def update_strength(self, strength, scores):
+        """计算新的记忆强度"""
+        new_strength = strength * (1 - self.weight) + scores * self.weight
+        return np.clip(new_strength, 0, 1)  # 确保在0-1之间
+
+    def review(self, batch, scores, elapsed):
+        """根据复习表现更新模型状态（原地修改 batch.state）"""
+
+    def interval_days(self, batch):
+        """计算复习间隔（天），NaN 表示无需再复习"""
+        raise NotImplementedError
+
+    def retrievability(self, batch, elapsed):
+        """计算当前的记忆保持率（遗忘曲线）"""
+        interval = self.interval_days(batch)
+        interval = np.where(np.isnan(interval), self.intervals[-1], interval)
+        return TARGET_RETENTION ** (elapsed / np.maximum(interval, 1.0))
+
+
+class LinearModel(MemoryModel):
+    """线性模型：按记忆强度从固定的 MEMORY_INTERVALS 中选择复习间隔"""
+
+    name = 'linear'
+
+    def interval_days(self, batch):
+        index = np.floor(batch.strength * len(self.intervals)).astype(np.int64)
+        days = self.intervals[np.clip(index, 0, len(self.intervals) - 1)]
+        mastered = (batch.strength >= self.threshold) | (index >= len(self.intervals))
+        return np.where(mastered, np.nan, days)
+
+
+class SM2Model(MemoryModel):
+    """SM-2 模型（SuperMemo 2）"""
+
+    name = 'sm2'
+    state_fields = {
+        'ease_factor': 2.5,
+        'repetitions': 0.0,
+        'interval': 0.0
+    }
+
+    def review(self, batch, scores, elapsed):
+        state = batch.state
+        quality = np.rint(np.clip(scores, 0, 1) * 5)
+        passed = quality >= 3
+
+        repetitions = np.where(passed, state['repetitions'] + 1, 0)
+        interval = np.where(
+            repetitions <= 1, 1.0,
+            np.where(repetitions == 2, 6.0, np.rint(state['interval'] * state['ease_factor']))
+        )
+        ease_factor = state['ease_factor'] + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
+
+        state['repetitions'] = repetitions.astype(np.float64)
+        state['interval'] = interval
+        state['ease_factor'] = np.maximum(ease_factor, 1.3)
+
+    def interval_days(self, batch):
+        interval = batch.state['interval']
+        return np.where(interval > 0, interval, self.intervals[0])
+
+
+class FSRSModel(MemoryModel):
+    """FSRS 风格模型：以稳定性（stability）和难度（difficulty）描述记忆状态"""
+
+    name = 'fsrs'
+    state_fields = {
+        'stability': 0.0,
+        'difficulty': 0.0
+    }
+    # FSRS v4 默认参数
+    weights = (0.4, 0.6, 2.4, 5.8, 4.93, 0.94, 0.86, 0.01, 1.49, 0.14, 0.94,
+               2.18, 0.05, 0.34, 1.26, 0.29, 2.61)
+
+    def _forgetting_curve(self, elapsed, stability):
+        return (1 + elapsed / (9 * np.maximum(stability, 1e-6))) ** -1
+
+    def review(self, batch, scores, elapsed):
+        w = self.weights
+        state = batch.state
+        stability = state['stability']
+        difficulty = state['difficulty']
+        # 将 0-1 的表现分映射为 1-4 的评分（重来/困难/良好/简单）
+        grade = 1 + np.rint(np.clip(scores, 0, 1) * 3)
+        is_new = stability <= 0
+
+        initial_stability = np.choose((grade - 1).astype(np.int64), w[0:4])
+        initial_difficulty = w[4] - (grade - 3) * w[5]
+
+        retention = self._forgetting_curve(elapsed, stability)
+        safe_stability = np.maximum(stability, 1e-6)
+        safe_difficulty = np.clip(difficulty, 1, 10)
+        bonus = np.where(grade == 2, w[15], np.where(grade == 4, w[16], 1.0))
+        recall_stability = safe_stability * (
+            1 + np.exp(w[8]) * (11 - safe_difficulty) * safe_stability ** -w[9]
+            * (np.exp(w[10] * (1 - retention)) - 1) * bonus
+        )
+        forget_stability = (
+            w[11] * safe_difficulty ** -w[12] * ((safe_stability + 1) ** w[13] - 1)
+            * np.exp(w[14] * (1 - retention))
+        )
+        next_difficulty = safe_difficulty - w[6] * (grade - 3)
+        # 难度向初始值均值回归
+        next_difficulty = w[7] * w[4] + (1 - w[7]) * next_difficulty
+
+        state['stability'] = np.where(
+            is_new, initial_stability, np.where(grade > 1, recall_stability, forget_stability))
+        state['difficulty'] = np.clip(
+            np.where(is_new, initial_difficulty, next_difficulty), 1, 10)
+
+    def interval_days(self, batch):
+        stability = batch.state['stability']
+        # 保持率衰减到 TARGET_RETENTION 所需的天数
+        interval = 9 * stability * (1 / TARGET_RETENTION - 1)
+        return np.where(stability > 0, np.maximum(np.rint(interval), 1.0), self.intervals[0])
+
+    def retrievability(self, batch, elapsed):
+        stability = batch.state['stability']
+        fallback = super().retrievability(batch, elapsed)
+        return np.where(stability > 0, self._forgetting_curve(elapsed, stability), fallback)
+
+
+MODELS = {model.name: model for model in (LinearModel, SM2Model, FSRSModel)}
+
+
+def get_model(name, intervals, threshold):
+    """根据名称创建记忆模型
+
+    Args:
+        name: 模型名称，可选值为 linear, sm2, fsrs
+        intervals: 复习间隔（天）
+        threshold: 记忆强度阈值
+
+    Returns:
+        MemoryModel: 记忆模型实例
+    """
+    if name not in MODELS:
+        raise ValueError(f"未知的记忆模型: {name}")
+    return MODELS[name](intervals, threshold)
+
+
+class SchedulingEngine:
+    """间隔复习调度引擎
+
+    对一批学习记录同时计算记忆强度、遗忘衰减和下次复习时间。
+    """
+
+    def __init__(self, model):
+        """初始化调度引擎
+
+        Args:
+            model: 记忆模型实例
+        """
+        self.model = model
+
+    def _batch(self, records, now):
+        return RecordBatch(records, self.model.state_fields, now)
+
+    @staticmethod
+    def _now(now):
+        return np.datetime64(now or datetime.now(), 'us')
+
+    def _next_review(self, batch):
+        interval = self.model.interval_days(batch)
+        missing = np.isnan(interval)
+        # 以微秒为单位换算间隔，NaN 对应 NaT
+        offset = np.where(missing, 0, interval * 86400e6).astype('timedelta64[us]')
+        next_review = batch.last_reviewed + offset
+        next_review[missing] = np.datetime64('NaT')
+        return next_review
+
+    def review(self, records, scores, now=None):
+        """批量应用复习结果
+
+        Args:
+            records: 学习记录列表（原地更新）
+            scores: 与记录一一对应的表现分（0-1）
+            now: 复习时间，默认为当前时间
+
+        Returns:
+            list: 更新后的学习记录
+        """
+        if not records:
+            return records
+        now = self._now(now)
+        batch = self._batch(records, now)
+        scores = np.asarray(scores, dtype=np.float64)
+        elapsed = batch.elapsed_days(now)
+
+        self.model.review(batch, scores, elapsed)
+        batch.strength = self.model.update_strength(batch.strength, scores)
+        batch.review_count = batch.review_count + 1
+        batch.last_reviewed = np.full(len(batch), now)
+        return batch.write_back(self._next_review(batch))
+
+    def schedule(self, records, now=None):
+        """根据当前模型状态重新计算下次复习时间
+
+        Args:
+            records: 学习记录列表（原地更新）
+            now: 当前时间，仅用于缺少时间字段的记录
+
+        Returns:
+            list: 更新后的学习记录
+        """
+        if not records:
+            return records
+        batch = self._batch(records, self._now(now))
+        return batch.write_back(self._next_review(batch))
+
+    def retention(self, records, now=None):
+        """计算每条记录当前的记忆保持率
+
+        Args:
+            records: 学习记录列表
+            now: 当前时间，默认为当前时间
+
+        Returns:
+            numpy.ndarray: 记忆保持率数组
+        """
+        now = self._now(now)
+        batch = self._batch(records, now)
+        return self.model.retrievability(batch, batch.elapsed_days(now))
+
+    def rescore(self, records, now=None):
+        """重新计算下次复习时间（用于每晚批量重算）
+
+        记忆保持率随时间变化，不写入记录，需要时通过 retention 计算。
+
+        Args:
+            records: 学习记录列表（原地更新）
+            now: 当前时间，默认为当前时间
+
+        Returns:
+            list: 更新后的学习记录
+        """
+        if not records:
+            return records
+        batch = self._batch(records, self._now(now))
+        return batch.write_back(self._next_review(batch))
+
+    def forecast(self, records, groups, group_count, days, score, now=None):
+        """预测未来每天到期的复习数量
+
+        假设每次复习都在到期当天完成且表现分为 score，按模型向前推演；
+        每一轮对所有仍在预测窗口内到期的记录同时计算，轮数不超过 days。
+
+        Args:
+            records: 学习记录列表
+            groups: 每条记录所属分组（如用户）的下标数组
+            group_count: 分组数
+            days: 预测天数（从今天开始）
+            score: 假设的复习表现分（0-1）
+            now: 当前时间，默认为当前时间
+
+        Returns:
+            numpy.ndarray: 形状为 (group_count, days) 的每日到期复习数，
+                已过期的复习计入第 0 天
+        """
+        counts = np.zeros((group_count, days), dtype=np.int64)
+        if not records:
+            return counts
+        now = self._now(now)
+        today = now.astype('datetime64[D]').astype('datetime64[us]')
+        groups = np.asarray(groups, dtype=np.int64)
+        batch = self._batch(records, now)
+        due = self._next_review(batch)
+
+        for _ in range(days):
+            active = ~np.isnat(due)
+            day = np.zeros(len(due), dtype=np.int64)
+            day[active] = np.maximum((due[active] - today) // _ONE_DAY, 0)
+            index = np.flatnonzero(active & (day < days))
+            if not len(index):
+                break
+            np.add.at(counts, (groups[index], day[index]), 1)
+
+            # 模拟在到期时（过期的按当前时间）完成复习
+            reviewed_at = np.maximum(due[index], now)
+            subset = batch.take(index)
+            elapsed = np.maximum((reviewed_at - subset.last_reviewed) / _ONE_DAY, 0.0)
+            scores = np.full(len(index), score, dtype=np.float64)
+            self.model.review(subset, scores, elapsed)
+            subset.strength = self.model.update_strength(subset.strength, scores)
+            subset.review_count = subset.review_count + 1
+            subset.last_reviewed = reviewed_at
+            batch.put(index, subset)
+
+            next_due = self._next_review(subset)
+            # 间隔至少一天，保证每轮推进
+            next_due = np.where(
+                np.isnat(next_due), next_due, np.maximum(next_due, reviewed_at + _ONE_DAY))
+            due[index] = next_due
+            due[np.flatnonzero(active & (day >= days))] = np.datetime64('NaT')
+        return counts
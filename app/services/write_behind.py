@@ -0,0 +1,177 @@
+import atexit
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindFullError(Exception):
+    """写后缓冲区的复习结果条数已达上限（通常是存储持续写入失败）"""
+
+
+class WriteBehindBuffer:
+    """复习结果写后缓冲区
+
+    在进程内按用户合并复习结果，达到条数上限或最长滞留时间时批量写入存储，
+    进程退出时写入剩余数据。同一进程内读取某用户数据前应先调用 flush_user，
+    以保证读到自己的写入；flush_user 只等待该用户正在进行的写入，不等待整批写入。
+
+    写入失败的数据放回缓冲区，由后台线程按指数退避重试；失败期间 add 不会在
+    请求线程中触发写入，缓冲条数达到 max_pending 后拒绝新的复习结果。
+    """
+
+    def __init__(self, writer, max_batch=1000, max_age=1.0, max_pending=10000, max_backoff=30.0):
+        """初始化写后缓冲区
+
+        Args:
+            writer: 写入函数，签名为 writer(user_id, [(concept, score), ...])
+            max_batch: 缓冲的复习结果总条数达到该值后立即写入
+            max_age: 复习结果在缓冲区中的最长滞留时间（秒）
+            max_pending: 缓冲的复习结果总条数上限，达到后 add 抛出 WriteBehindFullError
+            max_backoff: 写入失败后重试间隔的上限（秒）
+        """
+        self.writer = writer
+        self.max_batch = max_batch
+        self.max_age = max_age
+        self.max_pending = max(max_pending, max_batch)
+        self.max_backoff = max_backoff
+        # user_id -> (首条结果的缓冲时间, [(concept, score), ...])
+        self._pending = {}
+        self._pending_count = 0
+        self._lock = threading.Lock()
+        # 正在写入的用户，同一用户的数据按缓冲顺序依次写入；某个用户写入完成时通知
+        self._writing = set()
+        self._written = threading.Condition(self._lock)
+        # 保证同一时刻只有一次批量写入
+        self._flush_lock = threading.Lock()
+        self._closed = threading.Event()
+        # 连续写入失败的次数及下次重试时间（time.monotonic）
+        self._failures = 0
+        self._retry_at = 0.0
+        self.stats = {'buffered': 0, 'flushed': 0, 'flushes': 0, 'errors': 0, 'rejected': 0}
+
+        self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def add(self, user_id, concept, score):
+        """缓冲一条复习结果
+
+        Raises:
+            WriteBehindFullError: 缓冲条数已达 max_pending
+        """
+        with self._lock:
+            if self._pending_count >= self.max_pending:
+                self.stats['rejected'] += 1
+                raise WriteBehindFullError('复习结果写入繁忙，请稍后重试')
+            if user_id in self._pending:
+                self._pending[user_id][1].append((concept, score))
+            else:
+                self._pending[user_id] = (time.monotonic(), [(concept, score)])
+            self._pending_count += 1
+            self.stats['buffered'] += 1
+            # 上次写入失败时由后台线程退避重试，不在请求线程中写入
+            full = self._pending_count >= self.max_batch and not self._failures
+        if full:
+            self.flush()
+
+    def pending_count(self):
+        """当前缓冲的复习结果条数"""
+        return self._pending_count
+
+    def flush_user(self, user_id):
+        """立即写入某个用户的缓冲数据
+
+        该用户的数据正在由批量写入处理时，等待这部分写入完成后再写入剩余数据；
+        不等待其他用户的写入。
+        """
+        with self._lock:
+            self._written.wait_for(lambda: user_id not in self._writing)
+            entry = self._pending.pop(user_id, None)
+            if not entry:
+                return
+            self._pending_count -= len(entry[1])
+            self._writing.add(user_id)
+        self._write({user_id: entry})
+
+    def flush(self, older_than=None):
+        """写入缓冲数据
+
+        Args:
+            older_than: 只写入滞留时间超过该秒数的用户数据，默认全部写入
+        """
+        with self._flush_lock:
+            with self._lock:
+                if older_than is None:
+                    # 等待 flush_user 正在进行的写入完成，返回时全部数据均已写入
+                    self._written.wait_for(lambda: not self._writing)
+                    batch, self._pending = self._pending, {}
+                else:
+                    # 正在由 flush_user 写入的用户留到下次写入
+                    deadline = time.monotonic() - older_than
+                    batch = {
+                        user_id: entry for user_id, entry in self._pending.items()
+                        if entry[0] <= deadline and user_id not in self._writing
+                    }
+                    for user_id in batch:
+                        del self._pending[user_id]
+                self._pending_count -= sum(len(entry[1]) for entry in batch.values())
+                self._writing.update(batch)
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch):
+        """逐个用户写入合并后的复习结果（batch 中的用户已加入 _writing）"""
+        flushed = 0
+        errors = 0
+        for user_id, (buffered_at, results) in batch.items():
+            try:
+                self.writer(user_id, results)
+                flushed += len(results)
+            except Exception:
+                errors += 1
+                logger.exception('写入用户 %s 的复习结果失败，已放回缓冲区', user_id)
+                self._requeue(user_id, buffered_at, results)
+            finally:
+                with self._lock:
+                    self._writing.discard(user_id)
+                    self._written.notify_all()
+        with self._lock:
+            self.stats['flushed'] += flushed
+            self.stats['errors'] += errors
+            self.stats['flushes'] += 1
+            if errors:
+                self._failures += 1
+                self._retry_at = time.monotonic() + min(
+                    self.max_age * 2 ** self._failures, self.max_backoff)
+            elif flushed:
+                self._failures = 0
+
+    def _requeue(self, user_id, buffered_at, results):
+        """写入失败的数据放回缓冲区头部，等待下次重试"""
+        with self._lock:
+            if user_id in self._pending:
+                _, newer = self._pending[user_id]
+                self._pending[user_id] = (buffered_at, results + newer)
+            else:
+                self._pending[user_id] = (buffered_at, results)
+            self._pending_count += len(results)
+
+    def _run(self):
+        """后台线程：定期写入超过最长滞留时间的数据，写入失败后按退避间隔重试"""
+        interval = max(self.max_age / 2, 0.01)
+        while not self._closed.wait(interval):
+            if self._failures and time.monotonic() < self._retry_at:
+                continue
+            try:
+                self.flush(older_than=self.max_age)
+            except Exception:
+                logger.exception('写后缓冲区定时写入失败')
+
+    def close(self):
+        """停止后台线程并写入全部缓冲数据"""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self.flush()
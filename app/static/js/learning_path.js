@@ -32,9 +32,15 @@ async function handleGenerate() {
     showLoading(true);
     
     try {
-        // 获取学习路径
-        const path = await fetchLearningPath(concept, level);
-        displayLearningPath(path);
+        // 获取学习路径：支持流式读取时每完成一天立即显示
+        let path;
+        if (window.ReadableStream && window.TextDecoder) {
+            clearLearningPath();
+            path = await streamLearningPath(concept, level, appendDayCard);
+        } else {
+            path = await fetchLearningPath(concept, level);
+            displayLearningPath(path);
+        }
         
         // 更新学习资源
         updateResources(path);
@@ -63,32 +69,143 @@ async function fetchLearningPath(concept, level) {
         throw new Error('获取学习路径失败');
     }
     
-    return await response.json();
+    const data = await response.json();
+    // 服务端以异步任务方式生成时返回 202 和任务地址
+    if (response.status === 202) {
+        return await waitForLearningPathJob(data);
+    }
+    return data;
+}
+
+// 流式获取学习路径（NDJSON，每行为一天的学习计划）
+async function streamLearningPath(concept, level, onDay) {
+    const response = await fetch('/api/learning/path/stream', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({ concept, user_level: level })
+    });
+    
+    if (!response.ok || !response.body) {
+        throw new Error('获取学习路径失败');
+    }
+    
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    const path = {};
+    let buffer = '';
+    
+    const handleLine = (line) => {
+        if (!line.trim()) {
+            return;
+        }
+        const item = JSON.parse(line);
+        if (item.error) {
+            throw new Error(item.error);
+        }
+        path[item.day] = item.plan;
+        onDay(item.day, item.plan);
+    };
+    
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) {
+            break;
+        }
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        lines.forEach(handleLine);
+    }
+    handleLine(buffer + decoder.decode());
+    
+    return path;
+}
+
+// 等待学习路径生成任务完成（优先使用 SSE，不支持、服务端未提供或连接失败时轮询）
+function waitForLearningPathJob(job) {
+    return new Promise((resolve, reject) => {
+        const finish = (result) => {
+            if (result.status === 'done') {
+                resolve(result.result);
+            } else {
+                reject(new Error(result.error || '生成学习路径失败'));
+            }
+        };
+        
+        // 同步服务模式不提供 events_url
+        if (!window.EventSource || !job.events_url) {
+            pollLearningPathJob(job.status_url).then(finish, reject);
+            return;
+        }
+        
+        const source = new EventSource(job.events_url);
+        const handleEvent = (event) => {
+            const result = JSON.parse(event.data);
+            if (result.status === 'done' || result.status === 'failed') {
+                source.close();
+                finish(result);
+            }
+        };
+        source.addEventListener('done', handleEvent);
+        source.addEventListener('failed', handleEvent);
+        source.onerror = () => {
+            // 连接断开或超时后改为轮询
+            source.close();
+            pollLearningPathJob(job.status_url).then(finish, reject);
+        };
+    });
+}
+
+// 轮询任务状态
+async function pollLearningPathJob(statusUrl, interval = 1000) {
+    while (true) {
+        const response = await fetch(statusUrl);
+        if (!response.ok) {
+            throw new Error('查询学习路径生成任务失败');
+        }
+        const result = await response.json();
+        if (result.status === 'done' || result.status === 'failed') {
+            return result;
+        }
+        await new Promise(resolve => setTimeout(resolve, interval));
+    }
 }
 
 // 显示学习路径
 function displayLearningPath(path) {
-    const container = document.querySelector('.timeline');
-    container.innerHTML = '';
+    clearLearningPath();
     
     // 显示每天的学习计划
     for (const [day, plan] of Object.entries(path)) {
-        const dayCard = document.createElement('div');
-        dayCard.className = 'card mb-3';
-        dayCard.innerHTML = `
-            <div class="card-body">
-                <h6 class="card-title">${day}</h6>
-                <p class="card-text"><strong>学习目标：</strong>${plan.goal}</p>
-                <div class="activities">
-                    <strong>学习活动：</strong>
-                    <ul class="list-unstyled">
-                        ${plan.activities.map(activity => `<li>• ${activity}</li>`).join('')}
-                    </ul>
-                </div>
-            </div>
-        `;
-        container.appendChild(dayCard);
+        appendDayCard(day, plan);
     }
+}
+
+// 清空学习路径
+function clearLearningPath() {
+    document.querySelector('.timeline').innerHTML = '';
+}
+
+// 追加一天的学习计划
+function appendDayCard(day, plan) {
+    const container = document.querySelector('.timeline');
+    const dayCard = document.createElement('div');
+    dayCard.className = 'card mb-3';
+    dayCard.innerHTML = `
+        <div class="card-body">
+            <h6 class="card-title">${day}</h6>
+            <p class="card-text"><strong>学习目标：</strong>${plan.goal}</p>
+            <div class="activities">
+                <strong>学习活动：</strong>
+                <ul class="list-unstyled">
+                    ${plan.activities.map(activity => `<li>• ${activity}</li>`).join('')}
+                </ul>
+            </div>
+        </div>
+    `;
+    container.appendChild(dayCard);
     
     document.getElementById('learning-path').style.display = 'block';
 }
@@ -1,28 +1,53 @@
 // DOM加载完成后初始化
 document.addEventListener('DOMContentLoaded', function() {
-    // 加载复习计划
-    loadReviewSchedule();
-    // 加载记忆强度分析
-    loadMemoryStrengthChart();
-    // 加载学习统计
-    loadLearningStats();
+    // 一次请求加载复习计划、记忆强度分析和学习统计
+    loadDashboard();
 });
 
-// 加载复习计划
-async function loadReviewSchedule() {
+// 加载复习页面数据
+async function loadDashboard(fields) {
+    const params = new URLSearchParams({ user_id: '1' });
+    if (fields) {
+        params.set('fields', fields.join(','));
+    }
+    const requested = fields || ['schedule', 'strength', 'stats'];
+    
+    let dashboard = {};
     try {
-        const response = await fetch('/api/memory/review?user_id=1');
+        const response = await fetch(`/api/memory/dashboard?${params}`);
         if (!response.ok) {
-            throw new Error('获取复习计划失败');
+            throw new Error('获取复习数据失败');
         }
-        const schedule = await response.json();
-        
-        displayTodayReview(schedule);
-        displayReviewHistory(schedule);
-        
+        dashboard = await response.json();
     } catch (error) {
-        showAlert('加载复习计划失败: ' + error.message, 'danger');
+        showAlert('加载复习数据失败: ' + error.message, 'danger');
+    }
+    
+    if (requested.includes('schedule') && dashboard.schedule) {
+        displayTodayReview(dashboard.schedule);
+        displayReviewHistory(dashboard.schedule);
     }
+    if (requested.includes('strength')) {
+        if (dashboard.strength) {
+            displayMemoryStrengthChart(dashboard.strength);
+        } else {
+            // 使用模拟数据作为备用
+            useMockMemoryStrengthData();
+        }
+    }
+    if (requested.includes('stats')) {
+        if (dashboard.stats) {
+            displayLearningStats(dashboard.stats);
+        } else {
+            // 使用模拟数据作为备用
+            useMockLearningStats();
+        }
+    }
+}
+
+// 加载复习计划
+function loadReviewSchedule() {
+    return loadDashboard(['schedule']);
 }
 
 // 显示今日复习
@@ -94,46 +119,34 @@ function displayReviewHistory(schedule) {
     `).join('');
 }
 
-// 加载记忆强度分析
-async function loadMemoryStrengthChart() {
-    try {
-        const response = await fetch('/api/memory/strength?user_id=1');
-        if (!response.ok) {
-            throw new Error('获取记忆强度数据失败');
-        }
-        const data = await response.json();
-        
-        const chartData = [
-            {
-                x: data.concepts,
-                y: data.strengths,
-                type: 'bar',
-                marker: {
-                    color: 'rgb(13, 110, 253)'
-                }
-            }
-        ];
-        
-        const layout = {
-            title: '概念记忆强度分布',
-            yaxis: {
-                title: '记忆强度',
-                range: [0, 1]
-            },
-            margin: {
-                l: 50,
-                r: 50,
-                t: 50,
-                b: 50
+// 显示记忆强度分析
+function displayMemoryStrengthChart(data) {
+    const chartData = [
+        {
+            x: data.concepts,
+            y: data.strengths,
+            type: 'bar',
+            marker: {
+                color: 'rgb(13, 110, 253)'
             }
-        };
-        
-        Plotly.newPlot('memory-strength-chart', chartData, layout);
-    } catch (error) {
-        showAlert('加载记忆强度分析失败: ' + error.message, 'danger');
-        // 使用模拟数据作为备用
-        useMockMemoryStrengthData();
-    }
+        }
+    ];
+    
+    const layout = {
+        title: '概念记忆强度分布',
+        yaxis: {
+            title: '记忆强度',
+            range: [0, 1]
+        },
+        margin: {
+            l: 50,
+            r: 50,
+            t: 50,
+            b: 50
+        }
+    };
+    
+    Plotly.newPlot('memory-strength-chart', chartData, layout);
 }
 
 // 使用模拟数据作为备用
@@ -166,23 +179,6 @@ function useMockMemoryStrengthData() {
     Plotly.newPlot('memory-strength-chart', data, layout);
 }
 
-// 加载学习统计
-async function loadLearningStats() {
-    try {
-        const response = await fetch('/api/memory/stats?user_id=1');
-        if (!response.ok) {
-            throw new Error('获取学习统计数据失败');
-        }
-        const stats = await response.json();
-        
-        displayLearningStats(stats);
-    } catch (error) {
-        showAlert('加载学习统计失败: ' + error.message, 'danger');
-        // 使用模拟数据作为备用
-        useMockLearningStats();
-    }
-}
-
 // 显示学习统计
 function displayLearningStats(stats) {
     const container = document.getElementById('learning-stats');
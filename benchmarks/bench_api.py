@@ -0,0 +1,431 @@
+"""全部 API 接口的端到端基准测试（使用本地替身，无需外部服务）
+
+用法:
+    python benchmarks/bench_api.py                                  # 运行全部场景并与基线比较
+    python benchmarks/bench_api.py --routes explanation,memory-stats --concurrency 32
+    python benchmarks/bench_api.py --save-baseline                  # 以本次结果更新基线
+    python benchmarks/bench_api.py --mode async --fake-latency 0.2
+
+启动模拟 DeepSeek API（fake_deepseek.py，可配置延迟，支持流式输出）和 fakeredis 的 TCP 服务器
+（也可以用 --redis-url 指定专用的测试 Redis），写入测试用户的学习记录和班级后，以 gunicorn
+（--mode sync）或 uvicorn（--mode async）启动应用，对每个 /api 接口分别以固定并发发送请求，
+输出吞吐量和 p50/p95/p99 延迟。概念的知识图谱接口目前返回模拟数据，不需要 Neo4j。
+
+每个接口是一个场景；explanation、exercises、learning-path 在固定的概念集合中选择（预热后命中
+缓存），*-cold 场景每个请求使用新概念（经过模拟 DeepSeek API）。启动时检查应用中是否有
+未覆盖的 /api 接口，新增接口时需要在 SCENARIOS 中添加对应场景。
+
+与基线（默认 benchmarks/baseline_api.json）比较时，吞吐量下降或 p95 延迟上升超过 --tolerance 的
+场景记为退化，存在退化时退出码为1。运行前用固定的纯 Python 工作量测量本机速度并与基线机器比较，
+默认按速度比例换算基线（取多轮测量的最短耗时以减小共享机器上的波动）；在基线机器上重复运行时
+可以加 --no-normalize 直接比较原始数值。
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+
+from bench_serving import ROOT, free_port, percentile, start_server, stop_server  # noqa: E402
+from fake_deepseek import FakeDeepSeekServer  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baseline_api.json')
+ADMIN_TOKEN = 'bench-admin'
+COHORT_ID = 'bench-cohort'
+
+
+class Context:
+    """场景共享的测试数据"""
+
+    def __init__(self, base, users, concepts, records):
+        self.base = base
+        self.users = [f'bench-user-{i}' for i in range(users)]
+        self.concepts = [f'concept-{i}' for i in range(concepts)]
+        self.records = records
+        self.prefix = uuid.uuid4().hex[:8]
+        self._counter = itertools.count()
+
+    def user(self):
+        return random.choice(self.users)
+
+    def concept(self):
+        return random.choice(self.concepts)
+
+    def learned(self, user_id):
+        """用户已学习的概念（与 seed 写入的一致）"""
+        offset = int(user_id.rsplit('-', 1)[1])
+        return [self.concepts[(offset + i) % len(self.concepts)] for i in range(self.records)]
+
+    def cold_concept(self):
+        return f'cold-{self.prefix}-{next(self._counter)}'
+
+
+def _admin(session, method, url, **kwargs):
+    return session.request(method, url, headers={'X-Admin-Token': ADMIN_TOKEN}, **kwargs)
+
+
+def _learning_path_job(ctx, session, events):
+    response = session.post(f'{ctx.base}/api/learning/path', json={
+        'concept': ctx.cold_concept(), 'user_id': ctx.user(), 'async': True
+    })
+    if response.status_code != 202:
+        return response
+    job = response.json()
+    if events:
+        return session.get(ctx.base + job['events_url'])
+    deadline = time.monotonic() + 60
+    while True:
+        response = session.get(ctx.base + job['status_url'])
+        if not response.ok or response.json()['status'] in ('done', 'failed'):
+            return response
+        if time.monotonic() > deadline:
+            raise requests.Timeout(f"任务 {job['job_id']} 未在60秒内完成")
+        time.sleep(0.01)
+
+
+def _review_batch(ctx, session):
+    user_id = ctx.user()
+    return session.post(f'{ctx.base}/api/memory/review/batch', json={'user_id': user_id, 'results': [
+        {'concept': concept, 'performance_score': random.random()}
+        for concept in random.sample(ctx.learned(user_id), min(5, ctx.records))
+    ]})
+
+
+# 只在异步服务模式下提供的场景（同步模式下 SSE 推送返回 501）
+ASYNC_ONLY_SCENARIOS = {'learning-path-events'}
+
+# 场景名称 -> (方法, 路由规则, 发送请求的函数)
+SCENARIOS = {
+    'concept-search': ('GET', '/api/concept/search', lambda ctx, s: s.get(
+        f'{ctx.base}/api/concept/search', params={'q': ctx.concept()[:9]})),
+    'concept': ('GET', '/api/concept/<concept_name>', lambda ctx, s: s.get(
+        f'{ctx.base}/api/concept/{ctx.concept()}')),
+    'explanation': ('GET', '/api/concept/<concept_name>/explanation', lambda ctx, s: s.get(
+        f'{ctx.base}/api/concept/{ctx.concept()}/explanation')),
+    'explanation-cold': ('GET', '/api/concept/<concept_name>/explanation', lambda ctx, s: s.get(
+        f'{ctx.base}/api/concept/{ctx.cold_concept()}/explanation')),
+    'exercises': ('GET', '/api/concept/<concept_name>/exercises', lambda ctx, s: s.get(
+        f'{ctx.base}/api/concept/{ctx.concept()}/exercises')),
+    'exercises-cold': ('GET', '/api/concept/<concept_name>/exercises', lambda ctx, s: s.get(
+        f'{ctx.base}/api/concept/{ctx.cold_concept()}/exercises')),
+    'knowledge-graph': ('GET', '/api/concept/<concept_name>/knowledge-graph', lambda ctx, s: s.get(
+        f'{ctx.base}/api/concept/{ctx.concept()}/knowledge-graph')),
+    'content-stats': ('GET', '/api/content/stats', lambda ctx, s: s.get(f'{ctx.base}/api/content/stats')),
+    'content-hot': ('GET', '/api/content/hot', lambda ctx, s: s.get(f'{ctx.base}/api/content/hot?limit=20')),
+    'learning-path': ('POST', '/api/learning/path', lambda ctx, s: s.post(
+        f'{ctx.base}/api/learning/path', json={'concept': ctx.concept(), 'user_id': ctx.user()})),
+    'learning-path-cold': ('POST', '/api/learning/path', lambda ctx, s: s.post(
+        f'{ctx.base}/api/learning/path', json={'concept': ctx.cold_concept(), 'user_id': ctx.user()})),
+    'learning-path-stream': ('POST', '/api/learning/path/stream', lambda ctx, s: s.post(
+        f'{ctx.base}/api/learning/path/stream', json={'concept': ctx.cold_concept(), 'user_id': ctx.user()})),
+    'learning-path-job': ('GET', '/api/learning/path/<job_id>',
+                          lambda ctx, s: _learning_path_job(ctx, s, events=False)),
+    'learning-path-events': ('GET', '/api/learning/path/<job_id>/events',
+                             lambda ctx, s: _learning_path_job(ctx, s, events=True)),
+    'path-cache-stats': ('GET', '/api/learning/path-cache/stats', lambda ctx, s: s.get(
+        f'{ctx.base}/api/learning/path-cache/stats')),
+    'path-cache-invalidate': ('POST', '/api/learning/path-cache/invalidate', lambda ctx, s: _admin(
+        s, 'POST', f'{ctx.base}/api/learning/path-cache/invalidate', json={'concepts': [ctx.concept()]})),
+    'memory-review': ('GET', '/api/memory/review', lambda ctx, s: s.get(
+        f'{ctx.base}/api/memory/review', params={'user_id': ctx.user(), 'limit': 20})),
+    'review-start': ('POST', '/api/memory/review/start', lambda ctx, s: s.post(
+        f'{ctx.base}/api/memory/review/start', json={'user_id': ctx.user(), 'concept': ctx.concept()})),
+    'review-skip': ('POST', '/api/memory/review/skip', lambda ctx, s: s.post(
+        f'{ctx.base}/api/memory/review/skip', json={'user_id': ctx.user(), 'concept': ctx.concept()})),
+    'review-batch': ('POST', '/api/memory/review/batch', lambda ctx, s: _review_batch(ctx, s)),
+    'memory-stats': ('GET', '/api/memory/stats', lambda ctx, s: s.get(
+        f'{ctx.base}/api/memory/stats', params={'user_id': ctx.user()})),
+    'memory-strength': ('GET', '/api/memory/strength', lambda ctx, s: s.get(
+        f'{ctx.base}/api/memory/strength', params={'user_id': ctx.user()})),
+    'memory-history': ('GET', '/api/memory/history', lambda ctx, s: s.get(
+        f'{ctx.base}/api/memory/history', params={'user_id': ctx.user()})),
+    'memory-forecast': ('GET', '/api/memory/forecast', lambda ctx, s: s.get(
+        f'{ctx.base}/api/memory/forecast',
+        params={'user_ids': ','.join(random.sample(ctx.users, min(20, len(ctx.users)))), 'days': 30})),
+    'memory-dashboard': ('GET', '/api/memory/dashboard', lambda ctx, s: s.get(
+        f'{ctx.base}/api/memory/dashboard', params={'user_id': ctx.user()})),
+    'cohort-get': ('GET', '/api/memory/cohorts/<cohort_id>', lambda ctx, s: s.get(
+        f'{ctx.base}/api/memory/cohorts/{COHORT_ID}')),
+    'cohort-put': ('PUT', '/api/memory/cohorts/<cohort_id>', lambda ctx, s: s.put(
+        f'{ctx.base}/api/memory/cohorts/bench-put-{random.randrange(10)}',
+        json={'user_ids': random.sample(ctx.users, min(50, len(ctx.users)))})),
+    'cohort-mastery': ('GET', '/api/memory/cohort/mastery', lambda ctx, s: s.get(
+        f'{ctx.base}/api/memory/cohort/mastery', params={'cohort_id': COHORT_ID})),
+    'cohort-schedule': ('GET', '/api/memory/cohort/schedule', lambda ctx, s: s.get(
+        f'{ctx.base}/api/memory/cohort/schedule', params={'cohort_id': COHORT_ID, 'limit': 5})),
+    'cohort-concepts': ('GET', '/api/memory/cohort/concepts', lambda ctx, s: s.get(
+        f'{ctx.base}/api/memory/cohort/concepts', params={'cohort_id': COHORT_ID})),
+    # 分析会话只匹配不存在的路由，不影响其他场景
+    'cohort-forecast': ('POST', '/api/memory/forecast', lambda ctx, s: s.post(
+        f'{ctx.base}/api/memory/forecast', json={'cohort_id': COHORT_ID, 'days': 30})),
+    'profiling-start': ('POST', '/api/admin/profiling', lambda ctx, s: _admin(
+        s, 'POST', f'{ctx.base}/api/admin/profiling', json={'route': '/api/bench/none', 'duration': 600})),
+    'profiling-report': ('GET', '/api/admin/profiling', lambda ctx, s: _admin(
+        s, 'GET', f'{ctx.base}/api/admin/profiling')),
+    'profiling-flame': ('GET', '/api/admin/profiling/flame', lambda ctx, s: _admin(
+        s, 'GET', f'{ctx.base}/api/admin/profiling/flame')),
+    'profiling-stop': ('DELETE', '/api/admin/profiling', lambda ctx, s: _admin(
+        s, 'DELETE', f'{ctx.base}/api/admin/profiling')),
+    'metrics': ('GET', '/metrics', lambda ctx, s: s.get(f'{ctx.base}/metrics')),
+}
+
+
+def _serve_fake_redis(port):
+    from fakeredis import TcpFakeServer
+    TcpFakeServer(('127.0.0.1', port)).serve_forever()
+
+
+def start_fake_redis():
+    """在独立进程中启动 fakeredis 的 TCP 服务器（避免与发送请求的线程争用 GIL），返回 (进程, 地址)"""
+    port = free_port()
+    process = multiprocessing.get_context('spawn').Process(target=_serve_fake_redis, args=(port,), daemon=True)
+    process.start()
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process, f'redis://127.0.0.1:{port}/0'
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError('fakeredis 启动超时')
+
+
+def _prepare(redis_url, users, concepts, records, results):
+    os.environ.update(REDIS_URL=redis_url, MEMORY_STORE='redis', DEEPSEEK_API_KEY='bench')
+    sys.path.insert(0, ROOT)
+    from app import create_app
+
+    app = create_app('production')
+    ctx = Context('', users, concepts, records)
+    with app.app_context():
+        from app.api.routes import memory_service
+
+    def seed(user_id):
+        with app.app_context():
+            for concept in ctx.learned(user_id):
+                memory_service.add_learning_record(user_id, concept)
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        list(executor.map(seed, ctx.users))
+    with app.app_context():
+        memory_service.set_cohort_members(COHORT_ID, ctx.users)
+    results.put(sorted(rule.rule for rule in app.url_map.iter_rules() if rule.rule.startswith('/api/')))
+    results.close()
+    results.join_thread()
+    # 应用创建的后台线程不需要等待
+    os._exit(0)
+
+
+def prepare(redis_url, users, concepts, records):
+    """在子进程中写入测试数据：每个用户学习 records 个概念，全部用户组成一个班级
+
+    Returns:
+        set: 应用中全部 /api 接口的路由规则，用于检查场景覆盖
+    """
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=_prepare, args=(redis_url, users, concepts, records, results))
+    process.start()
+    rules = results.get()
+    process.join()
+    return set(rules)
+
+
+def run_scenario(ctx, name, concurrency, total):
+    """以固定并发数发送 total 个请求
+
+    Returns:
+        tuple: (耗时, 成功请求的延迟列表, 失败数)
+    """
+    send = SCENARIOS[name][2]
+    local = threading.local()
+
+    def one(_):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        start = time.perf_counter()
+        try:
+            response = send(ctx, session)
+            response.content
+            ok = response.ok
+        except requests.RequestException:
+            ok = False
+        return ok, time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(one, range(total)))
+    elapsed = time.perf_counter() - start
+    latencies = sorted(latency for ok, latency in results if ok)
+    return elapsed, latencies, sum(1 for ok, _ in results if not ok)
+
+
+def calibrate(rounds=15):
+    """本机速度：固定的纯 Python 工作量（JSON 编解码）的最短耗时（秒），在施加负载之前测量"""
+    payload = {'concept': 'concept-1', 'memory_strength': 0.5, 'review_count': 3,
+               'history': [{'day': day, 'score': day / 10} for day in range(20)]}
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(2000):
+            json.loads(json.dumps(payload))
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def compare(result, base, speed, tolerance):
+    """与基线比较，返回退化描述列表
+
+    Args:
+        speed: 本机相对基线机器的耗时比例（>1 表示本机更慢）
+    """
+    problems = []
+    expected_throughput = base['throughput'] / speed
+    if result['throughput'] < expected_throughput * (1 - tolerance):
+        problems.append(f"吞吐量 {result['throughput']:.1f} < 基线 {expected_throughput:.1f}")
+    # 毫秒级的延迟波动较大，变化小于 2ms 不计
+    expected_p95 = base['p95'] * speed
+    if result['p95'] > expected_p95 * (1 + tolerance) and result['p95'] - expected_p95 > 0.002:
+        problems.append(f"p95 {result['p95'] * 1000:.1f}ms > 基线 {expected_p95 * 1000:.1f}ms")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=('sync', 'async'), default='sync', help='服务模式')
+    parser.add_argument('--routes', default='', help='只运行这些场景，逗号分隔，默认全部')
+    parser.add_argument('--concurrency', type=int, default=16, help='并发数')
+    parser.add_argument('--requests', type=int, default=200, help='每个场景的请求数')
+    parser.add_argument('--warmup', type=int, default=20, help='每个场景正式计时前的预热请求数')
+    parser.add_argument('--repeat', type=int, default=3, help='每个场景的测量轮数，各项结果取中位数')
+    parser.add_argument('--workers', type=int, default=2, help='同步模式的 gunicorn worker 数')
+    parser.add_argument('--threads', type=int, default=4, help='同步模式每个 worker 的线程数')
+    parser.add_argument('--fake-latency', type=float, default=0.0, help='模拟 DeepSeek API 的耗时（秒）')
+    parser.add_argument('--users', type=int, default=100, help='测试用户数')
+    parser.add_argument('--concepts', type=int, default=50, help='概念集合大小')
+    parser.add_argument('--records', type=int, default=10, help='每个用户的学习记录数')
+    parser.add_argument('--redis-url', default='', help='使用该 Redis 代替 fakeredis（请使用专用的测试库）')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='基线文件')
+    parser.add_argument('--save-baseline', action='store_true', help='以本次结果更新基线文件')
+    parser.add_argument('--tolerance', type=float, default=0.35, help='允许的退化比例')
+    parser.add_argument('--normalize', action=argparse.BooleanOptionalAction, default=True,
+                        help='按本机与基线机器的速度比例换算基线（默认开启）')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    args = parser.parse_args()
+
+    names = [name for name in args.routes.split(',') if name] or list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f'未知场景: {", ".join(unknown)}')
+    if args.mode == 'sync':
+        names = [name for name in names if name not in ASYNC_ONLY_SCENARIOS]
+    random.seed(args.seed)
+
+    if not args.redis_url:
+        _, args.redis_url = start_fake_redis()
+
+    start = time.perf_counter()
+    api_routes = prepare(args.redis_url, args.users, args.concepts, args.records)
+    print(f'写入测试数据: {args.users} 个用户 x {args.records} 条记录，耗时 {time.perf_counter() - start:.1f}s')
+    for rule in sorted(api_routes - {rule for _, rule, _ in SCENARIOS.values()}):
+        print(f'警告: 接口 {rule} 没有对应的场景')
+
+    calibration = calibrate()
+    speed = 1.0
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        ratio = calibration / baseline['calibration']
+        speed = ratio if args.normalize else 1.0
+        print(f'基线: {args.baseline}（本机耗时约为基线机器的 {ratio:.2f} 倍'
+              f'{"，按此比例换算" if args.normalize else ""}）')
+        changed = [key for key, value in baseline['config'].items() if getattr(args, key) != value]
+        if changed:
+            print(f'警告: 以下参数与基线不同，比较结果仅供参考: {", ".join(changed)}')
+
+    deepseek = FakeDeepSeekServer(latency=args.fake_latency)
+    deepseek_url = deepseek.start()
+    # DeepSeek API 限流照常检查，但限额足够大，*-cold 场景测量的是实际生成路径
+    extra_env = {'MEMORY_STORE': 'redis', 'ADMIN_TOKEN': ADMIN_TOKEN,
+                 'LLM_USER_RATE': '100000', 'LLM_USER_BURST': '100000',
+                 'LLM_GLOBAL_RATE': '100000', 'LLM_GLOBAL_BURST': '100000'}
+    results = {}
+    regressions = {}
+    print(f'模式: {args.mode}  并发: {args.concurrency}  每个场景请求数: {args.requests}  '
+          f'模拟 DeepSeek 延迟: {args.fake_latency}s')
+    print(f'{"场景":<24}{"失败":>6}{"吞吐量(次/秒)":>16}{"p50(ms)":>10}{"p95(ms)":>10}{"p99(ms)":>10}  与基线比较')
+
+    try:
+        with tempfile.NamedTemporaryFile('w', prefix='bench-api-', suffix='.log', delete=False) as log:
+            process, base = start_server(args.mode, args, deepseek_url, log, extra_env, args.threads)
+            ctx = Context(base, args.users, args.concepts, args.records)
+            try:
+                for name in names:
+                    if args.warmup:
+                        run_scenario(ctx, name, args.concurrency, args.warmup)
+                    rounds = []
+                    for _ in range(args.repeat):
+                        elapsed, latencies, failed = run_scenario(ctx, name, args.concurrency, args.requests)
+                        rounds.append({
+                            'throughput': len(latencies) / elapsed,
+                            'p50': percentile(latencies, 50),
+                            'p95': percentile(latencies, 95),
+                            'p99': percentile(latencies, 99),
+                            'failed': failed
+                        })
+                    result = results[name] = {
+                        key: statistics.median(item[key] for item in rounds)
+                        for key in ('throughput', 'p50', 'p95', 'p99')
+                    }
+                    failed = result['failed'] = sum(item['failed'] for item in rounds)
+                    note = ''
+                    if baseline is not None and name in baseline['results']:
+                        problems = compare(result, baseline['results'][name], speed, args.tolerance)
+                        if failed:
+                            problems.append(f'{failed} 个请求失败')
+                        if problems:
+                            regressions[name] = problems
+                        note = '退化: ' + '；'.join(problems) if problems else '正常'
+                    print(f'{name:<26}{failed:>6}{result["throughput"]:>18.1f}{result["p50"] * 1000:>10.1f}'
+                          f'{result["p95"] * 1000:>10.1f}{result["p99"] * 1000:>10.1f}  {note}')
+            finally:
+                stop_server(process)
+    finally:
+        deepseek.stop()
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({
+                'calibration': round(calibration, 4),
+                'config': {key: getattr(args, key) for key in (
+                    'mode', 'concurrency', 'requests', 'repeat', 'workers', 'threads', 'fake_latency',
+                    'users', 'concepts', 'records')},
+                'results': {name: {key: round(value, 4) for key, value in result.items()}
+                            for name, result in results.items()}
+            }, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        print(f'已更新基线: {args.baseline}')
+    elif regressions:
+        print(f'{len(regressions)} 个场景性能退化: {", ".join(regressions)}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
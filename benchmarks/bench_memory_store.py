@@ -0,0 +1,271 @@
+"""记忆数据存储一致性检查与基准测试
+
+用法:
+    python benchmarks/bench_memory_store.py --users 200 --concepts 50
+    python benchmarks/bench_memory_store.py --backends memory,sqlite --skip-bench
+
+对每个存储后端先运行同一组一致性检查（行为必须与 Redis 存储一致），
+再测试写入吞吐量和常用查询的延迟。内存和 SQLite 后端无需任何外部服务；
+Redis 后端仅在 --redis-url（默认取 REDIS_URL）可连接时运行，
+测试会清空该库（请使用专用的测试库）。
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app', 'services'))
+
+import redis  # noqa: E402
+from memory_store import (STATS_FIELDS, InMemoryMemoryStore, RedisMemoryStore,  # noqa: E402
+                          SQLiteMemoryStore, empty_stats, make_event, review_score)
+
+
+def make_record(concept, days, strength=0.5, review_count=0):
+    """构造一条学习记录，days 为距下次复习的天数，None 表示无需复习"""
+    now = datetime.now()
+    return {
+        'concept': concept,
+        'first_learned': now.isoformat(),
+        'memory_strength': strength,
+        'review_count': review_count,
+        'next_review': (now + timedelta(days=days)).isoformat() if days is not None else None
+    }
+
+
+def record_stats(record):
+    if record is None:
+        return empty_stats()
+    return {
+        'total_concepts': 1,
+        'mastered_concepts': int(record['memory_strength'] >= 0.8),
+        'review_count': record['review_count'],
+        'strength_sum': float(record['memory_strength'])
+    }
+
+
+def upsert(store, user_id, new_records, event_type='learn'):
+    """以 MemoryService 相同的方式写入记录：计算计数器增量并追加事件"""
+    concepts = [record['concept'] for record in new_records]
+
+    def mutate(old_records):
+        delta = empty_stats()
+        for record in new_records:
+            old, new = record_stats(old_records.get(record['concept'])), record_stats(record)
+            for field in STATS_FIELDS:
+                delta[field] += new[field] - old[field]
+        events = [make_event(event_type, record, None) for record in new_records]
+        return {record['concept']: record for record in new_records}, delta, events
+
+    return store.update_records(user_id, concepts, mutate)
+
+
+def check(condition, message):
+    if not condition:
+        raise AssertionError(message)
+
+
+def run_conformance(store):
+    """一致性检查"""
+    upsert(store, 'u1', [make_record('A', 3), make_record('B', 1), make_record('C', None, 0.9)])
+    upsert(store, 'u2', [make_record('X', 2)])
+
+    records = store.get_records('u1', ['A', 'C', 'missing'])
+    check(set(records) == {'A', 'C'}, 'get_records 应只返回存在的记录')
+    check(store.get_records('nobody', ['A']) == {}, '不存在的用户应返回空结果')
+    check(len(store.get_all_records('u1')) == 3, 'get_all_records 应返回全部记录')
+
+    due = [record['concept'] for record in store.due_records('u1', None, 0, 10)]
+    check(due == ['B', 'A'], f'due_records 应按下次复习时间升序且排除已掌握概念: {due}')
+    limit = review_score(make_record('-', 2))
+    check([r['concept'] for r in store.due_records('u1', limit, 0, 10)] == ['B'], 'max_score 过滤错误')
+    check([r['concept'] for r in store.due_records('u1', None, 1, 1)] == ['A'], '分页错误')
+
+    stats = store.get_stats('u1')
+    check(stats['total_concepts'] == 3 and stats['mastered_concepts'] == 1, f'计数器错误: {stats}')
+    check(abs(stats['strength_sum'] - 1.9) < 1e-9, f'强度和错误: {stats}')
+    check(store.get_stats('nobody') == empty_stats(), '不存在的用户计数器应为零')
+
+    # 更新已有记录：计数器按差值增量更新，索引随之移动
+    upsert(store, 'u1', [make_record('B', 10, 0.85, 1)], 'review')
+    stats = store.get_stats('u1')
+    check(stats['mastered_concepts'] == 2 and stats['review_count'] == 1, f'增量更新错误: {stats}')
+    check([r['concept'] for r in store.due_records('u1', None, 0, 10)] == ['A', 'B'], '索引未随记录更新')
+
+    dashboard = store.get_dashboard('u1', ('schedule', 'stats'), 10)
+    check(set(dashboard) == {'schedule', 'stats'}, 'get_dashboard 应只返回请求的字段')
+    check([r['concept'] for r in dashboard['schedule']] == ['A', 'B'], 'dashboard 复习计划错误')
+    dashboard = store.get_dashboard('u1', ('schedule', 'strength', 'stats'), 1)
+    check(len(dashboard['schedule']) == 1 and len(dashboard['strength']) == 3, 'dashboard 数据错误')
+
+    check([len(r) for r in store.get_records_for_users(['u2', 'nobody', 'u1'])] == [1, 0, 3],
+          'get_records_for_users 应按输入顺序返回')
+
+    store.save_records({'u2': [make_record('X', None, 0.9)]})
+    check(store.due_records('u2', None, 0, 10) == [], 'save_records 应同步索引')
+    store.replace_records('u2', [make_record('Y', 1)])
+    check([r['concept'] for r in store.get_all_records('u2')] == ['Y'], 'replace_records 应删除旧记录')
+    check([r['concept'] for r in store.due_records('u2', None, 0, 10)] == ['Y'], 'replace_records 应重建索引')
+    rebuilt = store.rebuild_stats('u2', lambda records: {
+        field: sum(record_stats(record)[field] for record in records) for field in STATS_FIELDS})
+    check(rebuilt['total_concepts'] == 1 and store.get_stats('u2')['total_concepts'] == 1, 'rebuild_stats 错误')
+
+    users = sorted(user_id for batch in store.iter_user_ids(1) for user_id in batch)
+    check(users == ['u1', 'u2'], f'iter_user_ids 错误: {users}')
+
+    events = store.read_events('u1')
+    check([event['type'] for _, event in events] == ['learn'] * 3 + ['review'], '事件流内容错误')
+    check(len(store.read_events('u1', events[1][0])) == 2, 'read_events 应只返回 after_id 之后的事件')
+    check(store.load_snapshot('u1') is None, '初始快照应为空')
+    snapshot = {'last_id': events[2][0], 'records': {}, 'history': {}}
+    check(store.save_snapshot('u1', snapshot, None), 'save_snapshot 应成功')
+    check(not store.save_snapshot('u1', dict(snapshot, last_id=events[3][0]), None), '并发压缩应被拒绝')
+    check(store.load_snapshot('u1')['last_id'] == events[2][0], '快照内容错误')
+    remaining = store.read_events('u1')
+    check([event_id for event_id, _ in remaining] == [events[3][0]], '压缩后应删除已合并的事件')
+
+    store.set_cohort_members('class-1', ['u2', 'u1', 'u3'])
+    check(store.get_cohort_members('class-1') == ['u1', 'u2', 'u3'], '班级成员应排序返回')
+    store.set_cohort_members('class-1', ['u1'])
+    check(store.get_cohort_members('class-1') == ['u1'], 'set_cohort_members 应替换原有成员')
+    store.set_cohort_members('class-1', [])
+    check(store.get_cohort_members('class-1') == [], '空成员列表应删除班级')
+    check(sorted(u for batch in store.iter_user_ids(10) for u in batch) == ['u1', 'u2'],
+          '班级数据不应出现在 iter_user_ids 中')
+
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def timed(samples, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    samples.append(time.perf_counter() - start)
+    return result
+
+
+def run_benchmark(store, users, concepts, queries):
+    """基准测试：写入吞吐量及查询延迟"""
+    rng = random.Random(0)
+    user_ids = [f'bench-{i}' for i in range(users)]
+    results = []
+
+    start = time.perf_counter()
+    for user_id in user_ids:
+        upsert(store, user_id, [make_record(f'c{j}', rng.uniform(-5, 30), rng.uniform(0.2, 0.95))
+                                for j in range(concepts)])
+    elapsed = time.perf_counter() - start
+    results.append(('批量写入（每用户一个事务）', users * concepts / elapsed, '条/秒'))
+
+    samples = []
+    for _ in range(queries):
+        user_id = rng.choice(user_ids)
+        timed(samples, upsert, store, user_id,
+              [make_record(f'c{rng.randrange(concepts)}', rng.uniform(1, 30), rng.uniform(0.2, 0.95))],
+              'review')
+    results.append(('单条复习写入', len(samples) / sum(samples), '次/秒'))
+    latency = {'单条复习写入': samples}
+
+    for label, func in (
+        ('复习计划查询', lambda user_id: store.due_records(user_id, None, 0, 50)),
+        ('统计查询', store.get_stats),
+        ('复习页面聚合查询', lambda user_id: store.get_dashboard(
+            user_id, ('schedule', 'strength', 'stats'), 50)),
+    ):
+        samples = []
+        for _ in range(queries):
+            timed(samples, func, rng.choice(user_ids))
+        latency[label] = samples
+
+    start = time.perf_counter()
+    loaded = sum(len(records) for batch in store.iter_user_ids(500)
+                 for records in store.get_records_for_users(batch))
+    elapsed = time.perf_counter() - start
+    results.append(('全量批量读取', loaded / elapsed, '条/秒'))
+    return results, latency
+
+
+def create_stores(backends, redis_url, workdir):
+    for backend in backends:
+        if backend == 'memory':
+            yield backend, lambda: InMemoryMemoryStore(max_users=1000000)
+        elif backend == 'sqlite':
+            counter = iter(range(1000))
+            yield backend, lambda: SQLiteMemoryStore(os.path.join(workdir, f'memory-{next(counter)}.db'))
+        elif backend == 'redis':
+            client = redis.from_url(redis_url)
+            try:
+                client.ping()
+            except redis.ConnectionError:
+                print(f'[redis] 无法连接 {redis_url}，跳过')
+                continue
+
+            def factory(client=client):
+                client.flushdb()
+                return RedisMemoryStore(client)
+            yield backend, factory
+        else:
+            raise SystemExit(f'未知的存储后端: {backend}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backends', default='memory,sqlite,redis', help='逗号分隔的存储后端')
+    parser.add_argument('--redis-url', default=os.environ.get('REDIS_URL', 'redis://localhost:6379/15'))
+    parser.add_argument('--users', type=int, default=200, help='基准测试用户数')
+    parser.add_argument('--concepts', type=int, default=50, help='每个用户的概念数')
+    parser.add_argument('--queries', type=int, default=1000, help='每种查询的次数')
+    parser.add_argument('--skip-bench', action='store_true', help='只运行一致性检查')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='memory-store-')
+    failed = False
+    try:
+        for backend, factory in create_stores(args.backends.split(','), args.redis_url, workdir):
+            store = factory()
+            try:
+                run_conformance(store)
+                print(f'[{backend}] 一致性检查通过')
+            except AssertionError as e:
+                failed = True
+                print(f'[{backend}] 一致性检查失败: {e}')
+                continue
+            finally:
+                store.close()
+
+            # LRU 淘汰只适用于内存存储
+            if backend == 'memory':
+                lru = InMemoryMemoryStore(max_users=2)
+                for user_id in ('a', 'b', 'a', 'c'):
+                    upsert(lru, user_id, [make_record('A', 1)])
+                evicted = sorted(u for batch in lru.iter_user_ids(10) for u in batch) == ['a', 'c']
+                print(f'[{backend}] LRU 淘汰检查{"通过" if evicted else "失败"}')
+                failed = failed or not evicted
+
+            if args.skip_bench:
+                continue
+            store = factory()
+            try:
+                throughput, latency = run_benchmark(store, args.users, args.concepts, args.queries)
+            finally:
+                store.close()
+            for label, value, unit in throughput:
+                print(f'[{backend}] {label:<16}{value:>14,.0f} {unit}')
+            for label, samples in latency.items():
+                print(f'[{backend}] {label:<16} p50 {percentile(samples, 0.5) * 1e3:7.3f}ms  '
+                      f'p95 {percentile(samples, 0.95) * 1e3:7.3f}ms  '
+                      f'mean {statistics.mean(samples) * 1e3:7.3f}ms')
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
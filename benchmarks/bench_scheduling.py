@@ -0,0 +1,75 @@
+"""间隔复习调度引擎基准测试
+
+用法:
+    python benchmarks/bench_scheduling.py --records 1000000
+
+分别测试各记忆模型批量复习（review）、每晚重算（rescore）和复习量预测（forecast）
+的吞吐量（条/秒）。
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app', 'services'))
+
+from scheduling_engine import MODELS, SchedulingEngine, get_model  # noqa: E402
+
+INTERVALS = [1, 3, 7, 14, 30]
+THRESHOLD = 0.8
+
+
+def make_records(count, seed=0):
+    """生成模拟学习记录"""
+    rng = random.Random(seed)
+    now = datetime.now()
+    records = []
+    for i in range(count):
+        first_learned = now - timedelta(days=rng.uniform(1, 120))
+        records.append({
+            'concept': f'concept-{i}',
+            'first_learned': first_learned.isoformat(),
+            'last_reviewed': (first_learned + timedelta(days=rng.uniform(0, 1))).isoformat(),
+            'memory_strength': rng.uniform(0.2, 0.95),
+            'review_count': rng.randint(0, 10)
+        })
+    return records
+
+
+def bench(label, func, count, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    print(f'{label:<24}{count:>10}{best:>10.3f}s{count / best:>16,.0f} 条/秒')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=200000, help='记录数')
+    parser.add_argument('--users', type=int, default=20000, help='复习量预测的用户数')
+    parser.add_argument('--days', type=int, default=30, help='复习量预测天数')
+    parser.add_argument('--repeat', type=int, default=3, help='重复次数（取最优）')
+    args = parser.parse_args()
+
+    template = make_records(args.records)
+    scores = [random.random() for _ in range(args.records)]
+    print(f'{"测试项":<22}{"记录数":>8}{"耗时":>10}{"吞吐量":>14}')
+
+    for name in MODELS:
+        engine = SchedulingEngine(get_model(name, INTERVALS, THRESHOLD))
+        bench(f'{name}.review', lambda: engine.review([dict(r) for r in template], scores),
+              args.records, args.repeat)
+        records = engine.review([dict(r) for r in template], scores)
+        bench(f'{name}.rescore', lambda: engine.rescore(records), args.records, args.repeat)
+        groups = [i % args.users for i in range(args.records)]
+        bench(f'{name}.forecast({args.days}d)',
+              lambda: engine.forecast(records, groups, args.users, args.days, 0.85),
+              args.records, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
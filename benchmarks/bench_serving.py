@@ -0,0 +1,174 @@
+"""同步/异步服务模式对比基准测试
+
+用法:
+    python benchmarks/bench_serving.py --concurrency 10,100,300 --latency 1.0
+
+分别以同步模式（gunicorn 同步 worker）和异步模式（uvicorn --factory app.asgi:create_asgi_app，
+单进程）启动应用，DeepSeek API 由本地模拟服务器代替（每个请求耗时 --latency 秒），
+在不同并发数下请求需要调用 DeepSeek API 的接口，输出吞吐量和延迟分位数。
+每个请求使用不同的概念名称，保证不会命中已保存的内容。
+
+应用使用内存记忆存储；--redis-url 指向的 Redis 不可用时，生成内容不会保存，但每个请求都会
+产生连接失败的日志，结果偏低。没有 Redis 时可以使用 --fake-redis 启动 fakeredis 的 TCP 服务器。
+"""
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_deepseek import FakeDeepSeekServer  # noqa: E402
+
+ENDPOINTS = {
+    'explanation': lambda base, concept: requests.get(f'{base}/api/concept/{concept}/explanation', timeout=600),
+    'exercises': lambda base, concept: requests.get(f'{base}/api/concept/{concept}/exercises', timeout=600),
+    'learning-path': lambda base, concept: requests.post(
+        f'{base}/api/learning/path', json={'concept': concept}, timeout=600),
+    'learning-path-stream': lambda base, concept: requests.post(
+        f'{base}/api/learning/path/stream', json={'concept': concept}, timeout=600),
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def server_command(mode, port, workers, threads=1):
+    if mode == 'sync':
+        return ['gunicorn', '--workers', str(workers), '--threads', str(threads), '--bind', f'127.0.0.1:{port}',
+                '--backlog', '2048', '--timeout', '600', 'app:create_app()']
+    return ['uvicorn', '--factory', 'app.asgi:create_asgi_app', '--host', '127.0.0.1',
+            '--port', str(port), '--backlog', '2048', '--log-level', 'warning']
+
+
+def start_server(mode, args, deepseek_url, log, extra_env=None, threads=1):
+    """启动应用并等待就绪，返回 (进程, 地址)
+
+    Args:
+        extra_env: 额外的环境变量，覆盖默认值（默认使用内存记忆存储）
+        threads: 同步模式每个 worker 的线程数
+    """
+    port = free_port()
+    env = dict(os.environ, DEEPSEEK_API_BASE=deepseek_url, DEEPSEEK_API_KEY='bench',
+               FLASK_CONFIG='production', FLASK_DEBUG='False', MEMORY_STORE='memory',
+               REDIS_URL=args.redis_url)
+    env.update(extra_env or {})
+    process = subprocess.Popen(server_command(mode, port, args.workers, threads), cwd=ROOT, env=env,
+                               stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+    base = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'{mode} 模式启动失败，日志: {log.name}')
+        try:
+            if requests.get(f'{base}/api/concept/search?q=Py', timeout=1).ok:
+                return process, base
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    stop_server(process)
+    raise RuntimeError(f'{mode} 模式启动超时，日志: {log.name}')
+
+
+def stop_server(process):
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=10)
+    except (ProcessLookupError, subprocess.TimeoutExpired):
+        os.killpg(process.pid, signal.SIGKILL)
+
+
+def percentile(values, q):
+    if not values:
+        return float('nan')
+    index = min(len(values) - 1, max(0, round(q / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def run_load(base, endpoint, concurrency, total):
+    """以固定并发数发送 total 个请求
+
+    Returns:
+        tuple: (耗时, 成功请求的延迟列表, 失败数)
+    """
+    send = ENDPOINTS[endpoint]
+    prefix = uuid.uuid4().hex[:8]
+
+    def one(i):
+        start = time.perf_counter()
+        try:
+            response = send(base, f'bench-{prefix}-{i}')
+            response.content
+            ok = response.ok
+        except requests.RequestException:
+            ok = False
+        return ok, time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(one, range(total)))
+    elapsed = time.perf_counter() - start
+    latencies = sorted(latency for ok, latency in results if ok)
+    return elapsed, latencies, sum(1 for ok, _ in results if not ok)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', default='sync,async', help='服务模式，逗号分隔: sync, async')
+    parser.add_argument('--concurrency', default='10,100', help='并发数，逗号分隔')
+    parser.add_argument('--requests', type=int, default=0, help='每个并发级别的请求数，默认为并发数的2倍')
+    parser.add_argument('--latency', type=float, default=1.0, help='模拟 DeepSeek API 的耗时（秒）')
+    parser.add_argument('--endpoint', choices=sorted(ENDPOINTS), default='explanation', help='测试的接口')
+    parser.add_argument('--workers', type=int, default=4, help='同步模式的 gunicorn worker 数')
+    parser.add_argument('--redis-url', default=os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/0'),
+                        help='应用使用的 Redis')
+    parser.add_argument('--fake-redis', action='store_true', help='使用 fakeredis 的 TCP 服务器代替 Redis')
+    args = parser.parse_args()
+
+    if args.fake_redis:
+        from fakeredis import TcpFakeServer
+        redis_server = TcpFakeServer(('127.0.0.1', free_port()))
+        threading.Thread(target=redis_server.serve_forever, daemon=True).start()
+        args.redis_url = 'redis://{}:{}/0'.format(*redis_server.server_address)
+
+    levels = [int(level) for level in args.concurrency.split(',')]
+    deepseek = FakeDeepSeekServer(latency=args.latency)
+    deepseek_url = deepseek.start()
+    print(f'接口: {args.endpoint}  模拟 DeepSeek 延迟: {args.latency}s  同步 worker 数: {args.workers}')
+    print(f'{"模式":<8}{"并发":>6}{"请求数":>8}{"失败":>6}{"吞吐量(次/秒)":>16}'
+          f'{"p50":>9}{"p95":>9}{"p99":>9}')
+
+    try:
+        for mode in args.modes.split(','):
+            with tempfile.NamedTemporaryFile('w', prefix=f'bench-serving-{mode}-', suffix='.log',
+                                             delete=False) as log:
+                process, base = start_server(mode, args, deepseek_url, log)
+                try:
+                    for concurrency in levels:
+                        total = args.requests or concurrency * 2
+                        elapsed, latencies, failed = run_load(base, args.endpoint, concurrency, total)
+                        print(f'{mode:<10}{concurrency:>6}{total:>10}{failed:>8}'
+                              f'{len(latencies) / elapsed:>18.1f}'
+                              f'{percentile(latencies, 50):>9.2f}{percentile(latencies, 95):>9.2f}'
+                              f'{percentile(latencies, 99):>9.2f}')
+                finally:
+                    stop_server(process)
+    finally:
+        deepseek.stop()
+
+
+if __name__ == '__main__':
+    main()
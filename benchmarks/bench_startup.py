@@ -0,0 +1,194 @@
+"""应用启动时间基准测试和导入耗时报告（不需要外部服务）
+
+用法:
+    python benchmarks/bench_startup.py                     # 单进程启动时间、导入耗时报告和 gunicorn 启动时间
+    python benchmarks/bench_startup.py --repeat 10 --imports 30
+    python benchmarks/bench_startup.py --workers 8 --skip-gunicorn
+
+单进程：在新的解释器中导入应用、调用 create_app 并处理首个请求（/api/concept/search，不访问
+外部服务），分别记录三个阶段的耗时，重复 --repeat 次取中位数，并列出启动后已加载的较重的第三方库。
+
+导入耗时报告：以 -X importtime 运行一次，按顶层包汇总各模块自身的导入耗时，列出耗时最高的
+--imports 个包（app 为本项目的模块，不含其导入的第三方库）。
+
+gunicorn：分别在 master 预先导入常用模块（gunicorn.conf.py 的默认行为）和不预先导入
+（GUNICORN_PRELOAD_MODULES 为空）时，以 --workers 个 worker 启动应用，记录从启动到首个请求成功、
+到所有 worker 都能响应的时间，以及强制结束一个 worker 后新 worker 能够响应的时间。
+worker 通过 /metrics 中的 worker 标签区分，需要启用监控指标（默认启用）。
+"""
+import argparse
+import json
+import os
+import re
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+
+from bench_serving import ROOT, free_port, server_command, stop_server  # noqa: E402
+
+# 启动后检查是否已加载的第三方库
+HEAVY_MODULES = ('numpy', 'pandas', 'sklearn', 'plotly', 'dash', 'networkx', 'neo4j', 'openai', 'quart')
+
+# 在新的解释器中执行：导入应用、创建应用、处理首个请求，以 JSON 输出各阶段耗时
+STARTUP_SCRIPT = '''
+import json, sys, time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app(sys.argv[1])
+created = time.perf_counter()
+status = app.test_client().get('/api/concept/search?q=Py').status_code
+finished = time.perf_counter()
+print(json.dumps({
+    'import': imported - started,
+    'create_app': created - imported,
+    'first_request': finished - created,
+    'status': status,
+    'loaded': [name for name in sys.argv[2].split(',') if name in sys.modules]
+}))
+'''
+
+IMPORT_TIME_PATTERN = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+WORKER_LABEL_PATTERN = re.compile(r'worker="(\d+)"')
+
+
+def app_env(extra_env=None):
+    env = dict(os.environ, DEEPSEEK_API_KEY='bench', MEMORY_STORE='memory', FLASK_DEBUG='False')
+    env.update(extra_env or {})
+    return env
+
+
+def run_startup(config_name, importtime=False):
+    """在新的解释器中启动应用一次
+
+    Returns:
+        tuple: (各阶段耗时dict, -X importtime 的输出)
+    """
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + [
+        '-c', STARTUP_SCRIPT, config_name, ','.join(HEAVY_MODULES)]
+    result = subprocess.run(command, cwd=ROOT, env=app_env(), capture_output=True, text=True, timeout=300)
+    if result.returncode != 0:
+        raise RuntimeError(f'启动应用失败:\n{result.stderr[-2000:]}')
+    return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def import_report(stderr, top):
+    """按顶层包汇总 -X importtime 输出中各模块自身的导入耗时
+
+    Returns:
+        list: [(包名, 耗时秒数, 模块数)]，按耗时从高到低
+    """
+    totals = {}
+    for line in stderr.splitlines():
+        match = IMPORT_TIME_PATTERN.match(line)
+        if match is None:
+            continue
+        package = match.group(4).split('.')[0]
+        seconds, count = totals.get(package, (0.0, 0))
+        totals[package] = (seconds + int(match.group(1)) / 1e6, count + 1)
+    ranked = sorted(totals.items(), key=lambda item: item[1][0], reverse=True)
+    return [(package, seconds, count) for package, (seconds, count) in ranked[:top]]
+
+
+def live_workers(base, probes):
+    """并发请求 /metrics，返回响应的 worker 进程ID集合"""
+    def probe(_):
+        try:
+            response = requests.get(f'{base}/metrics', timeout=2)
+        except requests.RequestException:
+            return set()
+        return set(WORKER_LABEL_PATTERN.findall(response.text)) if response.ok else set()
+
+    with ThreadPoolExecutor(probes) as pool:
+        return set().union(*pool.map(probe, range(probes)))
+
+
+def wait_for(condition, deadline, process, log):
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'gunicorn 已退出，日志: {log.name}')
+        result = condition()
+        if result:
+            return result
+        time.sleep(0.05)
+    raise RuntimeError(f'等待 gunicorn 超时，日志: {log.name}')
+
+
+def gunicorn_boot(workers, preload, timeout=120):
+    """启动 gunicorn 并记录启动时间
+
+    Returns:
+        dict: first_response（首个请求成功）、all_workers（所有 worker 都能响应）、
+            respawn（强制结束一个 worker 后新 worker 能够响应）的耗时（秒）
+    """
+    port = free_port()
+    base = f'http://127.0.0.1:{port}'
+    extra_env = None if preload else {'GUNICORN_PRELOAD_MODULES': ''}
+    with tempfile.NamedTemporaryFile('w', prefix='bench-startup-', suffix='.log', delete=False) as log:
+        started = time.perf_counter()
+        process = subprocess.Popen(server_command('sync', port, workers), cwd=ROOT, env=app_env(extra_env),
+                                   stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+        try:
+            deadline = started + timeout
+            seen = set()
+            wait_for(lambda: seen.update(live_workers(base, 1)) or seen, deadline, process, log)
+            first_response = time.perf_counter() - started
+            wait_for(lambda: seen.update(live_workers(base, workers * 2)) or len(seen) >= workers,
+                     deadline, process, log)
+            all_workers = time.perf_counter() - started
+
+            victim = sorted(seen)[0]
+            killed = time.perf_counter()
+            os.kill(int(victim), signal.SIGKILL)
+            wait_for(lambda: live_workers(base, workers * 2) - seen, killed + timeout, process, log)
+            respawn = time.perf_counter() - killed
+        finally:
+            stop_server(process)
+    return {'first_response': first_response, 'all_workers': all_workers, 'respawn': respawn}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--config', default='production', help='create_app 使用的配置名')
+    parser.add_argument('--repeat', type=int, default=5, help='每项测量的重复次数（取中位数）')
+    parser.add_argument('--imports', type=int, default=15, help='导入耗时报告列出的包数，0 表示不输出')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn worker 数')
+    parser.add_argument('--skip-gunicorn', action='store_true', help='不测量 gunicorn 的启动时间')
+    args = parser.parse_args()
+
+    runs = [run_startup(args.config)[0] for _ in range(args.repeat)]
+    print(f'单进程启动（{args.repeat} 次的中位数，单位 ms）')
+    for phase, label in (('import', '导入应用'), ('create_app', '创建应用'), ('first_request', '首个请求')):
+        print(f'  {label:<10}{statistics.median(run[phase] for run in runs) * 1000:>10.1f}')
+    total = statistics.median(run['import'] + run['create_app'] + run['first_request'] for run in runs)
+    print(f'  {"合计":<10}{total * 1000:>10.1f}')
+    print(f'  已加载的第三方库: {", ".join(runs[-1]["loaded"]) or "无"}')
+
+    if args.imports:
+        _, stderr = run_startup(args.config, importtime=True)
+        print(f'\n导入耗时最高的包（-X importtime，模块自身耗时之和）')
+        print(f'  {"包":<24}{"耗时(ms)":>10}{"模块数":>8}')
+        for package, seconds, count in import_report(stderr, args.imports):
+            print(f'  {package:<24}{seconds * 1000:>10.1f}{count:>8}')
+
+    if not args.skip_gunicorn:
+        print(f'\ngunicorn 启动（{args.workers} 个 worker，{args.repeat} 次的中位数，单位 ms）')
+        print(f'  {"master 预先导入":<16}{"首个请求":>10}{"全部 worker":>12}{"worker 重启":>12}')
+        for preload in (True, False):
+            boots = [gunicorn_boot(args.workers, preload) for _ in range(args.repeat)]
+            print(f'  {"是" if preload else "否":<16}'
+                  + ''.join(f'{statistics.median(boot[key] for boot in boots) * 1000:>12.1f}'
+                            for key in ('first_response', 'all_workers', 'respawn')))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""模拟 DeepSeek API（OpenAI 兼容）的本地服务器，用于基准测试
+
+用法:
+    python benchmarks/fake_deepseek.py --port 8900 --latency 1.0
+
+启动应用时设置 DEEPSEEK_API_BASE=http://127.0.0.1:8900 即可。服务器支持
+POST /chat/completions（含 stream=true 的 SSE 流式输出），按提示词返回可被应用解析的
+概念解释、练习题或学习路径；每个请求等待 --latency 秒，流式输出时平均分摊到各片段。
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+EXPLANATION = (
+    '1. 核心定义\n{concept}是一种用于解决特定问题的方法。\n\n'
+    '2. 用费曼技巧解释\n可以把{concept}想象成日常生活中的一个工具。\n\n'
+    '3. 列出3个常见的误解\n误解一：{concept}很难\n误解二：{concept}没有用\n误解三：{concept}已过时'
+)
+EXERCISES = (
+    '1. 判断题\n{concept}可以用于数据分析。（正确）\n{concept}只能用于游戏开发。（错误）\n\n'
+    '2. 案例分析\n某团队使用{concept}优化系统。\n问题：这样做是否合理？\n还有哪些改进空间？\n\n'
+    '3. 编程题\n实现一个使用{concept}的函数。\n提示：先考虑边界条件'
+)
+LEARNING_PATH_DAY = '第{day}天\n目标：学习{concept}的第{day}部分\n- 阅读相关资料\n- 完成练习\n- https://example.com/{day}\n\n'
+
+
+def make_reply(messages, days=5):
+    """根据请求消息生成与应用解析逻辑相符的回复"""
+    prompt = messages[-1]['content'] if messages else ''
+    concept = prompt.split('"')[1] if prompt.count('"') >= 2 else '概念'
+    if '学习路径' in prompt:
+        return ''.join(LEARNING_PATH_DAY.format(day=day, concept=concept) for day in range(1, days + 1))
+    if '练习题' in prompt:
+        return EXERCISES.format(concept=concept)
+    return EXPLANATION.format(concept=concept)
+
+
+class FakeDeepSeekHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {'error': {'message': 'not found'}})
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        server = self.server
+        with server.lock:
+            server.requests += 1
+        if server.error_rate and server.rng_next() < server.error_rate:
+            time.sleep(server.latency)
+            self._send_json(500, {'error': {'message': 'injected failure'}})
+            return
+
+        reply = make_reply(request.get('messages', []))
+        completion_id = f'chatcmpl-{uuid.uuid4().hex}'
+        created = int(time.time())
+        usage = {'prompt_tokens': 50, 'completion_tokens': len(reply), 'total_tokens': 50 + len(reply)}
+        if not request.get('stream'):
+            time.sleep(server.latency)
+            self._send_json(200, {
+                'id': completion_id, 'object': 'chat.completion', 'created': created,
+                'model': request.get('model', 'deepseek-chat'),
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': reply},
+                             'finish_reason': 'stop'}],
+                'usage': usage
+            })
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        pieces = [reply[i:i + server.chunk_size] for i in range(0, len(reply), server.chunk_size)]
+        delay = server.latency / max(len(pieces), 1)
+        for piece in pieces:
+            time.sleep(delay)
+            chunk = {
+                'id': completion_id, 'object': 'chat.completion.chunk', 'created': created,
+                'model': request.get('model', 'deepseek-chat'),
+                'choices': [{'index': 0, 'delta': {'content': piece}, 'finish_reason': None}]
+            }
+            self.wfile.write(f'data: {json.dumps(chunk, ensure_ascii=False)}\n\n'.encode('utf-8'))
+            self.wfile.flush()
+        if (request.get('stream_options') or {}).get('include_usage'):
+            chunk = {
+                'id': completion_id, 'object': 'chat.completion.chunk', 'created': created,
+                'model': request.get('model', 'deepseek-chat'), 'choices': [], 'usage': usage
+            }
+            self.wfile.write(f'data: {json.dumps(chunk)}\n\n'.encode('utf-8'))
+        self.wfile.write(b'data: [DONE]\n\n')
+        self.wfile.flush()
+        self.close_connection = True
+
+
+class FakeDeepSeekServer(ThreadingHTTPServer):
+    """模拟 DeepSeek API 服务器（每个请求一个线程）"""
+
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, host='127.0.0.1', port=0, latency=1.0, chunk_size=16, error_rate=0.0, seed=0):
+        """初始化服务器
+
+        Args:
+            host: 监听地址
+            port: 监听端口，0 表示随机端口
+            latency: 每个请求的模拟耗时（秒）
+            chunk_size: 流式输出时每个片段的字符数
+            error_rate: 返回 500 错误的请求比例
+            seed: 错误注入的随机种子
+        """
+        super().__init__((host, port), FakeDeepSeekHandler)
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.error_rate = error_rate
+        self.requests = 0
+        self.lock = threading.Lock()
+        self._seed = seed
+        self._thread = None
+
+    def rng_next(self):
+        # 线性同余随机数，保证相同种子下错误注入可复现
+        with self.lock:
+            self._seed = (self._seed * 1103515245 + 12345) % 2 ** 31
+            return self._seed / 2 ** 31
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        """在后台线程中运行，返回服务器地址"""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址')
+    parser.add_argument('--port', type=int, default=8900, help='监听端口')
+    parser.add_argument('--latency', type=float, default=1.0, help='每个请求的模拟耗时（秒）')
+    parser.add_argument('--chunk-size', type=int, default=16, help='流式输出时每个片段的字符数')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='返回 500 错误的请求比例')
+    args = parser.parse_args()
+
+    server = FakeDeepSeekServer(args.host, args.port, args.latency, args.chunk_size, args.error_rate)
+    print(f'模拟 DeepSeek API: {server.url}（延迟 {args.latency}s）')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
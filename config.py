@@ -28,6 +28,12 @@ class Config:
     # Redis配置
     REDIS_URL = os.environ.get('REDIS_URL') or 'redis://localhost:6379/0'
 
+    # 记忆数据存储配置
+    MEMORY_STORE = os.getenv('MEMORY_STORE', 'redis')  # 存储后端: redis, sqlite, memory
+    MEMORY_SQLITE_PATH = os.getenv('MEMORY_SQLITE_PATH', os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'memory.db'))
+    MEMORY_STORE_MAX_USERS = 10000  # 内存存储最多保留的用户数（LRU淘汰）
+
     # 应用配置
     CONCEPT_EXPLANATION_TEMPLATE = """
     请从以下三个角度解释{concept}：
@@ -39,6 +45,81 @@ class Config:
     # 记忆系统配置
     MEMORY_INTERVALS = [1, 3, 7, 14, 30]  # 复习间隔（天）
     MEMORY_STRENGTH_THRESHOLD = 0.8  # 记忆强度阈值
+    REVIEW_SCHEDULE_PAGE_SIZE = 50  # 复习计划每页默认条数
+    REVIEW_BATCH_MAX_SIZE = 500  # 批量提交复习结果的最大条数
+    MEMORY_MODEL = os.getenv('MEMORY_MODEL', 'linear')  # 记忆模型: linear, sm2, fsrs
+    # 写后模式：高频复习结果在进程内合并后批量写入
+    MEMORY_WRITE_BEHIND = os.getenv('MEMORY_WRITE_BEHIND', 'False').lower() == 'true'
+    MEMORY_WRITE_BEHIND_MAX_BATCH = 1000  # 缓冲条数上限，达到后立即写入
+    MEMORY_WRITE_BEHIND_MAX_AGE = 1.0  # 最长滞留时间（秒）
+    MEMORY_WRITE_BEHIND_MAX_PENDING = 10000  # 缓冲条数硬上限，存储持续写入失败时超出后拒绝新的复习结果
+    REVIEW_EVENT_SHARDS = 16  # 全局复习事件流分片数
+    REVIEW_EVENT_SHARD_MAXLEN = 1000000  # 每个分片保留的近似最大事件数
+    MEMORY_FORECAST_SCORE = 0.85  # 复习量预测时假设的表现分
+    MEMORY_FORECAST_MAX_DAYS = 365  # 复习量预测的最大天数
+    MEMORY_FORECAST_MAX_USERS = 100000  # 单次预测的最大用户数
+    COHORT_BATCH_SIZE = 1000  # 班级批量查询每批读取的用户数
+    COHORT_MAX_USERS = 100000  # 班级批量查询的最大用户数
+
+    # 生成内容存储配置（概念解释、练习题、学习路径，压缩后存入 Redis）
+    CONTENT_COMPRESSION_LEVEL = 6  # zlib 压缩级别
+    CONTENT_TTL = 30 * 24 * 3600  # 生成内容的过期时间（秒），None 表示不过期
+    CONTENT_DICT_SIZE = 32 * 1024  # 压缩字典最大字节数（zlib 窗口上限为32KB）
+    CONTENT_DICT_SAMPLES = 2000  # 训练压缩字典的样本数
+
+    # 热门概念统计（count-min sketch + top-k，各进程定期合并到 Redis）
+    HOT_CONCEPTS_ENABLED = os.getenv('HOT_CONCEPTS_ENABLED', 'True').lower() == 'true'
+    HOT_CONCEPT_SKETCH_WIDTH = 2048  # sketch 每行的单元格数
+    HOT_CONCEPT_SKETCH_DEPTH = 4  # sketch 的行数
+    HOT_CONCEPT_TOP_K = 100  # 排行榜保留的概念数
+    HOT_CONCEPT_WINDOW = 3600  # 统计窗口（秒），排行榜合并当前和上一个窗口
+    HOT_CONCEPT_FLUSH_INTERVAL = 5  # 各进程合并到 Redis 的间隔（秒）
+
+    # 热门概念的内容预热（在过期前重新生成概念解释和练习题）
+    CONTENT_PREWARM_ENABLED = os.getenv('CONTENT_PREWARM_ENABLED', 'True').lower() == 'true'
+    CONTENT_PREWARM_TOP_N = 20  # 预热的热门概念数
+    CONTENT_PREWARM_INTERVAL = 300  # 检查间隔（秒），所有进程合计每个间隔执行一次
+    CONTENT_PREWARM_REFRESH_BEFORE = 24 * 3600  # 剩余有效时间低于该值（秒）的内容重新生成
+    CONTENT_PREWARM_DIFFICULTIES = ['medium']  # 预热的练习题难度
+
+    # 学习路径异步生成配置
+    LEARNING_PATH_ASYNC = os.getenv('LEARNING_PATH_ASYNC', 'False').lower() == 'true'  # 默认以任务方式生成
+    LEARNING_PATH_WORKERS = 4  # 每个进程生成学习路径的线程数
+    LEARNING_PATH_MAX_PENDING = 100  # 每个进程排队和执行中的任务数上限
+    LEARNING_PATH_JOB_TTL = 3600  # 任务状态和结果的保留时间（秒）
+    LEARNING_PATH_EVENTS_TIMEOUT = 120  # SSE 连接的最长等待时间（秒，只在异步服务模式下提供 SSE）
+    LEARNING_PATH_CACHE_SIZE = 1000  # 每个进程缓存的学习路径数（LRU淘汰）
+    LEARNING_PATH_CACHE_TTL = 3600  # 学习路径缓存的有效时间（秒）
+    LEARNING_PATH_CACHE_VERSION_TTL = 5  # 知识图谱版本号的本地缓存时间（秒）
+    LEARNING_PATH_MASTERY_EDGES = [0.4, 0.7]  # 整体记忆强度分档边界（低/中/高）
+
+    # 异步服务模式配置（uvicorn --factory app.asgi:create_asgi_app）
+    ASGI_WSGI_WORKERS = int(os.getenv('ASGI_WSGI_WORKERS', '10'))  # 处理同步接口的线程数
+    ASYNC_REDIS_MAX_CONNECTIONS = 100  # 异步 Redis 客户端的连接数上限，超出时等待空闲连接
+    ASYNC_REDIS_POOL_TIMEOUT = 5  # 等待空闲 Redis 连接的最长时间（秒）
+    LEARNING_PATH_EVENTS_MAX_STREAMS = 1000  # 每个进程同时推送任务状态的 SSE 连接数上限
+
+    # DeepSeek API 调用限流配置（令牌桶，只在生成新内容时检查，超出时返回模拟数据；按客户端IP区分调用方）
+    LLM_RATE_LIMIT_ENABLED = os.getenv('LLM_RATE_LIMIT_ENABLED', 'True').lower() == 'true'
+    LLM_USER_RATE = float(os.getenv('LLM_USER_RATE', '0.2'))  # 每个调用方每秒补充的调用次数（每分钟12次）
+    LLM_USER_BURST = int(os.getenv('LLM_USER_BURST', '5'))  # 每个调用方允许的突发调用次数
+    LLM_GLOBAL_RATE = float(os.getenv('LLM_GLOBAL_RATE', '5'))  # 所有进程合计每秒补充的调用次数
+    LLM_GLOBAL_BURST = int(os.getenv('LLM_GLOBAL_BURST', '50'))  # 所有进程合计允许的突发调用次数
+    LLM_RATE_LIMIT_LOCAL_USERS = 10000  # 每个进程保留本地令牌桶的调用方数（LRU淘汰）
+    PROXY_FIX_X_FOR = int(os.getenv('PROXY_FIX_X_FOR', '0'))  # 信任的反向代理层数，大于0时按 X-Forwarded-For 取客户端IP
+
+    # 监控指标配置（GET /metrics，Prometheus 文本格式）
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'
+
+    # 管理接口配置（请求头 X-Admin-Token 需要与 ADMIN_TOKEN 一致，未设置时管理接口不可用）
+    ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+
+    # 性能分析配置（/api/admin/profiling，未设置 ADMIN_TOKEN 时不安装分析钩子）
+    PROFILING_POLL_INTERVAL = 2.0  # 各进程读取分析会话状态的间隔（秒）
+    PROFILING_MAX_DURATION = 600  # 分析会话的最长时间窗口（秒）
+    PROFILING_MAX_RESULTS = 100  # 每个会话保留的请求分析结果数
+    PROFILING_MAX_FUNCTIONS = 200  # 每个请求保留的函数数
+    PROFILING_RESULT_TTL = 3600  # 分析结果的保留时间（秒）
 
     # 知识图谱配置
     MAX_RELATED_CONCEPTS = 5  # 每个概念最多显示的相关概念数
@@ -0,0 +1,42 @@
+"""gunicorn 配置（gunicorn 启动时自动读取工作目录下的 gunicorn.conf.py）
+
+master 进程启动时预先导入每个 worker 都会用到的模块，fork 出的 worker 直接共享已导入的模块
+（写时复制），worker 启动、重启和扩容时不再重复导入。应用本身仍在每个 worker 中创建
+（不使用 preload_app），Redis 连接、后台线程等不会在 fork 前创建。
+
+pandas（班级查询）、neo4j 和 networkx（知识图谱）只在少数接口中使用，默认在首次使用时才导入；
+需要时可以通过环境变量 GUNICORN_PRELOAD_MODULES（逗号分隔的模块名）调整预先导入的模块。
+"""
+import gc
+import importlib
+import os
+import sys
+
+DEFAULT_PRELOAD_MODULES = (
+    'numpy',
+    'openai',
+    'app.services.concept_service',
+    'app.services.learning_service',
+    'app.services.memory_service',
+    'app.services.profiler',
+)
+
+_preload_modules = os.getenv('GUNICORN_PRELOAD_MODULES')
+_preload_modules = ([name.strip() for name in _preload_modules.split(',') if name.strip()]
+                    if _preload_modules is not None else DEFAULT_PRELOAD_MODULES)
+# 读取配置文件时 gunicorn 可能还未把工作目录加入模块搜索路径
+_root = os.path.dirname(os.path.abspath(__file__))
+if _root not in sys.path:
+    sys.path.insert(0, _root)
+for _name in _preload_modules:
+    importlib.import_module(_name)
+
+# 将已导入的对象移出垃圾回收的跟踪范围，避免 worker 中的垃圾回收写入这些对象所在的内存页
+# 而破坏写时复制共享
+gc.freeze()
+
+
+def post_worker_init(worker):
+    """worker 加载应用后启动热门概念统计和内容预热的后台线程（不必等到首个请求）"""
+    from app.api.routes import start_background_tasks
+    start_background_tasks()
@@ -0,0 +1,4 @@
+import os
+
+# 测试不读取本地 .env，配置均取默认值
+os.environ.setdefault('PYTHON_DOTENV_DISABLED', '1')
@@ -0,0 +1,142 @@
+"""DeepSeek API 调用准入控制测试（Redis 令牌桶脚本和进程内快速路径）"""
+import asyncio
+
+import fakeredis
+import pytest
+
+from app.services.admission import LLMAdmission, LLMRateLimitExceeded
+
+# 测试期间令牌几乎不补充
+SLOW_RATE = 0.001
+
+
+class CountingScript:
+    """记录 Lua 脚本的调用次数"""
+
+    def __init__(self, script):
+        self.script = script
+        self.calls = 0
+
+    def __call__(self, *args, **kwargs):
+        self.calls += 1
+        return self.script(*args, **kwargs)
+
+
+def make_admission(redis_client, user_burst=2, global_burst=100, user_rate=SLOW_RATE, global_rate=SLOW_RATE):
+    admission = LLMAdmission(redis_client, user_rate, user_burst, global_rate, global_burst)
+    admission._script = CountingScript(admission._script)
+    return admission
+
+
+def tokens(redis_client, key):
+    return float(redis_client.hget(key, 'tokens'))
+
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis()
+
+
+def test_script_limits_each_client(redis_client):
+    admission = make_admission(redis_client)
+    admission.acquire('10.0.0.1')
+    admission.acquire('10.0.0.1')
+    with pytest.raises(LLMRateLimitExceeded) as excinfo:
+        admission.acquire('10.0.0.1')
+    assert excinfo.value.scope == 'user'
+    # 其他调用方不受影响
+    admission.acquire('10.0.0.2')
+    assert tokens(redis_client, 'ratelimit:llm:client:10.0.0.1') == pytest.approx(0, abs=0.01)
+    assert tokens(redis_client, 'ratelimit:llm:global') == pytest.approx(97, abs=0.01)
+
+
+def test_script_global_limit_and_no_charge_on_rejection(redis_client):
+    admission = make_admission(redis_client, user_burst=5, global_burst=3)
+    for client_id in ('a', 'b', 'c'):
+        admission.acquire(client_id)
+    with pytest.raises(LLMRateLimitExceeded) as excinfo:
+        admission.acquire('d')
+    assert excinfo.value.scope == 'global'
+    assert excinfo.value.retry_after > 0
+    # 被全局限额拒绝的请求不消耗调用方的令牌
+    assert redis_client.hget('ratelimit:llm:client:d', 'tokens') is None
+
+
+def test_script_retry_after(redis_client):
+    admission = make_admission(redis_client, user_rate=0.5)
+    admission.acquire('a')
+    admission.acquire('a')
+    with pytest.raises(LLMRateLimitExceeded) as excinfo:
+        admission.acquire('a')
+    # 补充一个令牌需要 1 / 0.5 = 2 秒
+    assert 0 < excinfo.value.retry_after <= 2
+
+
+def test_script_keys_expire(redis_client):
+    admission = make_admission(redis_client, user_rate=0.5)
+    admission.acquire('a')
+    # 令牌桶补满后键即可删除：容量 / 速率 = 4 秒
+    assert 0 < redis_client.pttl('ratelimit:llm:client:a') <= 4000
+
+
+def test_acquire_global_skips_client_bucket(redis_client):
+    admission = make_admission(redis_client, user_burst=1, global_burst=2)
+    admission.acquire_global()
+    admission.acquire_global()
+    with pytest.raises(LLMRateLimitExceeded) as excinfo:
+        admission.acquire_global()
+    assert excinfo.value.scope == 'global'
+    assert redis_client.keys('ratelimit:llm:client:*') == []
+
+
+def test_local_bucket_rejects_without_redis(redis_client):
+    admission = make_admission(redis_client)
+    admission.acquire('a')
+    admission.acquire('a')
+    assert admission._script.calls == 2
+    with pytest.raises(LLMRateLimitExceeded):
+        admission.acquire('a')
+    assert admission._script.calls == 2
+
+
+def test_redis_rejection_blocks_locally(redis_client):
+    # 两个进程共享 Redis 中的限额
+    first = make_admission(redis_client)
+    second = make_admission(redis_client)
+    first.acquire('a')
+    first.acquire('a')
+
+    with pytest.raises(LLMRateLimitExceeded) as excinfo:
+        second.acquire('a')
+    assert excinfo.value.scope == 'user' and second._script.calls == 1
+    # 被 Redis 拒绝时退回本地令牌，等待期间直接拒绝而不访问 Redis
+    assert second._buckets['a'].tokens == pytest.approx(2, abs=0.01)
+    with pytest.raises(LLMRateLimitExceeded):
+        second.acquire('a')
+    assert second._script.calls == 1
+    # 其他调用方照常检查
+    second.acquire('b')
+    assert second._script.calls == 2
+
+
+def test_falls_back_to_local_limit_without_redis():
+    server = fakeredis.FakeServer()
+    server.connected = False
+    admission = make_admission(fakeredis.FakeRedis(server=server))
+    admission.acquire('a')
+    admission.acquire('a')
+    with pytest.raises(LLMRateLimitExceeded) as excinfo:
+        admission.acquire('a')
+    assert excinfo.value.scope == 'user'
+
+
+def test_acquire_async(redis_client):
+    admission = make_admission(redis_client, user_burst=1)
+
+    async def acquire_twice():
+        await admission.acquire_async('a')
+        await admission.acquire_async('a')
+
+    with pytest.raises(LLMRateLimitExceeded):
+        asyncio.run(acquire_twice())
+    assert tokens(redis_client, 'ratelimit:llm:client:a') == pytest.approx(0, abs=0.01)
@@ -0,0 +1,174 @@
+"""API 路由测试（Redis 使用 fakeredis）"""
+import json
+
+import fakeredis
+import pytest
+import redis
+
+from app.services.memory_store import ConcurrentUpdateError
+
+
+@pytest.fixture(scope='module')
+def app():
+    # 路由模块导入时创建各服务，整个测试进程共用同一个 fakeredis 服务器
+    server = fakeredis.FakeServer()
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(redis, 'from_url',
+                      lambda *args, **kwargs: fakeredis.FakeRedis(server=server))
+        from app import create_app
+        app = create_app('testing')
+        yield app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def memory_service(app):
+    from app.api.routes import memory_service
+    return memory_service
+
+
+def review_batch(client, user_id, results):
+    return client.post('/api/memory/review/batch', json={'user_id': user_id, 'results': results})
+
+
+@pytest.mark.parametrize('results', [
+    None,
+    [],
+    'A',
+    [{'concept': 'A'}],
+    [{'concept': '', 'performance_score': 0.5}],
+    [{'concept': 'A', 'performance_score': 1.5}],
+    [{'concept': 'A', 'performance_score': True}],
+    [{'concept': 'A', 'performance_score': '0.5'}],
+    ['A'],
+])
+def test_review_batch_validation(client, results):
+    response = review_batch(client, 'batch-invalid', results)
+    assert response.status_code == 400
+
+
+def test_review_batch_size_limit(app, client):
+    results = [{'concept': 'A', 'performance_score': 0.5}] * (app.config['REVIEW_BATCH_MAX_SIZE'] + 1)
+    assert review_batch(client, 'batch-limit', results).status_code == 400
+
+
+def test_review_batch_applies_in_order(client, memory_service):
+    memory_service.add_learning_record('batch-user', 'A')
+    memory_service.add_learning_record('batch-user', 'B')
+
+    response = review_batch(client, 'batch-user', [
+        {'concept': 'A', 'performance_score': 0.6},
+        {'concept': 'missing', 'performance_score': 0.6},
+        {'concept': 'A', 'performance_score': 0.9},
+        {'concept': 'B', 'performance_score': 0.7},
+    ])
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['updated'] == 2
+    assert data['skipped'] == ['missing']
+    assert {item['concept'] for item in data['schedule']} <= {'A', 'B'}
+
+    records = memory_service.store.get_records('batch-user', ['A', 'B'])
+    assert records['A']['review_count'] == 2
+    assert records['B']['review_count'] == 1
+    assert memory_service.get_learning_stats('batch-user')['review_count'] == 3
+    history = memory_service.get_review_history('batch-user', 'A')['A']
+    assert [entry['performance_score'] for entry in history] == [0.6, 0.9]
+
+
+def test_review_batch_conflict_writes_nothing(client, memory_service, monkeypatch):
+    memory_service.add_learning_record('batch-conflict', 'A')
+
+    def conflict(user_id, concepts, mutate):
+        raise ConcurrentUpdateError('conflict')
+
+    monkeypatch.setattr(memory_service.store, 'update_records', conflict)
+    response = review_batch(client, 'batch-conflict', [{'concept': 'A', 'performance_score': 0.9}])
+    assert response.status_code == 409
+    monkeypatch.undo()
+
+    assert memory_service.store.get_records('batch-conflict', ['A'])['A']['review_count'] == 0
+    assert memory_service.get_learning_stats('batch-conflict')['review_count'] == 0
+
+
+def test_cohort_routes(client, memory_service):
+    memory_service.add_learning_record('cohort-1', 'A')
+    memory_service.add_learning_record('cohort-2', 'B')
+
+    assert client.get('/api/memory/cohorts/class-api').status_code == 404
+    assert client.put('/api/memory/cohorts/class-api', json={'user_ids': 'cohort-1'}).status_code == 400
+    response = client.put('/api/memory/cohorts/class-api', json={'user_ids': ['cohort-1', 'cohort-2']})
+    assert response.get_json()['members'] == 2
+    assert client.get('/api/memory/cohorts/class-api').get_json()['user_ids'] == ['cohort-1', 'cohort-2']
+
+    response = client.get('/api/memory/cohort/mastery?cohort_id=class-api')
+    assert response.mimetype == 'application/x-ndjson'
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [(row['user_id'], row['total_concepts']) for row in rows] == [('cohort-1', 1), ('cohort-2', 1)]
+
+    response = client.post('/api/memory/cohort/schedule', json={'user_ids': ['cohort-2'], 'limit': 5})
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [item['concept'] for item in rows[0]['schedule']] == ['B']
+
+    response = client.get('/api/memory/cohort/concepts?user_ids=cohort-1,cohort-2')
+    assert response.get_json()['users'] == 2
+    assert {row['concept'] for row in response.get_json()['concepts']} == {'A', 'B'}
+
+
+@pytest.mark.parametrize('path, status', [
+    ('/api/memory/cohort/mastery', 400),
+    ('/api/memory/cohort/mastery?cohort_id=missing-class', 404),
+    ('/api/memory/cohort/schedule?user_ids=u1&limit=0', 400),
+    ('/api/memory/cohort/schedule?user_ids=u1&before=tomorrow', 400),
+    ('/api/memory/cohort/concepts?user_ids=,', 400),
+])
+def test_cohort_route_validation(client, path, status):
+    assert client.get(path).status_code == status
+
+
+@pytest.fixture
+def submitted(monkeypatch):
+    """记录提交的学习路径任务（不实际生成）"""
+    from app.api.routes import learning_path_jobs
+    jobs = []
+    monkeypatch.setattr(learning_path_jobs, 'submit', lambda params: jobs.append(params) or 'job-1')
+    return jobs
+
+
+def test_learning_path_async_flag(app, client, submitted):
+    response = client.post('/api/learning/path', json={'concept': '递归', 'async': 'false'})
+    assert response.status_code == 400
+
+    response = client.post('/api/learning/path', json={'concept': '递归', 'async': True})
+    assert response.status_code == 202
+    # 同步服务模式不提供 SSE 推送地址
+    assert response.get_json() == {'job_id': 'job-1', 'status': 'queued',
+                                   'status_url': '/api/learning/path/job-1'}
+    assert submitted[0]['concept'] == '递归'
+
+
+def test_learning_path_async_config_cannot_be_overridden(app, client, submitted, monkeypatch):
+    monkeypatch.setitem(app.config, 'LEARNING_PATH_ASYNC', True)
+    response = client.post('/api/learning/path', json={'concept': '递归', 'async': False})
+    assert response.status_code == 202 and len(submitted) == 1
+
+
+def test_learning_path_events_rejected_in_sync_mode(client):
+    assert client.get('/api/learning/path/job-1/events').status_code == 501
+
+
+def test_learning_path_cache_invalidate_requires_admin(app, client, monkeypatch):
+    url = '/api/learning/path-cache/invalidate'
+    monkeypatch.setitem(app.config, 'ADMIN_TOKEN', '')
+    assert client.post(url, json={'concepts': ['递归']}).status_code == 403
+
+    monkeypatch.setitem(app.config, 'ADMIN_TOKEN', 'secret')
+    assert client.post(url, json={'concepts': ['递归']}).status_code == 403
+    headers = {'X-Admin-Token': 'secret'}
+    assert client.post(url, json={'concepts': []}, headers=headers).status_code == 400
+    response = client.post(url, json={'concepts': ['递归', '递归']}, headers=headers)
+    assert response.get_json() == {'status': 'success', 'invalidated': 1}
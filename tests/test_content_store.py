@@ -0,0 +1,132 @@
+"""生成内容压缩存储测试"""
+import asyncio
+import zlib
+
+import fakeredis
+import pytest
+
+from app.services.content_store import (_HEADER, _MAGIC, CONTENT_SCHEMA_VERSION, AsyncContentStore,
+                                        ContentStore, encode_content)
+
+VALUE = {'core_definition': '递归是函数调用自身', 'misconceptions': ['关于递归的常见误解'] * 3}
+
+
+@pytest.fixture
+def store():
+    return ContentStore(fakeredis.FakeRedis())
+
+
+def stored_totals(store):
+    stats = store.get_stats()
+    return stats['entries'], stats['raw_bytes'], stats['stored_bytes']
+
+
+def test_round_trip(store):
+    assert store.put('explanation', ('递归', 'easy'), VALUE)
+    entry = store.get('explanation', ('递归', 'easy'))
+    assert entry.raw_size == len(encode_content(VALUE))
+    assert entry.compressed_size < entry.raw_size
+    assert entry.value == VALUE
+    assert store.stats['hits'] == 1
+
+
+def test_read_is_lazy(store):
+    store.put('explanation', 'a', VALUE)
+    store.put('explanation', 'b', VALUE)
+    entries = store.get_many('explanation', ['a', 'missing', 'b'])
+    assert entries[1] is None
+    # 读取时只解析头部，首次访问内容时才解压
+    assert store.stats['decompressions'] == 0
+    assert entries[0].value == VALUE
+    assert store.stats['decompressions'] == 1
+
+
+def test_round_trip_without_dictionary(store):
+    raw = encode_content(VALUE)
+    blob = store.compress(raw, dictionary_id=0)
+    assert store.decompress(blob) == raw
+
+
+def test_missing_dictionary_is_a_miss(store):
+    blob = store.compress(encode_content(VALUE))
+    _, version, _, raw_size = _HEADER.unpack_from(blob)
+    store.redis_client.set('content:entry:explanation:a', _HEADER.pack(_MAGIC, version, 7, raw_size)
+                           + blob[_HEADER.size:])
+    assert store.get('explanation', 'a') is None
+    assert store.stats['stale'] == 1 and store.stats['decompressions'] == 0
+
+
+def test_stale_schema_is_a_miss(store):
+    raw = encode_content(VALUE)
+    body = zlib.compress(raw)
+    store.redis_client.set('content:entry:explanation:old',
+                           _HEADER.pack(_MAGIC, CONTENT_SCHEMA_VERSION - 1, 0, len(raw)) + body)
+    store.redis_client.set('content:entry:explanation:legacy', raw)
+    assert store.get('explanation', 'old') is None
+    assert store.get('explanation', 'legacy') is None
+    assert store.stats['stale'] == 2
+
+    calls = []
+    value = store.get_or_create('explanation', 'old', lambda: calls.append(1) or VALUE)
+    assert value == VALUE and calls == [1]
+    assert store.get('explanation', 'old').value == VALUE
+
+
+def test_corrupt_entry_is_regenerated(store):
+    blob = store.compress(encode_content(VALUE))
+    store.redis_client.set('content:entry:explanation:a', blob[:_HEADER.size] + b'not zlib data')
+    entry = store.get('explanation', 'a')
+    assert entry is not None
+    assert store.load_value(entry) is None
+    assert store.stats['stale'] == 1 and store.stats['hits'] == 0
+
+    assert store.get_or_create('explanation', 'a', lambda: VALUE) == VALUE
+    assert store.get('explanation', 'a').value == VALUE
+
+
+def test_overwrite_does_not_inflate_stats(store):
+    store.put('explanation', 'a', VALUE)
+    first = stored_totals(store)
+    store.put('explanation', 'a', VALUE)
+    assert stored_totals(store) == first
+
+    bigger = dict(VALUE, extra='额外内容' * 50)
+    store.put('explanation', 'a', bigger)
+    blob = store.redis_client.get('content:entry:explanation:a')
+    assert stored_totals(store) == (1, len(encode_content(bigger)), len(blob))
+
+
+def test_put_sets_ttl():
+    store = ContentStore(fakeredis.FakeRedis(), ttl=60)
+    store.put('explanation', 'a', VALUE)
+    assert 0 < store.redis_client.ttl('content:entry:explanation:a') <= 60
+
+
+def test_train_and_recompress(store):
+    for index in range(20):
+        store.put('explanation', index, dict(VALUE, concept=f'概念{index}'))
+    dictionary_id, size, samples = store.train(size=4096)
+    assert dictionary_id == 2 and 0 < size <= 4096 and samples == 20
+
+    totals = store.recompress()
+    assert totals['entries'] == 20
+    entry = store.get('explanation', 3)
+    assert entry.dictionary_id == dictionary_id
+    assert entry.value == dict(VALUE, concept='概念3')
+    assert stored_totals(store) == (totals['entries'], totals['raw_bytes'], totals['stored_bytes'])
+
+
+def test_async_store_shares_format():
+    server = fakeredis.FakeServer()
+    sync_store = ContentStore(fakeredis.FakeRedis(server=server))
+    async_store = AsyncContentStore(fakeredis.FakeAsyncRedis(server=server))
+
+    async def scenario():
+        assert await async_store.put('explanation', 'a', VALUE)
+        assert await async_store.put('explanation', 'a', VALUE)
+        assert await async_store.get_or_create('explanation', 'a', None) == VALUE
+        assert await async_store.get('explanation', 'missing') is None
+
+    asyncio.run(scenario())
+    assert sync_store.get('explanation', 'a').value == VALUE
+    assert stored_totals(sync_store)[0] == 1
@@ -0,0 +1,62 @@
+"""热门概念统计和内容预热测试"""
+import fakeredis
+
+from app.services.hot_concepts import ContentPrewarmer, HotConceptTracker
+
+
+class ConceptService:
+    def __init__(self):
+        self.refreshed = []
+
+    def refresh_content(self, concept, refresh_before, difficulties):
+        self.refreshed.append(concept)
+        return 1
+
+
+def test_tracker_ranks_concepts():
+    tracker = HotConceptTracker(fakeredis.FakeRedis(), top_k=2)
+    for concept in ['a'] * 3 + ['b'] * 2 + ['c']:
+        tracker.record(concept)
+    tracker.flush()
+    assert tracker.top(2) == [('a', 3), ('b', 2)]
+    tracker.close()
+
+
+def test_threads_start_lazily():
+    tracker = HotConceptTracker(fakeredis.FakeRedis(), flush_interval=60)
+    prewarmer = ContentPrewarmer(tracker, ConceptService(), interval=60)
+    # 创建时（如 CLI 命令导入路由模块）不启动后台线程
+    assert tracker._thread is None and prewarmer._thread is None
+
+    tracker.start()
+    prewarmer.start()
+    thread = tracker._thread
+    tracker.start()
+    assert tracker._thread is thread and thread.is_alive()
+    assert prewarmer._thread.is_alive()
+
+    tracker.close()
+    prewarmer.close()
+    thread.join(1)
+    prewarmer._thread.join(1)
+    assert not thread.is_alive() and not prewarmer._thread.is_alive()
+
+
+def test_closed_tracker_does_not_start():
+    tracker = HotConceptTracker(fakeredis.FakeRedis())
+    tracker.close()
+    tracker.start()
+    assert tracker._thread is None
+
+
+def test_prewarm_run_once():
+    tracker = HotConceptTracker(fakeredis.FakeRedis())
+    service = ConceptService()
+    prewarmer = ContentPrewarmer(tracker, service, top_n=1)
+    tracker.record('a')
+    tracker.record('a')
+    tracker.record('b')
+    tracker.flush()
+    assert prewarmer.run_once() == 1
+    assert service.refreshed == ['a']
+    tracker.close()
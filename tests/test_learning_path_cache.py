@@ -0,0 +1,141 @@
+"""学习路径缓存测试"""
+import fakeredis
+import pytest
+
+from app.services.learning_path_cache import (ANY_BUCKET, LearningPathCache, bump_graph_versions,
+                                              describe_bucket, graph_version_key, mastery_bucket)
+
+PATH = {'day1': {'goal': '了解递归', 'activities': ['阅读介绍'], 'resources': []}}
+
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis()
+
+
+def make_cache(redis_client, **kwargs):
+    kwargs.setdefault('version_ttl', 60)
+    return LearningPathCache(redis_client, **kwargs)
+
+
+def test_hit_and_miss(redis_client):
+    cache = make_cache(redis_client)
+    assert cache.get('递归', 'beginner', ANY_BUCKET) is None
+    cache.put('递归', 'beginner', ANY_BUCKET, PATH)
+    assert cache.get('递归', 'beginner', ANY_BUCKET) == PATH
+    assert cache.get('递归', 'advanced', ANY_BUCKET) is None
+    stats = cache.get_stats()
+    assert (stats['hits'], stats['misses'], stats['size']) == (1, 2, 1)
+    assert stats['hit_rate'] == pytest.approx(1 / 3)
+
+
+def test_entries_expire(redis_client):
+    cache = make_cache(redis_client, ttl=0)
+    cache.put('递归', 'beginner', ANY_BUCKET, PATH)
+    assert cache.get('递归', 'beginner', ANY_BUCKET) is None
+    assert cache.get_stats()['expired'] == 1 and cache.get_stats()['size'] == 0
+
+
+def test_lru_eviction(redis_client):
+    cache = make_cache(redis_client, max_entries=2)
+    cache.put('A', 'beginner', ANY_BUCKET, PATH)
+    cache.put('B', 'beginner', ANY_BUCKET, PATH)
+    # 访问 A 后 B 成为最久未使用的条目
+    assert cache.get('A', 'beginner', ANY_BUCKET) == PATH
+    cache.put('C', 'beginner', ANY_BUCKET, PATH)
+    assert cache.get('B', 'beginner', ANY_BUCKET) is None
+    assert cache.get('A', 'beginner', ANY_BUCKET) == PATH
+    assert cache.get('C', 'beginner', ANY_BUCKET) == PATH
+    assert cache.get_stats()['evictions'] == 1
+
+
+def test_invalidate_drops_local_entries(redis_client):
+    cache = make_cache(redis_client)
+    for bucket in (ANY_BUCKET, 'new', 'learning-mid'):
+        cache.put('递归', 'beginner', bucket, PATH)
+    cache.put('排序', 'beginner', ANY_BUCKET, PATH)
+    cache.invalidate(['递归', '递归'])
+    assert cache.get_stats()['invalidated'] == 3
+    assert int(redis_client.get(graph_version_key('递归'))) == 1
+    assert cache.get('递归', 'beginner', ANY_BUCKET) is None
+    assert cache.get('排序', 'beginner', ANY_BUCKET) == PATH
+
+
+def test_graph_version_invalidates_other_processes(redis_client):
+    fresh = make_cache(redis_client, version_ttl=0)
+    lagging = make_cache(redis_client, version_ttl=60)
+    for cache in (fresh, lagging):
+        cache.put('递归', 'beginner', ANY_BUCKET, PATH)
+
+    # 其他进程（如 KnowledgeGraphService）递增版本号
+    assert bump_graph_versions(redis_client, ['递归', '排序']) == [1, 1]
+    assert fresh.get('递归', 'beginner', ANY_BUCKET) is None
+    assert fresh.get_stats()['invalidated'] == 1
+    # 本地缓存的版本号在 version_ttl 内沿用
+    assert lagging.get('递归', 'beginner', ANY_BUCKET) == PATH
+
+
+def test_entry_generated_before_change_is_not_served(redis_client):
+    cache = make_cache(redis_client, version_ttl=0)
+    version = cache.graph_version('递归')
+    bump_graph_versions(redis_client, ['递归'])
+    # 生成期间图谱发生变化，按生成开始时的版本号缓存的结果不会命中
+    cache.put('递归', 'beginner', ANY_BUCKET, PATH, version)
+    assert cache.get('递归', 'beginner', ANY_BUCKET) is None
+
+
+def test_mastery_buckets():
+    assert mastery_bucket(None, [0.4, 0.7]) == ANY_BUCKET
+    assert mastery_bucket({'total_concepts': 0, 'concept_state': 'new'}, [0.4, 0.7]) == 'new'
+    profile = {'total_concepts': 3, 'concept_state': 'learning', 'average_strength': 0.5}
+    assert mastery_bucket(profile, [0.4, 0.7]) == 'learning-mid'
+    assert mastery_bucket(dict(profile, average_strength=0.9), [0.4, 0.7]) == 'learning-high'
+    assert describe_bucket(ANY_BUCKET) == ''
+    assert describe_bucket('new') == '尚未学习过该概念'
+    assert '整体记忆强度较高' in describe_bucket('mastered-high')
+
+
+class FakeDriver:
+    """记录 Cypher 查询，邻居查询返回固定结果"""
+
+    def __init__(self, neighbors):
+        self.neighbors = neighbors
+        self.queries = []
+
+    def session(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def run(self, query, **params):
+        self.queries.append((query, params))
+        if 'RETURN DISTINCT n.name' in query:
+            return [{'name': name} for name in self.neighbors]
+        return []
+
+    def close(self):
+        pass
+
+
+def test_graph_change_bumps_neighbors(redis_client):
+    from flask import Flask
+    from app.services.knowledge_graph_service import KnowledgeGraphService
+    from config import Config
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    with app.app_context():
+        service = KnowledgeGraphService(redis_client)
+    service.driver.close()
+    service.driver = FakeDriver(['C', 'A'])
+
+    service.update_relationship('A', 'B', 0.5)
+    versions = {concept: int(redis_client.get(graph_version_key(concept)) or 0) for concept in 'ABCD'}
+    # 边的端点及其 GRAPH_DEPTH - 1 跳以内的邻居都会失效
+    assert versions == {'A': 1, 'B': 1, 'C': 1, 'D': 0}
+    query, params = service.driver.queries[-1]
+    assert '*1..1' in query and params == {'concepts': ['A', 'B']}
@@ -0,0 +1,81 @@
+"""学习路径增量解析测试"""
+import pytest
+
+from app.services.learning_service import LearningPathParser
+
+OUTPUT = (
+    '好的，下面是学习路径：\n'
+    '### 第一天：入门\n'
+    '目标：了解递归\n'
+    '- 阅读递归的介绍\n'
+    '- https://example.com/1\n'
+    '\n'
+    '第2天\n'
+    '目标：练习递归\n'
+    '\n'
+    '- 完成练习题\n'
+    '- 阅读案例\n'
+    '\n'
+    '以上内容仅供参考\n'
+    '**第十二天**\n'
+    '目标：总结\n'
+    '- 复习全部内容'
+)
+
+EXPECTED = {
+    'day1': {'goal': '了解递归', 'activities': ['阅读递归的介绍'], 'resources': ['https://example.com/1']},
+    'day2': {'goal': '练习递归', 'activities': ['完成练习题', '阅读案例'], 'resources': []},
+    'day12': {'goal': '总结', 'activities': ['复习全部内容'], 'resources': []},
+}
+
+
+def parse(chunks):
+    parser = LearningPathParser()
+    events = []
+    for chunk in chunks:
+        events.append(parser.feed(chunk))
+    events.append(parser.close())
+    return events
+
+
+def test_parse_whole_output():
+    events = parse([OUTPUT])
+    assert dict(events[0] + events[1]) == EXPECTED
+    # 只有最后一天（后面没有空行）在输出结束时返回
+    assert [day for day, _ in events[1]] == ['day12']
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7, 16])
+def test_chunk_boundaries(size):
+    events = parse([OUTPUT[i:i + size] for i in range(0, len(OUTPUT), size)])
+    days = [block for blocks in events for block in blocks]
+    assert [day for day, _ in days] == ['day1', 'day2', 'day12']
+    assert dict(days) == EXPECTED
+
+
+def test_every_split_point():
+    for split in range(1, len(OUTPUT)):
+        events = parse([OUTPUT[:split], OUTPUT[split:]])
+        assert dict(events[0] + events[1] + events[2]) == EXPECTED, split
+
+
+def test_day_is_returned_at_blank_line():
+    parser = LearningPathParser()
+    assert parser.feed('第1天\n目标：了解递归\n- 阅读介绍\n') == []
+    # 空行之后即返回，不等待下一天的标题
+    assert parser.feed('- https://example.com/1\n\n') == [
+        ('day1', {'goal': '了解递归', 'activities': ['阅读介绍'], 'resources': ['https://example.com/1']})
+    ]
+    assert parser.feed('第2天\n目标：练习\n- 做题\n\n') == [
+        ('day2', {'goal': '练习', 'activities': ['做题'], 'resources': []})
+    ]
+    assert parser.close() == []
+
+
+def test_day_without_activities_waits_for_next_header():
+    parser = LearningPathParser()
+    assert parser.feed('第1天\n目标：了解递归\n\n- https://example.com/1\n\n') == []
+    assert parser.feed('第2天\n') == [
+        ('day1', {'goal': '了解递归', 'activities': [], 'resources': ['https://example.com/1']})
+    ]
+    assert parser.close() == [('day2', {'goal': '', 'activities': [], 'resources': []})]
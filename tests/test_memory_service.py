@@ -0,0 +1,167 @@
+"""MemoryService 测试（在各存储后端上运行）"""
+import json
+from datetime import datetime, timedelta
+
+import fakeredis
+import pytest
+import redis
+from flask import Flask
+
+from config import Config
+
+
+@pytest.fixture(params=['memory', 'sqlite', 'redis'])
+def service(request, tmp_path, monkeypatch):
+    monkeypatch.setattr(redis, 'from_url', lambda *args, **kwargs: fakeredis.FakeRedis())
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config.update(
+        MEMORY_STORE=request.param,
+        MEMORY_SQLITE_PATH=str(tmp_path / 'memory.db'),
+        MEMORY_WRITE_BEHIND=False,
+        REVIEW_EVENT_SHARDS=2
+    )
+    with app.app_context():
+        from app.services.memory_service import MemoryService
+        service = MemoryService()
+        yield service
+        service.store.close()
+
+
+def learn(service, user_id, *concepts):
+    for concept in concepts:
+        service.add_learning_record(user_id, concept)
+
+
+def make_record(concept, days, strength=0.5, review_count=0):
+    """构造一条学习记录，days 为距下次复习的天数（负数表示已到期），None 表示无需复习"""
+    now = datetime.now()
+    return {
+        'concept': concept,
+        'first_learned': now.isoformat(),
+        'memory_strength': strength,
+        'review_count': review_count,
+        'next_review': (now + timedelta(days=days)).isoformat() if days is not None else None
+    }
+
+
+@pytest.fixture
+def cohort(service):
+    """三个有记录的用户，每批读取两个用户，覆盖跨批次的情况"""
+    user_records = {
+        'u1': [make_record('A', -1, 0.9, 3), make_record('B', 2, 0.4, 1)],
+        'u2': [make_record('A', -2, 0.5, 1)],
+        'u3': [make_record('A', None, 0.95, 5), make_record('C', -3, 0.2, 2)],
+    }
+    service.store.restore_records(user_records, {
+        user_id: service._compute_stats(records) for user_id, records in user_records.items()
+    })
+    service.set_cohort_members('class-1', ['u1', 'u2', 'u3', 'u2'])
+    service.cohort_batch_size = 2
+    return service
+
+
+def test_rescore_keeps_concurrent_reviews(service):
+    learn(service, 'u1', 'A', 'B')
+    learn(service, 'u2', 'C')
+    load = service.store.get_records_for_users
+
+    def load_then_review(user_ids):
+        # 批量读取之后、写回之前，另一个请求提交了复习结果
+        records = load(user_ids)
+        service.apply_review_results('u1', [('A', 0.9)])
+        return records
+
+    service.store.get_records_for_users = load_then_review
+    result = service.rescore_all_records(batch_size=10)
+    service.store.get_records_for_users = load
+
+    assert result['users'] == 2 and result['records'] == 3
+    records = service.store.get_records('u1', ['A', 'B'])
+    assert records['A']['review_count'] == 1
+    assert records['B']['review_count'] == 0
+    assert all('retention' not in record for record in records.values())
+    assert service.get_learning_stats('u1')['review_count'] == 1
+
+
+def test_stats_are_maintained_incrementally(service):
+    assert service.get_learning_stats('u1') == {
+        'total_concepts': 0, 'mastered_concepts': 0, 'review_count': 0, 'average_strength': 0.0
+    }
+    learn(service, 'u1', 'A', 'B', 'C')
+    learn(service, 'u1', 'A')
+    service.apply_review_results('u1', [('A', 1.0), ('A', 1.0), ('A', 1.0), ('B', 0.2)])
+    service.update_memory_strength('u1', 'C', 0.7)
+
+    stats = service.get_learning_stats('u1')
+    records = service.store.get_all_records('u1')
+    assert stats['total_concepts'] == 3
+    assert stats['review_count'] == 5
+    assert stats['mastered_concepts'] == sum(
+        record['memory_strength'] >= service.memory_strength_threshold for record in records)
+    assert stats['average_strength'] == pytest.approx(
+        sum(record['memory_strength'] for record in records) / 3)
+    # 增量维护的计数器与根据全部记录重新计算的结果一致
+    assert service.store.get_stats('u1') == pytest.approx(service._compute_stats(records))
+
+
+def test_rebuild_stats_repairs_counters(service):
+    learn(service, 'u1', 'A', 'B')
+    service.apply_review_results('u1', [('A', 0.9)])
+    expected = service.get_learning_stats('u1')
+
+    # 模拟计数器漂移后由修复任务重建
+    records = service.store.get_all_records('u1')
+    service.store.restore_records({'u1': records}, {'u1': dict(service._compute_stats(records),
+                                                                review_count=100)})
+    assert service.get_learning_stats('u1')['review_count'] == 100
+    assert service.rebuild_all_learning_stats(batch_size=10) == 1
+    assert service.get_learning_stats('u1') == pytest.approx(expected)
+
+
+def test_cohort_members(cohort):
+    assert cohort.get_cohort_members('class-1') == ['u1', 'u2', 'u3']
+    assert cohort.set_cohort_members('class-1', []) == 0
+    assert cohort.get_cohort_members('class-1') == []
+
+
+def test_cohort_mastery(cohort):
+    rows = list(cohort.iter_cohort_mastery(['u3', 'nobody', 'u1', 'u2']))
+    assert [row['user_id'] for row in rows] == ['u3', 'nobody', 'u1', 'u2']
+
+    u3, nobody, u1, u2 = rows
+    assert nobody['total_concepts'] == 0 and nobody['next_review'] is None
+    assert nobody['mastery_rate'] == 0.0 and nobody['average_strength'] == 0.0
+    assert (u1['total_concepts'], u1['mastered_concepts'], u1['review_count'], u1['due_count']) \
+        == (2, 1, 4, 1)
+    assert u1['mastery_rate'] == 0.5
+    assert u1['average_strength'] == pytest.approx(0.65)
+    assert u3['mastered_concepts'] == 1 and u3['due_count'] == 1
+    # 与单个用户的统计结果一致
+    assert u2['review_count'] == cohort.get_learning_stats('u2')['review_count']
+    assert json.dumps(rows)
+
+
+def test_cohort_schedule(cohort):
+    rows = list(cohort.iter_cohort_schedule(['u1', 'u2', 'u3', 'nobody']))
+    schedules = {row['user_id']: [item['concept'] for item in row['schedule']] for row in rows}
+    assert schedules == {'u1': ['A', 'B'], 'u2': ['A'], 'u3': ['C'], 'nobody': []}
+
+    rows = list(cohort.iter_cohort_schedule(['u1', 'u3'], before=datetime.now(), limit=1))
+    assert [[item['concept'] for item in row['schedule']] for row in rows] == [['A'], ['C']]
+    assert rows[0]['schedule'][0] == {
+        'concept': 'A',
+        'memory_strength': 0.9,
+        'next_review': cohort.store.get_records('u1', ['A'])['A']['next_review'],
+        'review_count': 3
+    }
+
+
+def test_cohort_concept_summary(cohort):
+    summary = cohort.get_cohort_concept_summary(['u1', 'u2', 'u3'])
+    assert [row['concept'] for row in summary] == ['B', 'C', 'A']
+    concept_a = summary[-1]
+    assert (concept_a['learners'], concept_a['mastered'], concept_a['due_count']) == (3, 2, 2)
+    assert concept_a['mastery_rate'] == pytest.approx(2 / 3)
+    assert concept_a['average_strength'] == pytest.approx((0.9 + 0.5 + 0.95) / 3)
+    assert cohort.get_cohort_concept_summary(['nobody']) == []
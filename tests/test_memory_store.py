@@ -0,0 +1,196 @@
+"""MemoryStore 各后端的一致性测试（行为必须与 Redis 存储一致）"""
+import json
+from datetime import datetime, timedelta
+
+import fakeredis
+import pytest
+
+from app.services.memory_store import (STATS_FIELDS, InMemoryMemoryStore, RedisMemoryStore,
+                                       SQLiteMemoryStore, empty_stats, make_event, review_score)
+
+
+def make_record(concept, days, strength=0.5, review_count=0):
+    """构造一条学习记录，days 为距下次复习的天数，None 表示无需复习"""
+    now = datetime.now()
+    return {
+        'concept': concept,
+        'first_learned': now.isoformat(),
+        'memory_strength': strength,
+        'review_count': review_count,
+        'next_review': (now + timedelta(days=days)).isoformat() if days is not None else None
+    }
+
+
+def record_stats(record):
+    if record is None:
+        return empty_stats()
+    return {
+        'total_concepts': 1,
+        'mastered_concepts': int(record['memory_strength'] >= 0.8),
+        'review_count': record['review_count'],
+        'strength_sum': float(record['memory_strength'])
+    }
+
+
+def upsert(store, user_id, new_records, event_type='learn'):
+    """以 MemoryService 相同的方式写入记录：计算计数器增量并追加事件"""
+    concepts = [record['concept'] for record in new_records]
+
+    def mutate(old_records):
+        delta = empty_stats()
+        for record in new_records:
+            old, new = record_stats(old_records.get(record['concept'])), record_stats(record)
+            for field in STATS_FIELDS:
+                delta[field] += new[field] - old[field]
+        events = [make_event(event_type, record, None) for record in new_records]
+        return {record['concept']: record for record in new_records}, delta, events
+
+    return store.update_records(user_id, concepts, mutate)
+
+
+def concepts(records):
+    return [record['concept'] for record in records]
+
+
+@pytest.fixture(params=['memory', 'sqlite', 'redis'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        store = InMemoryMemoryStore(max_users=1000)
+    elif request.param == 'sqlite':
+        store = SQLiteMemoryStore(str(tmp_path / 'memory.db'))
+    else:
+        store = RedisMemoryStore(fakeredis.FakeRedis(), event_shards=2)
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def populated(store):
+    upsert(store, 'u1', [make_record('A', 3), make_record('B', 1), make_record('C', None, 0.9)])
+    upsert(store, 'u2', [make_record('X', 2)])
+    return store
+
+
+def test_get_records(populated):
+    assert set(populated.get_records('u1', ['A', 'C', 'missing'])) == {'A', 'C'}
+    assert populated.get_records('nobody', ['A']) == {}
+    assert len(populated.get_all_records('u1')) == 3
+    assert [len(r) for r in populated.get_records_for_users(['u2', 'nobody', 'u1'])] == [1, 0, 3]
+
+
+def test_due_records_order_filter_and_paging(populated):
+    # 按下次复习时间升序，排除已掌握的概念
+    assert concepts(populated.due_records('u1', None, 0, 10)) == ['B', 'A']
+    limit = review_score(make_record('-', 2))
+    assert concepts(populated.due_records('u1', limit, 0, 10)) == ['B']
+    assert concepts(populated.due_records('u1', None, 1, 1)) == ['A']
+
+
+def test_stats_follow_updates(populated):
+    stats = populated.get_stats('u1')
+    assert stats['total_concepts'] == 3 and stats['mastered_concepts'] == 1
+    assert stats['strength_sum'] == pytest.approx(1.9)
+    assert populated.get_stats('nobody') == empty_stats()
+
+    # 更新已有记录：计数器按差值增量更新，索引随之移动
+    upsert(populated, 'u1', [make_record('B', 10, 0.85, 1)], 'review')
+    stats = populated.get_stats('u1')
+    assert stats['mastered_concepts'] == 2 and stats['review_count'] == 1
+    assert concepts(populated.due_records('u1', None, 0, 10)) == ['A', 'B']
+
+
+def test_dashboard(populated):
+    dashboard = populated.get_dashboard('u1', ('schedule', 'stats'), 10)
+    assert set(dashboard) == {'schedule', 'stats'}
+    assert concepts(dashboard['schedule']) == ['B', 'A']
+    dashboard = populated.get_dashboard('u1', ('schedule', 'strength', 'stats'), 1)
+    assert len(dashboard['schedule']) == 1 and len(dashboard['strength']) == 3
+
+
+def test_save_replace_and_rebuild(populated):
+    populated.save_records({'u2': [make_record('X', None, 0.9)]})
+    assert populated.due_records('u2', None, 0, 10) == []
+
+    populated.replace_records('u2', [make_record('Y', 1)])
+    assert concepts(populated.get_all_records('u2')) == ['Y']
+    assert concepts(populated.due_records('u2', None, 0, 10)) == ['Y']
+
+    rebuilt = populated.rebuild_stats('u2', lambda records: {
+        field: sum(record_stats(record)[field] for record in records) for field in STATS_FIELDS})
+    assert rebuilt['total_concepts'] == 1
+    assert populated.get_stats('u2')['total_concepts'] == 1
+
+
+def test_restore_records(store):
+    records = [make_record('A', 1, 0.9, 2), make_record('B', 2)]
+    stats = {field: sum(record_stats(record)[field] for record in records) for field in STATS_FIELDS}
+    store.restore_records({'u1': records}, {'u1': stats})
+    store.restore_records({'u1': records}, {'u1': stats})
+    assert sorted(concepts(store.get_all_records('u1'))) == ['A', 'B']
+    assert store.get_stats('u1')['review_count'] == 2
+    assert concepts(store.due_records('u1', None, 0, 10)) == ['A', 'B']
+
+
+def test_iter_user_ids_excludes_cohorts(populated):
+    populated.set_cohort_members('class-1', ['u1'])
+    users = sorted(user_id for batch in populated.iter_user_ids(1) for user_id in batch)
+    assert users == ['u1', 'u2']
+
+
+def test_events_and_snapshots(populated):
+    upsert(populated, 'u1', [make_record('B', 10, 0.85, 1)], 'review')
+    events = populated.read_events('u1')
+    assert [event['type'] for _, event in events] == ['learn'] * 3 + ['review']
+    assert len(populated.read_events('u1', events[1][0])) == 2
+
+    assert populated.load_snapshot('u1') is None
+    snapshot = {'last_id': events[2][0], 'records': {}, 'history': {}}
+    assert populated.save_snapshot('u1', snapshot, None)
+    # 并发压缩：基于旧快照的保存被拒绝
+    assert not populated.save_snapshot('u1', dict(snapshot, last_id=events[3][0]), None)
+    assert populated.load_snapshot('u1')['last_id'] == events[2][0]
+    # 已合并到快照的事件被删除
+    assert [event_id for event_id, _ in populated.read_events('u1')] == [events[3][0]]
+
+
+def test_cohort_members(store):
+    store.set_cohort_members('class-1', ['u2', 'u1', 'u3'])
+    assert store.get_cohort_members('class-1') == ['u1', 'u2', 'u3']
+    store.set_cohort_members('class-1', ['u1'])
+    assert store.get_cohort_members('class-1') == ['u1']
+    store.set_cohort_members('class-1', [])
+    assert store.get_cohort_members('class-1') == []
+
+
+def test_in_memory_store_evicts_least_recently_used():
+    store = InMemoryMemoryStore(max_users=2)
+    for user_id in ('a', 'b', 'a', 'c'):
+        upsert(store, user_id, [make_record('A', 1)])
+    assert sorted(u for batch in store.iter_user_ids(10) for u in batch) == ['a', 'c']
+
+
+def test_redis_iter_user_ids_dedupes_scan_results(monkeypatch):
+    store = RedisMemoryStore(fakeredis.FakeRedis())
+    keys = [b'learning_records:u1', b'learning_records:u1', b'learning_records:u2', b'learning_records:u3']
+    monkeypatch.setattr(store.redis_client, 'scan_iter', lambda **kwargs: iter(keys))
+    assert list(store.iter_user_ids(2)) == [['u1', 'u2'], ['u3']]
+
+
+def test_redis_migrates_legacy_string_records():
+    client = fakeredis.FakeRedis()
+    store = RedisMemoryStore(client)
+    legacy = [make_record('A', 1), make_record('B', None, 0.9, 2), make_record('A', 3, 0.6, 1)]
+    client.set('learning_records:old', json.dumps(legacy))
+    upsert(store, 'new', [make_record('X', 2)])
+
+    def compute(records):
+        return {field: sum(record_stats(record)[field] for record in records) for field in STATS_FIELDS}
+
+    assert store.migrate_legacy_records(10, compute) == (1, 2)
+    assert sorted(concepts(store.get_all_records('old'))) == ['A', 'B']
+    assert store.get_records('old', ['A'])['A']['review_count'] == 1
+    assert concepts(store.due_records('old', None, 0, 10)) == ['A']
+    assert store.get_stats('old')['total_concepts'] == 2
+    assert store.get_all_records('new')[0]['concept'] == 'X'
+    # 重复执行不再转换
+    assert store.migrate_legacy_records(10, compute) == (0, 0)
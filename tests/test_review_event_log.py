@@ -0,0 +1,106 @@
+"""复习事件流消费组测试"""
+import fakeredis
+import pytest
+
+from app.services.memory_store import RedisMemoryStore, make_event
+from app.services.review_event_log import ReviewEventConsumer
+
+
+class Handler:
+    def __init__(self):
+        self.events = []
+        self.failing = False
+
+    def __call__(self, events):
+        if self.failing:
+            raise RuntimeError('handler failed')
+        self.events.extend((key, event_id) for key, event_id, _ in events)
+
+
+@pytest.fixture
+def store():
+    return RedisMemoryStore(fakeredis.FakeRedis(), event_shards=2)
+
+
+@pytest.fixture
+def handler():
+    return Handler()
+
+
+def append(store, user_ids):
+    for user_id in user_ids:
+        pipe = store.redis_client.pipeline()
+        store._queue_append_event(pipe, user_id, make_event('review', {'concept': 'A'}, 0.5))
+        pipe.execute()
+
+
+def pending(store, group='g'):
+    return sum(store.redis_client.xpending(key, group)['pending'] for key in store.shard_keys())
+
+
+def drain(consumer, count=100):
+    """读取到未确认事件处理完且没有新事件为止，返回处理的事件数"""
+    total = 0
+    while True:
+        recovering = consumer._pending_cursors is not None
+        processed = consumer.poll(count=count)
+        total += processed
+        if not processed and not recovering:
+            return total
+
+
+def test_consumes_and_acks_new_events(store, handler):
+    consumer = ReviewEventConsumer(store, 'g', 'c1', handler)
+    append(store, [f'u{i}' for i in range(10)])
+    assert drain(consumer) == 10
+    assert len(set(handler.events)) == 10
+    assert pending(store) == 0
+
+
+def test_handler_failure_replays_whole_pending_list(store, handler):
+    consumer = ReviewEventConsumer(store, 'g', 'c1', handler)
+    consumer.poll()
+    append(store, [f'u{i}' for i in range(30)])
+    handler.failing = True
+    with pytest.raises(RuntimeError):
+        consumer.poll(count=100)
+    assert pending(store) == 30
+
+    # 分多批重新处理全部未确认事件，不只是第一批
+    handler.failing = False
+    assert drain(consumer, count=4) == 30
+    assert len(set(handler.events)) == 30
+    assert pending(store) == 0
+
+
+def test_restart_recovers_unacked_events(store, handler):
+    consumer = ReviewEventConsumer(store, 'g', 'c1', handler)
+    consumer.poll()
+    append(store, ['u1', 'u2', 'u3'])
+    handler.failing = True
+    with pytest.raises(RuntimeError):
+        consumer.poll()
+
+    # 同名消费者重启后先处理未确认事件
+    handler.failing = False
+    restarted = ReviewEventConsumer(store, 'g', 'c1', handler)
+    assert drain(restarted) == 3
+    assert pending(store) == 0
+
+
+def test_trimmed_pending_entries_are_acked(store, handler):
+    consumer = ReviewEventConsumer(store, 'g', 'c1', handler)
+    consumer.poll()
+    append(store, [f'u{i}' for i in range(6)])
+    handler.failing = True
+    with pytest.raises(RuntimeError):
+        consumer.poll()
+
+    # 模拟分片裁剪：未确认事件的内容已被删除
+    key = next(key for key in store.shard_keys() if store.redis_client.xlen(key))
+    trimmed_id = store.redis_client.xrange(key, count=1)[0][0]
+    store.redis_client.xdel(key, trimmed_id)
+
+    handler.failing = False
+    assert drain(consumer) == 5
+    assert pending(store) == 0
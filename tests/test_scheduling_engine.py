@@ -0,0 +1,118 @@
+"""间隔复习调度引擎测试"""
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app.services.scheduling_engine import SchedulingEngine, get_model
+
+INTERVALS = [1, 2, 4, 7, 15, 30]
+NOW = datetime(2024, 1, 10, 12, 0, 0)
+
+
+def make_engine(name, threshold=0.8):
+    return SchedulingEngine(get_model(name, INTERVALS, threshold))
+
+
+def make_record(strength=0.5, review_count=0, days_ago=1):
+    return {
+        'concept': 'A',
+        'first_learned': (NOW - timedelta(days=days_ago)).isoformat(),
+        'memory_strength': strength,
+        'review_count': review_count
+    }
+
+
+def next_review(record):
+    return datetime.fromisoformat(record['next_review'])
+
+
+def test_unknown_model():
+    with pytest.raises(ValueError):
+        get_model('unknown', INTERVALS, 0.8)
+
+
+def test_empty_batch():
+    engine = make_engine('linear')
+    assert engine.review([], [], now=NOW) == []
+    assert engine.schedule([], now=NOW) == []
+    assert engine.forecast([], [], 2, 7, 0.8, now=NOW).shape == (2, 7)
+
+
+def test_linear_review_updates_strength_and_interval():
+    engine = make_engine('linear')
+    record, = engine.review([make_record(0.5)], [1.0], now=NOW)
+    # 记忆强度按权重 0.3 线性更新：0.5 * 0.7 + 1.0 * 0.3
+    assert record['memory_strength'] == pytest.approx(0.65)
+    assert record['review_count'] == 1
+    assert datetime.fromisoformat(record['last_reviewed']) == NOW
+    # 0.65 落在第 3 档（下标 3），间隔 7 天
+    assert next_review(record) == NOW + timedelta(days=7)
+
+
+def test_linear_mastered_records_need_no_review():
+    engine = make_engine('linear')
+    record, = engine.review([make_record(0.9)], [1.0], now=NOW)
+    assert record['next_review'] is None
+
+
+def test_batch_matches_single_records():
+    engine = make_engine('fsrs')
+    scores = [0.0, 0.4, 0.7, 1.0]
+    batch = engine.review([make_record(0.5, days_ago=3) for _ in scores], scores, now=NOW)
+    for score, record in zip(scores, batch):
+        single, = engine.review([make_record(0.5, days_ago=3)], [score], now=NOW)
+        assert single == record
+
+
+def test_sm2_intervals():
+    engine = make_engine('sm2')
+    record = make_record()
+    engine.review([record], [1.0], now=NOW)
+    assert record['repetitions'] == 1 and next_review(record) == NOW + timedelta(days=1)
+    engine.review([record], [1.0], now=NOW + timedelta(days=1))
+    assert record['repetitions'] == 2 and next_review(record) == NOW + timedelta(days=7)
+    # 回答不合格时重新开始
+    engine.review([record], [0.2], now=NOW + timedelta(days=7))
+    assert record['repetitions'] == 0 and record['interval'] == 1.0
+    assert record['ease_factor'] >= 1.3
+
+
+def test_fsrs_stability_grows_with_good_reviews():
+    engine = make_engine('fsrs')
+    record = make_record()
+    engine.review([record], [0.7], now=NOW)
+    first = record['stability']
+    engine.review([record], [0.7], now=next_review(record))
+    assert record['stability'] > first
+    assert 1 <= record['difficulty'] <= 10
+
+
+@pytest.mark.parametrize('name', ['linear', 'sm2', 'fsrs'])
+def test_retention_decays(name):
+    engine = make_engine(name)
+    records = [make_record(0.5, days_ago=days) for days in (0, 5, 30)]
+    engine.review(records, [0.7, 0.7, 0.7], now=NOW - timedelta(days=1))
+    retention = engine.retention(records, now=NOW + timedelta(days=10))
+    assert np.all((retention > 0) & (retention <= 1))
+    later = engine.retention(records, now=NOW + timedelta(days=40))
+    assert np.all(later < retention)
+
+
+def test_rescore_keeps_retention_out_of_records():
+    engine = make_engine('sm2')
+    records = engine.rescore([make_record()], now=NOW)
+    assert 'retention' not in records[0]
+    assert records[0]['next_review'] is not None
+
+
+def test_forecast_counts_by_group_and_day():
+    engine = make_engine('sm2')
+    records = [make_record() for _ in range(3)]
+    engine.review(records, [1.0, 1.0, 1.0], now=NOW - timedelta(days=3))
+    counts = engine.forecast(records, [0, 1, 1], 2, 10, 1.0, now=NOW)
+    assert counts.shape == (2, 10)
+    # 已过期的复习计入第 0 天，之后按 SM-2 间隔（6 天）再次到期
+    assert counts[:, 0].tolist() == [1, 2]
+    assert counts.sum(axis=1).tolist() == [2, 4]
+    assert counts[:, 6].tolist() == [1, 2]
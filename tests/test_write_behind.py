@@ -0,0 +1,158 @@
+"""复习结果写后缓冲区测试"""
+import threading
+import time
+
+import pytest
+
+from app.services.write_behind import WriteBehindBuffer, WriteBehindFullError
+
+
+class Writer:
+    """记录写入内容，可以模拟写入失败"""
+
+    def __init__(self):
+        self.calls = []
+        self.failing = False
+        # 写入这些用户时阻塞，直到 release 被设置
+        self.blocked_users = set()
+        self.release = threading.Event()
+
+    def __call__(self, user_id, results):
+        if user_id in self.blocked_users:
+            self.release.wait(5)
+        if self.failing:
+            raise ConnectionError('store unavailable')
+        self.calls.append((user_id, list(results)))
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.fixture
+def writer():
+    return Writer()
+
+
+@pytest.fixture
+def make_buffer(writer):
+    buffers = []
+
+    def factory(**kwargs):
+        buffer = WriteBehindBuffer(writer, **kwargs)
+        buffers.append(buffer)
+        return buffer
+    yield factory
+    for buffer in buffers:
+        buffer.close()
+
+
+def test_merges_results_per_user(make_buffer, writer):
+    buffer = make_buffer(max_age=60)
+    buffer.add('u1', 'A', 0.5)
+    buffer.add('u2', 'B', 0.7)
+    buffer.add('u1', 'C', 0.9)
+    assert buffer.pending_count() == 3 and writer.calls == []
+
+    buffer.flush_user('u1')
+    assert writer.calls == [('u1', [('A', 0.5), ('C', 0.9)])]
+    assert buffer.pending_count() == 1
+    buffer.flush()
+    assert writer.calls[1] == ('u2', [('B', 0.7)])
+    assert buffer.stats['flushed'] == 3
+
+
+def test_flushes_when_batch_is_full(make_buffer, writer):
+    buffer = make_buffer(max_batch=3, max_age=60)
+    for concept in 'ABC':
+        buffer.add('u1', concept, 1.0)
+    assert writer.calls == [('u1', [('A', 1.0), ('B', 1.0), ('C', 1.0)])]
+    assert buffer.pending_count() == 0
+
+
+def test_background_flush_after_max_age(make_buffer, writer):
+    buffer = make_buffer(max_age=0.05)
+    buffer.add('u1', 'A', 0.5)
+    assert wait_until(lambda: writer.calls)
+    assert writer.calls == [('u1', [('A', 0.5)])]
+
+
+def test_close_writes_remaining(make_buffer, writer):
+    buffer = make_buffer(max_age=60)
+    buffer.add('u1', 'A', 0.5)
+    buffer.close()
+    assert writer.calls == [('u1', [('A', 0.5)])]
+    buffer.close()
+    assert len(writer.calls) == 1
+
+
+def test_failed_writes_are_requeued_in_order(make_buffer, writer):
+    buffer = make_buffer(max_age=60)
+    buffer.add('u1', 'A', 0.1)
+    writer.failing = True
+    buffer.flush()
+    assert buffer.pending_count() == 1 and buffer.stats['errors'] == 1
+
+    buffer.add('u1', 'B', 0.2)
+    writer.failing = False
+    buffer.flush()
+    assert writer.calls == [('u1', [('A', 0.1), ('B', 0.2)])]
+    assert buffer.pending_count() == 0
+
+
+def test_no_request_thread_flush_while_failing(make_buffer, writer):
+    buffer = make_buffer(max_batch=2, max_age=60, max_pending=4)
+    writer.failing = True
+    buffer.add('u1', 'A', 0.5)
+    buffer.add('u1', 'B', 0.5)
+    attempts = buffer.stats['flushes']
+    assert attempts == 1 and buffer.pending_count() == 2
+
+    # 写入失败后 add 不再在请求线程中写入，达到 max_pending 后拒绝
+    buffer.add('u1', 'C', 0.5)
+    buffer.add('u1', 'D', 0.5)
+    assert buffer.stats['flushes'] == attempts
+    with pytest.raises(WriteBehindFullError):
+        buffer.add('u1', 'E', 0.5)
+    assert buffer.stats['rejected'] == 1 and buffer.pending_count() == 4
+
+
+def test_background_retry_recovers(make_buffer, writer):
+    buffer = make_buffer(max_age=0.02, max_backoff=0.1)
+    writer.failing = True
+    buffer.add('u1', 'A', 0.5)
+    assert wait_until(lambda: buffer.stats['errors'] >= 2)
+    writer.failing = False
+    assert wait_until(lambda: buffer.pending_count() == 0)
+    assert writer.calls == [('u1', [('A', 0.5)])]
+
+
+def test_flush_user_does_not_wait_for_other_users(make_buffer, writer):
+    buffer = make_buffer(max_age=60)
+    writer.blocked_users.add('slow')
+    buffer.add('slow', 'A', 0.5)
+    buffer.add('slow', 'B', 0.5)
+    flusher = threading.Thread(target=buffer.flush)
+    flusher.start()
+    assert wait_until(lambda: buffer.pending_count() == 0)
+
+    # 批量写入阻塞在 slow 用户时，其他用户的 flush_user 直接写入
+    buffer.add('fast', 'C', 0.5)
+    buffer.flush_user('fast')
+    assert writer.calls == [('fast', [('C', 0.5)])]
+
+    # 同一用户的 flush_user 等待正在进行的写入完成，保持写入顺序
+    buffer.add('slow', 'D', 0.5)
+    reader = threading.Thread(target=buffer.flush_user, args=('slow',))
+    reader.start()
+    time.sleep(0.05)
+    assert reader.is_alive()
+    writer.release.set()
+    reader.join(5)
+    flusher.join(5)
+    assert writer.calls[1:] == [('slow', [('A', 0.5), ('B', 0.5)]), ('slow', [('D', 0.5)])]